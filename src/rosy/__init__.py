@@ -1,2 +1,5 @@
 from rosy.node.node import Node
 from rosy.node.builder import build_node, build_node_from_args
+from rosy.node.peer.reconnect import ReconnectPolicy
+from rosy.node.topic.qos import TopicQoS
+from rosy.asyncio import run
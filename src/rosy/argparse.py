@@ -1,7 +1,13 @@
-from argparse import ArgumentParser
+from argparse import ArgumentParser, BooleanOptionalAction
+from typing import get_args
 
-from rosy.types import DomainId
-from rosy.utils import DEFAULT_DOMAIN_ID, get_domain_id
+from rosy.types import DomainId, EventLoopName
+from rosy.utils import (
+    DEFAULT_DOMAIN_ID,
+    get_domain_id,
+    get_eager_tasks,
+    get_event_loop_name,
+)
 
 
 def get_node_arg_parser(
@@ -101,3 +107,34 @@ def add_domain_id_arg(
         variable.
         Default: %(default)r""",
     )
+
+
+def add_event_loop_args(parser: ArgumentParser) -> None:
+    """
+    Adds `--event-loop` and `--eager-tasks` arguments to an argument parser,
+    to pass to `rosy.run`.
+
+    Args:
+        parser:
+            Argument parser to which the arguments will be added.
+    """
+
+    parser.add_argument(
+        "--event-loop",
+        choices=get_args(EventLoopName),
+        default=get_event_loop_name(),
+        help="""Event loop to run on. 'uvloop' requires uvloop to be installed;
+        'auto' uses it if it is. This can also be set with the
+        `ROSY_EVENT_LOOP` environment variable.
+        Default: %(default)r""",
+    )
+
+    parser.add_argument(
+        "--eager-tasks",
+        action=BooleanOptionalAction,
+        default=get_eager_tasks(),
+        help="""Start running new tasks as soon as they are created
+        (Python 3.12+). This can also be set with the `ROSY_EAGER_TASKS`
+        environment variable.
+        Default: %(default)s""",
+    )
@@ -1,9 +1,18 @@
 import asyncio
+import logging
+import sys
 from asyncio import IncompleteReadError, Lock
+from collections.abc import Coroutine, Iterable
 from io import BytesIO
-from typing import Protocol
+from types import ModuleType
+from typing import Any, Protocol, TypeVar, get_args
 
-from rosy.types import Buffer
+from rosy.types import Buffer, EventLoopName
+from rosy.utils import get_eager_tasks, get_event_loop_name, require
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
 
 
 async def cancel_task(task: asyncio.Task, *, timeout: float | None = 10) -> None:
@@ -45,15 +54,130 @@ def noop():
     return asyncio.sleep(0)
 
 
+def run(
+    main: Coroutine[Any, Any, T],
+    *,
+    event_loop: EventLoopName = None,
+    eager_tasks: bool = None,
+) -> T:
+    """
+    Runs the coroutine like ``asyncio.run``, on the chosen event loop.
+
+    Args:
+        main:
+            The coroutine to run, e.g. the node's ``main()``.
+        event_loop:
+            'asyncio' for the standard event loop; 'uvloop' for uvloop, which
+            must be installed (``pip install rosy[uvloop]``); or 'auto' for
+            uvloop if it is installed, and the standard loop otherwise.
+            Defaults to the `ROSY_EVENT_LOOP` environment variable, or
+            'asyncio' if it is not set.
+        eager_tasks:
+            If True, new tasks start running as soon as they are created,
+            until they first have to wait, instead of on the next iteration
+            of the event loop. Requires Python 3.12+; ignored with a warning
+            otherwise. Defaults to the `ROSY_EAGER_TASKS` environment variable
+            (e.g. `1`), or False if it is not set.
+    """
+
+    if event_loop is None:
+        event_loop = get_event_loop_name()
+
+    if eager_tasks is None:
+        eager_tasks = get_eager_tasks()
+
+    try:
+        uvloop = _import_uvloop(event_loop)
+    except BaseException:
+        main.close()
+        raise
+
+    if eager_tasks:
+        if sys.version_info >= (3, 12):
+            main = _run_with_eager_tasks(main)
+        else:
+            logger.warning("Eager tasks require Python 3.12+; not using them")
+
+    if uvloop is None:
+        return asyncio.run(main)
+
+    if sys.version_info >= (3, 11):
+        with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+            return runner.run(main)
+
+    # asyncio.Runner is not available until Python 3.11
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())  # pragma: no cover
+    return asyncio.run(main)  # pragma: no cover
+
+
+def _import_uvloop(event_loop: EventLoopName) -> ModuleType | None:
+    """Returns the uvloop module if it should be used, or None."""
+
+    require(
+        event_loop in get_args(EventLoopName),
+        f"event_loop must be one of {get_args(EventLoopName)}; got {event_loop!r}",
+    )
+
+    if event_loop == "asyncio":
+        return None
+
+    try:
+        import uvloop
+    except ImportError:
+        if event_loop == "auto":
+            return None
+
+        raise ImportError(
+            "uvloop is not installed; install it with `pip install rosy[uvloop]`"
+        ) from None
+
+    return uvloop
+
+
+def eager_task_factory(
+    loop: asyncio.AbstractEventLoop,
+    coro: Coroutine,
+    *,
+    eager_start: bool = None,
+    **kwargs,
+) -> asyncio.Task:
+    """
+    Task factory that starts running tasks as soon as they are created
+    (Python 3.12+). Unlike ``asyncio.eager_task_factory``, it also works on
+    uvloop, which passes ``eager_start`` to the factory.
+    """
+
+    return asyncio.Task(coro, loop=loop, eager_start=True, **kwargs)
+
+
+async def _run_with_eager_tasks(main: Coroutine[Any, Any, T]) -> T:
+    asyncio.get_running_loop().set_task_factory(eager_task_factory)
+    return await main
+
+
 class Reader(Protocol):
     async def readexactly(self, n: int) -> bytes: ...
 
     async def readuntil(self, separator: bytes) -> bytes: ...
 
 
+async def readexactly_view(reader: Reader, n: int) -> Buffer:
+    """
+    Reads exactly ``n`` bytes from the reader, without copying them again if
+    it can. Readers that can do so provide a ``readexactly_view`` method
+    returning a ``memoryview`` (e.g. ``rosy.buffered.BufferedStreamReader``);
+    ``readexactly`` is used for any other reader.
+    """
+
+    read = getattr(reader, "readexactly_view", reader.readexactly)
+    return await read(n)
+
+
 class Writer(Protocol):
     def write(self, data: bytes) -> None: ...
 
+    def writelines(self, data: Iterable[Buffer]) -> None: ...
+
     async def drain(self) -> None: ...
 
     def close(self) -> None: ...
@@ -85,6 +209,10 @@ class LockableWriter(Writer):
         self.require_locked()
         self.writer.write(data)
 
+    def writelines(self, data: Iterable[Buffer]) -> None:
+        self.require_locked()
+        self.writer.writelines(data)
+
     async def drain(self) -> None:
         await self.writer.drain()
 
@@ -120,11 +248,19 @@ class BufferReader(Reader):
     async def readuntil(self, separator: bytes) -> bytes:
         raise NotImplementedError()
 
+    def read_remaining(self) -> bytes:
+        """Returns all the data that has not been read yet."""
+        return self._data.read()
+
 
 class BufferWriter(bytearray, Buffer, Writer):
     def write(self, data: bytes) -> None:
         self.extend(data)
 
+    def writelines(self, data: Iterable[Buffer]) -> None:
+        for chunk in data:
+            self.extend(chunk)
+
     async def drain(self) -> None:
         pass
 
@@ -139,3 +275,65 @@ class BufferWriter(bytearray, Buffer, Writer):
 
     def get_extra_info(self, name: str, default=None):
         raise NotImplementedError()
+
+
+class SegmentedBuffer(BufferWriter):
+    """
+    ``BufferWriter`` that can also refer to buffers it does not own, so large
+    buffers can be written to a connection with ``writelines`` without first
+    being copied into it.
+
+    Data written as usual is copied into the bytearray itself; buffers added
+    with ``add_segment`` are not. ``segments()`` returns both, in the order
+    they were written. ``len()`` only counts the bytes copied in; ``nbytes``
+    is the total.
+    """
+
+    def __init__(self):
+        super().__init__()
+        # Offset into the bytearray each segment was added at
+        self._segments: list[tuple[int, memoryview]] = []
+        self._segments_nbytes = 0
+
+    @property
+    def nbytes(self) -> int:
+        return len(self) + self._segments_nbytes
+
+    def add_segment(self, data: Buffer) -> None:
+        """
+        Adds a contiguous buffer without copying it. It must not be modified
+        until it has been written.
+        """
+
+        view = memoryview(data).cast("B")
+        self._segments.append((len(self), view))
+        self._segments_nbytes += view.nbytes
+
+    def segments(self) -> list[Buffer]:
+        """
+        Returns the data as a list of buffers to be written with
+        ``writelines``. This buffer must not be written to afterward.
+        """
+
+        if not self._segments:
+            return [self]
+
+        view = memoryview(self)
+        segments = []
+        start = 0
+
+        for offset, segment in self._segments:
+            if offset > start:
+                segments.append(view[start:offset])
+            segments.append(segment)
+            start = offset
+
+        if start < len(self):
+            segments.append(view[start:])
+
+        return segments
+
+
+def segments_nbytes(segments: Iterable[Buffer]) -> int:
+    """Returns the total size of the segments, in bytes."""
+    return sum(memoryview(segment).nbytes for segment in segments)
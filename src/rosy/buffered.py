@@ -0,0 +1,378 @@
+"""
+Stream transport built on ``asyncio.BufferedProtocol``.
+
+``asyncio.StreamReader`` receives each chunk as a new ``bytes`` object,
+appends it to an internal ``bytearray``, and slices another ``bytes`` object
+out of that for every read; a multi-MB frame is copied several times on its
+way to the decoder. Here, the socket is read straight into a preallocated
+buffer that is reused for the whole connection, and reads larger than that
+buffer are read straight into a buffer of their own, which is handed to the
+decoder as a ``memoryview`` without any further copy.
+
+The data sent is the same as with ``asyncio`` streams, so either side of a
+connection can use either implementation.
+"""
+
+import asyncio
+from asyncio import IncompleteReadError
+from collections.abc import Awaitable, Callable, Iterable
+
+from rosy.asyncio import Reader, Writer
+from rosy.types import Buffer
+
+DEFAULT_BUFFER_SIZE: int = 256 * 1024
+"""
+Default size of the reusable receive buffer of each connection, in bytes.
+Reads larger than this are read into a buffer of their own.
+"""
+
+
+class BufferedStreamReader(Reader):
+    def __init__(self, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._end = 0
+
+        # Where the socket is read into while reading more than fits in
+        # the buffer
+        self._target: memoryview | None = None
+        self._target_filled = 0
+
+        self._transport: asyncio.Transport | None = None
+        self._paused = False
+        self._eof = False
+        self._exception: BaseException | None = None
+        self._waiter: asyncio.Future | None = None
+
+    async def readexactly(self, n: int) -> bytes:
+        if n <= len(self._buffer):
+            await self._wait_buffered(n)
+            data = bytes(self._view[self._start : self._start + n])
+            self._consume(n)
+            return data
+
+        return bytes(await self._read_into_target(n))
+
+    async def readexactly_view(self, n: int) -> memoryview:
+        """
+        Like ``readexactly``, but returns a read-only ``memoryview``. Reads
+        larger than the buffer are not copied after being received, so the
+        view may be given to decoders that keep references to the data, like
+        ``np.frombuffer``.
+        """
+
+        if n <= len(self._buffer):
+            return memoryview(await self.readexactly(n))
+
+        target = await self._read_into_target(n)
+        return memoryview(target).toreadonly()
+
+    async def readuntil(self, separator: bytes) -> bytes:
+        raise NotImplementedError()
+
+    async def _wait_buffered(self, n: int) -> None:
+        while self._end - self._start < n:
+            if self._eof:
+                data = bytes(self._view[self._start : self._end])
+                self._consume(len(data))
+                raise IncompleteReadError(data, n)
+
+            await self._wait()
+
+    async def _read_into_target(self, n: int) -> bytearray:
+        target = bytearray(n)
+
+        # Start with whatever has already been received
+        buffered = self._end - self._start
+        target[:buffered] = self._view[self._start : self._end]
+        self._consume(buffered)
+
+        self._target = memoryview(target)
+        self._target_filled = buffered
+
+        try:
+            while self._target is not None:
+                if self._eof:
+                    raise IncompleteReadError(bytes(target[: self._target_filled]), n)
+
+                await self._wait()
+        finally:
+            self._target = None
+
+        return target
+
+    async def _wait(self) -> None:
+        if self._exception is not None:
+            raise self._exception
+
+        if self._waiter is not None:
+            raise RuntimeError(
+                "Called while another coroutine is already waiting for data"
+            )
+
+        # The data needed may not fit in what is left of the buffer
+        self._resume_reading()
+
+        self._waiter = asyncio.get_running_loop().create_future()
+        try:
+            await self._waiter
+        finally:
+            self._waiter = None
+
+    def _wake_up(self) -> None:
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    def _consume(self, n: int) -> None:
+        self._start += n
+        if self._start == self._end:
+            self._start = self._end = 0
+
+        if self._end - self._start <= len(self._buffer) // 2:
+            self._resume_reading()
+
+    def _pause_reading(self) -> None:
+        if not self._paused and self._transport is not None:
+            self._paused = True
+            self._transport.pause_reading()
+
+    def _resume_reading(self) -> None:
+        if self._paused and self._transport is not None:
+            self._paused = False
+            self._transport.resume_reading()
+
+    def _get_buffer(self) -> memoryview:
+        if self._target is not None:
+            return self._target[self._target_filled :]
+
+        if self._end == len(self._buffer):
+            # Move the data not read yet to the front, to make room
+            buffered = self._end - self._start
+            self._view[:buffered] = self._view[self._start : self._end]
+            self._start, self._end = 0, buffered
+
+        return self._view[self._end :]
+
+    def _buffer_updated(self, nbytes: int) -> None:
+        if self._target is not None:
+            self._target_filled += nbytes
+            if self._target_filled == len(self._target):
+                self._target = None
+        else:
+            self._end += nbytes
+            if self._end - self._start > len(self._buffer) // 2:
+                # Wait for the data to be read, instead of moving it around
+                # to make room for more
+                self._pause_reading()
+
+        self._wake_up()
+
+    def _feed_eof(self) -> None:
+        self._eof = True
+        self._wake_up()
+
+    def _set_exception(self, exception: BaseException) -> None:
+        self._exception = exception
+        self._wake_up()
+
+
+class BufferedStreamWriter(Writer):
+    def __init__(
+        self,
+        transport: asyncio.Transport,
+        protocol: "BufferedStreamProtocol",
+    ):
+        self.transport = transport
+        self._protocol = protocol
+
+    def write(self, data: bytes) -> None:
+        self.transport.write(data)
+
+    def writelines(self, data: Iterable[Buffer]) -> None:
+        self.transport.writelines(data)
+
+    async def drain(self) -> None:
+        if self.transport.is_closing():
+            # Give connection_lost() a chance to be called
+            await asyncio.sleep(0)
+
+        await self._protocol._wait_writable()
+
+    def close(self) -> None:
+        self.transport.close()
+
+    def is_closing(self) -> bool:
+        return self.transport.is_closing()
+
+    async def wait_closed(self) -> None:
+        await self._protocol._closed
+
+    def get_extra_info(self, name: str, default=None):
+        return self.transport.get_extra_info(name, default)
+
+
+ClientConnectedCallback = Callable[
+    [BufferedStreamReader, BufferedStreamWriter], Awaitable[None]
+]
+
+
+class BufferedStreamProtocol(asyncio.BufferedProtocol):
+    def __init__(
+        self,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+        client_connected_cb: ClientConnectedCallback = None,
+    ):
+        """
+        Reads the connection into a ``BufferedStreamReader``.
+
+        Args:
+            buffer_size:
+                Size of the reusable receive buffer, in bytes.
+            client_connected_cb:
+                Called with the reader and writer once connected, if given.
+                Used by servers.
+        """
+
+        self.reader = BufferedStreamReader(buffer_size)
+        self.writer: BufferedStreamWriter | None = None
+        self.client_connected_cb = client_connected_cb
+
+        loop = asyncio.get_running_loop()
+        self._closed = loop.create_future()
+        self._connection_lost = False
+        self._write_paused = False
+        self._drain_waiters: list[asyncio.Future] = []
+        self._task: asyncio.Task | None = None
+
+    def connection_made(self, transport: asyncio.Transport) -> None:
+        self.reader._transport = transport
+        self.writer = BufferedStreamWriter(transport, self)
+
+        if self.client_connected_cb is not None:
+            self._task = asyncio.create_task(
+                self.client_connected_cb(self.reader, self.writer)
+            )
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        return self.reader._get_buffer()
+
+    def buffer_updated(self, nbytes: int) -> None:
+        self.reader._buffer_updated(nbytes)
+
+    def eof_received(self) -> bool:
+        self.reader._feed_eof()
+
+        # Keep the transport open for writing
+        return True
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        self._connection_lost = True
+
+        if exc is None:
+            self.reader._feed_eof()
+        else:
+            self.reader._set_exception(exc)
+
+        if not self._closed.done():
+            self._closed.set_result(None)
+
+        self._wake_drain_waiters(exc)
+
+    def pause_writing(self) -> None:
+        self._write_paused = True
+
+    def resume_writing(self) -> None:
+        self._write_paused = False
+        self._wake_drain_waiters()
+
+    async def _wait_writable(self) -> None:
+        if self._connection_lost:
+            raise ConnectionResetError("Connection lost")
+
+        if not self._write_paused:
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._drain_waiters.append(waiter)
+        try:
+            await waiter
+        finally:
+            self._drain_waiters.remove(waiter)
+
+    def _wake_drain_waiters(self, exc: Exception | None = None) -> None:
+        for waiter in self._drain_waiters:
+            if waiter.done():
+                continue
+
+            if self._connection_lost:
+                waiter.set_exception(exc or ConnectionResetError("Connection lost"))
+            else:
+                waiter.set_result(None)
+
+
+async def open_connection(
+    host: str = None,
+    port: int = None,
+    *,
+    buffer_size: int = DEFAULT_BUFFER_SIZE,
+    **kwargs,
+) -> tuple[BufferedStreamReader, BufferedStreamWriter]:
+    """Like ``asyncio.open_connection``."""
+
+    loop = asyncio.get_running_loop()
+    _, protocol = await loop.create_connection(
+        lambda: BufferedStreamProtocol(buffer_size), host, port, **kwargs
+    )
+    return protocol.reader, protocol.writer
+
+
+async def open_unix_connection(
+    path: str = None,
+    *,
+    buffer_size: int = DEFAULT_BUFFER_SIZE,
+    **kwargs,
+) -> tuple[BufferedStreamReader, BufferedStreamWriter]:
+    """Like ``asyncio.open_unix_connection``."""
+
+    loop = asyncio.get_running_loop()
+    _, protocol = await loop.create_unix_connection(
+        lambda: BufferedStreamProtocol(buffer_size), path, **kwargs
+    )
+    return protocol.reader, protocol.writer
+
+
+async def start_server(
+    client_connected_cb: ClientConnectedCallback,
+    host=None,
+    port: int = None,
+    *,
+    buffer_size: int = DEFAULT_BUFFER_SIZE,
+    **kwargs,
+) -> asyncio.Server:
+    """Like ``asyncio.start_server``."""
+
+    loop = asyncio.get_running_loop()
+    return await loop.create_server(
+        lambda: BufferedStreamProtocol(buffer_size, client_connected_cb),
+        host,
+        port,
+        **kwargs,
+    )
+
+
+async def start_unix_server(
+    client_connected_cb: ClientConnectedCallback,
+    path: str = None,
+    *,
+    buffer_size: int = DEFAULT_BUFFER_SIZE,
+    **kwargs,
+) -> asyncio.Server:
+    """Like ``asyncio.start_unix_server``."""
+
+    loop = asyncio.get_running_loop()
+    return await loop.create_unix_server(
+        lambda: BufferedStreamProtocol(buffer_size, client_connected_cb),
+        path,
+        **kwargs,
+    )
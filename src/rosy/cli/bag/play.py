@@ -37,7 +37,11 @@ async def _play_main(args: Namespace, node: Node) -> None:
                 args.rate,
             )
 
-        await node.send(topic, *args_, **kwargs_)
+        if args.immediate:
+            # Send as fast as listeners can receive, without dropping messages
+            await node.send_and_wait(topic, *args_, **kwargs_)
+        else:
+            await node.send(topic, *args_, **kwargs_)
 
         if not args.no_log:
             print(f"[{instant}] topic={topic!r}")
@@ -68,7 +72,8 @@ def add_play_args(subparsers) -> None:
     parser.add_argument(
         "--immediate",
         action="store_true",
-        help="Send messages immediately without waiting for the next send time.",
+        help="Send messages immediately without waiting for the next send time. "
+        "Each message is sent once listeners have received the previous one.",
     )
 
     parser.add_argument(
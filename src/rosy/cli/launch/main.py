@@ -6,7 +6,7 @@ from time import sleep
 from rosy.cli.launch.args import ProcessArgs
 from rosy.cli.launch.config import is_enabled, load_config
 from rosy.procman import ProcessManager
-from rosy.types import DomainId
+from rosy.types import DomainId, EventLoopName
 
 
 async def launch_main(args: Namespace) -> None:
@@ -20,7 +20,7 @@ async def launch_main(args: Namespace) -> None:
 
     with ProcessManager() as pm:
         domain_id = config.get("domain_id")
-        node_env = get_node_env(domain_id)
+        node_env = get_node_env(domain_id, args.event_loop, args.eager_tasks)
 
         nodes = config["nodes"]
         for node_name, node_config in nodes.items():
@@ -59,12 +59,27 @@ def add_launch_command(subparsers) -> None:
     )
 
 
-def get_node_env(domain_id: DomainId | None) -> dict[str, str]:
+def get_node_env(
+    domain_id: DomainId | None,
+    event_loop: EventLoopName | None = None,
+    eager_tasks: bool | None = None,
+) -> dict[str, str]:
+    """
+    Returns the environment to start nodes with. Nodes run with `rosy.run`
+    use the same event loop settings as `rosy launch` itself.
+    """
+
     env = dict(os.environ)
 
     if domain_id is not None:
         env["ROSY_DOMAIN_ID"] = domain_id
 
+    if event_loop is not None:
+        env["ROSY_EVENT_LOOP"] = event_loop
+
+    if eager_tasks is not None:
+        env["ROSY_EAGER_TASKS"] = "1" if eager_tasks else "0"
+
     return env
 
 
@@ -1,8 +1,8 @@
 import argparse
-import asyncio
 import sys
 
-from rosy.argparse import add_domain_id_arg
+from rosy.argparse import add_domain_id_arg, add_event_loop_args
+from rosy.asyncio import run
 from rosy.cli.bag.main import add_bag_command, bag_main
 from rosy.cli.launch.main import add_launch_command, launch_main
 from rosy.cli.node.main import add_node_command, node_main
@@ -31,13 +31,6 @@ _add_command_functions = [
 
 
 def main() -> None:
-    try:
-        asyncio.run(_main())
-    except KeyboardInterrupt:
-        pass
-
-
-async def _main():
     parser = get_arg_parser()
 
     if len(sys.argv) <= 1:
@@ -47,7 +40,15 @@ async def _main():
     args = parser.parse_args()
 
     command_main = _command_to_main.get(args.command)
-    await command_main(args)
+
+    try:
+        run(
+            command_main(args),
+            event_loop=args.event_loop,
+            eager_tasks=args.eager_tasks,
+        )
+    except KeyboardInterrupt:
+        pass
 
 
 def get_arg_parser() -> argparse.ArgumentParser:
@@ -56,6 +57,7 @@ def get_arg_parser() -> argparse.ArgumentParser:
     )
 
     add_domain_id_arg(parser)
+    add_event_loop_args(parser)
 
     parser.add_argument(
         "-v",
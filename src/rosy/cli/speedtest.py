@@ -4,6 +4,7 @@ import time
 from argparse import ArgumentParser, Namespace
 
 from rosy import Node, build_node
+from rosy.asyncio import eager_task_factory
 from rosy.types import Topic
 
 
@@ -17,11 +18,15 @@ async def speedtest_main(args: Namespace) -> None:
         domain_id=args.domain_id,
         allow_unix_connections=not args.disable_unix,
         allow_tcp_connections=not args.disable_tcp,
+        allow_shm_connections=args.enable_shm,
         data_codec=args.codec,
+        compression=args.compression,
         topic_load_balancer=load_balancer,
         service_load_balancer=load_balancer,
     )
 
+    print(f"Event loop: {describe_event_loop()}")
+
     speed_tester = SpeedTest(node)
 
     topic = args.topic
@@ -47,6 +52,14 @@ async def speedtest_main(args: Namespace) -> None:
         raise ValueError(f"Invalid role={args.role}")
 
 
+def describe_event_loop() -> str:
+    """Describes the running event loop, to compare results across them."""
+
+    loop = asyncio.get_running_loop()
+    eager_tasks = loop.get_task_factory() is eager_task_factory
+    return f"{type(loop).__module__}; eager_tasks={eager_tasks}"
+
+
 class SpeedTest:
     def __init__(self, node: Node):
         self.node = node
@@ -170,10 +183,15 @@ def add_speedtest_command(subparsers) -> None:
     )
     parser.add_argument(
         "--codec",
-        choices=("pickle", "json", "msgpack"),
+        choices=("pickle", "json", "msgpack", "msgpack-native", "numpy"),
         default="pickle",
         help="Codec to use for encoding/decoding messages. Default: %(default)s.",
     )
+    parser.add_argument(
+        "--compression",
+        choices=("zlib", "lzma", "lz4", "zstd"),
+        help="Compression algorithm to use for large messages. Default: none.",
+    )
     parser.add_argument(
         "--enable-load-balancer",
         action="store_true",
@@ -189,3 +207,8 @@ def add_speedtest_command(subparsers) -> None:
         action="store_true",
         help="Disable TCP sockets for inter-node connections.",
     )
+    parser.add_argument(
+        "--enable-shm",
+        action="store_true",
+        help="Enable shared memory for inter-node connections on the same host.",
+    )
@@ -1,12 +1,34 @@
+import copyreg
+import lzma
 import pickle
+import zlib
 from abc import ABC, abstractmethod
+from asyncio import IncompleteReadError
+from collections import ChainMap
 from collections.abc import Sequence
-from typing import Any, Generic, Literal, TypeVar
+from io import BytesIO
+from typing import Any, Callable, Generic, Literal, NamedTuple, TypeVar
 
 import msgpack
 import orjson
 
-from rosy.asyncio import BufferWriter, Reader, Writer
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+try:
+    import lz4.frame
+except ImportError:  # pragma: no cover
+    lz4 = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+from rosy.asyncio import BufferReader, BufferWriter, Reader, SegmentedBuffer, Writer
+from rosy.types import Buffer
 from rosy.utils import require
 
 T = TypeVar("T")
@@ -29,6 +51,62 @@ class Codec(Generic[T], ABC):
     @abstractmethod
     async def decode(self, reader: Reader) -> T: ...  # pragma: no cover
 
+    @property
+    def supports_sync(self) -> bool:
+        """
+        Whether ``encode_into`` and ``decode_from`` are implemented.
+
+        The synchronous methods avoid creating and awaiting a coroutine per
+        field, and should be used whenever the whole frame is in memory.
+        """
+        return False
+
+    def encode_into(self, buffer: bytearray, obj: T) -> None:
+        """Synchronously encode ``obj`` by appending it to ``buffer``."""
+        raise NotImplementedError(
+            f"{self.__class__.__name__} does not support synchronous encoding"
+        )
+
+    def decode_from(self, data: memoryview, offset: int = 0) -> tuple[T, int]:
+        """
+        Synchronously decode an object from ``data`` starting at ``offset``.
+
+        Returns the decoded object and the offset just past it.
+        """
+        raise NotImplementedError(
+            f"{self.__class__.__name__} does not support synchronous decoding"
+        )
+
+
+def read_from(data: memoryview, offset: int, n: int) -> tuple[memoryview, int]:
+    """
+    Returns ``n`` bytes of ``data`` starting at ``offset``, and the offset
+    just past them. Raises ``IncompleteReadError`` if there are not enough bytes.
+    """
+
+    end = offset + n
+    chunk = data[offset:end]
+
+    if len(chunk) < n:
+        raise IncompleteReadError(bytes(chunk), n)
+
+    return chunk, end
+
+
+def write_segment(buffer: bytearray | Writer, data: Buffer) -> None:
+    """
+    Writes a large buffer to ``buffer`` as a separate segment, without copying
+    it, if ``buffer`` is a ``SegmentedBuffer``; otherwise, copies it in as
+    usual. Works with both ``encode_into`` buffers and ``encode`` writers.
+    """
+
+    if isinstance(buffer, SegmentedBuffer):
+        buffer.add_segment(data)
+    elif isinstance(buffer, bytearray):
+        buffer += data
+    else:
+        buffer.write(data)
+
 
 class FixedLengthIntCodec(Codec[int]):
     def __init__(
@@ -51,6 +129,20 @@ class FixedLengthIntCodec(Codec[int]):
         data = await reader.readexactly(self.length)
         return int.from_bytes(data, byteorder=self.byte_order, signed=self.signed)
 
+    @property
+    def supports_sync(self) -> bool:
+        return True
+
+    def encode_into(self, buffer: bytearray, value: int) -> None:
+        buffer += value.to_bytes(
+            self.length, byteorder=self.byte_order, signed=self.signed
+        )
+
+    def decode_from(self, data: memoryview, offset: int = 0) -> tuple[int, int]:
+        chunk, offset = read_from(data, offset, self.length)
+        value = int.from_bytes(chunk, byteorder=self.byte_order, signed=self.signed)
+        return value, offset
+
 
 class VariableLengthIntCodec(Codec[int]):
     def __init__(
@@ -105,6 +197,42 @@ class VariableLengthIntCodec(Codec[int]):
         data = await reader.readexactly(int_byte_length)
         return int.from_bytes(data, byteorder=self.byte_order, signed=self.signed)
 
+    @property
+    def supports_sync(self) -> bool:
+        return True
+
+    def encode_into(self, buffer: bytearray, value: int) -> None:
+        int_byte_length = byte_length(value)
+
+        if int_byte_length > self.max_byte_length:
+            raise OverflowError(
+                f"Computed byte_length={int_byte_length} is greater than "
+                f"max_byte_length={self.max_byte_length}"
+            )
+
+        buffer.append(int_byte_length)
+
+        if int_byte_length > 0:
+            buffer += value.to_bytes(
+                int_byte_length, byteorder=self.byte_order, signed=self.signed
+            )
+
+    def decode_from(self, data: memoryview, offset: int = 0) -> tuple[int, int]:
+        header, offset = read_from(data, offset, 1)
+
+        int_byte_length = header[0]
+        if int_byte_length == 0:
+            return 0, offset
+
+        require(
+            int_byte_length <= self.max_byte_length,
+            f"Received byte_length={int_byte_length} > max_byte_length={self.max_byte_length}",
+        )
+
+        chunk, offset = read_from(data, offset, int_byte_length)
+        value = int.from_bytes(chunk, byteorder=self.byte_order, signed=self.signed)
+        return value, offset
+
 
 class LengthPrefixedStringCodec(Codec[str]):
     def __init__(
@@ -129,6 +257,23 @@ class LengthPrefixedStringCodec(Codec[str]):
         data = await reader.readexactly(length)
         return data.decode(encoding=self.encoding)
 
+    @property
+    def supports_sync(self) -> bool:
+        return self.len_prefix_codec.supports_sync
+
+    def encode_into(self, buffer: bytearray, data: str) -> None:
+        data = data.encode(encoding=self.encoding)
+        self.len_prefix_codec.encode_into(buffer, len(data))
+        buffer += data
+
+    def decode_from(self, data: memoryview, offset: int = 0) -> tuple[str, int]:
+        length, offset = self.len_prefix_codec.decode_from(data, offset)
+        if length == 0:
+            return "", offset
+
+        chunk, offset = read_from(data, offset, length)
+        return str(chunk, encoding=self.encoding), offset
+
 
 def byte_length(value: int) -> int:
     """Returns the number of bytes required to represent an integer."""
@@ -155,6 +300,28 @@ class SequenceCodec(Generic[T], Codec[Sequence[T]]):
 
         return [await self.item_codec.decode(reader) for _ in range(length)]
 
+    @property
+    def supports_sync(self) -> bool:
+        return self.len_header_codec.supports_sync and self.item_codec.supports_sync
+
+    def encode_into(self, buffer: bytearray, sequence: Sequence[T]) -> None:
+        self.len_header_codec.encode_into(buffer, len(sequence))
+
+        encode_item = self.item_codec.encode_into
+        for item in sequence:
+            encode_item(buffer, item)
+
+    def decode_from(self, data: memoryview, offset: int = 0) -> tuple[Sequence[T], int]:
+        length, offset = self.len_header_codec.decode_from(data, offset)
+
+        decode_item = self.item_codec.decode_from
+        result = []
+        for _ in range(length):
+            item, offset = decode_item(data, offset)
+            result.append(item)
+
+        return result, offset
+
 
 class DictCodec(Generic[K, V], Codec[dict[K, V]]):
     def __init__(
@@ -185,6 +352,40 @@ class DictCodec(Generic[K, V], Codec[dict[K, V]]):
 
         return result
 
+    @property
+    def supports_sync(self) -> bool:
+        return (
+            self.len_header_codec.supports_sync
+            and self.key_codec.supports_sync
+            and self.value_codec.supports_sync
+        )
+
+    def encode_into(self, buffer: bytearray, dict_: dict[K, V]) -> None:
+        self.len_header_codec.encode_into(buffer, len(dict_))
+
+        encode_key, encode_value = (
+            self.key_codec.encode_into,
+            self.value_codec.encode_into,
+        )
+        for key, value in dict_.items():
+            encode_key(buffer, key)
+            encode_value(buffer, value)
+
+    def decode_from(self, data: memoryview, offset: int = 0) -> tuple[dict[K, V], int]:
+        length, offset = self.len_header_codec.decode_from(data, offset)
+
+        decode_key, decode_value = (
+            self.key_codec.decode_from,
+            self.value_codec.decode_from,
+        )
+        result = {}
+        for _ in range(length):
+            key, offset = decode_key(data, offset)
+            value, offset = decode_value(data, offset)
+            result[key] = value
+
+        return result, offset
+
 
 class PickleCodec(Codec[Any]):
     def __init__(
@@ -194,15 +395,68 @@ class PickleCodec(Codec[Any]):
         load_kwargs: dict[str, Any] = None,
         len_header_bytes: int = 4,
         len_header_codec: Codec[int] = None,
+        out_of_band: bool = False,
+        min_out_of_band_size: int = 1024,
     ):
+        """
+        Args:
+            protocol:
+                Pickle protocol to use.
+            dump_kwargs:
+                Additional keyword arguments passed to the pickler.
+            load_kwargs:
+                Additional keyword arguments passed to ``pickle.loads``.
+            len_header_bytes:
+                Number of bytes used for length headers, if ``len_header_codec``
+                is not given.
+            len_header_codec:
+                Codec used for length headers.
+            out_of_band:
+                If True, large buffers (``memoryview``, numpy arrays, and
+                anything else that pickles to a protocol 5 ``PickleBuffer``)
+                are framed as separate segments after the pickle data instead
+                of being copied into the pickle stream. When encoding into a
+                ``SegmentedBuffer``, they are not copied at all (see
+                ``write_segment``), so they must not be modified until the
+                encoded data has been written. On decode, they are
+                handed to ``pickle.loads`` as views over the received data,
+                so they are reconstructed without a copy. ``bytes`` and
+                ``bytearray`` are always pickled in-band by ``pickle``; wrap
+                them in a ``memoryview`` to send them out-of-band.
+                Requires protocol 5 or higher.
+            min_out_of_band_size:
+                Buffers smaller than this many bytes are pickled in-band,
+                since the extra length header is not worth it.
+        """
+
+        if out_of_band:
+            require(
+                protocol >= 5,
+                f"out_of_band requires pickle protocol >= 5; got {protocol}.",
+            )
+
         self.protocol = protocol
         self.dump_kwargs = dump_kwargs or {}
         self.load_kwargs = load_kwargs or {}
         self.len_header_codec = len_header_codec or FixedLengthIntCodec(
             len_header_bytes
         )
+        self.out_of_band = out_of_band
+        self.min_out_of_band_size = min_out_of_band_size
 
     async def encode(self, writer: Writer, obj: Any) -> None:
+        if self.out_of_band:
+            data, buffers = self._dumps_out_of_band(obj)
+            await self.len_header_codec.encode(writer, len(data))
+            writer.write(data)
+
+            await self.len_header_codec.encode(writer, len(buffers))
+            for buffer in buffers:
+                await self.len_header_codec.encode(writer, buffer.nbytes)
+                write_segment(writer, buffer)
+
+            return
+
         buffer = BufferWriter()
         pickle.dump(obj, buffer, protocol=self.protocol, **self.dump_kwargs)
 
@@ -212,12 +466,106 @@ class PickleCodec(Codec[Any]):
     async def decode(self, reader: Reader) -> Any:
         data_len = await self.len_header_codec.decode(reader)
         data = await reader.readexactly(data_len)
-        return pickle.loads(data, **self.load_kwargs)
+
+        if not self.out_of_band:
+            return pickle.loads(data, **self.load_kwargs)
+
+        buffer_count = await self.len_header_codec.decode(reader)
+        buffers = []
+        for _ in range(buffer_count):
+            buffer_len = await self.len_header_codec.decode(reader)
+            buffers.append(await reader.readexactly(buffer_len))
+
+        return pickle.loads(data, buffers=buffers, **self.load_kwargs)
+
+    @property
+    def supports_sync(self) -> bool:
+        return self.len_header_codec.supports_sync
+
+    def encode_into(self, buffer: bytearray, obj: Any) -> None:
+        if self.out_of_band:
+            data, buffers = self._dumps_out_of_band(obj)
+        else:
+            data = pickle.dumps(obj, protocol=self.protocol, **self.dump_kwargs)
+            buffers = None
+
+        self.len_header_codec.encode_into(buffer, len(data))
+        buffer += data
+
+        if buffers is None:
+            return
+
+        self.len_header_codec.encode_into(buffer, len(buffers))
+        for oob_buffer in buffers:
+            self.len_header_codec.encode_into(buffer, oob_buffer.nbytes)
+            write_segment(buffer, oob_buffer)
+
+    def decode_from(self, data: memoryview, offset: int = 0) -> tuple[Any, int]:
+        data_len, offset = self.len_header_codec.decode_from(data, offset)
+        chunk, offset = read_from(data, offset, data_len)
+
+        if not self.out_of_band:
+            return pickle.loads(chunk, **self.load_kwargs), offset
+
+        buffer_count, offset = self.len_header_codec.decode_from(data, offset)
+        buffers = []
+        for _ in range(buffer_count):
+            buffer_len, offset = self.len_header_codec.decode_from(data, offset)
+            buffer, offset = read_from(data, offset, buffer_len)
+            buffers.append(buffer)
+
+        return pickle.loads(chunk, buffers=buffers, **self.load_kwargs), offset
+
+    def _dumps_out_of_band(self, obj: Any) -> tuple[bytes, list[memoryview]]:
+        """Returns the pickle data and the raw out-of-band buffers."""
+
+        buffers = []
+
+        def buffer_callback(buffer: pickle.PickleBuffer) -> bool:
+            """Returns True if the buffer should be pickled in-band."""
+            raw = buffer.raw()
+            if raw.nbytes < self.min_out_of_band_size:
+                return True
+
+            buffers.append(raw)
+            return False
+
+        file = BytesIO()
+        pickler = pickle.Pickler(
+            file,
+            self.protocol,
+            buffer_callback=buffer_callback,
+            **self.dump_kwargs,
+        )
+        pickler.dispatch_table = _out_of_band_dispatch_table
+        pickler.dump(obj)
+
+        return file.getvalue(), buffers
+
+
+def _reduce_memoryview(view: memoryview):
+    if view.contiguous:
+        return memoryview, (pickle.PickleBuffer(view),)
+
+    return memoryview, (view.tobytes(),)
+
+
+_out_of_band_dispatch_table = ChainMap(
+    {memoryview: _reduce_memoryview},
+    copyreg.dispatch_table,
+)
+"""Also allows pickling memoryviews, which are sent out-of-band."""
 
 
 pickle_codec = PickleCodec()
 """Pickle codec with default settings. Encoded data can be up to 4 GiB in size."""
 
+oob_pickle_codec = PickleCodec(out_of_band=True)
+"""
+Pickle codec that sends large buffers out-of-band, avoiding copies for
+large ``memoryview`` and numpy array payloads.
+"""
+
 
 class JsonCodec(Codec[Any]):
     def __init__(
@@ -241,6 +589,20 @@ class JsonCodec(Codec[Any]):
         data = await reader.readexactly(data_len)
         return orjson.loads(data)
 
+    @property
+    def supports_sync(self) -> bool:
+        return self.len_header_codec.supports_sync
+
+    def encode_into(self, buffer: bytearray, obj: T) -> None:
+        data = orjson.dumps(obj, **self.dumps_kwargs)
+        self.len_header_codec.encode_into(buffer, len(data))
+        buffer += data
+
+    def decode_from(self, data: memoryview, offset: int = 0) -> tuple[T, int]:
+        data_len, offset = self.len_header_codec.decode_from(data, offset)
+        chunk, offset = read_from(data, offset, data_len)
+        return orjson.loads(chunk), offset
+
 
 json_codec = JsonCodec()
 """JSON codec with default settings. Encoded data can be up to 4 GiB in size."""
@@ -272,5 +634,384 @@ class MsgpackCodec(Codec[MsgpackTypes]):
         data = await reader.readexactly(data_len)
         return msgpack.unpackb(data, **self.unpack_kwargs)
 
+    @property
+    def supports_sync(self) -> bool:
+        return self.len_header_codec.supports_sync
+
+    def encode_into(self, buffer: bytearray, obj: MsgpackTypes) -> None:
+        data = msgpack.packb(obj, **self.pack_kwargs)
+        self.len_header_codec.encode_into(buffer, len(data))
+        buffer += data
+
+    def decode_from(
+        self, data: memoryview, offset: int = 0
+    ) -> tuple[MsgpackTypes, int]:
+        data_len, offset = self.len_header_codec.decode_from(data, offset)
+        chunk, offset = read_from(data, offset, data_len)
+        return msgpack.unpackb(chunk, **self.unpack_kwargs), offset
+
 
 msgpack_codec = MsgpackCodec()
+
+
+class NumpyCodec(Codec[Any]):
+    """
+    Encodes numpy arrays as a small dtype/order/shape header followed by the
+    raw array data, and decodes them with ``np.frombuffer`` over the received
+    data, without copying. Decoded arrays are read-only. When encoding into a
+    ``SegmentedBuffer``, the array data is not copied either, so the array must
+    not be modified until the encoded data has been written.
+
+    Any other value (including arrays with object or structured dtypes) is
+    encoded with ``fallback_codec``.
+
+    Requires ``numpy`` to be installed to encode or decode arrays.
+    """
+
+    def __init__(
+        self,
+        fallback_codec: Codec[Any] = None,
+        fallback_tag: bytes = b"\x00",
+        array_tag: bytes = b"\x01",
+    ):
+        self.fallback_codec = fallback_codec or pickle_codec
+        self.fallback_tag = fallback_tag
+        self.array_tag = array_tag
+
+        self.dtype_codec = LengthPrefixedStringCodec(FixedLengthIntCodec(length=1))
+        self.shape_codec = SequenceCodec(
+            len_header_codec=FixedLengthIntCodec(length=1),
+            item_codec=FixedLengthIntCodec(length=8),
+        )
+
+    async def encode(self, writer: Writer, obj: Any) -> None:
+        if not self._is_supported_array(obj):
+            writer.write(self.fallback_tag)
+            await self.fallback_codec.encode(writer, obj)
+            return
+
+        array, order = _contiguous_array(obj)
+
+        header = bytearray()
+        self._encode_header_into(header, array, order)
+        writer.write(header)
+        write_segment(writer, _array_data(array, order))
+
+    async def decode(self, reader: Reader) -> Any:
+        tag = await reader.readexactly(1)
+
+        if tag == self.fallback_tag:
+            return await self.fallback_codec.decode(reader)
+        elif tag != self.array_tag:
+            raise ValueError(f"Received unknown tag={tag!r}")
+
+        require_numpy()
+
+        dtype = np.dtype(await self.dtype_codec.decode(reader))
+        order = (await reader.readexactly(1)).decode()
+        shape = await self.shape_codec.decode(reader)
+
+        data = await reader.readexactly(_array_nbytes(dtype, shape))
+        return np.frombuffer(data, dtype=dtype).reshape(shape, order=order)
+
+    @property
+    def supports_sync(self) -> bool:
+        return self.fallback_codec.supports_sync
+
+    def encode_into(self, buffer: bytearray, obj: Any) -> None:
+        if not self._is_supported_array(obj):
+            buffer += self.fallback_tag
+            self.fallback_codec.encode_into(buffer, obj)
+            return
+
+        array, order = _contiguous_array(obj)
+        self._encode_header_into(buffer, array, order)
+        write_segment(buffer, _array_data(array, order))
+
+    def decode_from(self, data: memoryview, offset: int = 0) -> tuple[Any, int]:
+        tag, offset = read_from(data, offset, 1)
+
+        if tag == self.fallback_tag:
+            return self.fallback_codec.decode_from(data, offset)
+        elif tag != self.array_tag:
+            raise ValueError(f"Received unknown tag={bytes(tag)!r}")
+
+        require_numpy()
+
+        dtype, offset = self.dtype_codec.decode_from(data, offset)
+        dtype = np.dtype(dtype)
+        order, offset = read_from(data, offset, 1)
+        order = str(order, encoding="ascii")
+        shape, offset = self.shape_codec.decode_from(data, offset)
+
+        chunk, offset = read_from(data, offset, _array_nbytes(dtype, shape))
+        array = np.frombuffer(chunk, dtype=dtype).reshape(shape, order=order)
+        return array, offset
+
+    def _is_supported_array(self, obj: Any) -> bool:
+        return (
+            np is not None
+            and type(obj) is np.ndarray
+            and not obj.dtype.hasobject
+            and obj.dtype.fields is None
+        )
+
+    def _encode_header_into(self, buffer: bytearray, array, order: str) -> None:
+        buffer += self.array_tag
+        self.dtype_codec.encode_into(buffer, array.dtype.str)
+        buffer += order.encode()
+        self.shape_codec.encode_into(buffer, array.shape)
+
+
+def _contiguous_array(array) -> tuple[Any, str]:
+    """
+    Returns the array and its memory order, "C" or "F". Non-contiguous arrays
+    are copied to be C-contiguous.
+    """
+
+    if array.flags.c_contiguous:
+        return array, "C"
+    elif array.flags.f_contiguous:
+        return array, "F"
+
+    return np.ascontiguousarray(array), "C"
+
+
+def _array_data(array, order: str) -> memoryview:
+    """Returns a view of the raw data of a contiguous array, without copying it."""
+    return array.ravel(order=order).view(np.uint8).data
+
+
+def _array_nbytes(dtype, shape: Sequence[int]) -> int:
+    nbytes = dtype.itemsize
+    for dim in shape:
+        nbytes *= dim
+    return nbytes
+
+
+def require_numpy() -> None:
+    if np is None:
+        raise ImportError("numpy must be installed to encode or decode numpy arrays")
+
+
+numpy_codec = NumpyCodec()
+"""
+Codec that encodes numpy arrays natively, and falls back to pickle for
+everything else. Requires ``numpy`` to be installed.
+"""
+
+
+CompressionAlgorithm = Literal["zlib", "lzma", "lz4", "zstd"]
+
+
+class Compression(NamedTuple):
+    tag: bytes
+    compress: Callable[[Buffer, int | None], bytes]
+    decompress: Callable[[Buffer], bytes]
+    is_available: Callable[[], bool] = lambda: True
+
+
+def _zlib_compress(data: Buffer, level: int | None) -> bytes:
+    return zlib.compress(data, -1 if level is None else level)
+
+
+def _lzma_compress(data: Buffer, level: int | None) -> bytes:
+    return lzma.compress(data, preset=level)
+
+
+def _lz4_compress(data: Buffer, level: int | None) -> bytes:
+    return lz4.frame.compress(data, compression_level=level or 0)
+
+
+def _lz4_decompress(data: Buffer) -> bytes:
+    return lz4.frame.decompress(data)
+
+
+def _zstd_compress(data: Buffer, level: int | None) -> bytes:
+    return zstandard.ZstdCompressor(level=3 if level is None else level).compress(data)
+
+
+def _zstd_decompress(data: Buffer) -> bytes:
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+COMPRESSIONS: dict[CompressionAlgorithm, Compression] = {
+    "zlib": Compression(b"\x01", _zlib_compress, zlib.decompress),
+    "lzma": Compression(b"\x02", _lzma_compress, lzma.decompress),
+    "lz4": Compression(
+        b"\x03", _lz4_compress, _lz4_decompress, lambda: lz4 is not None
+    ),
+    "zstd": Compression(
+        b"\x04", _zstd_compress, _zstd_decompress, lambda: zstandard is not None
+    ),
+}
+"""Supported compression algorithms. lz4 and zstd require optional packages."""
+
+_COMPRESSIONS_BY_TAG: dict[bytes, Compression] = {
+    compression.tag: compression for compression in COMPRESSIONS.values()
+}
+
+
+class CompressedCodec(Codec[T]):
+    """
+    Wraps another codec and compresses its encoded data if it is at least
+    ``min_size`` bytes. A header byte marks whether the data is compressed,
+    and with which algorithm.
+    """
+
+    def __init__(
+        self,
+        inner_codec: Codec[T],
+        algorithm: CompressionAlgorithm = "zlib",
+        min_size: int = 1024,
+        level: int | None = None,
+        adaptive: bool = False,
+        max_ratio: float = 0.9,
+        skip_count: int = 100,
+        len_header_bytes: int = 4,
+        len_header_codec: Codec[int] = None,
+        raw_tag: bytes = b"\x00",
+    ):
+        """
+        Args:
+            inner_codec:
+                Codec used to encode the data before compression.
+            algorithm:
+                Compression algorithm; one of 'zlib', 'lzma', 'lz4', or 'zstd'.
+                'lz4' and 'zstd' require the ``lz4`` and ``zstandard``
+                packages, respectively.
+            min_size:
+                Encoded data smaller than this many bytes is not compressed.
+            level:
+                Compression level. If None, the algorithm's default is used.
+            adaptive:
+                If True, compression is turned off for the next
+                ``skip_count`` values whenever compressing a value does not
+                get its size below ``max_ratio`` of the original size.
+            max_ratio:
+                Compressed size / original size above which compression is
+                considered not worth it. Compressed data is only sent if it
+                is smaller than the original.
+            skip_count:
+                Number of values to skip compressing in adaptive mode.
+            len_header_bytes:
+                Number of bytes used for the compressed data length header,
+                if ``len_header_codec`` is not given.
+            len_header_codec:
+                Codec used for the compressed data length header.
+            raw_tag:
+                Header byte marking uncompressed data.
+        """
+
+        require(
+            algorithm in COMPRESSIONS,
+            f"algorithm must be one of {list(COMPRESSIONS)}; got {algorithm!r}.",
+        )
+
+        compression = COMPRESSIONS[algorithm]
+        if not compression.is_available():
+            raise ImportError(
+                f"The package required for compression algorithm={algorithm!r} "
+                f"is not installed."
+            )
+
+        self.inner_codec = inner_codec
+        self.algorithm = algorithm
+        self.min_size = min_size
+        self.level = level
+        self.adaptive = adaptive
+        self.max_ratio = max_ratio
+        self.skip_count = skip_count
+        self.len_header_codec = len_header_codec or FixedLengthIntCodec(
+            len_header_bytes
+        )
+        self.raw_tag = raw_tag
+
+        self._compression = compression
+        self._skip_remaining = 0
+
+    async def encode(self, writer: Writer, obj: T) -> None:
+        data = BufferWriter()
+        await self.inner_codec.encode(data, obj)
+
+        compressed = self._compress(data)
+
+        if compressed is None:
+            writer.write(self.raw_tag)
+            writer.write(data)
+        else:
+            writer.write(self._compression.tag)
+            # The length header codec may not support sync encoding
+            await self.len_header_codec.encode(writer, len(compressed))
+            writer.write(compressed)
+
+    async def decode(self, reader: Reader) -> T:
+        tag = await reader.readexactly(1)
+
+        if tag == self.raw_tag:
+            return await self.inner_codec.decode(reader)
+
+        compression = self._get_compression(tag)
+        data_len = await self.len_header_codec.decode(reader)
+        data = await reader.readexactly(data_len)
+        data = compression.decompress(data)
+        return await self.inner_codec.decode(BufferReader(data))
+
+    @property
+    def supports_sync(self) -> bool:
+        return self.inner_codec.supports_sync and self.len_header_codec.supports_sync
+
+    def encode_into(self, buffer: bytearray, obj: T) -> None:
+        data = bytearray()
+        self.inner_codec.encode_into(data, obj)
+        self._encode_data_into(buffer, data)
+
+    def decode_from(self, data: memoryview, offset: int = 0) -> tuple[T, int]:
+        tag, offset = read_from(data, offset, 1)
+
+        if tag == self.raw_tag:
+            return self.inner_codec.decode_from(data, offset)
+
+        compression = self._get_compression(bytes(tag))
+        data_len, offset = self.len_header_codec.decode_from(data, offset)
+        chunk, offset = read_from(data, offset, data_len)
+        chunk = compression.decompress(chunk)
+
+        obj, _ = self.inner_codec.decode_from(memoryview(chunk))
+        return obj, offset
+
+    def _encode_data_into(self, buffer: bytearray, data: Buffer) -> None:
+        compressed = self._compress(data)
+
+        if compressed is None:
+            buffer += self.raw_tag
+            buffer += data
+        else:
+            buffer += self._compression.tag
+            self.len_header_codec.encode_into(buffer, len(compressed))
+            buffer += compressed
+
+    def _compress(self, data: Buffer) -> bytes | None:
+        """Returns the compressed data, or None if it should be sent raw."""
+
+        size = len(data)
+        if size < self.min_size:
+            return None
+
+        if self._skip_remaining > 0:
+            self._skip_remaining -= 1
+            return None
+
+        compressed = self._compression.compress(data, self.level)
+
+        if self.adaptive and len(compressed) > self.max_ratio * size:
+            self._skip_remaining = self.skip_count
+
+        return compressed if len(compressed) < size else None
+
+    def _get_compression(self, tag: bytes) -> Compression:
+        compression = _COMPRESSIONS_BY_TAG.get(tag)
+        if compression is None:
+            raise ValueError(f"Received unknown compression tag={tag!r}")
+
+        return compression
@@ -1,7 +1,6 @@
-import asyncio
 import logging
 
-from rosy import build_node
+from rosy import build_node, run
 from rosy.types import Service
 
 
@@ -19,4 +18,4 @@ async def multiply(service: Service, a: int, b: int) -> int:
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run(main())
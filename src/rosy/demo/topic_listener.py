@@ -1,7 +1,6 @@
-import asyncio
 import logging
 
-from rosy import build_node
+from rosy import build_node, run
 from rosy.types import Topic
 
 
@@ -19,4 +18,4 @@ async def callback(topic: Topic, message: str, name: str = None):
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run(main())
@@ -1,7 +1,6 @@
-import asyncio
 import logging
 
-from rosy import build_node
+from rosy import build_node, run
 
 
 async def main():
@@ -12,4 +11,4 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run(main())
@@ -10,7 +10,7 @@ from typing import cast
 
 from zeroconf import ServiceBrowser, ServiceInfo, ServiceStateChange, Zeroconf
 
-from rosy.asyncio import cancel_task
+from rosy.asyncio import cancel_task, noop
 from rosy.discovery.base import NodeDiscovery, TopologyChangedCallback
 from rosy.specs import MeshNodeSpec, MeshTopologySpec
 from rosy.types import DomainId
@@ -176,6 +176,10 @@ class ZeroconfNodeDiscovery(NodeDiscovery):
             self._node_monitors.pop(name)
 
     async def _monitor_node(self, name: str) -> None:
+        # With eager tasks, this starts running before it is registered
+        # as the node's monitor task
+        await noop()
+
         while await self._check_node(name):
             sleep_time = self._ttl + 1 + self._rng.random()
             await asyncio.sleep(sleep_time)
@@ -1,22 +1,30 @@
 from argparse import Namespace
-from typing import Literal
+from collections.abc import Iterable, Mapping, Sequence
+from typing import Literal, get_args
 
 from rosy import Node
 from rosy.argparse import get_node_arg_parser
 from rosy.codec import (
     Codec,
+    CompressedCodec,
+    CompressionAlgorithm,
     DictCodec,
     FixedLengthIntCodec,
     LengthPrefixedStringCodec,
     SequenceCodec,
     json_codec,
     msgpack_codec,
+    numpy_codec,
     pickle_codec,
 )
 from rosy.discovery.zeroconf import ZeroconfNodeDiscovery
 from rosy.network import get_lan_hostname
 from rosy.node.clienthandler import ClientHandler
-from rosy.node.codec import NodeMessageCodec
+from rosy.node.codec import (
+    SUPPORTED_FEATURES,
+    NodeMessageCodec,
+    NodeMessageCodecSelector,
+)
 from rosy.node.loadbalancing import (
     GroupingTopicLoadBalancer,
     LeastRecentLoadBalancer,
@@ -25,28 +33,39 @@ from rosy.node.loadbalancing import (
     node_name_group_key,
 )
 from rosy.node.peer.connection import PeerConnectionBuilder, PeerConnectionManager
+from rosy.node.peer.prewarm import ConnectionPrewarmer
+from rosy.node.peer.reconnect import ReconnectPolicy
 from rosy.node.peer.selector import PeerSelector
 from rosy.node.servers import (
     ServerProvider,
     ServersManager,
+    SharedMemoryServerProvider,
     TcpServerProvider,
+    TmpUnixDatagramServerProvider,
     TmpUnixServerProvider,
+    UdpServerProvider,
 )
 from rosy.node.service.caller import ServiceCaller
 from rosy.node.service.codec import ServiceRequestCodec, ServiceResponseCodec
 from rosy.node.service.handlermanager import ServiceHandlerManager
 from rosy.node.service.requesthandler import ServiceRequestHandler
 from rosy.node.topic.codec import TopicMessageCodec
+from rosy.node.topic.datagram import DatagramSender
+from rosy.node.topic.inprocess import InProcessInbox, InProcessSender
 from rosy.node.topic.listenermanager import TopicListenerManager
 from rosy.node.topic.messagehandler import TopicMessageHandler
+from rosy.node.topic.multicast import MulticastReceiver, MulticastSender
 from rosy.node.topic.outbox import NodeOutboxManager
+from rosy.node.topic.qos import TopicQoS, TopicQoSManager
 from rosy.node.topic.sender import TopicSender
 from rosy.node.topology import MeshTopologyManager, TopologyChangedHandler
+from rosy.node.types import Args, KWArgs
 from rosy.specs import NodeId
-from rosy.types import Data, DomainId, Host, ServerHost
+from rosy.types import Data, DomainId, Host, Priority, ServerHost, Service, Topic
 from rosy.utils import get_domain_id
 
-DataCodecArg = Codec[Data] | Literal["pickle", "json", "msgpack"]
+DataCodecName = Literal["pickle", "json", "msgpack", "msgpack-native", "numpy"]
+DataCodecArg = Codec[Data] | DataCodecName
 
 
 async def build_node_from_args(
@@ -81,11 +100,25 @@ async def build_node(
     domain_id: DomainId = None,
     allow_unix_connections: bool = True,
     allow_tcp_connections: bool = True,
+    allow_shm_connections: bool = False,
+    allow_datagrams: bool = False,
+    allow_in_process: bool = False,
+    copy_in_process_messages: bool = True,
+    buffered_connections: bool = False,
     node_server_host: ServerHost = None,
     node_client_host: Host = None,
     data_codec: DataCodecArg = "pickle",
+    data_codecs: Sequence[DataCodecName] = None,
+    compression: CompressionAlgorithm | None = None,
     topic_load_balancer: TopicLoadBalancer = None,
     service_load_balancer: ServiceLoadBalancer = None,
+    default_topic_qos: TopicQoS = None,
+    topic_qos: Mapping[Topic, TopicQoS] = None,
+    service_priorities: Mapping[Service, Priority] = None,
+    prewarm_connections: bool = False,
+    prewarm_topics: Iterable[Topic] = (),
+    prewarm_services: Iterable[Service] = (),
+    reconnect_policy: ReconnectPolicy = None,
     start: bool = True,
     **kwargs,
 ) -> Node:
@@ -105,18 +138,96 @@ async def build_node(
             Unix sockets. Defaults to True.
         allow_tcp_connections: Whether to allow connections to the node over
             TCP sockets. Defaults to True.
+        allow_shm_connections: Whether to allow connections to the node over
+            shared memory. When allowed, nodes on the same host will prefer it
+            over the other connection types. Each connection uses two ring
+            buffers of shared memory, so it is off by default. Only supported
+            on x86 machines; ignored with an error logged elsewhere.
+        allow_datagrams: Whether to accept best-effort topic messages as
+            datagrams; see `TopicQoS.best_effort`. Unix datagrams are used by
+            nodes on the same host if `allow_unix_connections` is True, and
+            UDP by other nodes if `allow_tcp_connections` is True. Off by
+            default.
+        allow_in_process: Whether to deliver topic messages directly to
+            listeners running in the same process, including this node,
+            instead of encoding them and sending them through a socket. Both
+            nodes must allow it. Messages delivered this way skip the topic's
+            QoS; they are dropped if 1000 are waiting for the listener, unless
+            sent with `send_and_wait`. Messages sent with `send_raw`, or to
+            raw listeners, still go through sockets. Off by default.
+        copy_in_process_messages: If True, the default, listeners in the same
+            process get deep copies of the args and kwargs sent, as if they
+            had been encoded and decoded. If False, they get the very objects
+            that were sent, which must then not be modified by anyone.
+        buffered_connections: Whether to read TCP and Unix connections, both
+            to and from the node, straight into reusable buffers, and to read
+            frames larger than those into a buffer of their own, which is
+            decoded without copying it. Reduces copies and allocations for
+            large messages. Works with nodes that do not use it. Off by
+            default.
         node_server_host: Hostname to use for the node's server. If not given,
             the node will listen on all available network interfaces.
         node_client_host: Hostname that other nodes will use to connect to this
             node. If not given, defaults to the machine's mDNS hostname, e.g.
             "<hostname>.local".
         data_codec: A codec to use for serializing and deserializing data
-            between nodes. Can be one of 'pickle', 'json', or 'msgpack';
-            or, a custom Codec instance. Defaults to 'pickle'.
+            between nodes. Can be one of 'pickle', 'json', 'msgpack',
+            'msgpack-native', or 'numpy'; or, a custom Codec instance.
+            Defaults to 'pickle'. 'msgpack-native' packs all the args, and
+            all the kwargs, of a message as one msgpack object each, instead
+            of packing every value separately; it is faster, but not
+            compatible with 'msgpack'. Messages are still sent in rosy's
+            length-prefixed frames; msgpack does not stream-decode the
+            connection.
+            'numpy' sends numpy arrays without pickling and decodes them
+            without copying, and uses pickle for all other data; it requires
+            `numpy` to be installed.
+        data_codecs: Names of the data codecs this node supports, in order
+            of preference (fastest first). The node advertises them to the
+            mesh, and each pair of nodes uses the first codec of the sender's
+            list that the receiver also supports. `data_codec` is still used
+            with nodes that do not advertise any codecs. This allows switching
+            a live mesh to a faster codec one node at a time. Defaults to just
+            `data_codec`, if it is a name.
+        compression: Compression algorithm to apply to encoded data larger
+            than 1 KiB; one of 'zlib', 'lzma', 'lz4', or 'zstd'. 'lz4' and
+            'zstd' require the `lz4` and `zstandard` packages, respectively.
+            Defaults to no compression. For more control, wrap the data codec
+            in a `CompressedCodec` instead. All nodes in a mesh must use the
+            same setting; nodes negotiating codecs only match codecs with the
+            same compression.
         topic_load_balancer: A load balancer to use for distributing topic
             messages. Defaults to a least-recently-used load balancer.
         service_load_balancer: A load balancer to use for distributing service
             requests. Defaults to a least-recently-used load balancer.
+        default_topic_qos: QoS to use when sending topic messages to other
+            nodes, for topics that neither `topic_qos` nor the listening node
+            sets a QoS for. Defaults to `TopicQoS()`: up to 100 messages
+            per topic per node, dropping the oldest when full, and dropping
+            messages not sent within 5 seconds.
+        topic_qos: QoS to use when sending messages on specific topics.
+            These take precedence over any QoS requested by listeners.
+            Set `TopicQoS.priority` to send a topic over a separate
+            connection, e.g. so control messages are not delayed behind
+            large messages on other topics.
+        service_priorities: Priority of the connection to send requests for
+            specific services on; 'normal' for services not given.
+        prewarm_connections: Whether to open connections in the background
+            to discovered nodes that listen to topics this node has sent on,
+            or provide services it has called, so sending to a new node does
+            not wait for the connection to be made. Defaults to False.
+        prewarm_topics: Topics this node will send on, to pre-warm
+            connections for before the first message is sent. Implies
+            `prewarm_connections`.
+        prewarm_services: Services this node will call, to pre-warm
+            connections for before the first call. Implies
+            `prewarm_connections`.
+        reconnect_policy: How long to wait before trying to connect to a
+            node again after failing to, e.g. because it crashed and has not
+            been removed from the mesh yet. Messages and service calls to the
+            node fail right away while waiting, instead of each trying to
+            connect. Defaults to `ReconnectPolicy()`: 0.1 seconds after the
+            first failure, doubling after each failed retry, up to 10 seconds.
         start: Whether to start the node immediately. Defaults to True.
             If False, the user must call `await node.start()` before the node
             will be ready to use.
@@ -126,34 +237,41 @@ async def build_node(
     discovery = ZeroconfNodeDiscovery(domain_id=domain_id)
 
     topic_listener_manager = TopicListenerManager()
+    topic_message_handler = TopicMessageHandler(topic_listener_manager)
     service_handler_manager = ServiceHandlerManager()
 
     request_id_bytes = 2
-    node_message_codec = build_node_message_codec(request_id_bytes, data_codec)
+    codec_selector = build_node_message_codec_selector(
+        request_id_bytes, data_codec, data_codecs, compression
+    )
 
     servers_manager = build_servers_manager(
         allow_unix_connections,
         allow_tcp_connections,
+        allow_shm_connections,
+        allow_datagrams,
         node_server_host,
         node_client_host,
-        topic_listener_manager,
+        topic_message_handler,
         service_handler_manager,
-        node_message_codec,
+        codec_selector,
+        buffered_connections,
     )
 
     topology_manager = MeshTopologyManager()
 
     connection_manager = PeerConnectionManager(
-        PeerConnectionBuilder(),
+        PeerConnectionBuilder(buffered=buffered_connections),
+        codec_selector,
+        reconnect_policy,
     )
 
-    outbox_manager = NodeOutboxManager(connection_manager)
+    outbox_manager = NodeOutboxManager(connection_manager, codec_selector)
 
-    discovery.topology_changed_callback = TopologyChangedHandler(
-        topology_manager,
-        connection_manager,
-        outbox_manager,
-    )
+    datagram_sender = DatagramSender(codec_selector)
+
+    prewarm_topics = list(prewarm_topics)
+    prewarm_services = list(prewarm_services)
 
     peer_selector = build_peer_selector(
         topology_manager,
@@ -161,13 +279,45 @@ async def build_node(
         service_load_balancer,
     )
 
-    topic_sender = TopicSender(peer_selector, node_message_codec, outbox_manager)
+    topic_sender = TopicSender(
+        peer_selector,
+        codec_selector,
+        outbox_manager,
+        TopicQoSManager(default_topic_qos, topic_qos),
+        datagram_sender,
+        MulticastSender(domain_id),
+        prewarm_topics,
+        (
+            InProcessSender(copy_messages=copy_in_process_messages)
+            if allow_in_process
+            else None
+        ),
+    )
 
     service_caller = ServiceCaller(
         peer_selector,
         connection_manager,
-        node_message_codec,
+        codec_selector,
         max_request_ids=2 ** (8 * request_id_bytes),
+        service_priorities=service_priorities,
+        services=prewarm_services,
+    )
+
+    connection_prewarmer = (
+        ConnectionPrewarmer(
+            connection_manager,
+            [topic_sender.get_priorities, service_caller.get_priorities],
+        )
+        if prewarm_connections or prewarm_topics or prewarm_services
+        else None
+    )
+
+    discovery.topology_changed_callback = TopologyChangedHandler(
+        topology_manager,
+        connection_manager,
+        outbox_manager,
+        datagram_sender,
+        connection_prewarmer,
     )
 
     node = Node(
@@ -179,6 +329,14 @@ async def build_node(
         topic_listener_manager=topic_listener_manager,
         service_caller=service_caller,
         service_handler_manager=service_handler_manager,
+        data_codecs=codec_selector.names,
+        features=SUPPORTED_FEATURES,
+        multicast_receiver=MulticastReceiver(
+            domain_id, servers_manager.datagram_received_cb
+        ),
+        in_process_inbox=(
+            InProcessInbox(topic_message_handler) if allow_in_process else None
+        ),
     )
 
     if start:
@@ -187,11 +345,44 @@ async def build_node(
     return node
 
 
+def build_node_message_codec_selector(
+    request_id_bytes: int,
+    data_codec: DataCodecArg,
+    data_codecs: Sequence[DataCodecName] | None,
+    compression: CompressionAlgorithm | None = None,
+) -> NodeMessageCodecSelector:
+    default_codec = build_node_message_codec(request_id_bytes, data_codec, compression)
+
+    if data_codecs is None:
+        data_codecs = [data_codec] if isinstance(data_codec, str) else []
+
+    codecs = {}
+    for name in data_codecs:
+        if name not in get_args(DataCodecName):
+            raise ValueError(f"Unknown data codec name: {name!r}")
+
+        codec = (
+            default_codec
+            if name == data_codec
+            else build_node_message_codec(request_id_bytes, name, compression)
+        )
+
+        # Peers must agree on compression as well as on the codec
+        codecs[f"{name}+{compression}" if compression else name] = codec
+
+    return NodeMessageCodecSelector(default_codec, codecs)
+
+
 def build_node_message_codec(
     request_id_bytes: int,
     data_codec: DataCodecArg,
+    compression: CompressionAlgorithm | None = None,
 ) -> NodeMessageCodec:
-    data_codec = build_data_codec(data_codec)
+    msgpack_native = data_codec == "msgpack-native"
+    if msgpack_native:
+        data_codec = "msgpack"
+
+    data_codec = build_data_codec(data_codec, compression)
 
     short_string_codec = LengthPrefixedStringCodec(
         len_prefix_codec=FixedLengthIntCodec(length=1)
@@ -199,16 +390,23 @@ def build_node_message_codec(
 
     short_int_codec = FixedLengthIntCodec(length=1)
 
-    args_codec: SequenceCodec[Data] = SequenceCodec(
-        len_header_codec=short_int_codec,
-        item_codec=data_codec,
-    )
+    args_codec: Codec[Args]
+    kwargs_codec: Codec[KWArgs]
+    if msgpack_native:
+        # msgpack handles the lists and dicts itself, in a single call each;
+        # the frame around them, and the topic, are still encoded by rosy
+        args_codec = kwargs_codec = data_codec
+    else:
+        args_codec = SequenceCodec(
+            len_header_codec=short_int_codec,
+            item_codec=data_codec,
+        )
 
-    kwargs_codec: DictCodec[str, Data] = DictCodec(
-        len_header_codec=short_int_codec,
-        key_codec=short_string_codec,
-        value_codec=data_codec,
-    )
+        kwargs_codec = DictCodec(
+            len_header_codec=short_int_codec,
+            key_codec=short_string_codec,
+            value_codec=data_codec,
+        )
 
     request_id_codec = FixedLengthIntCodec(length=request_id_bytes)
 
@@ -234,35 +432,44 @@ def build_node_message_codec(
     )
 
 
-def build_data_codec(data_codec: DataCodecArg) -> Codec[Data]:
+def build_data_codec(
+    data_codec: DataCodecArg,
+    compression: CompressionAlgorithm | None = None,
+) -> Codec[Data]:
     if data_codec == "pickle":
-        return pickle_codec
+        data_codec = pickle_codec
     elif data_codec == "json":
-        return json_codec
+        data_codec = json_codec
     elif data_codec == "msgpack":
-        return msgpack_codec
-    else:
-        return data_codec
+        data_codec = msgpack_codec
+    elif data_codec == "numpy":
+        data_codec = numpy_codec
+
+    if compression:
+        data_codec = CompressedCodec(data_codec, algorithm=compression)
+
+    return data_codec
 
 
 def build_servers_manager(
     allow_unix_connections: bool,
     allow_tcp_connections: bool,
+    allow_shm_connections: bool,
+    allow_datagrams: bool,
     node_server_host: ServerHost,
     node_client_host: Host | None,
-    topic_listener_manager: TopicListenerManager,
+    topic_message_handler: TopicMessageHandler,
     service_handler_manager: ServiceHandlerManager,
-    node_message_codec: NodeMessageCodec,
+    codec_selector: NodeMessageCodecSelector,
+    buffered_connections: bool = False,
 ) -> ServersManager:
-    topic_message_handler = TopicMessageHandler(topic_listener_manager)
-
     service_request_handler = ServiceRequestHandler(
         service_handler_manager,
-        node_message_codec,
+        codec_selector.default_codec,
     )
 
     client_handler = ClientHandler(
-        node_message_codec,
+        codec_selector,
         topic_message_handler,
         service_request_handler,
     )
@@ -270,31 +477,54 @@ def build_servers_manager(
     server_providers = build_server_providers(
         allow_unix_connections,
         allow_tcp_connections,
+        allow_shm_connections,
         node_server_host,
         node_client_host,
+        allow_datagrams,
+        buffered_connections,
     )
 
-    return ServersManager(server_providers, client_handler.handle_client)
+    return ServersManager(
+        server_providers,
+        client_handler.handle_client,
+        datagram_received_cb=client_handler.handle_datagram,
+    )
 
 
 def build_server_providers(
     allow_unix_connections: bool,
     allow_tcp_connections: bool,
+    allow_shm_connections: bool,
     node_server_host: ServerHost | None,
     node_client_host: Host | None,
+    allow_datagrams: bool = False,
+    buffered_connections: bool = False,
 ) -> list[ServerProvider]:
     server_providers = []
 
+    # Connection specs are tried in order, so this comes first
+    if allow_shm_connections:
+        server_providers.append(SharedMemoryServerProvider())
+
     if allow_unix_connections:
-        server_providers.append(TmpUnixServerProvider())
+        server_providers.append(TmpUnixServerProvider(buffered=buffered_connections))
+
+        if allow_datagrams:
+            server_providers.append(TmpUnixDatagramServerProvider())
 
     if allow_tcp_connections:
         if not node_client_host:
             node_client_host = get_lan_hostname()
 
-        provider = TcpServerProvider(node_server_host, node_client_host)
+        provider = TcpServerProvider(
+            node_server_host, node_client_host, buffered=buffered_connections
+        )
         server_providers.append(provider)
 
+        if allow_datagrams:
+            provider = UdpServerProvider(node_server_host, node_client_host)
+            server_providers.append(provider)
+
     if not server_providers:
         raise ValueError("Must allow at least one type of connection")
 
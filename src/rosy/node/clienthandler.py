@@ -1,12 +1,20 @@
 import asyncio
 import logging
 
-from rosy.asyncio import LockableWriter, Reader, Writer
-from rosy.node.codec import NodeMessageCodec
+from rosy.asyncio import (
+    BufferReader,
+    LockableWriter,
+    Reader,
+    Writer,
+    close_ignoring_errors,
+)
+from rosy.node.codec import MalformedFrameError, NodeMessageCodecSelector
 from rosy.node.service.requesthandler import ServiceRequestHandler
 from rosy.node.service.types import ServiceRequest
 from rosy.node.topic.messagehandler import TopicMessageHandler
-from rosy.node.topic.types import TopicMessage
+from rosy.node.topic.types import RawTopicMessage, TopicMessage
+from rosy.node.types import ConnectionHello
+from rosy.types import Topic
 
 logger = logging.getLogger(__name__)
 
@@ -14,11 +22,11 @@ logger = logging.getLogger(__name__)
 class ClientHandler:
     def __init__(
         self,
-        node_message_codec: NodeMessageCodec,
+        codec_selector: NodeMessageCodecSelector,
         topic_message_handler: TopicMessageHandler,
         service_request_handler: ServiceRequestHandler,
     ):
-        self.node_message_codec = node_message_codec
+        self.codec_selector = codec_selector
         self.topic_message_handler = topic_message_handler
         self.service_request_handler = service_request_handler
 
@@ -29,22 +37,96 @@ class ClientHandler:
         logger.debug(f"New connection from: {peer_name}")
 
         writer = LockableWriter(writer)
+        topic_ids: dict[int, Topic] = {}
+        callback_table = self.topic_message_handler.new_callback_table()
+
+        # Until the client says otherwise
+        data_codec = None
+        node_message_codec = self.codec_selector.default_codec
 
         while True:
             try:
-                obj = await self.node_message_codec.decode_topic_message_or_service_request(
-                    reader
+                obj = await node_message_codec.decode_topic_message_or_service_request(
+                    reader, topic_ids, self.topic_message_handler.raw_topics
                 )
+            except MalformedFrameError as e:
+                logger.error(f"Dropping message from {peer_name}: {e}")
+                continue
             except EOFError:
                 logger.debug(f"Closed connection from: {peer_name}")
                 return
 
             if isinstance(obj, TopicMessage):
-                await self.topic_message_handler.handle_message(obj)
+                await self.topic_message_handler.handle_message(obj, callback_table)
+            elif isinstance(obj, RawTopicMessage):
+                await self.topic_message_handler.handle_message(
+                    obj._replace(data_codec=data_codec), callback_table
+                )
             elif isinstance(obj, ServiceRequest):
                 asyncio.create_task(
-                    self.service_request_handler.handle_request(obj, writer),
+                    self.service_request_handler.handle_request(
+                        obj, writer, node_message_codec
+                    ),
                     name=f"Handle service request {obj.id} from {peer_name}",
                 )
+            elif isinstance(obj, ConnectionHello):
+                try:
+                    node_message_codec = self.codec_selector.get(obj.data_codec)
+                except ValueError as e:
+                    logger.error(f"Closing connection from {peer_name}: {e}")
+                    await close_ignoring_errors(writer)
+                    return
+
+                data_codec = obj.data_codec
+                logger.debug(f"Using data_codec={obj.data_codec!r} for {peer_name}")
             else:
                 raise RuntimeError("Unreachable code")
+
+    async def handle_datagram(self, data: bytes, topic: Topic = None) -> None:
+        """
+        Handles the topic messages in a datagram, which holds whole frames.
+
+        There is no connection to remember anything by, so a datagram starts
+        with a hello frame if the sender negotiated a data codec, and its
+        topic messages carry topic names instead of topic IDs.
+
+        If ``topic`` is given, messages on other topics are dropped. Multicast
+        datagrams are received on a topic's multicast group, which may be
+        shared with other topics; their messages are delivered by their own
+        groups, or over connections, so must not be handled here again.
+        """
+
+        reader = BufferReader(data)
+        data_codec = None
+        node_message_codec = self.codec_selector.default_codec
+
+        while True:
+            try:
+                obj = await node_message_codec.decode_topic_message_or_service_request(
+                    reader, None, self.topic_message_handler.raw_topics
+                )
+            except MalformedFrameError as e:
+                logger.error(f"Dropping datagram: {e}")
+                return
+            except EOFError:
+                return
+
+            if isinstance(obj, (TopicMessage, RawTopicMessage)):
+                if topic is not None and obj.topic != topic:
+                    continue
+
+                if isinstance(obj, RawTopicMessage):
+                    obj = obj._replace(data_codec=data_codec)
+
+                await self.topic_message_handler.handle_message(obj)
+            elif isinstance(obj, ConnectionHello):
+                try:
+                    node_message_codec = self.codec_selector.get(obj.data_codec)
+                except ValueError as e:
+                    logger.error(f"Dropping datagram: {e}")
+                    return
+
+                data_codec = obj.data_codec
+            else:
+                logger.warning(f"Dropping datagram with unexpected {obj!r}")
+                return
@@ -1,64 +1,446 @@
-from rosy.asyncio import BufferWriter, Reader, Writer
-from rosy.codec import Codec
+import logging
+from collections.abc import Container
+
+from rosy.asyncio import (
+    BufferReader,
+    BufferWriter,
+    Reader,
+    SegmentedBuffer,
+    Writer,
+    readexactly_view,
+    segments_nbytes,
+)
+from rosy.codec import (
+    Codec,
+    FixedLengthIntCodec,
+    LengthPrefixedStringCodec,
+    VariableLengthIntCodec,
+)
 from rosy.node.service.types import ServiceRequest, ServiceResponse
-from rosy.node.topic.types import TopicMessage
-from rosy.types import Buffer
+from rosy.node.topic.codec import TopicMessageCodec
+from rosy.node.topic.types import RawTopicMessage, TopicMessage
+from rosy.node.types import Args, ConnectionHello, KWArgs
+from rosy.specs import MeshNodeSpec
+from rosy.types import Buffer, Topic
 from rosy.utils import require
 
+logger = logging.getLogger(__name__)
+
+TOPIC_IDS_FEATURE = "topic_ids"
+"""The node understands topic messages with interned topic IDs."""
+
+SUPPORTED_FEATURES = frozenset({TOPIC_IDS_FEATURE})
+
 
 class NodeMessageCodec:
     def __init__(
         self,
-        topic_message_codec: Codec[TopicMessage],
+        topic_message_codec: TopicMessageCodec,
         service_request_codec: Codec[ServiceRequest],
         service_response_codec: Codec[ServiceResponse],
         topic_message_prefix: bytes = b"t",
         service_request_prefix: bytes = b"s",
+        topic_id_definition_prefix: bytes = b"d",
+        topic_id_prefix: bytes = b"i",
+        hello_prefix: bytes = b"h",
+        frame_len_codec: FixedLengthIntCodec = None,
+        topic_id_codec: Codec[int] = None,
+        hello_codec: Codec[str] = None,
     ):
-        require(
-            len(topic_message_prefix) == 1, "Topic message prefix must be a single byte"
+        """
+        Every message is sent as a frame prefixed with its total length, so
+        the receiver can read it with a single ``readexactly`` call and decode
+        it from memory.
+
+        Topic messages sent over a connection may refer to their topic by a
+        small integer ID instead of by name. The first frame for a topic on a
+        connection is a "definition" frame carrying both the ID and the topic
+        name; later frames carry only the ID. The receiver keeps the mapping
+        for the lifetime of the connection (see the ``topic_ids`` argument of
+        the decode methods).
+
+        A client that negotiated a data codec with the node it connects to
+        sends a "hello" frame naming that codec before anything else.
+        """
+
+        prefixes = (
+            topic_message_prefix,
+            service_request_prefix,
+            topic_id_definition_prefix,
+            topic_id_prefix,
+            hello_prefix,
         )
         require(
-            len(service_request_prefix) == 1,
-            "Service request prefix must be a single byte",
+            all(len(prefix) == 1 for prefix in prefixes),
+            "Message prefixes must be a single byte",
         )
+        require(len(set(prefixes)) == len(prefixes), "Message prefixes must be unique")
 
         self.topic_message_codec = topic_message_codec
         self.service_request_codec = service_request_codec
         self.service_response_codec = service_response_codec
         self.topic_message_prefix = topic_message_prefix
         self.service_request_prefix = service_request_prefix
+        self.topic_id_definition_prefix = topic_id_definition_prefix
+        self.topic_id_prefix = topic_id_prefix
+        self.hello_prefix = hello_prefix
+        self.frame_len_codec = frame_len_codec or FixedLengthIntCodec(length=4)
+        self.topic_id_codec = topic_id_codec or VariableLengthIntCodec()
+        self.hello_codec = hello_codec or LengthPrefixedStringCodec(
+            FixedLengthIntCodec(length=1)
+        )
 
-    async def encode_topic_message(self, message: TopicMessage) -> Buffer:
-        buffer = BufferWriter()
-        buffer.write(self.topic_message_prefix)
-        await self.topic_message_codec.encode(buffer, message)
-        return buffer
+        # Checked once here instead of on every message
+        self._sync_topic_message = topic_message_codec.supports_sync
+        self._sync_service_request = service_request_codec.supports_sync
+        self._sync_service_response = service_response_codec.supports_sync
+        self._sync_topic_id = self.topic_id_codec.supports_sync
+
+    @property
+    def supports_sync_decode(self) -> bool:
+        """Whether whole in-memory frames can be decoded synchronously."""
+        return (
+            self._sync_topic_message
+            and self._sync_service_request
+            and self._sync_topic_id
+            and self.hello_codec.supports_sync
+        )
+
+    async def encode_topic_message_body(
+        self,
+        args: Args,
+        kwargs: KWArgs,
+    ) -> list[Buffer]:
+        """
+        Encodes the args and kwargs of a topic message, so they can be encoded
+        once and then framed for each peer with ``encode_topic_message_frame``.
+
+        The body is returned as a list of segments. Large buffers that the
+        data codec writes out-of-band, like numpy array data, are their own
+        segments and refer to the original objects' memory, so they are never
+        copied before being written to the connection. Neither the segments
+        nor those objects may be modified until then.
+        """
+
+        buffer = SegmentedBuffer()
+
+        if self._sync_topic_message:
+            self.topic_message_codec.encode_body_into(buffer, args, kwargs)
+        else:
+            await self.topic_message_codec.encode_body(buffer, args, kwargs)
+
+        return buffer.segments()
+
+    async def encode_topic_message_frame(
+        self,
+        topic_id: int | None,
+        topic: Topic | None,
+        body: list[Buffer],
+    ) -> list[Buffer]:
+        """
+        Frames an encoded topic message body with an interned topic ID.
+
+        If ``topic`` is given, a definition frame is produced which tells the
+        receiver which topic the ID refers to; otherwise the receiver must
+        already know the ID. If ``topic_id`` is None, a plain topic message
+        frame is produced for receivers that do not support topic IDs.
+
+        The frame is returned as a header segment followed by the segments of
+        the body, to be written with ``writer.writelines``, so the body is
+        never copied into the frame.
+        """
+
+        if topic_id is None:
+            buffer = self._start_frame(self.topic_message_prefix)
+        else:
+            buffer = self._start_frame(
+                self.topic_id_prefix
+                if topic is None
+                else self.topic_id_definition_prefix
+            )
+
+            if self._sync_topic_id:
+                self.topic_id_codec.encode_into(buffer, topic_id)
+            else:
+                await self.topic_id_codec.encode(buffer, topic_id)
+
+        if topic is not None:
+            topic_codec = self.topic_message_codec.topic_codec
+            if self._sync_topic_message:
+                topic_codec.encode_into(buffer, topic)
+            else:
+                await topic_codec.encode(buffer, topic)
+
+        return [self._end_frame(buffer, segments_nbytes(body)), *body]
+
+    async def encode_hello(self, hello: ConnectionHello) -> Buffer:
+        buffer = self._start_frame(self.hello_prefix)
+
+        if self.hello_codec.supports_sync:
+            self.hello_codec.encode_into(buffer, hello.data_codec)
+        else:
+            await self.hello_codec.encode(buffer, hello.data_codec)
+
+        return self._end_frame(buffer)
 
     async def encode_service_request(self, request: ServiceRequest) -> Buffer:
-        buffer = BufferWriter()
-        buffer.write(self.service_request_prefix)
-        await self.service_request_codec.encode(buffer, request)
-        return buffer
+        buffer = self._start_frame(self.service_request_prefix)
+
+        if self._sync_service_request:
+            self.service_request_codec.encode_into(buffer, request)
+        else:
+            await self.service_request_codec.encode(buffer, request)
+
+        return self._end_frame(buffer)
 
     async def encode_service_response(
         self,
         writer: Writer,
         response: ServiceResponse,
     ) -> None:
-        await self.service_response_codec.encode(writer, response)
+        buffer = self._start_frame()
 
-    async def decode_topic_message_or_service_request(
-        self, reader: Reader
-    ) -> TopicMessage | ServiceRequest:
-        prefix = await reader.readexactly(1)
-
-        if prefix == self.topic_message_prefix:
-            return await self.topic_message_codec.decode(reader)
-        elif prefix == self.service_request_prefix:
-            return await self.service_request_codec.decode(reader)
+        if self._sync_service_response:
+            self.service_response_codec.encode_into(buffer, response)
         else:
-            raise ValueError(f"Unknown prefix={prefix!r}")
+            await self.service_response_codec.encode(buffer, response)
+
+        writer.write(self._end_frame(buffer))
+
+    def _start_frame(self, prefix: bytes = b"") -> BufferWriter:
+        buffer = BufferWriter(self.frame_len_codec.length)
+        buffer += prefix
+        return buffer
+
+    def _end_frame(self, buffer: BufferWriter, trailing_len: int = 0) -> BufferWriter:
+        """
+        Fills in the frame length. ``trailing_len`` is the length of any data
+        that will be written after the buffer as part of the same frame.
+        """
+
+        header_len = self.frame_len_codec.length
+
+        header = bytearray()
+        frame_len = len(buffer) - header_len + trailing_len
+        self.frame_len_codec.encode_into(header, frame_len)
+        buffer[:header_len] = header
+
+        return buffer
+
+    async def read_frame(self, reader: Reader) -> Buffer:
+        """Reads one whole length-prefixed frame, without the length prefix."""
+        frame_len = await self.frame_len_codec.decode(reader)
+
+        # Large frames are not copied after being received, if the reader
+        # supports it
+        return await readexactly_view(reader, frame_len)
+
+    async def decode_topic_message_or_service_request(
+        self,
+        reader: Reader,
+        topic_ids: dict[int, Topic] = None,
+        raw_topics: Container[Topic] = (),
+    ) -> TopicMessage | RawTopicMessage | ServiceRequest | ConnectionHello:
+        """
+        Reads and decodes the next frame from the reader.
+
+        ``topic_ids`` holds the topic IDs defined so far on the connection the
+        reader belongs to; it is updated in place by definition frames. It is
+        required to decode frames that use interned topic IDs. Messages sent
+        with a topic ID carry it as ``topic_id``.
+
+        Messages on ``raw_topics`` are returned as ``RawTopicMessage``s
+        without decoding their args and kwargs.
+
+        Raises:
+            EOFError:
+                If the reader reached EOF before the whole frame was read.
+            MalformedFrameError:
+                If the frame was read, but its contents are truncated.
+        """
+
+        frame = await self.read_frame(reader)
+
+        if self.supports_sync_decode:
+            return self.decode_topic_message_or_service_request_from(
+                frame, topic_ids, raw_topics
+            )
+
+        reader = BufferReader(frame)
+        prefix = b""
+        topic = topic_id = None
+
+        try:
+            prefix = await reader.readexactly(1)
+
+            if prefix == self.topic_id_prefix:
+                topic_id = await self.topic_id_codec.decode(reader)
+                topic = self._get_topic(topic_ids, topic_id)
+            elif prefix == self.topic_id_definition_prefix:
+                topic_id = await self.topic_id_codec.decode(reader)
+                topic = await self.topic_message_codec.topic_codec.decode(reader)
+                self._define_topic(topic_ids, topic_id, topic)
+            elif prefix == self.topic_message_prefix:
+                topic = await self.topic_message_codec.topic_codec.decode(reader)
+            elif prefix == self.service_request_prefix:
+                return await self.service_request_codec.decode(reader)
+            elif prefix == self.hello_prefix:
+                return ConnectionHello(await self.hello_codec.decode(reader))
+            else:
+                raise ValueError(f"Unknown prefix={prefix!r}")
+
+            if topic in raw_topics:
+                return RawTopicMessage(topic, reader.read_remaining(), topic_id)
+
+            args, kwargs = await self.topic_message_codec.decode_body(reader)
+        except EOFError as e:
+            raise MalformedFrameError(prefix, len(frame), topic) from e
+
+        return TopicMessage(topic, args, kwargs, topic_id)
+
+    def decode_topic_message_or_service_request_from(
+        self,
+        data: Buffer,
+        topic_ids: dict[int, Topic] = None,
+        raw_topics: Container[Topic] = (),
+    ) -> TopicMessage | RawTopicMessage | ServiceRequest | ConnectionHello:
+        """
+        Synchronously decodes a whole frame that is already in memory.
+
+        Raises ``MalformedFrameError`` if its contents are truncated.
+        """
+
+        data = memoryview(data)
+        prefix = bytes(data[:1])
+        topic = topic_id = None
+
+        try:
+            if prefix == self.topic_id_prefix:
+                topic_id, offset = self.topic_id_codec.decode_from(data, 1)
+                topic = self._get_topic(topic_ids, topic_id)
+            elif prefix == self.topic_id_definition_prefix:
+                topic_id, offset = self.topic_id_codec.decode_from(data, 1)
+                topic_codec = self.topic_message_codec.topic_codec
+                topic, offset = topic_codec.decode_from(data, offset)
+                self._define_topic(topic_ids, topic_id, topic)
+            elif prefix == self.topic_message_prefix:
+                topic_codec = self.topic_message_codec.topic_codec
+                topic, offset = topic_codec.decode_from(data, 1)
+            elif prefix == self.service_request_prefix:
+                request, _ = self.service_request_codec.decode_from(data, 1)
+                return request
+            elif prefix == self.hello_prefix:
+                data_codec, _ = self.hello_codec.decode_from(data, 1)
+                return ConnectionHello(data_codec)
+            else:
+                raise ValueError(f"Unknown prefix={prefix!r}")
+
+            if topic in raw_topics:
+                return RawTopicMessage(topic, bytes(data[offset:]), topic_id)
+
+            (args, kwargs), _ = self.topic_message_codec.decode_body_from(data, offset)
+        except EOFError as e:
+            raise MalformedFrameError(prefix, len(data), topic) from e
+
+        return TopicMessage(topic, args, kwargs, topic_id)
+
+    @staticmethod
+    def _define_topic(
+        topic_ids: dict[int, Topic] | None,
+        topic_id: int,
+        topic: Topic,
+    ) -> None:
+        if topic_ids is not None:
+            topic_ids[topic_id] = topic
+
+    @staticmethod
+    def _get_topic(topic_ids: dict[int, Topic] | None, topic_id: int) -> Topic:
+        try:
+            return topic_ids[topic_id]
+        except (KeyError, TypeError):
+            raise ValueError(f"Unknown topic_id={topic_id}") from None
 
     async def decode_service_response(self, reader: Reader) -> ServiceResponse:
-        return await self.service_response_codec.decode(reader)
+        frame = await self.read_frame(reader)
+
+        try:
+            if self._sync_service_response:
+                response, _ = self.service_response_codec.decode_from(memoryview(frame))
+                return response
+
+            return await self.service_response_codec.decode(BufferReader(frame))
+        except EOFError as e:
+            raise MalformedFrameError(b"", len(frame)) from e
+
+
+class MalformedFrameError(ValueError):
+    """
+    A whole frame was received, but a field in it runs past its end, e.g.
+    because it was encoded with a different data codec. Unlike ``EOFError``,
+    the connection is still intact; the next frame can be read as usual.
+    """
+
+    def __init__(self, prefix: bytes, frame_len: int, topic: Topic | None = None):
+        message = f"Truncated frame with prefix={prefix!r} of {frame_len} bytes"
+        if topic is not None:
+            message += f" on topic={topic!r}"
+
+        super().__init__(message)
+        self.topic = topic
+
+
+class NodeMessageCodecSelector:
+    def __init__(
+        self,
+        default_codec: NodeMessageCodec,
+        codecs: dict[str, NodeMessageCodec] = None,
+    ):
+        """
+        Picks the node message codec to use with each peer node.
+
+        Args:
+            default_codec:
+                Codec used with peers that do not advertise any data codecs,
+                and on incoming connections until the client says otherwise.
+            codecs:
+                Named codecs this node supports, in order of preference
+                (fastest first). With each peer, the first of these that the
+                peer also advertises is used.
+        """
+
+        self.default_codec = default_codec
+        self.codecs = codecs or {}
+
+    @property
+    def names(self) -> tuple[str, ...]:
+        """Names of the supported data codecs, in order of preference."""
+        return tuple(self.codecs)
+
+    def select(self, node: MeshNodeSpec) -> tuple[str | None, NodeMessageCodec]:
+        """
+        Returns the name of the codec to use with the given node, and the codec.
+
+        The name is None if no negotiation is possible, in which case the
+        default codec is used.
+
+        Raises:
+            ValueError: If the node has no data codecs in common with this one.
+        """
+
+        if not self.codecs or not node.data_codecs:
+            return None, self.default_codec
+
+        for name, codec in self.codecs.items():
+            if name in node.data_codecs:
+                return name, codec
+
+        raise ValueError(
+            f"No data codec in common with node={node.id}; "
+            f"ours={self.names}, theirs={tuple(node.data_codecs)}"
+        )
+
+    def get(self, name: str) -> NodeMessageCodec:
+        try:
+            return self.codecs[name]
+        except KeyError:
+            raise ValueError(f"Unsupported data codec={name!r}") from None
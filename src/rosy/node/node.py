@@ -1,5 +1,6 @@
 import asyncio
 import logging
+from collections.abc import Collection, Sequence
 from enum import Enum
 from functools import wraps
 from typing import NamedTuple
@@ -9,11 +10,23 @@ from rosy.discovery.base import NodeDiscovery
 from rosy.node.servers import ServersManager
 from rosy.node.service.caller import ServiceCaller
 from rosy.node.service.handlermanager import ServiceHandlerManager
+from rosy.node.topic.inprocess import InProcessInbox
 from rosy.node.topic.listenermanager import TopicListenerManager
+from rosy.node.topic.multicast import MulticastReceiver
+from rosy.node.topic.qos import TopicQoS
 from rosy.node.topic.sender import TopicSender
 from rosy.node.topology import MeshTopologyManager
 from rosy.specs import MeshNodeSpec, NodeId
-from rosy.types import Data, Service, ServiceCallback, Topic, TopicCallback
+from rosy.types import (
+    Buffer,
+    Data,
+    Priority,
+    RawTopicCallback,
+    Service,
+    ServiceCallback,
+    Topic,
+    TopicCallback,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +48,10 @@ class Node:
         topic_listener_manager: TopicListenerManager,
         service_caller: ServiceCaller,
         service_handler_manager: ServiceHandlerManager,
+        data_codecs: Sequence[str] = (),
+        features: Collection[str] = (),
+        multicast_receiver: MulticastReceiver = None,
+        in_process_inbox: InProcessInbox = None,
     ):
         """
         This is a node on the mesh. It is responsible for sending and receiving
@@ -52,6 +69,10 @@ class Node:
         self.topic_listener_manager = topic_listener_manager
         self.service_caller = service_caller
         self.service_handler_manager = service_handler_manager
+        self.data_codecs = tuple(data_codecs)
+        self.features = frozenset(features)
+        self.multicast_receiver = multicast_receiver
+        self.in_process_inbox = in_process_inbox
 
         self._state: State = State.INITD
 
@@ -85,6 +106,10 @@ class Node:
 
         await self.discovery.start()
         await self.servers_manager.start_servers()
+
+        if self.in_process_inbox is not None:
+            self.in_process_inbox.start(self.id)
+
         await self.register(first_time=True)
 
     async def stop(self) -> None:
@@ -100,22 +125,104 @@ class Node:
         try:
             await self.discovery.stop()
         finally:
-            await self.servers_manager.stop_servers()
+            try:
+                await self.servers_manager.stop_servers()
+            finally:
+                self.topic_sender.close()
+
+                if self.in_process_inbox is not None:
+                    await self.in_process_inbox.stop()
+
+                if self.multicast_receiver is not None:
+                    await self.multicast_receiver.close()
 
     async def send(self, topic: Topic, *args: Data, **kwargs: Data) -> None:
-        """Send a message on a topic, with optional arguments and keyword arguments."""
+        """
+        Send a message on a topic, with optional arguments and keyword arguments.
+
+        Depending on the topic's QoS overflow policy, this may wait for room
+        in the outbox of a slow listener; see ``set_topic_qos``.
+
+        With data codecs that send large buffers without copying them (numpy,
+        or out-of-band pickle), such buffers are written straight from their
+        memory, so they must not be modified until the message has been sent;
+        use ``send_and_wait`` to know when that is.
+        """
         await self.topic_sender.send(topic, args, kwargs)
         await noop()  # Give the event loop a chance to process the send
 
+    async def send_and_wait(self, topic: Topic, *args: Data, **kwargs: Data) -> None:
+        """
+        Send a message on a topic, and wait until it has been written to the
+        connection of every listener. This lets a producer send at exactly the
+        rate its slowest listener can receive at, instead of having messages
+        dropped when a listener's outbox is full.
+
+        Use ``asyncio.wait_for`` or ``asyncio.timeout`` to give up waiting.
+
+        Raises:
+            rosy.node.topic.outbox.TopicMessageDroppedError:
+                If the message was dropped before it could be sent to a
+                listener, e.g. it expired according to the topic's QoS.
+        """
+        await self.topic_sender.send(topic, args, kwargs, wait=True)
+
+    async def send_raw(
+        self,
+        topic: Topic,
+        payload: Buffer,
+        data_codec: str = None,
+    ) -> None:
+        """
+        Send an already-encoded payload on a topic without re-encoding it,
+        e.g. one received by a ``raw=True`` listener, along with the
+        ``data_codec`` it was received with.
+
+        The payload is sent as-is, so it is only sent to listeners using the
+        same data codec it was encoded with: the one named ``data_codec`` (see
+        the ``data_codecs`` build option), or this node's default data codec
+        if not given. Listeners using any other codec are skipped.
+        """
+        await self.topic_sender.send_raw(topic, payload, data_codec=data_codec)
+        await noop()  # Give the event loop a chance to process the send
+
     async def listen(
         self,
         topic: Topic,
-        callback: TopicCallback,
+        callback: TopicCallback | RawTopicCallback,
+        raw: bool = False,
+        qos: TopicQoS = None,
     ) -> None:
-        """Start listening to a topic with a callback function."""
-        self.topic_listener_manager.set_callback(topic, callback)
+        """
+        Start listening to a topic with a callback function.
+
+        If ``raw`` is true, the args and kwargs of messages are not decoded;
+        instead, the callback is called with the topic, the encoded payload
+        bytes, and the name of the data codec they were encoded with. They can
+        be forwarded with ``send_raw(topic, payload, data_codec)``. This is much
+        cheaper for nodes that only record or relay messages.
+
+        If ``qos`` is given, nodes sending on the topic are asked to use it
+        when sending to this node, unless they set their own QoS for the topic.
+        If ``qos.multicast`` is true, this node joins the topic's multicast
+        group to receive messages on it.
+        """
+
+        multicast = qos is not None and qos.multicast
+
+        # Join before, and leave after, senders find out from the registration
+        if multicast:
+            if self.multicast_receiver is None:
+                raise ValueError("This node cannot receive multicast messages")
+
+            await self.multicast_receiver.join(topic)
+
+        self.topic_listener_manager.set_callback(topic, callback, raw=raw, qos=qos)
         await self.register()
 
+        if not multicast and self.multicast_receiver is not None:
+            await self.multicast_receiver.leave(topic)
+
     async def stop_listening(self, topic: Topic) -> None:
         """Stop listening to a topic."""
 
@@ -123,11 +230,22 @@ class Node:
 
         if callback is not None:
             await self.register()
+
+            if self.multicast_receiver is not None:
+                await self.multicast_receiver.leave(topic)
         else:
             logger.warning(
                 f"Attempted to remove non-existing listener for topic={topic!r}"
             )
 
+    def set_topic_qos(self, topic: Topic, qos: TopicQoS | None) -> None:
+        """
+        Set the QoS used when sending messages on a topic to other nodes,
+        overriding any QoS the listening nodes asked for. If ``qos`` is None,
+        the topic goes back to using the listeners' QoS or the default.
+        """
+        self.topic_sender.qos_manager.set_qos(topic, qos)
+
     async def topic_has_listeners(self, topic: Topic) -> bool:
         """Check if there are any listeners for a topic."""
         listeners = self.topology_manager.get_nodes_listening_to_topic(topic)
@@ -205,6 +323,14 @@ class Node:
         """Call a service and return the result."""
         return await self.service_caller.call(service, args, kwargs)
 
+    def set_service_priority(self, service: Service, priority: Priority | None) -> None:
+        """
+        Set the priority of requests this node makes to a service, or reset it
+        to 'normal' if ``priority`` is None. Each priority is sent over its own
+        connection, so requests are not delayed behind other traffic.
+        """
+        self.service_caller.set_priority(service, priority)
+
     async def add_service(self, service: Service, handler: ServiceCallback) -> None:
         """Add a service to the node that other nodes can call."""
         self.service_handler_manager.set_callback(service, handler)
@@ -268,6 +394,9 @@ class Node:
             connection_specs=self.servers_manager.connection_specs,
             topics=self.topic_listener_manager.keys,
             services=self.service_handler_manager.keys,
+            data_codecs=self.data_codecs,
+            features=self.features,
+            topic_qos=dict(self.topic_listener_manager.topic_qos),
         )
 
     async def forever(self) -> None:
@@ -289,6 +418,15 @@ class TopicProxy(NamedTuple):
     async def send(self, *args: Data, **kwargs: Data) -> None:
         await self.node.send(self.topic, *args, **kwargs)
 
+    async def send_and_wait(self, *args: Data, **kwargs: Data) -> None:
+        await self.node.send_and_wait(self.topic, *args, **kwargs)
+
+    async def send_raw(self, payload: Buffer, data_codec: str = None) -> None:
+        await self.node.send_raw(self.topic, payload, data_codec)
+
+    def set_qos(self, qos: TopicQoS | None) -> None:
+        self.node.set_topic_qos(self.topic, qos)
+
     async def has_listeners(self) -> bool:
         return await self.node.topic_has_listeners(self.topic)
 
@@ -313,6 +451,9 @@ class ServiceProxy(NamedTuple):
     async def call(self, *args: Data, **kwargs: Data) -> Data:
         return await self.node.call(self.service, *args, **kwargs)
 
+    def set_priority(self, priority: Priority | None) -> None:
+        self.node.set_service_priority(self.service, priority)
+
     async def has_providers(self) -> bool:
         return await self.node.service_has_providers(self.service)
 
@@ -1,23 +1,35 @@
+import asyncio
+import dataclasses
 import logging
 from asyncio import Lock, open_connection, open_unix_connection
 from collections import defaultdict
 from collections.abc import Iterable
 from typing import NamedTuple
 
+from rosy import buffered, shm
 from rosy.asyncio import LockableWriter, Reader, Writer, close_ignoring_errors
 from rosy.network import get_hostname
+from rosy.node.codec import NodeMessageCodecSelector
+from rosy.node.peer.reconnect import ConnectStats, ReconnectPolicy, ReconnectState
+from rosy.node.types import ConnectionHello
 from rosy.socket import setup_socket
 from rosy.specs import (
     ConnectionSpec,
+    DatagramConnectionSpec,
     IpConnectionSpec,
     MeshNodeSpec,
     NodeId,
+    SharedMemoryConnectionSpec,
     UnixConnectionSpec,
 )
-from rosy.types import Host
+from rosy.types import Host, Priority
 
 logger = logging.getLogger(__name__)
 
+# Errors that fail one attempt to connect, including its handshake, e.g. a
+# shared memory handshake cut short or answered with garbage
+_CONNECT_ERRORS = (OSError, EOFError, ValueError)
+
 
 class PeerConnection(NamedTuple):
     reader: Reader
@@ -31,33 +43,104 @@ class PeerConnection(NamedTuple):
 
 
 class PeerConnectionBuilder:
-    def __init__(self, host: Host = None):
+    def __init__(
+        self,
+        host: Host = None,
+        buffered: bool = False,
+        stagger_delay: float | None = 0.25,
+    ):
+        """
+        Args:
+            host:
+                Hostname of this machine, to tell which Unix sockets are local.
+            buffered:
+                Whether to read TCP and Unix connections into reusable buffers
+                with ``rosy.buffered``, instead of using ``asyncio`` streams.
+            stagger_delay:
+                Seconds to wait for an attempt to connect to one connection
+                spec before also trying the next one, "happy eyeballs" style,
+                so a spec that hangs (e.g. an unreachable IPv6 address) does
+                not delay connecting until it times out. If None, each spec
+                is only tried once the one before it has failed.
+        """
+
         self.host = host or get_hostname()
+        self.buffered = buffered
+        self.stagger_delay = stagger_delay
 
     async def build(
         self, conn_specs: Iterable[ConnectionSpec]
     ) -> tuple[Reader, Writer]:
-        reader_writer = None
-        for conn_spec in conn_specs:
-            try:
-                reader_writer = await self._get_connection(conn_spec)
-            except (ConnectionError, IOError) as e:
-                logger.error(f"Error connecting to {conn_spec}: {e!r}")
-                continue
+        """
+        Connects using the first connection spec that works.
+
+        Specs are tried in order, each starting once the one before it has
+        failed, or after ``stagger_delay``. The first connection made is
+        kept, and the other attempts are cancelled; so earlier specs, like
+        Unix sockets on the same host, are preferred as long as they connect
+        quickly.
+
+        Raises:
+            PeerConnectError: If no spec could be connected to.
+        """
+
+        conn_specs = iter(conn_specs)
+        attempts: dict[asyncio.Task, ConnectionSpec] = {}
+        errors: list[tuple[ConnectionSpec, Exception]] = []
 
-            if reader_writer is not None:
-                break
+        try:
+            while True:
+                conn_spec = next(conn_specs, None)
+                if conn_spec is not None:
+                    task = asyncio.create_task(self._get_connection(conn_spec))
+                    attempts[task] = conn_spec
+                elif not attempts:
+                    raise PeerConnectError(errors)
 
-        if reader_writer is None:
-            raise ConnectionError("Could not connect to any connection spec")
+                done, _ = await asyncio.wait(
+                    attempts,
+                    timeout=self.stagger_delay if conn_spec is not None else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
 
-        return reader_writer
+                # Prefer earlier specs if several attempts finished together
+                for task in [task for task in attempts if task in done]:
+                    conn_spec = attempts.pop(task)
+                    try:
+                        reader_writer = task.result()
+                    except _CONNECT_ERRORS as e:
+                        logger.error(f"Error connecting to {conn_spec}: {e!r}")
+                        errors.append((conn_spec, e))
+                        continue
+
+                    if reader_writer is not None:
+                        return reader_writer
+        finally:
+            await self._cancel_attempts(attempts)
+
+    @staticmethod
+    async def _cancel_attempts(attempts: Iterable[asyncio.Task]) -> None:
+        """Cancels the attempts, closing any connections they made anyway."""
+
+        attempts = list(attempts)
+        for task in attempts:
+            task.cancel()
+
+        results = await asyncio.gather(*attempts, return_exceptions=True)
+        for result in results:
+            if isinstance(result, tuple):
+                _, writer = result
+                await close_ignoring_errors(writer)
 
     async def _get_connection(
         self, conn_spec: ConnectionSpec
     ) -> tuple[Reader, Writer] | None:
         if isinstance(conn_spec, IpConnectionSpec):
-            reader, writer = await open_connection(
+            open_ip_connection = (
+                buffered.open_connection if self.buffered else open_connection
+            )
+
+            reader, writer = await open_ip_connection(
                 host=conn_spec.host,
                 port=conn_spec.port,
                 family=conn_spec.family,
@@ -71,45 +154,176 @@ class PeerConnectionBuilder:
             if conn_spec.host != self.host:
                 return None
 
+            if self.buffered:
+                return await buffered.open_unix_connection(path=conn_spec.path)
+
             return await open_unix_connection(path=conn_spec.path)
+        elif isinstance(conn_spec, SharedMemoryConnectionSpec):
+            if conn_spec.host != self.host:
+                return None
+
+            sock_reader, sock_writer = await open_unix_connection(path=conn_spec.path)
+            return await shm.connect(sock_reader, sock_writer)
+        elif isinstance(conn_spec, DatagramConnectionSpec):
+            # Only used for best-effort topic messages; see DatagramSender
+            return None
         else:
             raise ValueError(f"Unrecognized connection spec: {conn_spec}")
 
 
+class PeerConnectError(ConnectionError):
+    """Raised when no connection spec of a node could be connected to."""
+
+    def __init__(self, errors: list[tuple[ConnectionSpec, Exception]]):
+        message = "Could not connect to any connection spec"
+        if errors:
+            message += ": " + "; ".join(
+                f"{conn_spec}: {error!r}" for conn_spec, error in errors
+            )
+
+        super().__init__(message)
+        self.errors = errors
+
+
 class PeerConnectionManager:
-    def __init__(self, conn_builder: PeerConnectionBuilder):
+    def __init__(
+        self,
+        conn_builder: PeerConnectionBuilder,
+        codec_selector: NodeMessageCodecSelector = None,
+        reconnect_policy: ReconnectPolicy = None,
+    ):
         self.conn_builder = conn_builder
+        self.codec_selector = codec_selector
+        self.reconnect_policy = reconnect_policy or ReconnectPolicy()
+
+        # Each priority gets its own connection, i.e. its own lane
+        self._connections: dict[tuple[NodeId, Priority], PeerConnection] = {}
+        self._connections_locks: dict[tuple[NodeId, Priority], Lock] = defaultdict(Lock)
+
+        self._reconnect_states: dict[NodeId, ReconnectState] = {}
 
-        self._connections: dict[NodeId, PeerConnection] = {}
-        self._connections_locks: dict[NodeId, Lock] = defaultdict(Lock)
+    async def get_connection(
+        self,
+        node: MeshNodeSpec,
+        priority: Priority = "normal",
+    ) -> PeerConnection:
+        """
+        Returns the open connection to the node for the priority, connecting
+        if needed.
 
-    async def get_connection(self, node: MeshNodeSpec) -> PeerConnection:
-        async with self._connections_locks[node.id]:
-            connection = await self._get_cached_connection(node)
+        Raises:
+            PeerUnreachableError: If connecting to the node failed recently;
+                see ``ReconnectPolicy``.
+            PeerConnectError: If connecting to the node fails.
+            OSError: If telling the node which data codec to use fails.
+        """
+
+        key = (node.id, priority)
+
+        async with self._connections_locks[key]:
+            connection = await self._get_cached_connection(key)
             if connection:
                 return connection
 
+            reconnect_state = self._get_reconnect_state(node)
+            reconnect_state.check(node)
+
+            data_codec = self._select_data_codec(node)
+
             logger.debug(f"Connecting to node: {node.id}")
-            reader, writer = await self.conn_builder.build(node.connection_specs)
+            reconnect_state.record_attempt()
+            try:
+                reader, writer = await self.conn_builder.build(node.connection_specs)
+
+                if data_codec is not None:
+                    await self._send_hello(writer, data_codec)
+            except _CONNECT_ERRORS:
+                delay = reconnect_state.record_failure()
+                if delay is not None:
+                    logger.warning(
+                        f"Could not connect to node={node.id}; "
+                        f"not retrying for {delay:.2f}s"
+                    )
+                raise
+
+            reconnect_state.record_success()
 
             writer = LockableWriter(writer)
 
             connection = PeerConnection(reader, writer)
-            self._connections[node.id] = connection
+            self._connections[key] = connection
             return connection
 
-    async def _get_cached_connection(self, node: MeshNodeSpec) -> PeerConnection | None:
-        connection = self._connections.get(node.id, None)
+    def has_connection(self, node: MeshNodeSpec, priority: Priority = "normal") -> bool:
+        """Whether an open connection to the node is cached for the priority."""
+
+        connection = self._connections.get((node.id, priority))
+        return connection is not None and not connection.is_closing()
+
+    def get_connect_stats(self, node: MeshNodeSpec) -> ConnectStats:
+        """
+        Returns the counts of the attempts to connect to the node since it
+        was discovered.
+        """
+
+        reconnect_state = self._reconnect_states.get(node.id)
+        if reconnect_state is None:
+            return ConnectStats()
+
+        return dataclasses.replace(reconnect_state.stats)
+
+    def _get_reconnect_state(self, node: MeshNodeSpec) -> ReconnectState:
+        reconnect_state = self._reconnect_states.get(node.id)
+        if reconnect_state is None:
+            reconnect_state = ReconnectState(self.reconnect_policy)
+            self._reconnect_states[node.id] = reconnect_state
+
+        return reconnect_state
+
+    def _select_data_codec(self, node: MeshNodeSpec) -> str | None:
+        if self.codec_selector is None:
+            return None
+
+        data_codec, _ = self.codec_selector.select(node)
+        return data_codec
+
+    async def _send_hello(self, writer: Writer, data_codec: str) -> None:
+        """Tells the node which data codec will be used on this connection."""
+
+        codec = self.codec_selector.get(data_codec)
+        hello = await codec.encode_hello(ConnectionHello(data_codec))
+
+        try:
+            writer.write(hello)
+            await writer.drain()
+        except BaseException:
+            await close_ignoring_errors(writer)
+            raise
+
+    async def _get_cached_connection(
+        self,
+        key: tuple[NodeId, Priority],
+    ) -> PeerConnection | None:
+        connection = self._connections.get(key, None)
         if not connection:
             return None
 
         if connection.is_closing():
-            await self.close_connection(node)
+            del self._connections[key]
+            await connection.close()
             return None
 
         return connection
 
     async def close_connection(self, node: MeshNodeSpec) -> None:
-        connection = self._connections.pop(node.id, None)
-        if connection:
+        """
+        Closes the connections of every priority to the node, and forgets
+        any failed attempts to connect to it.
+        """
+
+        self._reconnect_states.pop(node.id, None)
+
+        keys = [key for key in self._connections if key[0] == node.id]
+        for key in keys:
+            connection = self._connections.pop(key)
             await connection.close()
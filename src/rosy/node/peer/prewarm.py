@@ -0,0 +1,89 @@
+import asyncio
+import logging
+from collections.abc import Callable, Collection, Iterable
+
+from rosy.node.peer.connection import PeerConnectionManager
+from rosy.specs import MeshNodeSpec, NodeId
+from rosy.types import Priority
+
+logger = logging.getLogger(__name__)
+
+PriorityGetter = Callable[[MeshNodeSpec], Collection[Priority]]
+"""Returns the priorities of the connections that will be needed to a node."""
+
+
+class ConnectionPrewarmer:
+    def __init__(
+        self,
+        connection_manager: PeerConnectionManager,
+        priority_getters: Iterable[PriorityGetter],
+    ):
+        """
+        Opens connections to nodes in the background, before anything is sent
+        to them, so the first topic message or service request to a node does
+        not wait for the connection to be made.
+
+        Args:
+            connection_manager:
+                Opens and caches the connections.
+            priority_getters:
+                Decide which connections to open to each node, e.g. those this
+                node sends topic messages or service requests to the node on.
+        """
+
+        self.connection_manager = connection_manager
+        self.priority_getters = list(priority_getters)
+
+        self._tasks: dict[tuple[NodeId, Priority], asyncio.Task] = {}
+
+    def prewarm(self, nodes: Iterable[MeshNodeSpec]) -> None:
+        """Starts opening the connections needed to the nodes, if not open yet."""
+
+        for node in nodes:
+            priorities = set()
+            for get_priorities in self.priority_getters:
+                priorities.update(get_priorities(node))
+
+            for priority in priorities:
+                self._start_connecting(node, priority)
+
+    async def cancel(self, node: MeshNodeSpec) -> None:
+        """Stops opening connections to the node."""
+
+        keys = [key for key in self._tasks if key[0] == node.id]
+        for key in keys:
+            task = self._tasks.pop(key)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    def _start_connecting(self, node: MeshNodeSpec, priority: Priority) -> None:
+        key = (node.id, priority)
+        if key in self._tasks:
+            return
+
+        if self.connection_manager.has_connection(node, priority):
+            return
+
+        task = asyncio.create_task(
+            self._connect(node, priority),
+            name=f"Prewarm {priority} connection to {node.id}",
+        )
+
+        # Called soon after the task is done, even if it was done on creation
+        task.add_done_callback(lambda _: self._forget(key, task))
+        self._tasks[key] = task
+
+    def _forget(self, key: tuple[NodeId, Priority], task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+
+    async def _connect(self, node: MeshNodeSpec, priority: Priority) -> None:
+        logger.debug(f"Pre-warming {priority} connection to node={node.id}")
+
+        try:
+            await self.connection_manager.get_connection(node, priority)
+        except Exception as e:
+            # Connecting will be retried when something is sent to the node
+            logger.warning(
+                f"Error pre-warming {priority} connection to node={node.id}: {e!r}"
+            )
@@ -0,0 +1,150 @@
+from collections.abc import Callable
+from dataclasses import dataclass
+from random import Random
+
+from rosy.asyncio import loop_time
+from rosy.specs import MeshNodeSpec
+from rosy.utils import require
+
+
+@dataclass(frozen=True)
+class ReconnectPolicy:
+    """
+    How to back off from connecting to a node that could not be connected to.
+
+    After ``failure_threshold`` attempts in a row fail, the node's circuit
+    opens: getting a connection to the node fails right away, without trying
+    to connect, until the backoff delay has passed. The next attempt is then
+    let through; if it fails too, the delay is multiplied by ``multiplier``,
+    up to ``max_delay``. A successful attempt resets the delay.
+
+    Args:
+        initial_delay:
+            Seconds to wait after the circuit first opens.
+        max_delay:
+            Max seconds to wait between attempts.
+        multiplier:
+            What the delay is multiplied by after each failed attempt.
+        jitter:
+            Fraction of the delay to randomly add or remove, so nodes that
+            lost the same peer do not all retry at the same time.
+        failure_threshold:
+            Number of failed attempts in a row that opens the circuit.
+    """
+
+    initial_delay: float = 0.1
+    max_delay: float = 10.0
+    multiplier: float = 2.0
+    jitter: float = 0.1
+    failure_threshold: int = 1
+
+    def __post_init__(self):
+        require(
+            self.initial_delay >= 0,
+            f"initial_delay must be non-negative; got {self.initial_delay}",
+        )
+        require(
+            self.max_delay >= self.initial_delay,
+            f"max_delay must be at least initial_delay; got {self.max_delay}",
+        )
+        require(
+            self.multiplier >= 1,
+            f"multiplier must be at least 1; got {self.multiplier}",
+        )
+        require(
+            0 <= self.jitter <= 1, f"jitter must be between 0 and 1; got {self.jitter}"
+        )
+        require(
+            self.failure_threshold > 0,
+            f"failure_threshold must be positive; got {self.failure_threshold}",
+        )
+
+    def get_delay(self, failures: int, rng: Random) -> float:
+        """Returns the delay after ``failures`` failed attempts in a row."""
+
+        exponent = failures - self.failure_threshold
+        delay = min(self.initial_delay * self.multiplier**exponent, self.max_delay)
+        return delay * (1 + self.jitter * rng.uniform(-1, 1))
+
+
+@dataclass
+class ConnectStats:
+    """Counts of the attempts to connect to a node."""
+
+    attempts: int = 0
+    """Attempts to connect, whether they succeeded or not."""
+
+    failures: int = 0
+    """Attempts that failed."""
+
+    rejected: int = 0
+    """Connections not attempted because the node's circuit was open."""
+
+
+class PeerUnreachableError(ConnectionError):
+    """Raised instead of connecting to a node while its circuit is open."""
+
+
+class ReconnectState:
+    def __init__(
+        self,
+        policy: ReconnectPolicy,
+        time_func: Callable[[], float] = loop_time,
+        rng: Random = None,
+    ):
+        """
+        The connection attempts to one node, and when the next one may be made.
+        """
+
+        self.policy = policy
+        self.time_func = time_func
+        self.rng = rng or Random()
+
+        self.stats = ConnectStats()
+        self.failures = 0
+        self.retry_at = 0.0
+
+    @property
+    def is_open(self) -> bool:
+        """Whether connection attempts are being rejected."""
+
+        return (
+            self.failures >= self.policy.failure_threshold
+            and self.time_func() < self.retry_at
+        )
+
+    def check(self, node: MeshNodeSpec) -> None:
+        """Raises ``PeerUnreachableError`` if the circuit is open."""
+
+        if not self.is_open:
+            return
+
+        self.stats.rejected += 1
+        retry_in = self.retry_at - self.time_func()
+        raise PeerUnreachableError(
+            f"Not connecting to node={node.id} for {retry_in:.2f}s "
+            f"after {self.failures} failed attempt(s)"
+        )
+
+    def record_attempt(self) -> None:
+        self.stats.attempts += 1
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.retry_at = 0.0
+
+    def record_failure(self) -> float | None:
+        """
+        Returns the seconds until the next attempt may be made, or None if
+        the circuit is not open.
+        """
+
+        self.stats.failures += 1
+        self.failures += 1
+
+        if self.failures < self.policy.failure_threshold:
+            return None
+
+        delay = self.policy.get_delay(self.failures, self.rng)
+        self.retry_at = self.time_func() + delay
+        return delay
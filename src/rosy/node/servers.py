@@ -1,5 +1,7 @@
 import asyncio
 import logging
+import platform
+import socket
 import tempfile
 from abc import ABC, abstractmethod
 from asyncio import StreamReader, StreamWriter
@@ -7,12 +9,21 @@ from collections.abc import Awaitable, Callable, Iterable
 from pathlib import Path
 from typing import Protocol
 
-from rosy.asyncio import Reader, Writer
-from rosy.specs import ConnectionSpec, IpConnectionSpec, UnixConnectionSpec
+from rosy import buffered, shm
+from rosy.asyncio import Reader, Writer, cancel_task, close_ignoring_errors
+from rosy.specs import (
+    ConnectionSpec,
+    IpConnectionSpec,
+    SharedMemoryConnectionSpec,
+    UdpConnectionSpec,
+    UnixConnectionSpec,
+    UnixDatagramConnectionSpec,
+)
 from rosy.types import Host, Port, ServerHost
 from rosy.utils import ALLOWED_EXCEPTIONS
 
 ClientConnectedCallback = Callable[[Reader, Writer], Awaitable[None]]
+DatagramReceivedCallback = Callable[[bytes], Awaitable[None]]
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +44,34 @@ class ServerProvider(ABC):
         ...  # pragma: no cover
 
 
+class DatagramServerProvider(ServerProvider, ABC):
+    """
+    Provides a server that receives datagrams instead of connections. Its
+    ``start_server`` method is given a ``DatagramReceivedCallback``.
+    """
+
+    def __init__(self, max_queue_size: int = 1000):
+        """
+        Args:
+            max_queue_size:
+                Max number of received datagrams waiting to be handled.
+                Datagrams received while the queue is full are dropped.
+        """
+
+        self.max_queue_size = max_queue_size
+
+    async def _create_endpoint(
+        self,
+        datagram_received_cb: DatagramReceivedCallback,
+        **kwargs,
+    ) -> tuple[asyncio.DatagramTransport, "QueuedDatagramProtocol"]:
+        loop = asyncio.get_running_loop()
+        return await loop.create_datagram_endpoint(
+            lambda: QueuedDatagramProtocol(datagram_received_cb, self.max_queue_size),
+            **kwargs,
+        )
+
+
 class TcpServerProvider(ServerProvider):
     """Starts a TCP server on the first available port."""
 
@@ -41,6 +80,7 @@ class TcpServerProvider(ServerProvider):
         server_host: ServerHost,
         client_host: Host,
         port: Port = 0,
+        buffered: bool = False,
         **kwargs,
     ):
         """
@@ -52,21 +92,28 @@ class TcpServerProvider(ServerProvider):
             port:
                 The port to start the server on. If set to 0, the server will
                 choose an available port automatically.
+            buffered:
+                Whether to read connections into reusable buffers with
+                ``rosy.buffered``, instead of using ``asyncio`` streams.
             kwargs:
                 Additional keyword arguments will be passed to the
-                ``asyncio.start_server`` call.
+                ``asyncio.start_server`` (or ``rosy.buffered.start_server``)
+                call.
         """
 
         self.server_host = server_host
         self.client_host = client_host
         self.port = port
+        self.buffered = buffered
         self.kwargs = kwargs
 
     async def start_server(
         self,
         client_connected_cb,
     ) -> tuple[Server, list[ConnectionSpec]]:
-        server = await asyncio.start_server(
+        start_server = buffered.start_server if self.buffered else asyncio.start_server
+
+        server = await start_server(
             client_connected_cb,
             host=self.server_host,
             port=self.port,
@@ -96,6 +143,7 @@ class TmpUnixServerProvider(ServerProvider):
         prefix: str | None = "rosy-node-server.",
         suffix: str | None = ".sock",
         dir=None,
+        buffered: bool = False,
         **kwargs,
     ):
         """
@@ -107,14 +155,19 @@ class TmpUnixServerProvider(ServerProvider):
             dir:
                 The directory to create the temporary Unix socket file in.
                 If not set, the system's default temporary directory will be used.
+            buffered:
+                Whether to read connections into reusable buffers with
+                ``rosy.buffered``, instead of using ``asyncio`` streams.
             kwargs:
                 Additional keyword arguments will be passed to the
-                ``asyncio.start_unix_server`` call.
+                ``asyncio.start_unix_server`` (or
+                ``rosy.buffered.start_unix_server``) call.
         """
 
         self.prefix = prefix
         self.suffix = suffix
         self.dir = dir
+        self.buffered = buffered
         self.kwargs = kwargs
 
     async def start_server(
@@ -128,8 +181,12 @@ class TmpUnixServerProvider(ServerProvider):
         ) as file:
             path = file.name
 
+        start_unix_server = (
+            buffered.start_unix_server if self.buffered else asyncio.start_unix_server
+        )
+
         try:
-            server = await asyncio.start_unix_server(
+            server = await start_unix_server(
                 client_connected_cb, path=path, **self.kwargs
             )
         except NotImplementedError as e:
@@ -142,6 +199,264 @@ class TmpUnixServerProvider(ServerProvider):
         return server, [conn_spec]
 
 
+class SharedMemoryServerProvider(TmpUnixServerProvider):
+    """
+    Starts a Unix server on a tmp file, which clients on the same host use to
+    set up shared-memory connections. See ``rosy.shm``.
+
+    Only supported on x86 machines; see ``rosy.shm.is_supported_platform``.
+    """
+
+    def __init__(
+        self,
+        capacity: int = shm.DEFAULT_CAPACITY,
+        prefix: str | None = "rosy-node-shm.",
+        **kwargs,
+    ):
+        """
+        Args:
+            capacity:
+                Size in bytes of the ring buffer for each direction of
+                each connection.
+            prefix:
+                The prefix for the temporary Unix socket file.
+            kwargs:
+                Additional keyword arguments will be passed to
+                ``TmpUnixServerProvider``.
+        """
+
+        super().__init__(prefix=prefix, **kwargs)
+        self.capacity = capacity
+
+    async def start_server(
+        self,
+        client_connected_cb,
+    ) -> tuple[Server, list[ConnectionSpec]]:
+        if not shm.is_supported_platform():
+            raise UnsupportedProviderError(
+                self, f"Not supported on machine={platform.machine()!r}; only on x86"
+            )
+
+        async def handle_client(
+            sock_reader: StreamReader,
+            sock_writer: StreamWriter,
+        ) -> None:
+            try:
+                reader, writer = await shm.accept(
+                    sock_reader, sock_writer, self.capacity
+                )
+            except (EOFError, ConnectionError, OSError) as e:
+                logger.error(f"Failed to set up shared-memory connection: {e!r}")
+                return
+
+            try:
+                await client_connected_cb(reader, writer)
+            finally:
+                await close_ignoring_errors(writer)
+
+        server, conn_specs = await super().start_server(handle_client)
+
+        conn_specs = [SharedMemoryConnectionSpec(path=spec.path) for spec in conn_specs]
+
+        return server, conn_specs
+
+
+class UdpServerProvider(DatagramServerProvider):
+    """Starts a UDP server on the first available port."""
+
+    def __init__(
+        self,
+        server_host: ServerHost,
+        client_host: Host,
+        port: Port = 0,
+        **kwargs,
+    ):
+        """
+        Args:
+            server_host:
+                The interface(s) that the server will listen on. If None,
+                listens on all IPv4 interfaces.
+            client_host:
+                The host that clients will send datagrams to.
+            port:
+                The port to start the server on. If set to 0, the server will
+                choose an available port automatically.
+            kwargs:
+                Additional keyword arguments will be passed to
+                ``DatagramServerProvider``.
+        """
+
+        super().__init__(**kwargs)
+        self.server_host = server_host
+        self.client_host = client_host
+        self.port = port
+
+    async def start_server(
+        self,
+        datagram_received_cb: DatagramReceivedCallback,
+    ) -> tuple[Server, list[ConnectionSpec]]:
+        if self.server_host is None:
+            server_hosts = ["0.0.0.0"]
+        elif isinstance(self.server_host, str):
+            server_hosts = [self.server_host]
+        else:
+            server_hosts = list(self.server_host)
+
+        server = _DatagramServer()
+        conn_specs = []
+
+        try:
+            for server_host in server_hosts:
+                transport, protocol = await self._create_endpoint(
+                    datagram_received_cb,
+                    local_addr=(server_host, self.port),
+                )
+                server.add_endpoint(transport, protocol)
+
+                sock = transport.get_extra_info("socket")
+                conn_specs.append(
+                    UdpConnectionSpec(
+                        self.client_host,
+                        port=sock.getsockname()[1],
+                        family=sock.family,
+                    )
+                )
+        except BaseException:
+            server.close()
+            await server.wait_closed()
+            raise
+
+        return server, conn_specs
+
+
+class TmpUnixDatagramServerProvider(DatagramServerProvider):
+    """Starts a Unix datagram server on a tmp file."""
+
+    def __init__(
+        self,
+        prefix: str | None = "rosy-node-dgram.",
+        suffix: str | None = ".sock",
+        dir=None,
+        **kwargs,
+    ):
+        """
+        Args:
+            prefix:
+                The prefix for the temporary Unix socket file.
+            suffix:
+                The suffix for the temporary Unix socket file.
+            dir:
+                The directory to create the temporary Unix socket file in.
+                If not set, the system's default temporary directory will be used.
+            kwargs:
+                Additional keyword arguments will be passed to
+                ``DatagramServerProvider``.
+        """
+
+        super().__init__(**kwargs)
+        self.prefix = prefix
+        self.suffix = suffix
+        self.dir = dir
+
+    async def start_server(
+        self,
+        datagram_received_cb: DatagramReceivedCallback,
+    ) -> tuple[Server, list[ConnectionSpec]]:
+        family = getattr(socket, "AF_UNIX", None)
+        if family is None:
+            raise UnsupportedProviderError(self, "Unix sockets are not supported")
+
+        with tempfile.NamedTemporaryFile(
+            prefix=self.prefix,
+            suffix=self.suffix,
+            dir=self.dir,
+        ) as file:
+            path = file.name
+
+        try:
+            transport, protocol = await self._create_endpoint(
+                datagram_received_cb,
+                family=family,
+                local_addr=path,
+            )
+        except NotImplementedError as e:
+            raise UnsupportedProviderError(self, repr(e))
+
+        server = _DatagramServer(path)
+        server.add_endpoint(transport, protocol)
+
+        conn_spec = UnixDatagramConnectionSpec(path=path)
+
+        return server, [conn_spec]
+
+
+class QueuedDatagramProtocol(asyncio.DatagramProtocol):
+    """
+    Queues received datagrams to be handled one at a time, in order, dropping
+    them when the queue is full; datagrams are best-effort anyway.
+    """
+
+    def __init__(
+        self,
+        datagram_received_cb: DatagramReceivedCallback,
+        max_queue_size: int,
+    ):
+        self.datagram_received_cb = datagram_received_cb
+        self._queue: asyncio.Queue[bytes] = asyncio.Queue(max_queue_size)
+        self._task = asyncio.create_task(self._run(), name="DatagramServer")
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        try:
+            self._queue.put_nowait(data)
+        except asyncio.QueueFull:
+            logger.warning("Dropped datagram; receive queue is full")
+
+    def error_received(self, exc: Exception) -> None:
+        logger.error(f"Datagram server error: {exc!r}")
+
+    async def stop(self) -> None:
+        await cancel_task(self._task)
+
+    async def _run(self) -> None:
+        while True:
+            data = await self._queue.get()
+            try:
+                await self.datagram_received_cb(data)
+            except ALLOWED_EXCEPTIONS:
+                raise
+            except Exception as e:
+                logger.exception("Error handling datagram", exc_info=e)
+
+
+class _DatagramServer(Server):
+    """Closes the datagram endpoints, and deletes the Unix socket file, if any."""
+
+    def __init__(self, path: str = None):
+        self.path = Path(path) if path else None
+        self._endpoints: list[
+            tuple[asyncio.DatagramTransport, QueuedDatagramProtocol]
+        ] = []
+
+    def add_endpoint(
+        self,
+        transport: asyncio.DatagramTransport,
+        protocol: QueuedDatagramProtocol,
+    ) -> None:
+        self._endpoints.append((transport, protocol))
+
+    def close(self) -> None:
+        for transport, _ in self._endpoints:
+            transport.close()
+
+    async def wait_closed(self) -> None:
+        try:
+            for _, protocol in self._endpoints:
+                await protocol.stop()
+        finally:
+            if self.path:
+                self.path.unlink(missing_ok=True)
+
+
 class _UnixServer(Server):
     """
     This is a wrapper that ensures that the Unix socket file is deleted
@@ -170,10 +485,12 @@ class ServersManager:
         server_providers: Iterable[ServerProvider],
         client_connected_cb: ClientConnectedCallback,
         stop_servers_timeout: float = 1.0,
+        datagram_received_cb: DatagramReceivedCallback = None,
     ):
         self.server_providers = server_providers
         self.client_connected_cb = client_connected_cb
         self.stop_servers_timeout = stop_servers_timeout
+        self.datagram_received_cb = datagram_received_cb
 
         self._servers: list[Server] = []
         self._connection_specs: list[ConnectionSpec] = []
@@ -189,10 +506,20 @@ class ServersManager:
         client_connected_cb = _close_on_return(self.client_connected_cb)
 
         for provider in self.server_providers:
+            if isinstance(provider, DatagramServerProvider):
+                if self.datagram_received_cb is None:
+                    logger.warning(
+                        f"Not starting datagram server using provider={provider}; "
+                        f"no datagram_received_cb given"
+                    )
+                    continue
+
+                callback = self.datagram_received_cb
+            else:
+                callback = client_connected_cb
+
             try:
-                server, connection_specs = await provider.start_server(
-                    client_connected_cb
-                )
+                server, connection_specs = await provider.start_server(callback)
             except UnsupportedProviderError as e:
                 logger.exception(
                     f"Failed to start server using provider={provider}", exc_info=e
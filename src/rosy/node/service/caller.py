@@ -1,17 +1,18 @@
 import asyncio
 import logging
 from asyncio import Future
-from collections.abc import Iterator
+from collections.abc import Iterable, Iterator, Mapping
 from contextlib import contextmanager
 from weakref import WeakKeyDictionary
 
 from rosy.asyncio import Reader
-from rosy.node.codec import NodeMessageCodec
+from rosy.node.codec import NodeMessageCodec, NodeMessageCodecSelector
 from rosy.node.peer.connection import PeerConnectionManager
 from rosy.node.peer.selector import PeerSelector
 from rosy.node.service.types import RequestId, ServiceRequest, ServiceResponse
 from rosy.node.types import Args, KWArgs
-from rosy.types import Data
+from rosy.specs import MeshNodeSpec
+from rosy.types import Data, Priority, Service
 
 logger = logging.getLogger(__name__)
 
@@ -21,34 +22,69 @@ class ServiceCaller:
         self,
         peer_selector: PeerSelector,
         connection_manager: PeerConnectionManager,
-        node_message_codec: NodeMessageCodec,
+        codec_selector: NodeMessageCodecSelector,
         max_request_ids: int,
+        service_priorities: Mapping[Service, Priority] = None,
+        services: Iterable[Service] = (),
     ):
         self.peer_selector = peer_selector
         self.connection_selector = connection_manager
-        self.node_message_codec = node_message_codec
+        self.codec_selector = codec_selector
         self.max_request_ids = max_request_ids
+        self._service_priorities: dict[Service, Priority] = dict(
+            service_priorities or {}
+        )
+
+        # Services called so far, plus any expected to be; see get_priorities
+        self.services: set[Service] = set(services)
 
         self._next_request_id: RequestId = 0
         self._response_futures: WeakKeyDictionary[Reader, dict[RequestId, Future]] = (
             WeakKeyDictionary()
         )
 
+    def set_priority(self, service: Service, priority: Priority | None) -> None:
+        """
+        Sets the priority of the connection to send requests for a service on,
+        or resets it to 'normal' if ``priority`` is None.
+        """
+
+        if priority is None:
+            self._service_priorities.pop(service, None)
+        else:
+            self._service_priorities[service] = priority
+
+    def get_priorities(self, node: MeshNodeSpec) -> set[Priority]:
+        """
+        Returns the priorities of the connections that requests for the
+        services in ``services`` are sent to the node over.
+        """
+
+        return {
+            self._service_priorities.get(service, "normal")
+            for service in node.services & self.services
+        }
+
     async def call(self, service: str, args: Args, kwargs: KWArgs) -> Data:
+        self.services.add(service)
+
         node = self.peer_selector.get_node_for_service(service)
         if node is None:
             raise ValueError(f"No node hosting service={service!r}")
 
-        connection = await self.connection_selector.get_connection(node)
+        _, node_message_codec = self.codec_selector.select(node)
+
+        priority = self._service_priorities.get(service, "normal")
+        connection = await self.connection_selector.get_connection(node, priority)
 
-        self._start_response_handler(connection.reader)
+        self._start_response_handler(connection.reader, node_message_codec)
 
         with self._get_request_id_and_response_future(connection.reader) as (
             request_id,
             response_future,
         ):
             request = ServiceRequest(request_id, service, args, kwargs)
-            request = await self.node_message_codec.encode_service_request(request)
+            request = await node_message_codec.encode_service_request(request)
 
             async with connection.writer as writer:
                 writer.write(request)
@@ -96,23 +132,36 @@ class ServiceCaller:
     def _inc_next_request_id(self) -> None:
         self._next_request_id = (self._next_request_id + 1) % self.max_request_ids
 
-    def _start_response_handler(self, reader: Reader) -> None:
+    def _start_response_handler(
+        self,
+        reader: Reader,
+        node_message_codec: NodeMessageCodec,
+    ) -> None:
         if reader not in self._response_futures:
             self._response_futures[reader] = {}
             asyncio.create_task(
-                self._response_handler(reader), name="ServiceResponseHandler"
+                self._response_handler(reader, node_message_codec),
+                name="ServiceResponseHandler",
             )
 
-    async def _response_handler(self, reader: Reader) -> None:
+    async def _response_handler(
+        self,
+        reader: Reader,
+        node_message_codec: NodeMessageCodec,
+    ) -> None:
         try:
             while True:
-                await self._handle_one_response(reader)
+                await self._handle_one_response(reader, node_message_codec)
         finally:
             self._fail_pending_response_futures_for(reader)
             self._response_futures.pop(reader)
 
-    async def _handle_one_response(self, reader: Reader) -> None:
-        response = await self.node_message_codec.decode_service_response(reader)
+    async def _handle_one_response(
+        self,
+        reader: Reader,
+        node_message_codec: NodeMessageCodec,
+    ) -> None:
+        response = await node_message_codec.decode_service_response(reader)
 
         response_future = self._response_futures[reader].get(response.id)
         if response_future is None:
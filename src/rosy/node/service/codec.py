@@ -1,5 +1,5 @@
 from rosy.asyncio import Reader, Writer
-from rosy.codec import Codec
+from rosy.codec import Codec, read_from
 from rosy.node.service.types import RequestId, ServiceRequest, ServiceResponse
 from rosy.node.types import Args, KWArgs
 from rosy.types import Data, Service
@@ -31,6 +31,30 @@ class ServiceRequestCodec(Codec[ServiceRequest]):
         kwargs = await self.kwargs_codec.decode(reader)
         return ServiceRequest(id, service, args, kwargs)
 
+    @property
+    def supports_sync(self) -> bool:
+        return (
+            self.id_codec.supports_sync
+            and self.service_codec.supports_sync
+            and self.args_codec.supports_sync
+            and self.kwargs_codec.supports_sync
+        )
+
+    def encode_into(self, buffer: bytearray, request: ServiceRequest) -> None:
+        self.id_codec.encode_into(buffer, request.id)
+        self.service_codec.encode_into(buffer, request.service)
+        self.args_codec.encode_into(buffer, request.args)
+        self.kwargs_codec.encode_into(buffer, request.kwargs)
+
+    def decode_from(
+        self, data: memoryview, offset: int = 0
+    ) -> tuple[ServiceRequest, int]:
+        id, offset = self.id_codec.decode_from(data, offset)
+        service, offset = self.service_codec.decode_from(data, offset)
+        args, offset = self.args_codec.decode_from(data, offset)
+        kwargs, offset = self.kwargs_codec.decode_from(data, offset)
+        return ServiceRequest(id, service, args, kwargs), offset
+
 
 class ServiceResponseCodec(Codec[ServiceResponse]):
     def __init__(
@@ -71,3 +95,39 @@ class ServiceResponseCodec(Codec[ServiceResponse]):
             raise ValueError(f"Received unknown status code={status_code!r}")
 
         return ServiceResponse(id, data, error)
+
+    @property
+    def supports_sync(self) -> bool:
+        return (
+            self.id_codec.supports_sync
+            and self.data_codec.supports_sync
+            and self.error_codec.supports_sync
+        )
+
+    def encode_into(self, buffer: bytearray, response: ServiceResponse) -> None:
+        self.id_codec.encode_into(buffer, response.id)
+
+        if response.error:
+            buffer += self.error_status_code
+            self.error_codec.encode_into(buffer, response.error)
+        else:
+            buffer += self.success_status_code
+            self.data_codec.encode_into(buffer, response.result)
+
+    def decode_from(
+        self, data: memoryview, offset: int = 0
+    ) -> tuple[ServiceResponse, int]:
+        id, offset = self.id_codec.decode_from(data, offset)
+
+        status_code, offset = read_from(data, offset, 1)
+        status_code = bytes(status_code)
+        if status_code == self.success_status_code:
+            result, offset = self.data_codec.decode_from(data, offset)
+            error = None
+        elif status_code == self.error_status_code:
+            result = None
+            error, offset = self.error_codec.decode_from(data, offset)
+        else:
+            raise ValueError(f"Received unknown status code={status_code!r}")
+
+        return ServiceResponse(id, result, error), offset
@@ -21,7 +21,13 @@ class ServiceRequestHandler:
         self,
         request: ServiceRequest,
         writer: LockableWriter,
+        node_message_codec: NodeMessageCodec = None,
     ) -> None:
+        """
+        Handles the request and writes the response to the writer, encoded
+        with the given codec, or the default codec if not given.
+        """
+
         handler = self.service_handler_manager.get_callback(request.service)
 
         result, error = None, None
@@ -45,8 +51,10 @@ class ServiceRequestHandler:
 
         response = ServiceResponse(request.id, result, error)
 
+        node_message_codec = node_message_codec or self.node_message_codec
+
         async with writer:
-            await self.node_message_codec.encode_service_response(
+            await node_message_codec.encode_service_response(
                 writer,
                 response,
             )
@@ -18,11 +18,49 @@ class TopicMessageCodec(Codec[TopicMessage]):
 
     async def encode(self, writer: Writer, message: TopicMessage) -> None:
         await self.topic_codec.encode(writer, message.topic)
-        await self.args_codec.encode(writer, message.args)
-        await self.kwargs_codec.encode(writer, message.kwargs)
+        await self.encode_body(writer, message.args, message.kwargs)
 
     async def decode(self, reader: Reader) -> TopicMessage:
         topic = await self.topic_codec.decode(reader)
+        args, kwargs = await self.decode_body(reader)
+        return TopicMessage(topic, args, kwargs)
+
+    async def encode_body(self, writer: Writer, args: Args, kwargs: KWArgs) -> None:
+        """Encodes just the args and kwargs of a message."""
+        await self.args_codec.encode(writer, args)
+        await self.kwargs_codec.encode(writer, kwargs)
+
+    async def decode_body(self, reader: Reader) -> tuple[Args, KWArgs]:
         args = await self.args_codec.decode(reader)
         kwargs = await self.kwargs_codec.decode(reader)
-        return TopicMessage(topic, args, kwargs)
+        return args, kwargs
+
+    @property
+    def supports_sync(self) -> bool:
+        return (
+            self.topic_codec.supports_sync
+            and self.args_codec.supports_sync
+            and self.kwargs_codec.supports_sync
+        )
+
+    def encode_into(self, buffer: bytearray, message: TopicMessage) -> None:
+        self.topic_codec.encode_into(buffer, message.topic)
+        self.encode_body_into(buffer, message.args, message.kwargs)
+
+    def decode_from(
+        self, data: memoryview, offset: int = 0
+    ) -> tuple[TopicMessage, int]:
+        topic, offset = self.topic_codec.decode_from(data, offset)
+        (args, kwargs), offset = self.decode_body_from(data, offset)
+        return TopicMessage(topic, args, kwargs), offset
+
+    def encode_body_into(self, buffer: bytearray, args: Args, kwargs: KWArgs) -> None:
+        self.args_codec.encode_into(buffer, args)
+        self.kwargs_codec.encode_into(buffer, kwargs)
+
+    def decode_body_from(
+        self, data: memoryview, offset: int = 0
+    ) -> tuple[tuple[Args, KWArgs], int]:
+        args, offset = self.args_codec.decode_from(data, offset)
+        kwargs, offset = self.kwargs_codec.decode_from(data, offset)
+        return (args, kwargs), offset
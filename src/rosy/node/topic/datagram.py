@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import socket
+from asyncio import DatagramTransport, Lock
+from collections import defaultdict
+from typing import NamedTuple
+
+from rosy.asyncio import segments_nbytes
+from rosy.network import get_hostname
+from rosy.node.codec import NodeMessageCodec, NodeMessageCodecSelector
+from rosy.node.types import ConnectionHello
+from rosy.specs import (
+    MeshNodeSpec,
+    NodeId,
+    UdpConnectionSpec,
+    UnixDatagramConnectionSpec,
+)
+from rosy.types import Buffer, Host, Topic
+
+logger = logging.getLogger(__name__)
+
+
+class DatagramSender:
+    def __init__(
+        self,
+        codec_selector: NodeMessageCodecSelector,
+        host: Host = None,
+        max_udp_size: int = 1472,
+        max_unix_size: int = 65536,
+        max_buffer_size: int = 256 * 1024,
+    ):
+        """
+        Sends best-effort topic messages to nodes as datagrams, so a lost
+        message never delays the messages after it.
+
+        Args:
+            codec_selector:
+                Picks the codec to use with each node.
+            host:
+                Hostname of this machine; Unix datagrams are only sent to nodes
+                on the same host.
+            max_udp_size:
+                Max size of a UDP datagram. The default fits in one Ethernet
+                packet, so the datagram is never fragmented.
+            max_unix_size:
+                Max size of a Unix datagram.
+            max_buffer_size:
+                Datagrams are dropped while this many bytes are waiting to be
+                sent to the node, instead of being buffered.
+        """
+
+        self.codec_selector = codec_selector
+        self.host = host or get_hostname()
+        self.max_udp_size = max_udp_size
+        self.max_unix_size = max_unix_size
+        self.max_buffer_size = max_buffer_size
+
+        # None if the node does not accept datagrams
+        self._endpoints: dict[NodeId, _Endpoint | None] = {}
+        self._endpoints_locks: dict[NodeId, Lock] = defaultdict(Lock)
+        self._encoder = DatagramEncoder()
+
+    async def send(self, node: MeshNodeSpec, topic: Topic, body: list[Buffer]) -> bool:
+        """
+        Sends a topic message to the node as a datagram.
+
+        Returns False if the message must be sent some other way instead,
+        i.e. if the node does not accept datagrams or the message does not fit
+        in one. Returns True if the message was sent, or dropped.
+        """
+
+        endpoint = await self._get_endpoint(node)
+        if endpoint is None:
+            return False
+
+        try:
+            data_codec, codec = self.codec_selector.select(node)
+        except ValueError:
+            return False
+
+        datagram = await self._encoder.encode(
+            data_codec, codec, topic, body, endpoint.max_size
+        )
+        if datagram is None:
+            return False
+
+        transport = endpoint.transport
+        if transport.is_closing():
+            self._endpoints.pop(node.id, None)
+            return False
+
+        if transport.get_write_buffer_size() > self.max_buffer_size:
+            logger.warning(
+                f"Dropped topic message for node={node.id}; "
+                f"datagram buffer full for topic={topic!r}",
+            )
+            return True
+
+        transport.sendto(datagram)
+        return True
+
+    def close(self, node: MeshNodeSpec) -> None:
+        endpoint = self._endpoints.pop(node.id, None)
+        self._endpoints_locks.pop(node.id, None)
+        if endpoint is not None:
+            endpoint.transport.close()
+
+    def close_all(self) -> None:
+        for node_id in list(self._endpoints):
+            endpoint = self._endpoints.pop(node_id)
+            if endpoint is not None:
+                endpoint.transport.close()
+
+        self._endpoints_locks.clear()
+
+    async def _get_endpoint(self, node: MeshNodeSpec) -> "_Endpoint | None":
+        if node.id in self._endpoints:
+            return self._endpoints[node.id]
+
+        async with self._endpoints_locks[node.id]:
+            if node.id not in self._endpoints:
+                self._endpoints[node.id] = await self._create_endpoint(node)
+
+            return self._endpoints[node.id]
+
+    async def _create_endpoint(self, node: MeshNodeSpec) -> "_Endpoint | None":
+        loop = asyncio.get_running_loop()
+
+        for conn_spec in node.connection_specs:
+            if isinstance(conn_spec, UnixDatagramConnectionSpec):
+                if conn_spec.host != self.host:
+                    continue
+
+                kwargs = dict(family=socket.AF_UNIX, remote_addr=conn_spec.path)
+                max_size = self.max_unix_size
+            elif isinstance(conn_spec, UdpConnectionSpec):
+                kwargs = dict(
+                    family=conn_spec.family,
+                    remote_addr=(conn_spec.host, conn_spec.port),
+                )
+                max_size = self.max_udp_size
+            else:
+                continue
+
+            try:
+                transport, _ = await loop.create_datagram_endpoint(
+                    _DatagramClientProtocol, **kwargs
+                )
+            except OSError as e:
+                logger.error(f"Error connecting to {conn_spec}: {e!r}")
+                continue
+
+            return _Endpoint(transport, max_size)
+
+        return None
+
+
+class DatagramEncoder:
+    """
+    Encodes topic messages as datagrams that can be decoded on their own:
+    a hello frame naming the data codec, if one was negotiated, followed by
+    a topic message frame with the topic name.
+    """
+
+    def __init__(self):
+        self._hellos: dict[str, Buffer] = {}
+
+    async def encode(
+        self,
+        data_codec: str | None,
+        codec: NodeMessageCodec,
+        topic: Topic,
+        body: list[Buffer],
+        max_size: int,
+    ) -> bytes | None:
+        """
+        Returns the datagram, or None if it would be larger than max_size.
+        The size is checked before the segments are joined, so a message
+        that is too large is never copied.
+        """
+
+        segments = await codec.encode_topic_message_frame(None, topic, body)
+        if data_codec is not None:
+            segments.insert(0, await self._get_hello(data_codec, codec))
+
+        if segments_nbytes(segments) > max_size:
+            return None
+
+        return b"".join(segments)
+
+    async def _get_hello(self, data_codec: str, codec: NodeMessageCodec) -> Buffer:
+        hello = self._hellos.get(data_codec)
+        if hello is None:
+            hello = await codec.encode_hello(ConnectionHello(data_codec))
+            self._hellos[data_codec] = hello
+
+        return hello
+
+
+class _Endpoint(NamedTuple):
+    transport: DatagramTransport
+    max_size: int
+
+
+class _DatagramClientProtocol(asyncio.DatagramProtocol):
+    def error_received(self, exc: Exception) -> None:
+        # E.g. the node stopped listening; the datagram is lost either way
+        logger.debug(f"Error sending datagram: {exc!r}")
@@ -0,0 +1,187 @@
+import asyncio
+import copy
+import logging
+from collections.abc import Sequence
+
+from rosy.asyncio import cancel_task
+from rosy.node.topic.messagehandler import TopicMessageHandler
+from rosy.node.topic.types import TopicMessage
+from rosy.node.types import Args, KWArgs
+from rosy.specs import MeshNodeSpec, NodeId
+from rosy.types import Topic
+from rosy.utils import ALLOWED_EXCEPTIONS
+
+logger = logging.getLogger(__name__)
+
+
+class InProcessInbox:
+    def __init__(
+        self,
+        message_handler: TopicMessageHandler,
+        registry: "InProcessRegistry" = None,
+        max_queue_size: int = 1000,
+    ):
+        """
+        Receives topic messages sent by nodes in the same process, without
+        encoding them or sending them through a socket. Messages are handled
+        one at a time, in the order they were sent, like messages received
+        over a connection.
+
+        Args:
+            message_handler:
+                Calls the listener callbacks with the messages.
+            registry:
+                Where senders in this process find the inbox, once started.
+                Defaults to the process-wide registry.
+            max_queue_size:
+                Max number of messages waiting to be handled. Messages sent
+                while the queue is full are dropped, unless the sender waits.
+        """
+
+        self.message_handler = message_handler
+        self.registry = registry or IN_PROCESS_REGISTRY
+        self.max_queue_size = max_queue_size
+
+        self._node_id: NodeId | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._queue: asyncio.Queue[TopicMessage] | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop | None:
+        """The event loop the inbox is running on, if started."""
+        return self._loop
+
+    def accepts(self, topic: Topic) -> bool:
+        """Whether messages on the topic can be delivered to this inbox."""
+
+        # Raw listeners expect the encoded payload
+        return self._task is not None and topic not in self.message_handler.raw_topics
+
+    def start(self, node_id: NodeId) -> None:
+        self._node_id = node_id
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(self.max_queue_size)
+        self._task = asyncio.create_task(self._run(), name=f"InProcessInbox {node_id}")
+        self.registry.register(node_id, self)
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        self.registry.unregister(self._node_id, self)
+        task, self._task = self._task, None
+        await cancel_task(task)
+
+    async def put(self, message: TopicMessage, wait: bool = False) -> None:
+        """
+        Queues a message to be handled. If ``wait`` is true, waits for room
+        if the queue is full; otherwise, drops the message.
+        """
+
+        if wait:
+            await self._queue.put(message)
+            return
+
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            logger.warning(
+                f"Dropped in-process topic message for node={self._node_id}; "
+                f"inbox full for topic={message.topic!r}"
+            )
+
+    async def _run(self) -> None:
+        while True:
+            message = await self._queue.get()
+            try:
+                await self.message_handler.handle_message(message)
+            except ALLOWED_EXCEPTIONS:
+                raise
+            except Exception as e:
+                logger.exception("Error handling in-process topic message", exc_info=e)
+
+
+class InProcessRegistry:
+    """The inboxes of the nodes running in this process, by node ID."""
+
+    def __init__(self):
+        self._inboxes: dict[NodeId, InProcessInbox] = {}
+
+    def register(self, node_id: NodeId, inbox: InProcessInbox) -> None:
+        self._inboxes[node_id] = inbox
+
+    def unregister(self, node_id: NodeId, inbox: InProcessInbox) -> None:
+        if self._inboxes.get(node_id) is inbox:
+            del self._inboxes[node_id]
+
+    def get(self, node_id: NodeId) -> InProcessInbox | None:
+        """
+        Returns the node's inbox, if the node is running in this process, on
+        the current event loop.
+        """
+
+        inbox = self._inboxes.get(node_id)
+        if inbox is None or inbox.loop is not asyncio.get_running_loop():
+            return None
+
+        return inbox
+
+
+IN_PROCESS_REGISTRY = InProcessRegistry()
+
+
+class InProcessSender:
+    def __init__(
+        self,
+        registry: InProcessRegistry = None,
+        copy_messages: bool = True,
+    ):
+        """
+        Delivers topic messages directly to listening nodes in the same
+        process, passing the args and kwargs objects to the listener's
+        callback instead of encoding them and sending them through a socket.
+
+        Args:
+            registry:
+                Where to find the inboxes of nodes in this process. Defaults
+                to the process-wide registry.
+            copy_messages:
+                If True, each listener gets a deep copy of the args and kwargs,
+                as it would if they had been encoded and decoded. If False,
+                listeners get the objects that were sent, which is faster, but
+                neither the sender nor the listeners may modify them.
+        """
+
+        self.registry = registry or IN_PROCESS_REGISTRY
+        self.copy_messages = copy_messages
+
+    async def send(
+        self,
+        nodes: Sequence[MeshNodeSpec],
+        topic: Topic,
+        args: Args,
+        kwargs: KWArgs,
+        wait: bool = False,
+    ) -> list[MeshNodeSpec]:
+        """
+        Delivers the message to the nodes in this process. Returns the other
+        nodes, which it must be sent to some other way.
+        """
+
+        other_nodes = []
+
+        for node in nodes:
+            inbox = self.registry.get(node.id)
+            if inbox is None or not inbox.accepts(topic):
+                other_nodes.append(node)
+                continue
+
+            if self.copy_messages:
+                message = TopicMessage(topic, *copy.deepcopy((args, kwargs)))
+            else:
+                message = TopicMessage(topic, args, kwargs)
+
+            await inbox.put(message, wait)
+
+        return other_nodes
@@ -1,4 +1,52 @@
 from rosy.node.callbackmanager import CallbackManager
-from rosy.types import Topic, TopicCallback
+from rosy.node.topic.qos import TopicQoS
+from rosy.types import RawTopicCallback, Topic, TopicCallback
 
-TopicListenerManager = CallbackManager[Topic, TopicCallback]
+
+class TopicListenerManager(CallbackManager[Topic, TopicCallback | RawTopicCallback]):
+    def __init__(self):
+        super().__init__()
+        self._raw_topics: set[Topic] = set()
+        self._topic_qos: dict[Topic, TopicQoS] = {}
+        self._version = 0
+
+    @property
+    def raw_topics(self) -> set[Topic]:
+        """Topics whose listeners receive undecoded payloads."""
+        return self._raw_topics
+
+    @property
+    def version(self) -> int:
+        """Incremented whenever a listener is set or removed."""
+        return self._version
+
+    @property
+    def topic_qos(self) -> dict[Topic, TopicQoS]:
+        """QoS requested from senders for some topics."""
+        return self._topic_qos
+
+    def set_callback(
+        self,
+        key: Topic,
+        callback: TopicCallback | RawTopicCallback,
+        raw: bool = False,
+        qos: TopicQoS = None,
+    ) -> None:
+        super().set_callback(key, callback)
+        self._version += 1
+
+        if raw:
+            self._raw_topics.add(key)
+        else:
+            self._raw_topics.discard(key)
+
+        if qos is not None:
+            self._topic_qos[key] = qos
+        else:
+            self._topic_qos.pop(key, None)
+
+    def remove_callback(self, key: Topic) -> TopicCallback | RawTopicCallback | None:
+        self._raw_topics.discard(key)
+        self._topic_qos.pop(key, None)
+        self._version += 1
+        return super().remove_callback(key)
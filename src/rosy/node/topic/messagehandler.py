@@ -1,11 +1,15 @@
+import asyncio
 import logging
 
 from rosy.node.topic.listenermanager import TopicListenerManager
-from rosy.node.topic.types import TopicMessage
+from rosy.node.topic.types import RawTopicMessage, TopicMessage
+from rosy.types import RawTopicCallback, Topic, TopicCallback
 from rosy.utils import ALLOWED_EXCEPTIONS
 
 logger = logging.getLogger(__name__)
 
+Callback = TopicCallback | RawTopicCallback
+
 
 class TopicMessageHandler:
     def __init__(
@@ -14,14 +18,85 @@ class TopicMessageHandler:
     ):
         self.listener_manager = listener_manager
 
-    async def handle_message(self, message: TopicMessage) -> None:
-        callback = self.listener_manager.get_callback(message.topic)
+        # Latest message on each keep_latest topic waiting for its callback,
+        # and the task calling the callback with them
+        self._latest: dict[Topic, tuple[Callback, TopicMessage | RawTopicMessage]] = {}
+        self._latest_tasks: dict[Topic, asyncio.Task] = {}
+
+    @property
+    def raw_topics(self) -> set[Topic]:
+        """Topics whose messages should be handled without being decoded."""
+        return self.listener_manager.raw_topics
+
+    def new_callback_table(self) -> "TopicCallbackTable":
+        """Returns a table to resolve the topic IDs of one connection with."""
+        return TopicCallbackTable(self.listener_manager)
+
+    async def handle_message(
+        self,
+        message: TopicMessage | RawTopicMessage,
+        callback_table: "TopicCallbackTable" = None,
+    ) -> None:
+        """
+        Calls the listener of the message's topic. If the message was sent
+        with a topic ID, its listener is looked up in ``callback_table``,
+        if given, instead of by topic name.
+
+        If the listener asked for ``TopicQoS(keep_latest=True)``, this returns
+        right away instead, and the callback is called in the background; a
+        message received while it is still handling an earlier one replaces
+        any other message waiting for it. So a slow listener skips to the
+        latest message, instead of working through the ones already received.
+        """
+
+        if callback_table is not None and message.topic_id is not None:
+            callback = callback_table.get(message.topic_id, message.topic)
+        else:
+            callback = self.listener_manager.get_callback(message.topic)
 
         if not callback:
             logger.warning(
                 f"Received message for topic={message.topic!r} "
                 f"but no listener is registered."
             )
+            return
+
+        qos = self.listener_manager.topic_qos.get(message.topic)
+        if qos is not None and qos.keep_latest:
+            self._put_latest(callback, message)
+            return
+
+        await self._call_callback(callback, message)
+
+    def _put_latest(
+        self,
+        callback: Callback,
+        message: TopicMessage | RawTopicMessage,
+    ) -> None:
+        topic = message.topic
+        self._latest[topic] = callback, message
+
+        if topic not in self._latest_tasks:
+            self._latest_tasks[topic] = asyncio.create_task(
+                self._call_latest(topic),
+                name=f"Call keep_latest listener for topic={topic!r}",
+            )
+
+    async def _call_latest(self, topic: Topic) -> None:
+        try:
+            while (latest := self._latest.pop(topic, None)) is not None:
+                await self._call_callback(*latest)
+        finally:
+            del self._latest_tasks[topic]
+
+    async def _call_callback(
+        self,
+        callback: Callback,
+        message: TopicMessage | RawTopicMessage,
+    ) -> None:
+        if isinstance(message, RawTopicMessage):
+            await self._call_raw_callback(callback, message)
+            return
 
         try:
             await callback(message.topic, *message.args, **message.kwargs)
@@ -35,3 +110,50 @@ class TopicMessageHandler:
                 f"and kwargs={message.kwargs!r}",
                 exc_info=e,
             )
+
+    async def _call_raw_callback(self, callback, message: RawTopicMessage) -> None:
+        try:
+            await callback(message.topic, message.payload, message.data_codec)
+        except ALLOWED_EXCEPTIONS:
+            raise
+        except Exception as e:
+            logger.exception(
+                f"Error calling callback={callback} "
+                f"for topic={message.topic!r} "
+                f"with raw payload of {len(message.payload)} bytes",
+                exc_info=e,
+            )
+
+
+class TopicCallbackTable:
+    """
+    Listener callbacks of the topics defined by ID on one connection, resolved
+    once per topic ID instead of being looked up by topic name for every
+    message. Resolved again after any listener is set or removed.
+    """
+
+    def __init__(self, listener_manager: TopicListenerManager):
+        self.listener_manager = listener_manager
+        self._version = listener_manager.version
+        self._callbacks: dict[
+            int, tuple[Topic, TopicCallback | RawTopicCallback | None]
+        ] = {}
+
+    def get(
+        self,
+        topic_id: int,
+        topic: Topic,
+    ) -> TopicCallback | RawTopicCallback | None:
+        if self._version != self.listener_manager.version:
+            self._version = self.listener_manager.version
+            self._callbacks.clear()
+
+        entry = self._callbacks.get(topic_id)
+
+        # The topic is the same object for every message with the ID, until
+        # the ID is defined again
+        if entry is None or entry[0] is not topic:
+            entry = topic, self.listener_manager.get_callback(topic)
+            self._callbacks[topic_id] = entry
+
+        return entry[1]
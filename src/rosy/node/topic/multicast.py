@@ -0,0 +1,200 @@
+import asyncio
+import hashlib
+import logging
+import socket
+import sys
+from asyncio import DatagramTransport
+from collections.abc import Awaitable, Callable
+
+from rosy.node.codec import NodeMessageCodec
+from rosy.node.servers import QueuedDatagramProtocol
+from rosy.node.topic.datagram import DatagramEncoder
+from rosy.types import Buffer, DomainId, Host, Port, Topic
+
+MulticastDatagramReceivedCallback = Callable[[bytes, Topic], Awaitable[None]]
+
+logger = logging.getLogger(__name__)
+
+
+def get_multicast_address(domain_id: DomainId, topic: Topic) -> tuple[Host, Port]:
+    """
+    Returns the multicast group and port for a topic in a domain. The group is
+    in the site-local 239.255.0.0/16 range. Distinct topics may share a group
+    and port, so receivers must drop messages on topics they did not join for.
+    """
+
+    digest = hashlib.blake2b(f"{domain_id}/{topic}".encode(), digest_size=4).digest()
+    group = f"239.255.{digest[0]}.{digest[1]}"
+    port = 20000 + int.from_bytes(digest[2:], "little") % 10000
+    return group, port
+
+
+class MulticastSender:
+    def __init__(
+        self,
+        domain_id: DomainId,
+        max_size: int = 65507,
+        ttl: int = 1,
+        interface: Host = None,
+    ):
+        """
+        Sends topic messages once to the topic's multicast group, to be
+        received by every node that joined it.
+
+        Args:
+            domain_id:
+                Domain of the node; part of each topic's multicast address.
+            max_size:
+                Max size of a datagram. The default is the largest possible UDP
+                datagram, which is fragmented into many IP packets; if any of
+                them is lost, the whole message is lost.
+            ttl:
+                Number of network hops the datagrams may take. The default
+                keeps them on the local network.
+            interface:
+                IP address of the network interface to send from. If not
+                given, the OS picks one.
+        """
+
+        self.domain_id = domain_id
+        self.max_size = max_size
+        self.ttl = ttl
+        self.interface = interface
+
+        self._transport: DatagramTransport | None = None
+        self._encoder = DatagramEncoder()
+
+    async def send(
+        self,
+        topic: Topic,
+        data_codec: str | None,
+        codec: NodeMessageCodec,
+        body: list[Buffer],
+    ) -> bool:
+        """
+        Sends a topic message to the topic's multicast group. Returns False
+        if it does not fit in one datagram, so it must be sent some other way.
+        """
+
+        datagram = await self._encoder.encode(
+            data_codec, codec, topic, body, self.max_size
+        )
+        if datagram is None:
+            return False
+
+        transport = await self._get_transport()
+        transport.sendto(datagram, get_multicast_address(self.domain_id, topic))
+        return True
+
+    def close(self) -> None:
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    async def _get_transport(self) -> DatagramTransport:
+        if self._transport is None or self._transport.is_closing():
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, self.ttl)
+            if self.interface:
+                sock.setsockopt(
+                    socket.IPPROTO_IP,
+                    socket.IP_MULTICAST_IF,
+                    socket.inet_aton(self.interface),
+                )
+
+            loop = asyncio.get_running_loop()
+            self._transport, _ = await loop.create_datagram_endpoint(
+                asyncio.DatagramProtocol, sock=sock
+            )
+
+        return self._transport
+
+
+class MulticastReceiver:
+    def __init__(
+        self,
+        domain_id: DomainId,
+        datagram_received_cb: MulticastDatagramReceivedCallback,
+        interface: Host = "0.0.0.0",
+        max_queue_size: int = 1000,
+    ):
+        """
+        Joins the multicast groups of topics, and passes the datagrams sent
+        to them to ``datagram_received_cb``.
+
+        Args:
+            domain_id:
+                Domain of the node; part of each topic's multicast address.
+            datagram_received_cb:
+                Called with each datagram received, and the topic whose
+                group it was received on; the datagram may also hold
+                messages on other topics that share the group.
+            interface:
+                IP address of the network interface to join the groups on.
+                If "0.0.0.0", the OS picks one.
+            max_queue_size:
+                Max number of received datagrams waiting to be handled, per
+                topic. Datagrams received while the queue is full are dropped.
+        """
+
+        self.domain_id = domain_id
+        self.datagram_received_cb = datagram_received_cb
+        self.interface = interface
+        self.max_queue_size = max_queue_size
+
+        self._endpoints: dict[
+            Topic, tuple[DatagramTransport, QueuedDatagramProtocol]
+        ] = {}
+
+    @property
+    def topics(self) -> set[Topic]:
+        """Topics whose multicast groups have been joined."""
+        return set(self._endpoints)
+
+    async def join(self, topic: Topic) -> None:
+        if topic in self._endpoints:
+            return
+
+        group, port = get_multicast_address(self.domain_id, topic)
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        try:
+            # Every node on the host listening to the topic binds the same port
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if hasattr(socket, "SO_REUSEPORT"):
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+
+            # Binding to the group filters out other groups on the same port,
+            # except on Windows, which does not allow it
+            sock.bind(("" if sys.platform == "win32" else group, port))
+
+            membership = socket.inet_aton(group) + socket.inet_aton(self.interface)
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+
+            loop = asyncio.get_running_loop()
+            transport, protocol = await loop.create_datagram_endpoint(
+                lambda: QueuedDatagramProtocol(
+                    lambda data: self.datagram_received_cb(data, topic),
+                    self.max_queue_size,
+                ),
+                sock=sock,
+            )
+        except BaseException:
+            sock.close()
+            raise
+
+        logger.debug(f"Joined multicast group {group}:{port} for topic={topic!r}")
+        self._endpoints[topic] = transport, protocol
+
+    async def leave(self, topic: Topic) -> None:
+        endpoint = self._endpoints.pop(topic, None)
+        if endpoint is None:
+            return
+
+        transport, protocol = endpoint
+        transport.close()
+        await protocol.stop()
+
+    async def close(self) -> None:
+        for topic in list(self._endpoints):
+            await self.leave(topic)
@@ -1,29 +1,60 @@
 import asyncio
 import logging
+from collections import OrderedDict, deque
+from typing import NamedTuple
 
-from rosy.asyncio import LockableWriter, cancel_task, loop_time
+from rosy.asyncio import LockableWriter, cancel_task, loop_time, segments_nbytes
+from rosy.node.codec import (
+    TOPIC_IDS_FEATURE,
+    NodeMessageCodec,
+    NodeMessageCodecSelector,
+)
 from rosy.node.peer.connection import PeerConnectionManager
+from rosy.node.peer.reconnect import PeerUnreachableError
+from rosy.node.topic.qos import TopicQoS
 from rosy.specs import MeshNodeSpec, NodeId
-from rosy.types import Buffer
+from rosy.types import Buffer, Priority, Topic
 from rosy.utils import ALLOWED_EXCEPTIONS
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_QOS = TopicQoS()
+
 
 class NodeOutboxManager:
-    def __init__(self, connection_manager: PeerConnectionManager):
+    def __init__(
+        self,
+        connection_manager: PeerConnectionManager,
+        codec_selector: NodeMessageCodecSelector,
+    ):
         self.connection_manager = connection_manager
-        self._outboxes: dict[NodeId, NodeOutbox] = {}
+        self.codec_selector = codec_selector
+        self._outboxes: dict[tuple[NodeId, Priority], NodeOutbox] = {}
 
-    def get_outbox(self, node: MeshNodeSpec) -> "NodeOutbox":
-        if node.id not in self._outboxes:
-            self._outboxes[node.id] = NodeOutbox(node, self.connection_manager)
+    def get_outbox(
+        self,
+        node: MeshNodeSpec,
+        priority: Priority = "normal",
+    ) -> "NodeOutbox":
+        key = (node.id, priority)
+
+        if key not in self._outboxes:
+            _, node_message_codec = self.codec_selector.select(node)
+            self._outboxes[key] = NodeOutbox(
+                node,
+                self.connection_manager,
+                node_message_codec,
+                priority=priority,
+            )
 
-        return self._outboxes[node.id]
+        return self._outboxes[key]
 
     async def stop_outbox(self, node: MeshNodeSpec) -> None:
-        outbox = self._outboxes.pop(node.id, None)
-        if outbox is not None:
+        """Stops the outboxes of every priority for the node."""
+
+        keys = [key for key in self._outboxes if key[0] == node.id]
+        for key in keys:
+            outbox = self._outboxes.pop(key)
             await outbox.stop()
 
 
@@ -32,69 +63,371 @@ class NodeOutbox:
         self,
         node: MeshNodeSpec,
         connection_manager: PeerConnectionManager,
-        ttl: float = 5,
-        maxsize: int = 100,
+        node_message_codec: NodeMessageCodec,
+        priority: Priority = "normal",
+        max_batch_size: int = 100,
+        max_batch_bytes: int = 1024 * 1024,
+        linger: float = 0.0,
     ):
+        """
+        Args:
+            node:
+                The node to send messages to.
+            connection_manager:
+                Provides the connection to the node.
+            node_message_codec:
+                Codec used to frame messages for the node.
+            priority:
+                Messages are sent over the node's connection for this
+                priority, separate from the other priorities' outboxes.
+            max_batch_size:
+                Max number of queued messages to write to the connection at
+                once, with a single drain.
+            max_batch_bytes:
+                A batch is not extended once the message bodies in it add up
+                to this many bytes.
+            linger:
+                Seconds to wait for more messages after the first message of
+                a batch arrives, if the queue is then empty. Trades latency
+                for fewer, larger writes. Disabled by default.
+        """
+
         self.node = node
         self.connection_manager = connection_manager
-        self.ttl = ttl
+        self.node_message_codec = node_message_codec
+        self.priority = priority
+        self.max_batch_size = max_batch_size
+        self.max_batch_bytes = max_batch_bytes
+        self.linger = linger
+
+        self._use_topic_ids = TOPIC_IDS_FEATURE in node.features
+
+        # Topic IDs are only valid for the connection they were defined on
+        self._topic_ids: dict[Topic, int] = {}
+        self._topic_ids_writer: LockableWriter | None = None
+
+        # Queued messages in the order they were sent, keyed by sequence
+        # number, so any message can be dropped without a scan
+        self._messages: OrderedDict[int, _QueuedMessage] = OrderedDict()
+        self._next_seq = 0
+        self._topic_queues: dict[Topic, _TopicQueue] = {}
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._stopped = False
 
-        self._queue = asyncio.Queue(maxsize)
         self._task = asyncio.create_task(self._run())
 
-    def send(self, data: Buffer) -> None:
+    async def send(
+        self,
+        topic: Topic,
+        body: list[Buffer],
+        qos: TopicQoS = None,
+    ) -> None:
+        """
+        Queues an encoded topic message body, as a list of segments, to be
+        sent to the node. The segments are written as they are, without
+        being copied.
+
+        The body is framed with the topic's ID on the current connection when
+        it is actually written. Returns once the message is queued, or
+        dropped, according to ``qos``.
+
+        Raises:
+            TopicMessageDroppedError:
+                If the outbox was stopped while waiting for room in a full
+                queue.
+        """
+
+        await self._enqueue(topic, body, qos or DEFAULT_QOS)
+
+    async def send_and_wait(
+        self,
+        topic: Topic,
+        body: list[Buffer],
+        qos: TopicQoS = None,
+    ) -> None:
+        """
+        Like ``send``, but returns only once the message has been written to
+        the connection and drained, so the caller is slowed down to the rate
+        the node can receive at. Wrap in ``asyncio.wait_for`` for a timeout.
+
+        The message is never dropped for being sent while the queue is full;
+        this waits for room instead. ``keep_latest`` is ignored for it.
+
+        Raises:
+            TopicMessageDroppedError:
+                If the message expired, was dropped by a later message on the
+                topic, or the outbox was stopped before it could be sent.
+            Exception:
+                Any error raised writing the message to the connection.
+        """
+
+        sent = asyncio.get_running_loop().create_future()
+        await self._enqueue(topic, body, qos or DEFAULT_QOS, sent)
+        await sent
+
+    async def _enqueue(
+        self,
+        topic: Topic,
+        body: list[Buffer],
+        qos: TopicQoS,
+        sent: asyncio.Future | None = None,
+    ) -> None:
+        self._require_running()
+
+        nbytes = segments_nbytes(body)
+        topic_queue = self._topic_queues.get(topic)
+
+        if qos.keep_latest and sent is None and topic_queue is not None:
+            self._replace_latest(topic_queue, qos, topic, body, nbytes)
+            return
+
+        while topic_queue is not None and topic_queue.is_full(qos, nbytes):
+            if sent is None and qos.overflow == "drop-newest":
+                logger.warning(
+                    f"Dropped topic message for node={self.node.id}; "
+                    f"outbox queue full for topic={topic!r}",
+                )
+                return
+            elif sent is None and qos.overflow == "drop-oldest":
+                self._drop_oldest(topic_queue)
+                logger.warning(
+                    f"Dropped topic message for node={self.node.id}; "
+                    f"outbox queue full for topic={topic!r}",
+                )
+            else:
+                self._not_full.clear()
+                await self._not_full.wait()
+                if self._stopped:
+                    raise TopicMessageDroppedError("Outbox was stopped")
+
+                self._require_running()
+
+            topic_queue = self._topic_queues.get(topic)
+
+        if topic_queue is None:
+            topic_queue = self._topic_queues[topic] = _TopicQueue()
+
+        seq = self._next_seq
+        self._next_seq += 1
+
+        self._messages[seq] = _QueuedMessage(
+            loop_time() + qos.ttl, topic, body, nbytes, sent
+        )
+        topic_queue.append(seq, nbytes)
+
+        self._not_empty.set()
+
+    async def stop(self) -> None:
+        self._stopped = True
+        await cancel_task(self._task)
+
+        # Wake up any senders blocked on a full queue or waiting for a send
+        self._not_full.set()
+        for message in self._messages.values():
+            _resolve(message, TopicMessageDroppedError("Outbox was stopped"))
+
+    def _require_running(self) -> None:
         if self._task.done():
             raise RuntimeError(
                 f"Outbox task unexpectedly completed for node={self.node.id}"
             )
 
-        deadline = loop_time() + self.ttl
+    def _replace_latest(
+        self,
+        topic_queue: "_TopicQueue",
+        qos: TopicQoS,
+        topic: Topic,
+        body: list[Buffer],
+        nbytes: int,
+    ) -> None:
+        """Replaces the newest queued message on the topic, in place."""
 
-        if self._queue.full():
-            self._queue.get_nowait()
-            self._queue.task_done()
-            logger.warning(
-                f"Dropped topic message for node={self.node.id}; outbox queue full",
-            )
+        # Normally there is only one, unless the QoS was changed
+        while len(topic_queue.seqs) > 1:
+            self._drop_oldest(topic_queue)
 
-        self._queue.put_nowait((deadline, data))
+        seq = topic_queue.seqs[0]
+        old_message = self._messages[seq]
+        self._messages[seq] = _QueuedMessage(loop_time() + qos.ttl, topic, body, nbytes)
+        topic_queue.nbytes += nbytes - old_message.nbytes
+        _resolve(old_message, TopicMessageDroppedError("Replaced by newer message"))
 
-    async def stop(self) -> None:
-        await cancel_task(self._task)
+    def _drop_oldest(self, topic_queue: "_TopicQueue") -> None:
+        seq = topic_queue.seqs[0]
+        message = self._remove(seq)
+        _resolve(message, TopicMessageDroppedError("Outbox queue was full"))
+
+    def _remove(self, seq: int) -> "_QueuedMessage":
+        message = self._messages.pop(seq)
+
+        topic_queue = self._topic_queues[message.topic]
+        topic_queue.popleft(message.nbytes)
+        if not topic_queue.seqs:
+            del self._topic_queues[message.topic]
+
+        self._not_full.set()
+        return message
 
     async def _run(self) -> None:
         while True:
-            item = await self._queue.get()
+            batch = await self._get_batch()
             try:
-                await self._send_once(*item)
+                await self._send_batch(batch)
             except ALLOWED_EXCEPTIONS:
+                for message in batch:
+                    _resolve(message, TopicMessageDroppedError("Outbox was stopped"))
                 raise
             except Exception as e:
-                logger.error(
-                    f"Error sending topic message to node={self.node.id}: {e!r}",
+                # The failed attempt to connect has already been logged
+                log = (
+                    logger.debug
+                    if isinstance(e, PeerUnreachableError)
+                    else logger.error
                 )
-            finally:
-                self._queue.task_done()
+                log(
+                    f"Error sending {len(batch)} topic message(s) "
+                    f"to node={self.node.id}: {e!r}",
+                )
+                for message in batch:
+                    _resolve(message, e)
+            else:
+                for message in batch:
+                    _resolve(message)
+
+    async def _get_batch(self) -> list["_QueuedMessage"]:
+        """Waits for a message, then takes as many more as are queued."""
 
-    async def _send_once(self, deadline: float, data: Buffer) -> None:
-        if self._expired(deadline):
+        while not self._messages:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+
+        if self.linger > 0 and len(self._messages) == 1:
+            await asyncio.sleep(self.linger)
+
+        batch = []
+        batch_bytes = 0
+        while (
+            self._messages
+            and len(batch) < self.max_batch_size
+            and batch_bytes < self.max_batch_bytes
+        ):
+            seq = next(iter(self._messages))
+            message = self._remove(seq)
+            batch.append(message)
+            batch_bytes += message.nbytes
+
+        return batch
+
+    async def _send_batch(self, batch: list["_QueuedMessage"]) -> None:
+        batch = [message for message in batch if not self._expired(message)]
+        if not batch:
             return
 
         async with await self._get_writer() as writer:
-            if self._expired(deadline):
-                return
+            if writer is not self._topic_ids_writer:
+                self._topic_ids.clear()
+                self._topic_ids_writer = writer
+
+            segments = []
+            try:
+                for message in batch:
+                    # Messages may also expire while waiting for the writer
+                    if not self._expired(message):
+                        segments += await self._encode_frame(
+                            message.topic, message.body
+                        )
+
+                writer.writelines(segments)
+            except BaseException:
+                # The peer may not have received the topic ID definitions
+                self._topic_ids_writer = None
+                raise
 
-            writer.write(data)
             await writer.drain()
 
-    def _expired(self, deadline: float) -> bool:
-        if loop_time() >= deadline:
+    async def _encode_frame(self, topic: Topic, body: list[Buffer]) -> list[Buffer]:
+        if not self._use_topic_ids:
+            return await self.node_message_codec.encode_topic_message_frame(
+                None, topic, body
+            )
+
+        topic_id = self._topic_ids.get(topic)
+        if topic_id is not None:
+            return await self.node_message_codec.encode_topic_message_frame(
+                topic_id, None, body
+            )
+
+        topic_id = len(self._topic_ids)
+        segments = await self.node_message_codec.encode_topic_message_frame(
+            topic_id, topic, body
+        )
+        self._topic_ids[topic] = topic_id
+        return segments
+
+    def _expired(self, message: "_QueuedMessage") -> bool:
+        if loop_time() >= message.deadline:
             logger.warning(
                 f"Topic message expired waiting to send to node={self.node.id}",
             )
+            _resolve(message, TopicMessageDroppedError("Message expired"))
             return True
         return False
 
     async def _get_writer(self) -> LockableWriter:
-        connection = await self.connection_manager.get_connection(self.node)
+        connection = await self.connection_manager.get_connection(
+            self.node, self.priority
+        )
         return connection.writer
+
+
+class TopicMessageDroppedError(Exception):
+    pass
+
+
+class _QueuedMessage(NamedTuple):
+    deadline: float
+    topic: Topic
+    body: list[Buffer]
+    nbytes: int
+    # Resolved once the message is sent or dropped, if anyone is waiting
+    sent: asyncio.Future | None = None
+
+
+def _resolve(message: _QueuedMessage, error: BaseException = None) -> None:
+    sent = message.sent
+    if sent is None or sent.done():
+        return
+
+    if error is None:
+        sent.set_result(None)
+    else:
+        sent.set_exception(error)
+
+
+class _TopicQueue:
+    """Sequence numbers and total size of the queued messages on one topic."""
+
+    def __init__(self):
+        self.seqs: deque[int] = deque()
+        self.nbytes = 0
+
+    def append(self, seq: int, nbytes: int) -> None:
+        self.seqs.append(seq)
+        self.nbytes += nbytes
+
+    def popleft(self, nbytes: int) -> None:
+        self.seqs.popleft()
+        self.nbytes -= nbytes
+
+    def is_full(self, qos: TopicQoS, nbytes: int) -> bool:
+        """Whether a message of the given size would exceed the QoS limits."""
+
+        if len(self.seqs) >= qos.maxsize:
+            return True
+
+        return (
+            qos.max_bytes is not None
+            and bool(self.seqs)
+            and self.nbytes + nbytes > qos.max_bytes
+        )
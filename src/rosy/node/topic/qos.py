@@ -0,0 +1,118 @@
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Literal, get_args
+
+from rosy.specs import MeshNodeSpec
+from rosy.types import Priority, Topic
+from rosy.utils import require
+
+OverflowPolicy = Literal["drop-oldest", "drop-newest", "block"]
+
+
+@dataclass(frozen=True)
+class TopicQoS:
+    """
+    Quality of service settings for sending messages on a topic to one node.
+
+    Args:
+        maxsize:
+            Max number of messages on the topic waiting to be sent to the node.
+        max_bytes:
+            Max total size of the encoded messages on the topic waiting to be
+            sent to the node. A single message larger than this is still
+            queued if no other messages on the topic are waiting. No limit if
+            None.
+        ttl:
+            Messages that have waited this many seconds to be sent are dropped.
+        overflow:
+            What to do when a message is sent while the queue is full:
+            'drop-oldest' drops the oldest waiting message on the topic to
+            make room; 'drop-newest' drops the message being sent; 'block'
+            makes the sender wait until there is room.
+        keep_latest:
+            If True, at most one message on the topic waits to be sent to the
+            node; a newer message replaces it, keeping its place in the queue.
+            Useful for topics where only the latest value matters, e.g. robot
+            state, so a slow node is not sent stale messages. ``maxsize``,
+            ``max_bytes`` and ``overflow`` are ignored. When requested by a
+            listener, messages already received by it are conflated as well:
+            its callback is only called with the latest message received
+            while it handled the one before.
+        priority:
+            Messages on the topic are sent over a separate connection to the
+            node for each priority, so they do not wait behind messages of
+            other priorities. E.g. 'high' for small control messages, and
+            'low' for large messages like images or point clouds.
+        best_effort:
+            If True, messages on the topic are sent as datagrams (UDP, or Unix
+            datagrams on the same host) to nodes that accept them, and fit in
+            one datagram. Lost messages are not resent, so they never delay
+            the messages after them; useful for e.g. teleop and telemetry.
+            The other settings do not apply to messages sent this way.
+        multicast:
+            Only has an effect when requested by a listener with
+            ``node.listen(..., qos=...)``. The listening node joins a UDP
+            multicast group for the topic, and senders send each message once
+            to the group instead of once to each such listener, if it fits in
+            one datagram. Like ``best_effort``, lost messages are not resent.
+            Every node in the group receives each message multicast to it,
+            regardless of load balancing.
+    """
+
+    maxsize: int = 100
+    max_bytes: int | None = None
+    ttl: float = 5.0
+    overflow: OverflowPolicy = "drop-oldest"
+    keep_latest: bool = False
+    priority: Priority = "normal"
+    best_effort: bool = False
+    multicast: bool = False
+
+    def __post_init__(self) -> None:
+        require(self.maxsize > 0, f"maxsize must be positive; got {self.maxsize}")
+        require(
+            self.max_bytes is None or self.max_bytes > 0,
+            f"max_bytes must be positive or None; got {self.max_bytes}",
+        )
+        require(self.ttl > 0, f"ttl must be positive; got {self.ttl}")
+        require(
+            self.overflow in get_args(OverflowPolicy),
+            f"overflow must be one of {get_args(OverflowPolicy)}; "
+            f"got {self.overflow!r}",
+        )
+        require(
+            self.priority in get_args(Priority),
+            f"priority must be one of {get_args(Priority)}; " f"got {self.priority!r}",
+        )
+
+
+class TopicQoSManager:
+    def __init__(
+        self,
+        default: TopicQoS = None,
+        topic_qos: Mapping[Topic, TopicQoS] = None,
+    ):
+        """
+        Decides the QoS to use when sending a topic to a node. In order of
+        precedence, that is: the QoS set for the topic on this node; the QoS
+        requested by the node when it started listening to the topic; or the
+        default QoS.
+        """
+
+        self.default = default or TopicQoS()
+        self._topic_qos: dict[Topic, TopicQoS] = dict(topic_qos or {})
+
+    def set_qos(self, topic: Topic, qos: TopicQoS | None) -> None:
+        """Sets the QoS for a topic, or resets it if ``qos`` is None."""
+
+        if qos is None:
+            self._topic_qos.pop(topic, None)
+        else:
+            self._topic_qos[topic] = qos
+
+    def get_qos(self, topic: Topic, node: MeshNodeSpec) -> TopicQoS:
+        qos = self._topic_qos.get(topic)
+        if qos is not None:
+            return qos
+
+        return node.topic_qos.get(topic, self.default)
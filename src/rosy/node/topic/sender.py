@@ -1,11 +1,17 @@
+import asyncio
 import logging
+from collections.abc import Iterable
 
-from rosy.node.codec import NodeMessageCodec
+from rosy.node.codec import NodeMessageCodec, NodeMessageCodecSelector
 from rosy.node.peer.selector import PeerSelector
+from rosy.node.topic.datagram import DatagramSender
+from rosy.node.topic.inprocess import InProcessSender
+from rosy.node.topic.multicast import MulticastSender
 from rosy.node.topic.outbox import NodeOutboxManager
-from rosy.node.topic.types import TopicMessage
+from rosy.node.topic.qos import TopicQoSManager
 from rosy.node.types import Args, KWArgs
-from rosy.types import Topic
+from rosy.specs import MeshNodeSpec
+from rosy.types import Buffer, Priority, Topic
 
 logger = logging.getLogger(__name__)
 
@@ -14,23 +20,209 @@ class TopicSender:
     def __init__(
         self,
         peer_selector: PeerSelector,
-        node_message_codec: NodeMessageCodec,
+        codec_selector: NodeMessageCodecSelector,
         outbox_manager: NodeOutboxManager,
+        qos_manager: TopicQoSManager = None,
+        datagram_sender: DatagramSender = None,
+        multicast_sender: MulticastSender = None,
+        topics: Iterable[Topic] = (),
+        in_process_sender: InProcessSender = None,
     ):
         self.peer_selector = peer_selector
-        self.node_message_codec = node_message_codec
+        self.codec_selector = codec_selector
         self.outbox_manager = outbox_manager
+        self.qos_manager = qos_manager or TopicQoSManager()
+        self.datagram_sender = datagram_sender
+        self.multicast_sender = multicast_sender
+        self.in_process_sender = in_process_sender
 
-    async def send(self, topic: Topic, args: Args, kwargs: KWArgs) -> None:
-        # TODO handle case of self-sending more efficiently
+        # Topics sent on so far, plus any expected to be; see get_priorities
+        self.topics: set[Topic] = set(topics)
+
+    def close(self) -> None:
+        """Closes the datagram and multicast sockets used to send messages."""
+
+        if self.datagram_sender is not None:
+            self.datagram_sender.close_all()
+
+        if self.multicast_sender is not None:
+            self.multicast_sender.close()
+
+    def get_priorities(self, node: MeshNodeSpec) -> set[Priority]:
+        """
+        Returns the priorities of the connections that messages on the topics
+        in ``topics`` are sent to the node over.
+        """
+
+        return {
+            self.qos_manager.get_qos(topic, node).priority
+            for topic in node.topics & self.topics
+            if not _joined_multicast(node, topic)
+        }
+
+    async def send(
+        self,
+        topic: Topic,
+        args: Args,
+        kwargs: KWArgs,
+        wait: bool = False,
+    ) -> None:
+        """
+        Sends a message to all listeners of the topic. If ``wait`` is true,
+        returns only once it has been written to every listener's connection.
+        """
+
+        self.topics.add(topic)
 
         nodes = self.peer_selector.get_nodes_for_topic(topic)
+
+        # Nodes in this process, including this one, get the objects as-is
+        if nodes and self.in_process_sender is not None:
+            nodes = await self.in_process_sender.send(nodes, topic, args, kwargs, wait)
+
         if not nodes:
             return
 
-        message = TopicMessage(topic, args, kwargs)
-        data = await self.node_message_codec.encode_topic_message(message)
+        # Encode the message once per codec in use, not once per node
+        bodies: dict[NodeMessageCodec, list[Buffer]] = {}
+        node_bodies = []
 
         for node in nodes:
-            outbox = self.outbox_manager.get_outbox(node)
-            outbox.send(data)
+            try:
+                _, codec = self.codec_selector.select(node)
+            except ValueError as e:
+                logger.error(f"Cannot send topic={topic!r} to node={node.id}: {e}")
+                continue
+
+            body = bodies.get(codec)
+            if body is None:
+                body = await codec.encode_topic_message_body(args, kwargs)
+                bodies[codec] = body
+
+            node_bodies.append((node, body))
+
+        await self._send_to_outboxes(topic, node_bodies, wait)
+
+    async def send_raw(
+        self,
+        topic: Topic,
+        payload: Buffer,
+        wait: bool = False,
+        data_codec: str = None,
+    ) -> None:
+        """
+        Sends an already-encoded args/kwargs payload, as-is, to all listeners
+        that use the data codec it was encoded with: the one named
+        ``data_codec``, or the default codec if not given. Other listeners
+        are skipped, since they could not decode it.
+        """
+
+        self.topics.add(topic)
+
+        payload_codec = (
+            self.codec_selector.default_codec
+            if data_codec is None
+            else self.codec_selector.get(data_codec)
+        )
+
+        body = [payload]
+        node_bodies = []
+
+        for node in self.peer_selector.get_nodes_for_topic(topic):
+            try:
+                name, codec = self.codec_selector.select(node)
+            except ValueError as e:
+                logger.error(f"Cannot send topic={topic!r} to node={node.id}: {e}")
+                continue
+
+            if codec is not payload_codec:
+                logger.warning(
+                    f"Not sending raw payload on topic={topic!r} to node={node.id}; "
+                    f"it uses data_codec={name!r}, not the payload's"
+                )
+                continue
+
+            node_bodies.append((node, body))
+
+        await self._send_to_outboxes(topic, node_bodies, wait)
+
+    async def _send_to_outboxes(
+        self,
+        topic: Topic,
+        node_bodies: list[tuple[MeshNodeSpec, list[Buffer]]],
+        wait: bool,
+    ) -> None:
+        if self.multicast_sender is not None:
+            node_bodies = await self._send_multicast(topic, node_bodies)
+
+        waiting_sends = []
+
+        for node, body in node_bodies:
+            qos = self.qos_manager.get_qos(topic, node)
+
+            if (
+                qos.best_effort
+                and self.datagram_sender is not None
+                and await self.datagram_sender.send(node, topic, body)
+            ):
+                continue
+
+            outbox = self.outbox_manager.get_outbox(node, qos.priority)
+            if wait:
+                waiting_sends.append(outbox.send_and_wait(topic, body, qos))
+            else:
+                await outbox.send(topic, body, qos)
+
+        # Wait on all nodes at once, so the slowest one sets the pace
+        if waiting_sends:
+            await asyncio.gather(*waiting_sends)
+
+    async def _send_multicast(
+        self,
+        topic: Topic,
+        node_bodies: list[tuple[MeshNodeSpec, list[Buffer]]],
+    ) -> list[tuple[MeshNodeSpec, list[Buffer]]]:
+        """
+        Sends the message once to the topic's multicast group, if any of the
+        nodes joined it. Returns the nodes it still needs to be sent to.
+        """
+
+        multicast_nodes = [
+            node for node, _ in node_bodies if _joined_multicast(node, topic)
+        ]
+        if not multicast_nodes:
+            return node_bodies
+
+        # Every node in the group gets the same datagram, so they must all use
+        # the same codec; otherwise, some would get the message twice
+        try:
+            codecs = {self.codec_selector.select(node) for node in multicast_nodes}
+        except ValueError:
+            return node_bodies
+
+        if len(codecs) > 1:
+            logger.warning(
+                f"Not multicasting topic={topic!r}; "
+                f"listeners do not all use the same data codec"
+            )
+            return node_bodies
+
+        [(data_codec, codec)] = codecs
+        body = next(
+            body for node, body in node_bodies if _joined_multicast(node, topic)
+        )
+
+        if not await self.multicast_sender.send(topic, data_codec, codec, body):
+            return node_bodies
+
+        return [
+            (node, body)
+            for node, body in node_bodies
+            if not _joined_multicast(node, topic)
+        ]
+
+
+def _joined_multicast(node: MeshNodeSpec, topic: Topic) -> bool:
+    """Whether the node joined the topic's multicast group to listen to it."""
+    qos = node.topic_qos.get(topic)
+    return qos is not None and qos.multicast
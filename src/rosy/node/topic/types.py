@@ -8,3 +8,15 @@ class TopicMessage(NamedTuple):
     topic: Topic
     args: Args
     kwargs: KWArgs
+    # ID of the topic on the connection the message was received on, if any
+    topic_id: int | None = None
+
+
+class RawTopicMessage(NamedTuple):
+    """A topic message whose args and kwargs have not been decoded."""
+
+    topic: Topic
+    payload: bytes
+    topic_id: int | None = None
+    # Name of the data codec the payload was encoded with; None for the default
+    data_codec: str | None = None
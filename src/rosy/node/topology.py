@@ -2,6 +2,8 @@ import logging
 from collections import defaultdict
 
 from rosy.node.peer.connection import PeerConnectionManager
+from rosy.node.peer.prewarm import ConnectionPrewarmer
+from rosy.node.topic.datagram import DatagramSender
 from rosy.node.topic.outbox import NodeOutboxManager
 from rosy.specs import MeshNodeSpec, MeshTopologySpec
 from rosy.types import Service, Topic
@@ -70,10 +72,20 @@ class TopologyChangedHandler:
         topology_manager: MeshTopologyManager,
         connection_manager: PeerConnectionManager,
         outbox_manager: NodeOutboxManager,
+        datagram_sender: DatagramSender = None,
+        connection_prewarmer: ConnectionPrewarmer = None,
     ):
+        """
+        Updates the topology when it changes, and cleans up after the nodes
+        that left it. If ``connection_prewarmer`` is given, it is used to open
+        connections to the nodes in the new topology in the background.
+        """
+
         self.topology_manager = topology_manager
         self.connection_manager = connection_manager
         self.outbox_manager = outbox_manager
+        self.datagram_sender = datagram_sender
+        self.connection_prewarmer = connection_prewarmer
 
     async def __call__(self, new_topology: MeshTopologySpec) -> None:
         logger.debug(
@@ -90,7 +102,16 @@ class TopologyChangedHandler:
         self.topology_manager.set_topology(new_topology)
 
         for node in removed_nodes:
+            if self.datagram_sender is not None:
+                self.datagram_sender.close(node)
+
+            if self.connection_prewarmer is not None:
+                await self.connection_prewarmer.cancel(node)
+
             try:
                 await self.outbox_manager.stop_outbox(node)
             finally:
                 await self.connection_manager.close_connection(node)
+
+        if self.connection_prewarmer is not None:
+            self.connection_prewarmer.prewarm(new_topology.nodes)
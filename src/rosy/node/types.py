@@ -1,6 +1,13 @@
 from collections.abc import Sequence
+from typing import NamedTuple
 
 from rosy.types import Data
 
 Args = Sequence[Data]
 KWArgs = dict[str, Data]
+
+
+class ConnectionHello(NamedTuple):
+    """First message sent on a new connection to a node."""
+
+    data_codec: str
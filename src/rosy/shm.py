@@ -0,0 +1,534 @@
+"""
+Shared-memory transport for nodes on the same host.
+
+Each connection has two single-producer, single-consumer ring buffers in
+shared memory, one per direction. The bulk data only ever goes through the
+rings; a Unix socket is used to set them up, to wake up a reader or writer
+that is waiting on its peer, and to detect when the peer goes away.
+
+Python has no memory barriers, so the rings rely on the CPU not reordering
+stores with other stores, or loads with other loads, for the reader to never
+see a new head before the data written ahead of it. x86 CPUs guarantee this;
+weakly-ordered CPUs, like ARM, do not, so shared-memory connections are only
+supported on x86 (see ``is_supported_platform``).
+
+Waking up a waiting peer is not ordered even on x86: a reader sets its
+waiting flag and then loads the head, while the writer stores the head and
+then loads the flag, and x86 may reorder a store with a later load. Both
+sides can then miss each other's store, so the reader waits with data in the
+ring and no wakeup is sent; the same goes for a writer waiting for space.
+Such a missed wakeup is recovered by checking the ring again every
+``poll_interval``, so that is the added latency in the worst case.
+"""
+
+import asyncio
+import platform
+import struct
+import sys
+from asyncio import IncompleteReadError, StreamReader, StreamWriter
+from collections.abc import Iterable
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+from rosy.asyncio import Reader, Writer, close_ignoring_errors
+from rosy.types import Buffer
+
+DEFAULT_CAPACITY: int = 8 * 1024 * 1024
+"""Default size of each ring buffer, in bytes."""
+
+DEFAULT_POLL_INTERVAL: float = 0.05
+"""
+Max time to wait for a wakeup before checking a ring buffer again, in case a
+wakeup was missed; i.e. the worst-case latency added by a missed wakeup.
+"""
+
+_WAKEUP = b"\x00"
+_CAPACITY = struct.Struct("<Q")
+
+_X86_MACHINES = frozenset({"x86_64", "amd64", "x86", "i386", "i486", "i586", "i686"})
+
+# Names of the shared memory created by this process and not yet unlinked
+_created_names: set[str] = set()
+
+
+def is_supported_platform() -> bool:
+    """
+    Whether shared-memory connections can be used on this machine, i.e.
+    whether its CPU keeps the order of stores and of loads; see above.
+    """
+    return platform.machine().lower() in _X86_MACHINES
+
+
+class SharedMemoryRing:
+    """
+    A byte ring buffer in shared memory, written by one process and read by
+    another.
+
+    The header holds the total number of bytes written (head) and read (tail)
+    so far, and flags set by the reader and writer while they are waiting for
+    data or space, respectively.
+    """
+
+    HEADER_SIZE = 64
+
+    _HEAD = 0
+    _TAIL = 8
+    _READER_WAITING = 16
+    _WRITER_WAITING = 17
+
+    _U64 = struct.Struct("<Q")
+
+    def __init__(self, shm: SharedMemory, capacity: int, owner: bool):
+        if shm.size < self.HEADER_SIZE + capacity:
+            raise ValueError(
+                f"Shared memory size={shm.size} is too small "
+                f"for capacity={capacity}"
+            )
+
+        self.shm = shm
+        self.capacity = capacity
+        self.owner = owner
+        self._closed = False
+
+    @classmethod
+    def create(cls, capacity: int = DEFAULT_CAPACITY) -> "SharedMemoryRing":
+        shm = SharedMemory(create=True, size=cls.HEADER_SIZE + capacity)
+        shm.buf[: cls.HEADER_SIZE] = bytes(cls.HEADER_SIZE)
+        _created_names.add(shm.name)
+        return cls(shm, capacity, owner=True)
+
+    @classmethod
+    def attach(cls, name: str, capacity: int) -> "SharedMemoryRing":
+        return cls(_attach_shared_memory(name), capacity, owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def head(self) -> int:
+        return self._U64.unpack_from(self.shm.buf, self._HEAD)[0]
+
+    @property
+    def tail(self) -> int:
+        return self._U64.unpack_from(self.shm.buf, self._TAIL)[0]
+
+    @property
+    def reader_waiting(self) -> bool:
+        return bool(self.shm.buf[self._READER_WAITING])
+
+    @reader_waiting.setter
+    def reader_waiting(self, value: bool) -> None:
+        self.shm.buf[self._READER_WAITING] = value
+
+    @property
+    def writer_waiting(self) -> bool:
+        return bool(self.shm.buf[self._WRITER_WAITING])
+
+    @writer_waiting.setter
+    def writer_waiting(self, value: bool) -> None:
+        self.shm.buf[self._WRITER_WAITING] = value
+
+    def readable(self) -> int:
+        """Number of bytes available to read."""
+        if self._closed:
+            return 0
+        return self.head - self.tail
+
+    def writable(self) -> int:
+        """Number of bytes that can be written without overwriting unread data."""
+        if self._closed:
+            return 0
+        return self.capacity - (self.head - self.tail)
+
+    def write(self, data: memoryview) -> int:
+        """Writes as much of the data as fits, and returns how many bytes that was."""
+
+        if self._closed:
+            raise ConnectionResetError("Shared memory ring is closed")
+
+        head = self.head
+        n = min(len(data), self.capacity - (head - self.tail))
+        if n <= 0:
+            return 0
+
+        buf = self.shm.buf
+        start = self.HEADER_SIZE + head % self.capacity
+        first = min(n, self.HEADER_SIZE + self.capacity - start)
+
+        buf[start : start + first] = data[:first]
+        if first < n:
+            buf[self.HEADER_SIZE : self.HEADER_SIZE + n - first] = data[first:n]
+
+        # Publish the data only once it has been written. This store is not
+        # reordered before the ones above on x86 only; see the module docs.
+        self._U64.pack_into(buf, self._HEAD, head + n)
+        return n
+
+    def read(self, n: int) -> bytes:
+        """Reads up to n bytes."""
+
+        tail = self.tail
+        n = min(n, self.readable())
+        if n <= 0:
+            return b""
+
+        buf = self.shm.buf
+        start = self.HEADER_SIZE + tail % self.capacity
+        first = min(n, self.HEADER_SIZE + self.capacity - start)
+
+        if first == n:
+            data = bytes(buf[start : start + n])
+        else:
+            data = b"".join(
+                (
+                    buf[start : start + first],
+                    buf[self.HEADER_SIZE : self.HEADER_SIZE + n - first],
+                )
+            )
+
+        self._U64.pack_into(buf, self._TAIL, tail + n)
+        return data
+
+    def read_into(self, target: memoryview) -> int:
+        """
+        Reads up to ``len(target)`` bytes into ``target``, and returns how
+        many bytes that was.
+        """
+
+        tail = self.tail
+        n = min(len(target), self.readable())
+        if n <= 0:
+            return 0
+
+        buf = self.shm.buf
+        start = self.HEADER_SIZE + tail % self.capacity
+        first = min(n, self.HEADER_SIZE + self.capacity - start)
+
+        target[:first] = buf[start : start + first]
+        if first < n:
+            target[first:n] = buf[self.HEADER_SIZE : self.HEADER_SIZE + n - first]
+
+        self._U64.pack_into(buf, self._TAIL, tail + n)
+        return n
+
+    def close(self) -> None:
+        if self._closed:
+            return
+
+        self._closed = True
+        self.shm.close()
+
+    def unlink(self) -> None:
+        """
+        Removes the shared memory name once both processes have attached.
+        The memory itself is freed when both processes have closed it.
+        """
+
+        if self.owner:
+            _created_names.discard(self.shm.name)
+            self.shm.unlink()
+
+
+class SharedMemoryChannel:
+    """
+    State shared by the reader and writer of one end of a shared-memory
+    connection.
+    """
+
+    def __init__(
+        self,
+        sock_reader: StreamReader,
+        sock_writer: StreamWriter,
+        inbound: SharedMemoryRing,
+        outbound: SharedMemoryRing,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+    ):
+        self.sock_reader = sock_reader
+        self.sock_writer = sock_writer
+        self.inbound = inbound
+        self.outbound = outbound
+        self.poll_interval = poll_interval
+
+        self._readable = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._eof = False
+        self._watcher = asyncio.create_task(self._watch_socket())
+
+    @property
+    def eof(self) -> bool:
+        """Whether the peer has closed the connection."""
+        return self._eof
+
+    async def _watch_socket(self) -> None:
+        try:
+            while await self.sock_reader.read(4096):
+                self._readable.set()
+                self._writable.set()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self._eof = True
+            self._readable.set()
+            self._writable.set()
+
+    def wake_peer_reader(self) -> None:
+        """Call after writing to the outbound ring."""
+        if self.outbound.reader_waiting:
+            self.outbound.reader_waiting = False
+            self._send_wakeup()
+
+    def wake_peer_writer(self) -> None:
+        """Call after reading from the inbound ring."""
+        if self.inbound.writer_waiting:
+            self.inbound.writer_waiting = False
+            self._send_wakeup()
+
+    def _send_wakeup(self) -> None:
+        if not self.sock_writer.is_closing():
+            self.sock_writer.write(_WAKEUP)
+
+    async def wait_readable(self) -> None:
+        ring = self.inbound
+        self._readable.clear()
+        ring.reader_waiting = True
+        try:
+            if not ring.readable() and not self._eof:
+                await self._wait(self._readable)
+        finally:
+            if not ring.closed:
+                ring.reader_waiting = False
+
+    async def wait_writable(self) -> None:
+        ring = self.outbound
+        self._writable.clear()
+        ring.writer_waiting = True
+        try:
+            if not ring.writable() and not self._eof:
+                await self._wait(self._writable)
+        finally:
+            if not ring.closed:
+                ring.writer_waiting = False
+
+    async def _wait(self, event: asyncio.Event) -> None:
+        timer = asyncio.get_running_loop().call_later(self.poll_interval, event.set)
+        try:
+            await event.wait()
+        finally:
+            timer.cancel()
+
+    def close(self) -> None:
+        self.sock_writer.close()
+
+    async def wait_closed(self) -> None:
+        try:
+            await close_ignoring_errors(self.sock_writer)
+        finally:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self.inbound.close()
+            self.outbound.close()
+
+
+class SharedMemoryReader(Reader):
+    def __init__(self, channel: SharedMemoryChannel):
+        self.channel = channel
+
+    async def readexactly(self, n: int) -> bytes:
+        channel = self.channel
+        ring = channel.inbound
+
+        if ring.readable() >= n:
+            data = ring.read(n)
+            channel.wake_peer_writer()
+            return data
+
+        return bytes(await self._read_into_target(n))
+
+    async def readexactly_view(self, n: int) -> memoryview:
+        """
+        Like ``readexactly``, but returns a read-only ``memoryview``, and the
+        data is copied out of the ring only once, however many reads it takes
+        to arrive.
+
+        The view is not of the ring itself, since the peer reuses that space
+        as soon as it has been read, while decoders may keep references to
+        the data (like ``np.frombuffer``).
+        """
+
+        ring = self.channel.inbound
+
+        if ring.readable() >= n:
+            data = ring.read(n)
+            self.channel.wake_peer_writer()
+            return memoryview(data)
+
+        target = await self._read_into_target(n)
+        return memoryview(target).toreadonly()
+
+    async def _read_into_target(self, n: int) -> bytearray:
+        """Reads data that does not fit in the ring, or has not all arrived."""
+
+        channel = self.channel
+        ring = channel.inbound
+
+        target = bytearray(n)
+        view = memoryview(target)
+        filled = 0
+
+        while filled < n:
+            read = ring.read_into(view[filled:])
+            if read:
+                filled += read
+                channel.wake_peer_writer()
+            elif channel.eof:
+                raise IncompleteReadError(bytes(view[:filled]), n)
+            else:
+                await channel.wait_readable()
+
+        return target
+
+    async def readuntil(self, separator: bytes) -> bytes:
+        raise NotImplementedError()
+
+
+class SharedMemoryWriter(Writer):
+    def __init__(self, channel: SharedMemoryChannel):
+        self.channel = channel
+        self._pending = bytearray()
+        self._closing = False
+
+    def write(self, data: bytes) -> None:
+        if self._pending:
+            self._pending += data
+            return
+
+        view = memoryview(data)
+        written = self.channel.outbound.write(view)
+        if written:
+            self.channel.wake_peer_reader()
+        if written < len(view):
+            self._pending += view[written:]
+
+    def writelines(self, data: Iterable[Buffer]) -> None:
+        for chunk in data:
+            self.write(chunk)
+
+    async def drain(self) -> None:
+        channel = self.channel
+
+        while self._pending:
+            if channel.eof:
+                raise ConnectionResetError("Connection lost")
+
+            with memoryview(self._pending) as view:
+                written = channel.outbound.write(view)
+
+            if written:
+                del self._pending[:written]
+                channel.wake_peer_reader()
+            else:
+                await channel.wait_writable()
+
+    def close(self) -> None:
+        self._closing = True
+        self.channel.close()
+
+    def is_closing(self) -> bool:
+        return self._closing or self.channel.eof
+
+    async def wait_closed(self) -> None:
+        await self.channel.wait_closed()
+
+    def get_extra_info(self, name: str, default=None):
+        return self.channel.sock_writer.get_extra_info(name, default)
+
+
+async def connect(
+    sock_reader: StreamReader,
+    sock_writer: StreamWriter,
+    capacity: int = DEFAULT_CAPACITY,
+) -> tuple[SharedMemoryReader, SharedMemoryWriter]:
+    """Client side of the handshake over a newly connected Unix socket."""
+
+    outbound = SharedMemoryRing.create(capacity)
+    inbound = None
+    try:
+        await _send_ring(sock_writer, outbound)
+        inbound = await _receive_ring(sock_reader)
+
+        # Both ends are attached to both rings now
+        outbound.unlink()
+        sock_writer.write(_WAKEUP)
+        await sock_writer.drain()
+    except BaseException:
+        outbound.unlink()
+        outbound.close()
+        if inbound is not None:
+            inbound.close()
+        await close_ignoring_errors(sock_writer)
+        raise
+
+    channel = SharedMemoryChannel(sock_reader, sock_writer, inbound, outbound)
+    return SharedMemoryReader(channel), SharedMemoryWriter(channel)
+
+
+async def accept(
+    sock_reader: StreamReader,
+    sock_writer: StreamWriter,
+    capacity: int = DEFAULT_CAPACITY,
+) -> tuple[SharedMemoryReader, SharedMemoryWriter]:
+    """Server side of the handshake over a newly accepted Unix socket."""
+
+    inbound = await _receive_ring(sock_reader)
+    outbound = None
+    try:
+        outbound = SharedMemoryRing.create(capacity)
+        await _send_ring(sock_writer, outbound)
+
+        # Wait for the client to attach before unlinking
+        await sock_reader.readexactly(1)
+    except BaseException:
+        inbound.close()
+        if outbound is not None:
+            outbound.unlink()
+            outbound.close()
+        raise
+
+    outbound.unlink()
+
+    channel = SharedMemoryChannel(sock_reader, sock_writer, inbound, outbound)
+    return SharedMemoryReader(channel), SharedMemoryWriter(channel)
+
+
+async def _send_ring(writer: StreamWriter, ring: SharedMemoryRing) -> None:
+    name = ring.name.encode()
+    writer.write(bytes([len(name)]) + name + _CAPACITY.pack(ring.capacity))
+    await writer.drain()
+
+
+async def _receive_ring(reader: StreamReader) -> SharedMemoryRing:
+    name_len = (await reader.readexactly(1))[0]
+    name = (await reader.readexactly(name_len)).decode()
+    (capacity,) = _CAPACITY.unpack(await reader.readexactly(_CAPACITY.size))
+    return SharedMemoryRing.attach(name, capacity)
+
+
+def _attach_shared_memory(name: str) -> SharedMemory:
+    """
+    Attaches to shared memory created by another process, without letting
+    this process's resource tracker unlink it on exit. Only the creator
+    unlinks it.
+    """
+
+    if sys.version_info >= (3, 13):  # pragma: no cover
+        return SharedMemory(name, track=False)
+
+    shm = SharedMemory(name)
+    if name not in _created_names:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
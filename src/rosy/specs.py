@@ -1,11 +1,15 @@
 from collections.abc import Collection
 from dataclasses import dataclass, field
 from socket import AddressFamily
+from typing import TYPE_CHECKING
 from uuid import UUID, uuid1
 
 from rosy.network import get_hostname
 from rosy.types import Host, Port, Service, Topic
 
+if TYPE_CHECKING:
+    from rosy.node.topic.qos import TopicQoS
+
 
 @dataclass
 class IpConnectionSpec:
@@ -20,7 +24,42 @@ class UnixConnectionSpec:
     host: Host = field(default_factory=get_hostname)
 
 
-ConnectionSpec = IpConnectionSpec | UnixConnectionSpec
+@dataclass
+class SharedMemoryConnectionSpec:
+    """
+    Unix socket path used to set up a shared-memory connection.
+    See ``rosy.shm``.
+    """
+
+    path: str
+    host: Host = field(default_factory=get_hostname)
+
+
+@dataclass
+class UdpConnectionSpec:
+    """Address that accepts best-effort topic messages as UDP datagrams."""
+
+    host: Host
+    port: Port
+    family: AddressFamily
+
+
+@dataclass
+class UnixDatagramConnectionSpec:
+    """Unix socket path that accepts best-effort topic messages as datagrams."""
+
+    path: str
+    host: Host = field(default_factory=get_hostname)
+
+
+DatagramConnectionSpec = UdpConnectionSpec | UnixDatagramConnectionSpec
+
+ConnectionSpec = (
+    IpConnectionSpec
+    | UnixConnectionSpec
+    | SharedMemoryConnectionSpec
+    | DatagramConnectionSpec
+)
 
 NodeName = str
 NodeUUID = UUID
@@ -45,6 +84,16 @@ class MeshNodeSpec:
     topics: set[Topic]
     services: set[Service]
 
+    # Names of the data codecs the node can decode, in order of preference.
+    # Empty for nodes that do not support codec negotiation.
+    data_codecs: tuple[str, ...] = ()
+
+    # Optional wire protocol features supported by the node
+    features: frozenset[str] = frozenset()
+
+    # QoS the node asked senders to use for some of the topics it listens to
+    topic_qos: dict[Topic, "TopicQoS"] = field(default_factory=dict)
+
 
 @dataclass
 class MeshTopologySpec:
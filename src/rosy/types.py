@@ -1,5 +1,5 @@
 from collections.abc import Sequence
-from typing import Any, Awaitable, Callable, Protocol
+from typing import Any, Awaitable, Callable, Literal, Protocol
 
 Data = Any
 
@@ -8,6 +8,12 @@ TopicCallback = (
     Callable[[Topic], Awaitable[None]] | Callable[[Topic, ...], Awaitable[None]]
 )
 
+RawTopicCallback = Callable[[Topic, bytes, str | None], Awaitable[None]]
+"""
+Called with the topic, the encoded payload, and the name of the data codec the
+payload was encoded with (None for the default codec), to pass to ``send_raw``.
+"""
+
 Service = str
 ServiceCallback = (
     Callable[[Service], Awaitable[Data]] | Callable[[Service, ...], Awaitable[Data]]
@@ -19,6 +25,18 @@ Port = int
 
 DomainId = str
 
+Priority = Literal["high", "normal", "low"]
+"""
+Each priority is sent to a node over its own connection, so e.g. small control
+messages are not delayed behind a large message on another topic.
+"""
+
+EventLoopName = Literal["asyncio", "uvloop", "auto"]
+"""
+The event loop to run nodes on: 'asyncio' for the standard loop; 'uvloop' for
+uvloop, which must be installed; or 'auto' for uvloop if it is installed.
+"""
+
 
 class Buffer(Protocol):
     """Not available in std lib until Python 3.12."""
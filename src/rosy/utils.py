@@ -1,7 +1,7 @@
 import os
 from asyncio import CancelledError
 
-from rosy.types import DomainId
+from rosy.types import DomainId, EventLoopName
 
 ALLOWED_EXCEPTIONS = (
     CancelledError,
@@ -17,6 +17,18 @@ def get_domain_id(default: DomainId = DEFAULT_DOMAIN_ID) -> DomainId:
     return os.environ.get("ROSY_DOMAIN_ID", default)
 
 
+def get_event_loop_name(default: EventLoopName = "asyncio") -> EventLoopName:
+    return os.environ.get("ROSY_EVENT_LOOP", default)
+
+
+def get_eager_tasks(default: bool = False) -> bool:
+    value = os.environ.get("ROSY_EAGER_TASKS")
+    if value is None:
+        return default
+
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
 def require(result, message: str = None) -> None:
     if not result:
         raise ValueError(message) if message else ValueError()
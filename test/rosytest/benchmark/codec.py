@@ -0,0 +1,349 @@
+"""
+Micro-benchmarks for the data codecs in `rosy.codec` and for whole topic
+messages encoded with `NodeMessageCodec`.
+
+Run standalone to print a table and optionally write the results as JSON, so
+results can be compared between releases:
+
+    python -m rosytest.benchmark.codec --output results.json
+
+The test module next to this one runs every case once under pytest, as a
+round-trip check.
+"""
+
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+from argparse import ArgumentParser, Namespace
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from rosy.asyncio import BufferReader, BufferWriter
+from rosy.codec import (
+    Codec,
+    CompressedCodec,
+    json_codec,
+    msgpack_codec,
+    np,
+    numpy_codec,
+    oob_pickle_codec,
+    pickle_codec,
+)
+from rosy.node.builder import build_node_message_codec
+from rosy.node.topic.types import TopicMessage
+from rosy.types import Buffer
+
+DATA_CODECS: dict[str, Codec] = {
+    "pickle": pickle_codec,
+    "pickle-oob": oob_pickle_codec,
+    "json": json_codec,
+    "msgpack": msgpack_codec,
+    "numpy": numpy_codec,
+    "pickle+zlib": CompressedCodec(pickle_codec, algorithm="zlib"),
+}
+
+NODE_DATA_CODECS = ("pickle", "json", "msgpack", "msgpack-native", "numpy")
+
+
+def get_payloads() -> dict[str, Any]:
+    payloads = {
+        "empty": {},
+        "small_dict": {"x": 1, "y": 2.5, "name": "rosy", "ok": True},
+        "str_1kb": "x" * 1024,
+        "bytes_1mb": os.urandom(1024 * 1024),
+        "many_kwargs": {f"key{i}": i for i in range(100)},
+    }
+
+    if np is not None:
+        payloads["ndarray_small"] = np.arange(16, dtype=np.float32)
+        payloads["ndarray_image"] = np.zeros((480, 640, 3), dtype=np.uint8)
+
+    return payloads
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    codec: str
+    payload: str
+    iterations: int
+    encode_ns_per_op: float
+    decode_ns_per_op: float
+    bytes_per_op: int
+
+
+@dataclass
+class BenchmarkCase:
+    name: str
+    codec: str
+    payload: str
+    encode: Callable[[], Awaitable[Buffer | list[Buffer]]]
+    decode: Callable[[bytes], Awaitable[Any]]
+    expected: Any
+
+    async def run(self, iterations: int) -> BenchmarkResult:
+        encoded = _join(await self.encode())
+
+        start = time.perf_counter_ns()
+        for _ in range(iterations):
+            await self.encode()
+        encode_ns = time.perf_counter_ns() - start
+
+        start = time.perf_counter_ns()
+        for _ in range(iterations):
+            await self.decode(encoded)
+        decode_ns = time.perf_counter_ns() - start
+
+        return BenchmarkResult(
+            name=self.name,
+            codec=self.codec,
+            payload=self.payload,
+            iterations=iterations,
+            encode_ns_per_op=encode_ns / iterations,
+            decode_ns_per_op=decode_ns / iterations,
+            bytes_per_op=len(encoded),
+        )
+
+    async def check_round_trip(self) -> None:
+        decoded = await self.decode(_join(await self.encode()))
+        if not values_equal(decoded, self.expected):
+            raise AssertionError(f"{self.name}: decoded value differs from input")
+
+
+def get_benchmark_cases() -> list[BenchmarkCase]:
+    payloads = get_payloads()
+    cases = []
+
+    for codec_name, codec in DATA_CODECS.items():
+        for payload_name, payload in payloads.items():
+            if is_supported(codec_name, payload):
+                cases.append(data_codec_case(codec_name, codec, payload_name, payload))
+
+    for codec_name in NODE_DATA_CODECS:
+        node_message_codec = build_node_message_codec(2, codec_name)
+        for payload_name, payload in payloads.items():
+            if is_supported(codec_name, payload):
+                cases.append(
+                    topic_message_case(
+                        codec_name, node_message_codec, payload_name, payload
+                    )
+                )
+
+    return cases
+
+
+def is_supported(codec_name: str, payload: Any) -> bool:
+    if codec_name.startswith("json"):
+        return not isinstance(payload, bytes) and not is_ndarray(payload)
+
+    if codec_name.startswith("msgpack"):
+        return not is_ndarray(payload)
+
+    return True
+
+
+def data_codec_case(
+    codec_name: str,
+    codec: Codec,
+    payload_name: str,
+    payload: Any,
+) -> BenchmarkCase:
+    if codec.supports_sync:
+
+        async def encode() -> bytes:
+            buffer = bytearray()
+            codec.encode_into(buffer, payload)
+            return buffer
+
+        async def decode(data: bytes) -> Any:
+            obj, _ = codec.decode_from(memoryview(data))
+            return obj
+
+    else:
+
+        async def encode() -> bytes:
+            writer = BufferWriter()
+            await codec.encode(writer, payload)
+            return writer
+
+        async def decode(data: bytes) -> Any:
+            return await codec.decode(BufferReader(data))
+
+    return BenchmarkCase(
+        name=f"data/{codec_name}/{payload_name}",
+        codec=codec_name,
+        payload=payload_name,
+        encode=encode,
+        decode=decode,
+        expected=payload,
+    )
+
+
+def topic_message_case(
+    codec_name: str,
+    node_message_codec,
+    payload_name: str,
+    payload: Any,
+) -> BenchmarkCase:
+    if payload_name == "empty":
+        message = TopicMessage("topic", [], {})
+    elif payload_name == "many_kwargs":
+        message = TopicMessage("topic", [], payload)
+    else:
+        message = TopicMessage("topic", [payload], {})
+
+    # Like TopicSender: the body is encoded once, then framed for each peer
+    async def encode() -> list[Buffer]:
+        body = await node_message_codec.encode_topic_message_body(
+            message.args, message.kwargs
+        )
+        return await node_message_codec.encode_topic_message_frame(
+            None, message.topic, body
+        )
+
+    async def decode(data: bytes) -> Any:
+        return await node_message_codec.decode_topic_message_or_service_request(
+            BufferReader(data)
+        )
+
+    return BenchmarkCase(
+        name=f"topic_message/{codec_name}/{payload_name}",
+        codec=codec_name,
+        payload=payload_name,
+        encode=encode,
+        decode=decode,
+        expected=message,
+    )
+
+
+def _join(encoded: Buffer | list[Buffer]) -> Buffer:
+    """Joins segmented encodings, as written to a connection, for decoding."""
+    return b"".join(encoded) if isinstance(encoded, list) else encoded
+
+
+def is_ndarray(value: Any) -> bool:
+    return np is not None and isinstance(value, np.ndarray)
+
+
+def values_equal(a: Any, b: Any) -> bool:
+    if is_ndarray(a) or is_ndarray(b):
+        return np.array_equal(a, b) and a.dtype == b.dtype
+
+    if isinstance(a, TopicMessage) and isinstance(b, TopicMessage):
+        return (
+            a.topic == b.topic
+            and len(a.args) == len(b.args)
+            and all(values_equal(x, y) for x, y in zip(a.args, b.args))
+            and a.kwargs == b.kwargs
+        )
+
+    if isinstance(a, (bytes, bytearray, memoryview)):
+        return bytes(a) == bytes(b)
+
+    return a == b
+
+
+async def calibrate(case: BenchmarkCase, min_time: float) -> int:
+    """Returns how many iterations it takes to encode for at least min_time."""
+
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await case.encode()
+        if time.perf_counter() - start >= min_time:
+            return iterations
+
+        iterations *= 2
+
+
+async def run_benchmarks(
+    cases: Iterable[BenchmarkCase],
+    min_time: float,
+) -> list[BenchmarkResult]:
+    results = []
+    for case in cases:
+        await case.check_round_trip()
+        iterations = await calibrate(case, min_time)
+        results.append(await case.run(iterations))
+
+    return results
+
+
+def results_to_json(results: list[BenchmarkResult]) -> dict:
+    return dict(
+        created=datetime.now(timezone.utc).isoformat(),
+        python=sys.version,
+        platform=platform.platform(),
+        results=[asdict(result) for result in results],
+    )
+
+
+def print_results(results: list[BenchmarkResult]) -> None:
+    name_width = max(len(result.name) for result in results)
+
+    print(
+        f"{'benchmark':<{name_width}}  {'encode ns/op':>14}  "
+        f"{'decode ns/op':>14}  {'bytes/op':>10}"
+    )
+    for result in results:
+        print(
+            f"{result.name:<{name_width}}  {result.encode_ns_per_op:>14,.0f}  "
+            f"{result.decode_ns_per_op:>14,.0f}  {result.bytes_per_op:>10,}"
+        )
+
+
+async def main(args: Namespace) -> None:
+    cases = [
+        case
+        for case in get_benchmark_cases()
+        if not args.filter or any(f in case.name for f in args.filter)
+    ]
+
+    results = await run_benchmarks(cases, args.min_time)
+
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results_to_json(results), file, indent=2)
+        print(f'\nWrote results to "{args.output}".')
+
+
+def parse_args() -> Namespace:
+    parser = ArgumentParser(description="Benchmark rosy codecs.")
+
+    parser.add_argument(
+        "--output",
+        "-o",
+        type=Path,
+        help="Write the results to this JSON file.",
+    )
+
+    parser.add_argument(
+        "--min-time",
+        type=float,
+        default=0.2,
+        help="Minimum time in seconds to spend on each encode/decode "
+        "measurement. Default: %(default)s",
+    )
+
+    parser.add_argument(
+        "--filter",
+        "-k",
+        action="append",
+        help="Only run benchmarks whose name contains this string. "
+        "Can be given multiple times.",
+    )
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
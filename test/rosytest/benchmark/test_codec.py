@@ -0,0 +1,34 @@
+import json
+
+import pytest
+
+from rosytest.benchmark.codec import (
+    BenchmarkCase,
+    get_benchmark_cases,
+    results_to_json,
+    run_benchmarks,
+)
+
+CASES = get_benchmark_cases()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("case", CASES, ids=[case.name for case in CASES])
+async def test_benchmark_case(case: BenchmarkCase):
+    await case.check_round_trip()
+
+    result = await case.run(iterations=1)
+
+    assert result.name == case.name
+    assert result.encode_ns_per_op > 0
+    assert result.decode_ns_per_op > 0
+    assert result.bytes_per_op > 0
+
+
+@pytest.mark.asyncio
+async def test_results_are_json_serializable():
+    results = await run_benchmarks(CASES[:2], min_time=0)
+
+    data = json.loads(json.dumps(results_to_json(results)))
+
+    assert [r["name"] for r in data["results"]] == [c.name for c in CASES[:2]]
@@ -0,0 +1,29 @@
+from rosy.cli.launch.main import get_node_env
+
+
+def test_get_node_env_copies_environment(monkeypatch):
+    monkeypatch.setenv("FOO", "bar")
+
+    env = get_node_env(None)
+
+    assert env["FOO"] == "bar"
+
+
+def test_get_node_env_sets_domain_id():
+    assert get_node_env("domain")["ROSY_DOMAIN_ID"] == "domain"
+
+
+def test_get_node_env_sets_event_loop_settings(monkeypatch):
+    monkeypatch.delenv("ROSY_EVENT_LOOP", raising=False)
+    monkeypatch.delenv("ROSY_EAGER_TASKS", raising=False)
+
+    env = get_node_env(None)
+    assert "ROSY_EVENT_LOOP" not in env
+    assert "ROSY_EAGER_TASKS" not in env
+
+    env = get_node_env(None, event_loop="uvloop", eager_tasks=True)
+    assert env["ROSY_EVENT_LOOP"] == "uvloop"
+    assert env["ROSY_EAGER_TASKS"] == "1"
+
+    env = get_node_env(None, eager_tasks=False)
+    assert env["ROSY_EAGER_TASKS"] == "0"
@@ -1,15 +1,29 @@
+import asyncio
 import socket
 from unittest.mock import call, create_autospec, patch
 
 import pytest
 
 from rosy.asyncio import LockableWriter, Reader, Writer
+from rosy.node.builder import build_node_message_codec_selector
 from rosy.node.peer.connection import (
+    PeerConnectError,
     PeerConnection,
     PeerConnectionBuilder,
     PeerConnectionManager,
 )
-from rosy.specs import IpConnectionSpec, UnixConnectionSpec
+from rosy.node.peer.reconnect import (
+    ConnectStats,
+    PeerUnreachableError,
+    ReconnectPolicy,
+)
+from rosy.specs import (
+    IpConnectionSpec,
+    SharedMemoryConnectionSpec,
+    UdpConnectionSpec,
+    UnixConnectionSpec,
+    UnixDatagramConnectionSpec,
+)
 from rosytest.util import mock_node_spec
 
 
@@ -85,6 +99,39 @@ class TestPeerConnectionBuilder:
 
         open_unix_connection_mock.assert_not_awaited()
 
+    @patch("rosy.node.peer.connection.shm.connect")
+    @pytest.mark.asyncio
+    async def test_build_with_SharedMemoryConnectionSpec_on_same_host_succeeds(
+        self, shm_connect_mock, open_unix_connection_mock
+    ):
+        sock_reader = create_autospec(Reader)
+        sock_writer = create_autospec(Writer)
+        open_unix_connection_mock.return_value = sock_reader, sock_writer
+
+        reader = create_autospec(Reader)
+        writer = create_autospec(Writer)
+        shm_connect_mock.return_value = reader, writer
+
+        conn_spec = SharedMemoryConnectionSpec("path", "host")
+
+        result = await self.conn_builder.build([conn_spec])
+
+        assert result == (reader, writer)
+
+        open_unix_connection_mock.assert_awaited_once_with(path="path")
+        shm_connect_mock.assert_awaited_once_with(sock_reader, sock_writer)
+
+    @pytest.mark.asyncio
+    async def test_build_with_SharedMemoryConnectionSpec_on_different_host_fails(
+        self, open_unix_connection_mock
+    ):
+        conn_spec = SharedMemoryConnectionSpec("path", "other-host")
+
+        with pytest.raises(ConnectionError):
+            await self.conn_builder.build([conn_spec])
+
+        open_unix_connection_mock.assert_not_awaited()
+
     @pytest.mark.asyncio
     async def test_build_with_multiple_specs_uses_first_successful(
         self, open_connection_mock
@@ -110,6 +157,150 @@ class TestPeerConnectionBuilder:
             call(host="host2", port=8080, family=socket.AF_INET6),
         ]
 
+    @patch("rosy.node.peer.connection.shm.connect")
+    @pytest.mark.asyncio
+    async def test_build_tries_next_spec_if_handshake_fails(
+        self, shm_connect_mock, open_connection_mock, open_unix_connection_mock
+    ):
+        open_unix_connection_mock.return_value = (
+            create_autospec(Reader),
+            create_autospec(Writer),
+        )
+        shm_connect_mock.side_effect = asyncio.IncompleteReadError(b"", 8)
+
+        reader = create_autospec(Reader)
+        writer = create_autospec(Writer)
+        open_connection_mock.return_value = reader, writer
+
+        conn_specs = [
+            SharedMemoryConnectionSpec("path", "host"),
+            IpConnectionSpec("host", 8080, family=socket.AF_INET),
+        ]
+
+        assert await self.conn_builder.build(conn_specs) == (reader, writer)
+
+    @patch("rosy.node.peer.connection.shm.connect")
+    @pytest.mark.asyncio
+    async def test_build_raises_PeerConnectError_with_every_attempts_error(
+        self, shm_connect_mock, open_connection_mock, open_unix_connection_mock
+    ):
+        open_unix_connection_mock.return_value = (
+            create_autospec(Reader),
+            create_autospec(Writer),
+        )
+        shm_error = ValueError("Bad handshake")
+        shm_connect_mock.side_effect = shm_error
+
+        ip_error = ConnectionRefusedError()
+        open_connection_mock.side_effect = ip_error
+
+        conn_specs = [
+            SharedMemoryConnectionSpec("path", "host"),
+            IpConnectionSpec("host", 8080, family=socket.AF_INET),
+        ]
+
+        with pytest.raises(PeerConnectError, match="Bad handshake") as e:
+            await self.conn_builder.build(conn_specs)
+
+        assert isinstance(e.value, ConnectionError)
+        assert e.value.errors == [(conn_specs[0], shm_error), (conn_specs[1], ip_error)]
+
+    @pytest.mark.asyncio
+    async def test_build_tries_next_spec_if_first_hangs(self, open_connection_mock):
+        self.conn_builder.stagger_delay = 0.01
+        reader = create_autospec(Reader)
+        writer = create_autospec(Writer)
+        hanging = asyncio.Event()
+
+        async def open_connection(host, port, family):
+            if host == "host1":
+                try:
+                    await asyncio.Future()
+                finally:
+                    hanging.set()
+
+            return reader, writer
+
+        open_connection_mock.side_effect = open_connection
+
+        conn_specs = [
+            IpConnectionSpec("host1", 8080, family=socket.AF_INET6),
+            IpConnectionSpec("host2", 8080, family=socket.AF_INET),
+        ]
+
+        result = await asyncio.wait_for(self.conn_builder.build(conn_specs), 1)
+
+        assert result == (reader, writer)
+        assert hanging.is_set()
+
+    @pytest.mark.asyncio
+    async def test_build_tries_next_spec_right_away_if_first_fails(
+        self, open_connection_mock
+    ):
+        self.conn_builder.stagger_delay = 60
+        reader = create_autospec(Reader)
+        writer = create_autospec(Writer)
+        open_connection_mock.side_effect = [ConnectionError(), (reader, writer)]
+
+        conn_specs = [
+            IpConnectionSpec("host1", 8080, family=socket.AF_INET6),
+            IpConnectionSpec("host2", 8080, family=socket.AF_INET),
+        ]
+
+        result = await asyncio.wait_for(self.conn_builder.build(conn_specs), 1)
+
+        assert result == (reader, writer)
+
+    @pytest.mark.asyncio
+    async def test_build_prefers_unix_connection_on_same_host(
+        self, open_connection_mock, open_unix_connection_mock
+    ):
+        reader = create_autospec(Reader)
+        writer = create_autospec(Writer)
+        open_unix_connection_mock.return_value = reader, writer
+
+        conn_specs = [
+            UnixConnectionSpec("path", "host"),
+            IpConnectionSpec("host", 8080, family=socket.AF_INET),
+        ]
+
+        result = await self.conn_builder.build(conn_specs)
+
+        assert result == (reader, writer)
+        open_connection_mock.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_build_closes_connections_made_by_losing_attempts(
+        self, open_connection_mock
+    ):
+        self.conn_builder.stagger_delay = 0.01
+        reader = create_autospec(Reader)
+        writer = create_autospec(Writer)
+        late_writer = create_autospec(Writer)
+
+        async def open_connection(host, port, family):
+            if host == "host1":
+                try:
+                    await asyncio.Future()
+                except asyncio.CancelledError:
+                    # Connected just as the attempt was cancelled
+                    return create_autospec(Reader), late_writer
+
+            return reader, writer
+
+        open_connection_mock.side_effect = open_connection
+
+        conn_specs = [
+            IpConnectionSpec("host1", 8080, family=socket.AF_INET6),
+            IpConnectionSpec("host2", 8080, family=socket.AF_INET),
+        ]
+
+        result = await asyncio.wait_for(self.conn_builder.build(conn_specs), 1)
+
+        assert result == (reader, writer)
+        late_writer.close.assert_called_once()
+        writer.close.assert_not_called()
+
     @pytest.mark.asyncio
     async def test_build_raises_ConnectionError_if_no_specs_succeed(
         self, open_connection_mock
@@ -134,6 +325,59 @@ class TestPeerConnectionBuilder:
             call(host="host2", port=8080, family=socket.AF_INET6),
         ]
 
+    @pytest.mark.asyncio
+    async def test_build_skips_datagram_connection_specs(
+        self, open_connection_mock, open_unix_connection_mock
+    ):
+        conn_specs = [
+            UnixDatagramConnectionSpec("path", host="host"),
+            UdpConnectionSpec("host", 8080, family=socket.AF_INET),
+        ]
+
+        with pytest.raises(ConnectionError):
+            await self.conn_builder.build(conn_specs)
+
+        open_connection_mock.assert_not_called()
+        open_unix_connection_mock.assert_not_called()
+
+    @patch("rosy.node.peer.connection.buffered.open_connection")
+    @pytest.mark.asyncio
+    async def test_buffered_build_with_IPConnectionSpec(
+        self, buffered_open_connection_mock, open_connection_mock
+    ):
+        self.conn_builder.buffered = True
+        reader = create_autospec(Reader)
+        writer = create_autospec(Writer)
+        buffered_open_connection_mock.return_value = reader, writer
+
+        conn_spec = IpConnectionSpec("host", 8080, family=socket.AF_INET)
+
+        assert await self.conn_builder.build([conn_spec]) == (reader, writer)
+
+        buffered_open_connection_mock.assert_awaited_once_with(
+            host="host",
+            port=8080,
+            family=socket.AF_INET,
+        )
+        open_connection_mock.assert_not_called()
+
+    @patch("rosy.node.peer.connection.buffered.open_unix_connection")
+    @pytest.mark.asyncio
+    async def test_buffered_build_with_UnixConnectionSpec(
+        self, buffered_open_unix_connection_mock, open_unix_connection_mock
+    ):
+        self.conn_builder.buffered = True
+        reader = create_autospec(Reader)
+        writer = create_autospec(Writer)
+        buffered_open_unix_connection_mock.return_value = reader, writer
+
+        conn_spec = UnixConnectionSpec("path", "host")
+
+        assert await self.conn_builder.build([conn_spec]) == (reader, writer)
+
+        buffered_open_unix_connection_mock.assert_awaited_once_with(path="path")
+        open_unix_connection_mock.assert_not_called()
+
     @pytest.mark.asyncio
     async def test_build_raises_ValueError_if_unknown_connection_spec_given(self):
         with pytest.raises(ValueError, match="Unrecognized connection spec:"):
@@ -216,3 +460,161 @@ class TestPeerConnectionManager:
             call(node.connection_specs),
             call(node.connection_specs),
         ]
+
+    @pytest.mark.asyncio
+    async def test_get_connection_fails_fast_after_failing_to_connect(self):
+        self.manager.reconnect_policy = ReconnectPolicy(initial_delay=60, max_delay=60)
+        self.conn_builder.build.side_effect = ConnectionError()
+        node = mock_node_spec("node")
+
+        with pytest.raises(ConnectionError):
+            await self.manager.get_connection(node)
+
+        with pytest.raises(PeerUnreachableError):
+            await self.manager.get_connection(node, "high")
+
+        self.conn_builder.build.assert_awaited_once()
+        assert self.manager.get_connect_stats(node) == ConnectStats(
+            attempts=1, failures=1, rejected=1
+        )
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "error", [PeerConnectError([]), EOFError(), ValueError("Bad hello")]
+    )
+    async def test_get_connection_records_failed_handshake(self, error):
+        self.manager.reconnect_policy = ReconnectPolicy(initial_delay=60, max_delay=60)
+        self.conn_builder.build.side_effect = error
+        node = mock_node_spec("node")
+
+        with pytest.raises(type(error)):
+            await self.manager.get_connection(node)
+
+        with pytest.raises(PeerUnreachableError):
+            await self.manager.get_connection(node)
+
+        assert self.manager.get_connect_stats(node) == ConnectStats(
+            attempts=1, failures=1, rejected=1
+        )
+
+    @pytest.mark.asyncio
+    async def test_get_connection_retries_after_backoff_delay(self):
+        self.manager.reconnect_policy = ReconnectPolicy(initial_delay=0)
+        self.conn_builder.build.side_effect = [
+            ConnectionError(),
+            (self.reader, self.writer),
+        ]
+        node = mock_node_spec("node")
+
+        with pytest.raises(ConnectionError):
+            await self.manager.get_connection(node)
+
+        connection = await self.manager.get_connection(node)
+
+        assert connection.reader is self.reader
+        assert self.manager.get_connect_stats(node) == ConnectStats(
+            attempts=2, failures=1, rejected=0
+        )
+
+    @pytest.mark.asyncio
+    async def test_close_connection_forgets_failed_attempts(self):
+        self.manager.reconnect_policy = ReconnectPolicy(initial_delay=60, max_delay=60)
+        self.conn_builder.build.side_effect = [
+            ConnectionError(),
+            (self.reader, self.writer),
+        ]
+        node = mock_node_spec("node")
+
+        with pytest.raises(ConnectionError):
+            await self.manager.get_connection(node)
+
+        await self.manager.close_connection(node)
+
+        assert self.manager.get_connect_stats(node) == ConnectStats()
+        await self.manager.get_connection(node)
+
+    @pytest.mark.asyncio
+    async def test_get_connection_sends_hello_with_negotiated_data_codec(self):
+        self.manager.codec_selector = build_node_message_codec_selector(
+            2, "pickle", ["msgpack", "pickle"]
+        )
+
+        node = mock_node_spec("node")
+        node.data_codecs = ("json", "pickle")
+
+        await self.manager.get_connection(node)
+
+        self.writer.write.assert_called_once_with(b"\x08\x00\x00\x00h\x06pickle")
+        self.writer.drain.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_get_connection_does_not_send_hello_to_node_without_data_codecs(
+        self,
+    ):
+        self.manager.codec_selector = build_node_message_codec_selector(
+            2, "pickle", ["msgpack", "pickle"]
+        )
+
+        node = mock_node_spec("node")
+
+        await self.manager.get_connection(node)
+
+        self.writer.write.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_get_connection_raises_ValueError_if_no_common_data_codec(self):
+        self.manager.codec_selector = build_node_message_codec_selector(
+            2, "pickle", ["pickle"]
+        )
+
+        node = mock_node_spec("node")
+        node.data_codecs = ("json",)
+
+        with pytest.raises(ValueError, match="No data codec in common"):
+            await self.manager.get_connection(node)
+
+        self.conn_builder.build.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_get_connection_returns_separate_connection_per_priority(self):
+        node = mock_node_spec("node")
+
+        high = await self.manager.get_connection(node, "high")
+        normal = await self.manager.get_connection(node)
+        low = await self.manager.get_connection(node, "low")
+
+        assert len({id(high), id(normal), id(low)}) == 3
+        assert await self.manager.get_connection(node, "high") is high
+        assert await self.manager.get_connection(node, "normal") is normal
+        assert self.conn_builder.build.await_count == 3
+
+    @pytest.mark.asyncio
+    async def test_close_connection_closes_connections_of_every_priority(self):
+        node = mock_node_spec("node")
+        other_node = mock_node_spec("other_node")
+
+        await self.manager.get_connection(node, "high")
+        await self.manager.get_connection(node)
+        other_connection = await self.manager.get_connection(other_node)
+
+        await self.manager.close_connection(node)
+
+        assert self.writer.close.call_count == 2
+        assert await self.manager.get_connection(other_node) is other_connection
+        await self.manager.get_connection(node)
+        assert self.conn_builder.build.await_count == 4
+
+    @pytest.mark.asyncio
+    async def test_has_connection(self):
+        node = mock_node_spec("node")
+
+        assert self.manager.has_connection(node) is False
+
+        await self.manager.get_connection(node, "high")
+
+        assert self.manager.has_connection(node, "high") is True
+        assert self.manager.has_connection(node) is False
+
+        self.writer.is_closing.return_value = True
+
+        assert self.manager.has_connection(node, "high") is False
@@ -0,0 +1,102 @@
+import asyncio
+from unittest.mock import call, create_autospec
+
+import pytest
+
+from rosy.asyncio import noop
+from rosy.node.peer.connection import PeerConnection, PeerConnectionManager
+from rosy.node.peer.prewarm import ConnectionPrewarmer
+from rosytest.util import mock_node_spec
+
+
+class TestConnectionPrewarmer:
+    def setup_method(self):
+        self.connection_manager = create_autospec(PeerConnectionManager)
+        self.connection_manager.has_connection.return_value = False
+        self.connection_manager.get_connection.return_value = create_autospec(
+            PeerConnection
+        )
+
+        self.nodes = [mock_node_spec("node0"), mock_node_spec("node1")]
+        self.priorities = {
+            self.nodes[0]: [{"normal"}, {"normal", "high"}],
+            self.nodes[1]: [set(), set()],
+        }
+
+        self.prewarmer = ConnectionPrewarmer(
+            self.connection_manager,
+            [
+                lambda node: self.priorities[node][0],
+                lambda node: self.priorities[node][1],
+            ],
+        )
+
+    async def wait_for_tasks(self) -> None:
+        await asyncio.gather(*self.prewarmer._tasks.values())
+        await noop()
+
+    @pytest.mark.asyncio
+    async def test_prewarm_opens_connections_of_every_priority_needed(self):
+        self.prewarmer.prewarm(self.nodes)
+        await self.wait_for_tasks()
+
+        self.connection_manager.get_connection.assert_has_awaits(
+            [call(self.nodes[0], "normal"), call(self.nodes[0], "high")],
+            any_order=True,
+        )
+        assert self.connection_manager.get_connection.await_count == 2
+        assert self.prewarmer._tasks == {}
+
+    @pytest.mark.asyncio
+    async def test_prewarm_skips_open_connections(self):
+        self.connection_manager.has_connection.side_effect = (
+            lambda node, priority: priority == "normal"
+        )
+
+        self.prewarmer.prewarm(self.nodes)
+        await self.wait_for_tasks()
+
+        self.connection_manager.get_connection.assert_awaited_once_with(
+            self.nodes[0], "high"
+        )
+
+    @pytest.mark.asyncio
+    async def test_prewarm_does_not_open_connection_being_opened(self):
+        connected = asyncio.Event()
+
+        async def get_connection(node, priority):
+            await connected.wait()
+
+        self.connection_manager.get_connection.side_effect = get_connection
+
+        self.prewarmer.prewarm(self.nodes)
+        self.prewarmer.prewarm(self.nodes)
+        connected.set()
+        await self.wait_for_tasks()
+
+        assert self.connection_manager.get_connection.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_prewarm_logs_connection_errors(self):
+        self.connection_manager.get_connection.side_effect = ConnectionError()
+
+        self.prewarmer.prewarm(self.nodes)
+        await self.wait_for_tasks()
+
+        assert self.prewarmer._tasks == {}
+
+    @pytest.mark.asyncio
+    async def test_cancel_cancels_opening_connections_to_node(self):
+        async def get_connection(node, priority):
+            await asyncio.Future()
+
+        self.connection_manager.get_connection.side_effect = get_connection
+
+        self.prewarmer.prewarm(self.nodes)
+        tasks = list(self.prewarmer._tasks.values())
+        await noop()
+
+        await self.prewarmer.cancel(self.nodes[0])
+
+        assert self.prewarmer._tasks == {}
+        assert all(task.cancelled() for task in tasks)
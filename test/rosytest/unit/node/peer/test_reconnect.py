@@ -0,0 +1,107 @@
+from random import Random
+from unittest.mock import create_autospec
+
+import pytest
+
+from rosy.node.peer.reconnect import (
+    ConnectStats,
+    PeerUnreachableError,
+    ReconnectPolicy,
+    ReconnectState,
+)
+from rosytest.util import mock_node_spec
+
+
+class TestReconnectPolicy:
+    def test_get_delay_grows_exponentially_up_to_max_delay(self):
+        policy = ReconnectPolicy(
+            initial_delay=1, max_delay=5, multiplier=2, jitter=0, failure_threshold=2
+        )
+        rng = Random()
+
+        assert [policy.get_delay(failures, rng) for failures in range(2, 7)] == [
+            1,
+            2,
+            4,
+            5,
+            5,
+        ]
+
+    def test_get_delay_adds_jitter(self):
+        policy = ReconnectPolicy(initial_delay=1, jitter=0.5)
+        rng = create_autospec(Random)
+        rng.uniform.return_value = -1
+
+        assert policy.get_delay(1, rng) == 0.5
+        rng.uniform.assert_called_once_with(-1, 1)
+
+    @pytest.mark.parametrize(
+        "kwargs",
+        [
+            dict(initial_delay=-1),
+            dict(initial_delay=2, max_delay=1),
+            dict(multiplier=0.5),
+            dict(jitter=2),
+            dict(failure_threshold=0),
+        ],
+    )
+    def test_invalid_values_raise_ValueError(self, kwargs):
+        with pytest.raises(ValueError):
+            ReconnectPolicy(**kwargs)
+
+
+class TestReconnectState:
+    def setup_method(self):
+        self.time = 100.0
+        self.state = ReconnectState(
+            ReconnectPolicy(initial_delay=1, jitter=0, failure_threshold=2),
+            time_func=lambda: self.time,
+        )
+        self.node = mock_node_spec("node")
+
+    def test_circuit_opens_after_failure_threshold(self):
+        assert self.state.record_failure() is None
+        assert not self.state.is_open
+        self.state.check(self.node)
+
+        assert self.state.record_failure() == 1
+        assert self.state.is_open
+
+        with pytest.raises(PeerUnreachableError):
+            self.state.check(self.node)
+
+    def test_circuit_closes_after_delay(self):
+        self.state.record_failure()
+        self.state.record_failure()
+
+        self.time += 1
+
+        assert not self.state.is_open
+        self.state.check(self.node)
+
+    def test_delay_doubles_after_each_failed_retry(self):
+        self.state.record_failure()
+        self.state.record_failure()
+
+        assert self.state.record_failure() == 2
+        assert self.state.retry_at == 102
+
+    def test_record_success_closes_circuit(self):
+        self.state.record_failure()
+        self.state.record_failure()
+
+        self.state.record_success()
+
+        assert not self.state.is_open
+        assert self.state.failures == 0
+
+    def test_stats(self):
+        self.state.record_attempt()
+        self.state.record_failure()
+        self.state.record_attempt()
+        self.state.record_failure()
+
+        with pytest.raises(PeerUnreachableError):
+            self.state.check(self.node)
+
+        assert self.state.stats == ConnectStats(attempts=2, failures=2, rejected=1)
@@ -3,7 +3,7 @@ from unittest.mock import AsyncMock, patch
 import pytest
 
 from rosy.asyncio import LockableWriter
-from rosy.node.codec import NodeMessageCodec
+from rosy.node.codec import NodeMessageCodec, NodeMessageCodecSelector
 from rosy.node.peer.connection import PeerConnection, PeerConnectionManager
 from rosy.node.peer.selector import PeerSelector
 from rosy.node.service.caller import (
@@ -29,7 +29,10 @@ class TestServiceCaller:
             node if service == "service" else None
         )
 
-        connection_manager = AsyncMock(spec=PeerConnectionManager)
+        self.node = node
+        self.connection_manager = connection_manager = AsyncMock(
+            spec=PeerConnectionManager
+        )
         connection_manager.get_connection.return_value = self.connection
 
         self.node_message_codec = AsyncMock(spec=NodeMessageCodec)
@@ -38,7 +41,7 @@ class TestServiceCaller:
         self.service_caller = ServiceCaller(
             peer_selector,
             connection_manager,
-            self.node_message_codec,
+            NodeMessageCodecSelector(self.node_message_codec),
             max_request_ids=10,
         )
 
@@ -115,6 +118,59 @@ class TestServiceCaller:
 
         logger_mock.warning.assert_called_once()
 
+    @pytest.mark.asyncio
+    async def test_request_uses_normal_priority_connection_by_default(self):
+        self.node_message_codec.decode_service_response.side_effect = [
+            ServiceResponse(id=0, result="response"),
+        ]
+
+        await self._call("service")
+
+        self.connection_manager.get_connection.assert_awaited_once_with(
+            self.node, "normal"
+        )
+
+    @pytest.mark.asyncio
+    async def test_request_uses_connection_for_service_priority(self):
+        self.node_message_codec.decode_service_response.side_effect = [
+            ServiceResponse(id=0, result="response"),
+        ]
+
+        self.service_caller.set_priority("service", "high")
+        await self._call("service")
+
+        self.connection_manager.get_connection.assert_awaited_once_with(
+            self.node, "high"
+        )
+
+    def test_set_priority_to_None_resets_priority(self):
+        self.service_caller.set_priority("service", "high")
+        self.service_caller.set_priority("service", None)
+
+        assert self.service_caller._service_priorities == {}
+
+    @pytest.mark.asyncio
+    async def test_call_adds_service_to_services(self):
+        self.node_message_codec.decode_service_response.side_effect = [
+            ServiceResponse(id=0, result="response"),
+        ]
+
+        await self._call("service")
+
+        assert self.service_caller.services == {"service"}
+
+    def test_get_priorities_returns_priorities_of_services_called_on_node(self):
+        self.service_caller.services.update({"service", "high-service", "other"})
+        self.service_caller.set_priority("high-service", "high")
+        self.node.services = {"service", "high-service", "not-called"}
+
+        assert self.service_caller.get_priorities(self.node) == {"normal", "high"}
+
+    def test_get_priorities_returns_empty_set_if_no_services_called_on_node(self):
+        self.node.services = {"service"}
+
+        assert self.service_caller.get_priorities(self.node) == set()
+
     async def _call(self, service: Service):
         return await self.service_caller.call(service, ["arg"], {"key": "value"})
 
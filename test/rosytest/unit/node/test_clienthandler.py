@@ -1,15 +1,27 @@
 import asyncio
-from unittest.mock import ANY, create_autospec
+from unittest.mock import ANY, AsyncMock, create_autospec
 
 import pytest
 
-from rosy.asyncio import LockableWriter, Reader, Writer
+from rosy.asyncio import BufferReader, LockableWriter, Reader, Writer
+from rosy.node.builder import build_node_message_codec_selector
 from rosy.node.clienthandler import ClientHandler
-from rosy.node.codec import NodeMessageCodec
+from rosy.node.codec import (
+    MalformedFrameError,
+    NodeMessageCodec,
+    NodeMessageCodecSelector,
+)
+from rosy.node.peer.selector import PeerSelector
 from rosy.node.service.requesthandler import ServiceRequestHandler
 from rosy.node.service.types import ServiceRequest
+from rosy.node.topic.listenermanager import TopicListenerManager
 from rosy.node.topic.messagehandler import TopicMessageHandler
-from rosy.node.topic.types import TopicMessage
+from rosy.node.topic.outbox import NodeOutbox, NodeOutboxManager
+from rosy.node.topic.qos import TopicQoS
+from rosy.node.topic.sender import TopicSender
+from rosy.node.topic.types import RawTopicMessage, TopicMessage
+from rosy.node.types import ConnectionHello
+from rosytest.util import mock_node_spec
 
 
 class TestClientHandler:
@@ -20,11 +32,16 @@ class TestClientHandler:
         self.writer.get_extra_info.side_effect = lambda key: key
 
         self.node_message_codec = create_autospec(NodeMessageCodec)
+        self.msgpack_codec = create_autospec(NodeMessageCodec)
         self.topic_message_handler = create_autospec(TopicMessageHandler)
+        self.topic_message_handler.raw_topics = {"raw_topic"}
         self.service_request_handler = create_autospec(ServiceRequestHandler)
 
         self.handler = ClientHandler(
-            self.node_message_codec,
+            NodeMessageCodecSelector(
+                self.node_message_codec,
+                {"msgpack": self.msgpack_codec},
+            ),
             self.topic_message_handler,
             self.service_request_handler,
         )
@@ -41,9 +58,11 @@ class TestClientHandler:
         assert await self.handler.handle_client(self.reader, self.writer) is None
 
         self.node_message_codec.decode_topic_message_or_service_request.assert_called_with(
-            self.reader
+            self.reader, {}, {"raw_topic"}
+        )
+        self.topic_message_handler.handle_message.assert_awaited_once_with(
+            message, self.topic_message_handler.new_callback_table.return_value
         )
-        self.topic_message_handler.handle_message.assert_awaited_once_with(message)
         self.service_request_handler.handle_request.assert_not_awaited()
 
     @pytest.mark.asyncio
@@ -67,10 +86,10 @@ class TestClientHandler:
         await asyncio.sleep(0)
 
         self.node_message_codec.decode_topic_message_or_service_request.assert_called_with(
-            self.reader
+            self.reader, {}, {"raw_topic"}
         )
         self.service_request_handler.handle_request.assert_awaited_once_with(
-            message, ANY
+            message, ANY, self.node_message_codec
         )
         self.topic_message_handler.handle_message.assert_not_awaited()
 
@@ -91,7 +110,293 @@ class TestClientHandler:
             await self.handler.handle_client(self.reader, self.writer)
 
         self.node_message_codec.decode_topic_message_or_service_request.assert_called_once_with(
-            self.reader
+            self.reader, {}, {"raw_topic"}
         )
         self.service_request_handler.handle_request.assert_not_awaited()
         self.topic_message_handler.handle_message.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_receive_hello_switches_codec_for_connection(self):
+        message = TopicMessage(topic="topic", args=["arg"], kwargs={"key": "value"})
+
+        self.node_message_codec.decode_topic_message_or_service_request.side_effect = [
+            ConnectionHello("msgpack"),
+        ]
+        self.msgpack_codec.decode_topic_message_or_service_request.side_effect = [
+            message,
+            EOFError(),
+        ]
+
+        assert await self.handler.handle_client(self.reader, self.writer) is None
+
+        self.node_message_codec.decode_topic_message_or_service_request.assert_called_once()
+        self.msgpack_codec.decode_topic_message_or_service_request.assert_called_with(
+            self.reader, {}, {"raw_topic"}
+        )
+        self.topic_message_handler.handle_message.assert_awaited_once_with(
+            message, self.topic_message_handler.new_callback_table.return_value
+        )
+
+    @pytest.mark.asyncio
+    async def test_receive_malformed_frame_logs_error_and_continues(self, caplog):
+        message = TopicMessage(topic="topic", args=["arg"], kwargs={"key": "value"})
+
+        self.node_message_codec.decode_topic_message_or_service_request.side_effect = [
+            MalformedFrameError(b"t", 10, "topic"),
+            message,
+            EOFError(),
+        ]
+
+        assert await self.handler.handle_client(self.reader, self.writer) is None
+
+        assert "Dropping message from peername" in caplog.text
+        assert "topic='topic'" in caplog.text
+        assert any(record.levelname == "ERROR" for record in caplog.records)
+        self.writer.close.assert_not_called()
+        self.topic_message_handler.handle_message.assert_awaited_once_with(
+            message, self.topic_message_handler.new_callback_table.return_value
+        )
+
+    @pytest.mark.asyncio
+    async def test_receive_hello_with_unknown_codec_closes_connection(self):
+        self.node_message_codec.decode_topic_message_or_service_request.side_effect = [
+            ConnectionHello("json"),
+        ]
+
+        assert await self.handler.handle_client(self.reader, self.writer) is None
+
+        self.writer.close.assert_called_once()
+        self.topic_message_handler.handle_message.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_receive_raw_topic_message_calls_topic_message_handler(self):
+        message = RawTopicMessage(topic="raw_topic", payload=b"payload")
+
+        self.node_message_codec.decode_topic_message_or_service_request.side_effect = [
+            message,
+            EOFError(),
+        ]
+
+        assert await self.handler.handle_client(self.reader, self.writer) is None
+
+        self.topic_message_handler.handle_message.assert_awaited_once_with(
+            message, self.topic_message_handler.new_callback_table.return_value
+        )
+
+    @pytest.mark.asyncio
+    async def test_handle_datagram_calls_topic_message_handler(self):
+        message = TopicMessage(topic="topic", args=["arg"], kwargs={})
+
+        self.node_message_codec.decode_topic_message_or_service_request.side_effect = [
+            message,
+            EOFError(),
+        ]
+
+        assert await self.handler.handle_datagram(b"datagram") is None
+
+        self.node_message_codec.decode_topic_message_or_service_request.assert_called_with(
+            ANY, None, {"raw_topic"}
+        )
+        self.topic_message_handler.handle_message.assert_awaited_once_with(message)
+
+    @pytest.mark.asyncio
+    async def test_handle_datagram_with_hello_switches_codec(self):
+        message = TopicMessage(topic="topic", args=["arg"], kwargs={})
+
+        self.node_message_codec.decode_topic_message_or_service_request.side_effect = [
+            ConnectionHello("msgpack"),
+        ]
+        self.msgpack_codec.decode_topic_message_or_service_request.side_effect = [
+            message,
+            EOFError(),
+        ]
+
+        assert await self.handler.handle_datagram(b"datagram") is None
+
+        self.topic_message_handler.handle_message.assert_awaited_once_with(message)
+
+    @pytest.mark.asyncio
+    async def test_receive_raw_topic_message_after_hello_has_data_codec(self):
+        message = RawTopicMessage(topic="raw_topic", payload=b"payload")
+
+        self.node_message_codec.decode_topic_message_or_service_request.side_effect = [
+            ConnectionHello("msgpack"),
+        ]
+        self.msgpack_codec.decode_topic_message_or_service_request.side_effect = [
+            message,
+            EOFError(),
+        ]
+
+        assert await self.handler.handle_client(self.reader, self.writer) is None
+
+        self.topic_message_handler.handle_message.assert_awaited_once_with(
+            message._replace(data_codec="msgpack"),
+            self.topic_message_handler.new_callback_table.return_value,
+        )
+
+    @pytest.mark.asyncio
+    async def test_handle_datagram_with_hello_gives_raw_messages_data_codec(self):
+        message = RawTopicMessage(topic="raw_topic", payload=b"payload")
+
+        self.node_message_codec.decode_topic_message_or_service_request.side_effect = [
+            ConnectionHello("msgpack"),
+        ]
+        self.msgpack_codec.decode_topic_message_or_service_request.side_effect = [
+            message,
+            EOFError(),
+        ]
+
+        assert await self.handler.handle_datagram(b"datagram") is None
+
+        self.topic_message_handler.handle_message.assert_awaited_once_with(
+            message._replace(data_codec="msgpack")
+        )
+
+    @pytest.mark.asyncio
+    async def test_handle_datagram_with_topic_drops_messages_on_other_topics(self):
+        message = TopicMessage(topic="topic", args=["arg"], kwargs={})
+        other_message = TopicMessage(topic="other_topic", args=["arg"], kwargs={})
+
+        self.node_message_codec.decode_topic_message_or_service_request.side_effect = [
+            other_message,
+            message,
+            EOFError(),
+        ]
+
+        assert await self.handler.handle_datagram(b"datagram", "topic") is None
+
+        self.topic_message_handler.handle_message.assert_awaited_once_with(message)
+
+    @pytest.mark.asyncio
+    async def test_handle_datagram_drops_malformed_datagram(self, caplog):
+        self.node_message_codec.decode_topic_message_or_service_request.side_effect = [
+            MalformedFrameError(b"t", 10, "topic"),
+        ]
+
+        assert await self.handler.handle_datagram(b"datagram") is None
+
+        assert "Dropping datagram" in caplog.text
+        self.topic_message_handler.handle_message.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_handle_datagram_drops_service_requests(self):
+        self.node_message_codec.decode_topic_message_or_service_request.side_effect = [
+            ServiceRequest(id=0, service="service", args=[], kwargs={}),
+        ]
+
+        assert await self.handler.handle_datagram(b"datagram") is None
+
+        self.service_request_handler.handle_request.assert_not_called()
+        self.topic_message_handler.handle_message.assert_not_awaited()
+
+
+class TestRawRelayWithMixedCodecs:
+    """A relay forwards raw payloads only to nodes that can decode them."""
+
+    def setup_method(self):
+        self.codec_selector = build_node_message_codec_selector(
+            2, "pickle", ["pickle", "msgpack"]
+        )
+
+        self.pickle_node = mock_node_spec("pickle_node")
+        self.pickle_node.data_codecs = ("pickle",)
+        self.msgpack_node = mock_node_spec("msgpack_node")
+        self.msgpack_node.data_codecs = ("msgpack",)
+
+        self.peer_selector = create_autospec(PeerSelector)
+        self.peer_selector.get_nodes_for_topic.return_value = [
+            self.pickle_node,
+            self.msgpack_node,
+        ]
+
+        self.outboxes = {
+            self.pickle_node: AsyncMock(spec=NodeOutbox),
+            self.msgpack_node: AsyncMock(spec=NodeOutbox),
+        }
+        self.outbox_manager = AsyncMock(spec=NodeOutboxManager)
+        self.outbox_manager.get_outbox.side_effect = lambda n, p: self.outboxes[n]
+
+        self.topic_sender = TopicSender(
+            self.peer_selector, self.codec_selector, self.outbox_manager
+        )
+
+        async def relay(topic, payload, data_codec):
+            await self.topic_sender.send_raw("out", payload, data_codec=data_codec)
+
+        listener_manager = TopicListenerManager()
+        listener_manager.set_callback("in", relay, raw=True)
+
+        self.handler = ClientHandler(
+            self.codec_selector,
+            TopicMessageHandler(listener_manager),
+            create_autospec(ServiceRequestHandler),
+        )
+
+        self.writer = create_autospec(Writer)
+        self.writer.get_extra_info.side_effect = lambda key: key
+
+    @pytest.mark.asyncio
+    async def test_relays_payload_to_nodes_using_its_codec(self):
+        codec = self.codec_selector.get("msgpack")
+        body = await codec.encode_topic_message_body(["arg"], {"key": "value"})
+        data = b"".join(
+            [
+                await codec.encode_hello(ConnectionHello("msgpack")),
+                *await codec.encode_topic_message_frame(None, "in", body),
+            ]
+        )
+
+        await self.handler.handle_client(BufferReader(data), self.writer)
+
+        self.outboxes[self.pickle_node].send.assert_not_awaited()
+        outbox = self.outboxes[self.msgpack_node]
+        outbox.send.assert_awaited_once()
+        (topic, relayed_body, _), _ = outbox.send.call_args
+        assert topic == "out"
+
+        frame = b"".join(
+            await codec.encode_topic_message_frame(None, "out", relayed_body)
+        )
+        assert codec.decode_topic_message_or_service_request_from(
+            memoryview(frame)[4:]
+        ) == TopicMessage("out", ["arg"], {"key": "value"})
+
+
+class TestKeepLatestWithSlowListener:
+    @pytest.mark.asyncio
+    async def test_slow_listener_only_handles_latest_of_received_messages(self):
+        codec_selector = build_node_message_codec_selector(2, "pickle", None)
+        codec = codec_selector.default_codec
+
+        received = []
+
+        async def slow_callback(topic, value):
+            received.append(value)
+            await asyncio.sleep(0.05)
+
+        listener_manager = TopicListenerManager()
+        listener_manager.set_callback(
+            "state", slow_callback, qos=TopicQoS(keep_latest=True)
+        )
+        handler = ClientHandler(
+            codec_selector,
+            TopicMessageHandler(listener_manager),
+            create_autospec(ServiceRequestHandler),
+        )
+
+        frames = []
+        for value in range(200):
+            body = await codec.encode_topic_message_body([value], {})
+            frames += await codec.encode_topic_message_frame(None, "state", body)
+
+        writer = create_autospec(Writer)
+        writer.get_extra_info.side_effect = lambda key: key
+
+        # Reading the connection is not held up by the slow listener
+        await asyncio.wait_for(
+            handler.handle_client(BufferReader(b"".join(frames)), writer), 1
+        )
+        await asyncio.sleep(0.2)
+
+        assert len(received) <= 2
+        assert received[-1] == 199
@@ -1,21 +1,38 @@
+from unittest.mock import AsyncMock, call, create_autospec
+
 import pytest
 
-from rosy.asyncio import BufferReader, BufferWriter
-from rosy.codec import FixedLengthIntCodec, LengthPrefixedStringCodec
+from rosy.asyncio import BufferReader, BufferWriter, Reader
+from rosy.buffered import BufferedStreamReader
+from rosy.codec import Codec, FixedLengthIntCodec, LengthPrefixedStringCodec
 from rosy.node.builder import build_node_message_codec
+from rosy.node.codec import (
+    MalformedFrameError,
+    NodeMessageCodec,
+    NodeMessageCodecSelector,
+)
+from rosy.node.topic.codec import TopicMessageCodec
 from rosy.node.service.types import ServiceRequest, ServiceResponse
-from rosy.node.topic.types import TopicMessage
+from rosy.node.topic.types import RawTopicMessage, TopicMessage
+from rosy.node.types import ConnectionHello
+from rosytest.util import mock_node_spec
 
 
 class TestNodeMessageCodec:
     def setup_method(self):
         self.topic_message = TopicMessage("topic", ["arg"], {"key": "value"})
-        self.encoded_topic_message = b"t\x05topic\x01\x03arg\x01\x03key\x05value"
+        self.topic_message_frame = b"t\x05topic\x01\x03arg\x01\x03key\x05value"
+        self.encoded_topic_message = (
+            # Frame length
+            b"\x17\x00\x00\x00"
+            # Frame
+            + self.topic_message_frame
+        )
 
         self.service_request = ServiceRequest(
             id=1, service="service", args=["arg"], kwargs={"key": "value"}
         )
-        self.encoded_service_request = (
+        self.service_request_frame = (
             # Prefix for service request
             b"s"
             # ID
@@ -27,9 +44,17 @@ class TestNodeMessageCodec:
             # KWArgs
             b"\x01\x03key\x05value"
         )
+        self.encoded_service_request = (
+            # Frame length
+            b"\x1b\x00\x00\x00"
+            # Frame
+            + self.service_request_frame
+        )
 
         self.service_response = ServiceResponse(id=1, result="result", error=None)
         self.encoded_service_response = (
+            # Frame length
+            b"\x0a\x00\x00\x00"
             # ID
             b"\x01\x00"
             # Success
@@ -44,9 +69,148 @@ class TestNodeMessageCodec:
         )
 
     @pytest.mark.asyncio
-    async def test_encode_topic_message(self):
-        result = await self.codec.encode_topic_message(self.topic_message)
-        assert result == self.encoded_topic_message
+    async def test_encode_topic_message_body(self):
+        result = await self.codec.encode_topic_message_body(["arg"], {"key": "value"})
+        assert result == [b"\x01\x03arg\x01\x03key\x05value"]
+
+    @pytest.mark.asyncio
+    async def test_encode_topic_message_frame_with_topic_id_definition(self):
+        body = [b"\x01\x03arg", b"\x01\x03key\x05value"]
+
+        result = await self.codec.encode_topic_message_frame(1, "topic", body)
+
+        assert result == [b"\x19\x00\x00\x00" + b"d\x01\x01\x05topic", *body]
+        assert result[1] is body[0]
+        assert result[2] is body[1]
+
+    @pytest.mark.asyncio
+    async def test_encode_topic_message_frame_with_topic_id(self):
+        body = [b"\x01\x03arg\x01\x03key\x05value"]
+
+        result = await self.codec.encode_topic_message_frame(1, None, body)
+
+        assert result == [b"\x13\x00\x00\x00" + b"i\x01\x01", *body]
+
+    @pytest.mark.asyncio
+    async def test_encode_topic_message_frame_without_topic_id(self):
+        body = [b"\x01\x03arg\x01\x03key\x05value"]
+
+        result = await self.codec.encode_topic_message_frame(None, "topic", body)
+
+        assert b"".join(result) == self.encoded_topic_message
+
+    @pytest.mark.asyncio
+    async def test_decode_raw_topic_messages(self):
+        body = [b"\x01\x03arg\x01\x03key\x05value"]
+        reader = BufferReader(
+            self.encoded_topic_message
+            + b"".join(await self.codec.encode_topic_message_frame(0, "topic", body))
+            + b"".join(await self.codec.encode_topic_message_frame(0, None, body))
+        )
+        topic_ids = {}
+
+        for topic_id in [None, 0, 0]:
+            message = await self.codec.decode_topic_message_or_service_request(
+                reader, topic_ids, raw_topics={"topic"}
+            )
+            assert message == RawTopicMessage("topic", body[0], topic_id)
+
+    @pytest.mark.asyncio
+    async def test_decode_raw_topic_message_with_async_only_codecs(self):
+        self.codec.topic_message_codec = AsyncOnlyTopicMessageCodec(
+            self.codec.topic_message_codec
+        )
+        self.codec._sync_topic_message = False
+
+        reader = BufferReader(self.encoded_topic_message)
+        message = await self.codec.decode_topic_message_or_service_request(
+            reader, raw_topics={"topic"}
+        )
+
+        assert message == RawTopicMessage("topic", b"\x01\x03arg\x01\x03key\x05value")
+
+    @pytest.mark.asyncio
+    async def test_encode_and_decode_hello(self):
+        encoded_hello = await self.codec.encode_hello(ConnectionHello("msgpack"))
+        assert encoded_hello == b"\x09\x00\x00\x00h\x07msgpack"
+
+        reader = BufferReader(encoded_hello)
+        hello = await self.codec.decode_topic_message_or_service_request(reader)
+        assert hello == ConnectionHello("msgpack")
+
+    @pytest.mark.asyncio
+    async def test_decode_topic_messages_with_topic_ids(self):
+        body = [b"\x01\x03arg\x01\x03key\x05value"]
+        reader = BufferReader(
+            b"".join(await self.codec.encode_topic_message_frame(1, "topic", body))
+            + b"".join(await self.codec.encode_topic_message_frame(1, None, body))
+            + b"".join(await self.codec.encode_topic_message_frame(2, None, body))
+        )
+        topic_ids = {}
+
+        message = await self.codec.decode_topic_message_or_service_request(
+            reader, topic_ids
+        )
+        assert message == self.topic_message._replace(topic_id=1)
+        assert topic_ids == {1: "topic"}
+
+        message = await self.codec.decode_topic_message_or_service_request(
+            reader, topic_ids
+        )
+        assert message == self.topic_message._replace(topic_id=1)
+
+        with pytest.raises(ValueError, match="Unknown topic_id=2"):
+            await self.codec.decode_topic_message_or_service_request(reader, topic_ids)
+
+    def test_decode_from_with_topic_id_without_topic_ids_raises_ValueError(self):
+        with pytest.raises(ValueError, match="Unknown topic_id=1"):
+            self.codec.decode_topic_message_or_service_request_from(
+                b"i\x01\x01\x00\x00"
+            )
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("sync", [True, False])
+    async def test_decode_truncated_frame_raises_MalformedFrameError(self, sync):
+        if not sync:
+            self.codec.topic_message_codec = AsyncOnlyTopicMessageCodec(
+                self.codec.topic_message_codec
+            )
+            self.codec._sync_topic_message = False
+
+        frame = self.topic_message_frame[:-2]
+        reader = BufferReader(len(frame).to_bytes(4, "little") + frame)
+
+        with pytest.raises(MalformedFrameError, match="topic='topic'") as e:
+            await self.codec.decode_topic_message_or_service_request(reader)
+
+        assert not isinstance(e.value, EOFError)
+        assert e.value.topic == "topic"
+
+    @pytest.mark.asyncio
+    async def test_decode_at_eof_before_frame_raises_EOFError(self):
+        reader = BufferReader(self.encoded_topic_message[:10])
+
+        with pytest.raises(EOFError):
+            await self.codec.decode_topic_message_or_service_request(reader)
+
+    @pytest.mark.asyncio
+    async def test_decode_truncated_service_response_raises_MalformedFrameError(
+        self,
+    ):
+        frame = self.encoded_service_response[4:-2]
+        reader = BufferReader(len(frame).to_bytes(4, "little") + frame)
+
+        with pytest.raises(MalformedFrameError):
+            await self.codec.decode_service_response(reader)
+
+    def test_prefixes_must_be_unique(self):
+        with pytest.raises(ValueError):
+            NodeMessageCodec(
+                self.codec.topic_message_codec,
+                self.codec.service_request_codec,
+                self.codec.service_response_codec,
+                topic_id_prefix=b"t",
+            )
 
     @pytest.mark.asyncio
     async def test_encode_service_request(self):
@@ -64,7 +228,8 @@ class TestNodeMessageCodec:
         reader = BufferReader(
             self.encoded_topic_message
             + self.encoded_service_request
-            + b"?"  # Unrecognized prefix to test error handling
+            # Unrecognized prefix to test error handling
+            + b"\x01\x00\x00\x00?"
         )
 
         message = await self.codec.decode_topic_message_or_service_request(reader)
@@ -81,3 +246,182 @@ class TestNodeMessageCodec:
         reader = BufferReader(self.encoded_service_response)
         response = await self.codec.decode_service_response(reader)
         assert response == self.service_response
+
+    def test_decode_topic_message_or_service_request_from(self):
+        assert self.codec.supports_sync_decode
+
+        message = self.codec.decode_topic_message_or_service_request_from(
+            self.topic_message_frame
+        )
+        assert message == self.topic_message
+
+        request = self.codec.decode_topic_message_or_service_request_from(
+            self.service_request_frame
+        )
+        assert request == self.service_request
+
+        with pytest.raises(ValueError, match="Unknown prefix="):
+            self.codec.decode_topic_message_or_service_request_from(b"?")
+
+    @pytest.mark.asyncio
+    async def test_read_frame_reads_whole_frame_in_one_read(self):
+        reader = AsyncMock(Reader)
+        reader.readexactly.side_effect = [
+            self.encoded_topic_message[:4],
+            self.topic_message_frame,
+        ]
+
+        assert await self.codec.read_frame(reader) == self.topic_message_frame
+
+        assert reader.readexactly.call_args_list == [call(4), call(23)]
+
+    @pytest.mark.asyncio
+    async def test_read_frame_reads_view_from_reader_that_supports_it(self):
+        reader = create_autospec(BufferedStreamReader)
+        frame = memoryview(self.topic_message_frame)
+        reader.readexactly.return_value = self.encoded_topic_message[:4]
+        reader.readexactly_view.return_value = frame
+
+        assert await self.codec.read_frame(reader) is frame
+
+        reader.readexactly_view.assert_awaited_once_with(23)
+
+    @pytest.mark.asyncio
+    async def test_async_only_codecs_use_same_frames(self):
+        self.codec.topic_message_codec = AsyncOnlyTopicMessageCodec(
+            self.codec.topic_message_codec
+        )
+        self.codec._sync_topic_message = False
+
+        body = await self.codec.encode_topic_message_body(["arg"], {"key": "value"})
+        result = await self.codec.encode_topic_message_frame(None, "topic", body)
+        assert b"".join(result) == self.encoded_topic_message
+
+        reader = BufferReader(self.encoded_topic_message)
+        message = await self.codec.decode_topic_message_or_service_request(reader)
+        assert message == self.topic_message
+
+    @pytest.mark.asyncio
+    async def test_async_only_codecs_use_same_topic_id_frames(self):
+        body = await self.codec.encode_topic_message_body(["arg"], {"key": "value"})
+        expected = await self.codec.encode_topic_message_frame(1, "topic", body)
+
+        self.codec.topic_message_codec = AsyncOnlyTopicMessageCodec(
+            self.codec.topic_message_codec
+        )
+        self.codec._sync_topic_message = False
+
+        assert (
+            await self.codec.encode_topic_message_body(["arg"], {"key": "value"})
+            == body
+        )
+        assert await self.codec.encode_topic_message_frame(1, "topic", body) == expected
+
+        topic_ids = {}
+        message = await self.codec.decode_topic_message_or_service_request(
+            BufferReader(b"".join(expected)), topic_ids
+        )
+        assert message == self.topic_message._replace(topic_id=1)
+        assert topic_ids == {1: "topic"}
+
+
+class TestMsgpackNativeNodeMessageCodec:
+    def setup_method(self):
+        self.codec = build_node_message_codec(
+            request_id_bytes=2,
+            data_codec="msgpack-native",
+        )
+
+    @pytest.mark.asyncio
+    async def test_args_and_kwargs_are_each_one_msgpack_object(self):
+        body = await self.codec.encode_topic_message_body(["arg", 1], {"key": "value"})
+
+        assert body == [
+            b"\x06\x00\x00\x00" + b"\x92\xa3arg\x01"
+            b"\x0b\x00\x00\x00" + b"\x81\xa3key\xa5value"
+        ]
+
+    @pytest.mark.asyncio
+    async def test_topic_message_round_trip(self):
+        body = await self.codec.encode_topic_message_body(("arg", 1), {"key": "value"})
+        frame = await self.codec.encode_topic_message_frame(None, "topic", body)
+
+        message = await self.codec.decode_topic_message_or_service_request(
+            BufferReader(b"".join(frame))
+        )
+
+        assert message == TopicMessage("topic", ["arg", 1], {"key": "value"})
+
+    @pytest.mark.asyncio
+    async def test_service_request_round_trip(self):
+        request = ServiceRequest(1, "service", ["arg"], {"key": "value"})
+
+        encoded = await self.codec.encode_service_request(request)
+        decoded = await self.codec.decode_topic_message_or_service_request(
+            BufferReader(encoded)
+        )
+
+        assert decoded == request
+
+
+class TestNodeMessageCodecSelector:
+    def setup_method(self):
+        self.default_codec = create_autospec(NodeMessageCodec)
+        self.msgpack_codec = create_autospec(NodeMessageCodec)
+        self.pickle_codec = create_autospec(NodeMessageCodec)
+
+        self.selector = NodeMessageCodecSelector(
+            self.default_codec,
+            {"msgpack": self.msgpack_codec, "pickle": self.pickle_codec},
+        )
+
+        self.node = mock_node_spec()
+
+    def test_names(self):
+        assert self.selector.names == ("msgpack", "pickle")
+
+    def test_select_returns_first_preferred_common_codec(self):
+        self.node.data_codecs = ("json", "pickle", "msgpack")
+
+        assert self.selector.select(self.node) == ("msgpack", self.msgpack_codec)
+
+    def test_select_returns_default_codec_for_node_without_data_codecs(self):
+        assert self.selector.select(self.node) == (None, self.default_codec)
+
+    def test_select_returns_default_codec_if_no_codecs_are_named(self):
+        selector = NodeMessageCodecSelector(self.default_codec)
+        self.node.data_codecs = ("pickle",)
+
+        assert selector.select(self.node) == (None, self.default_codec)
+
+    def test_select_raises_ValueError_if_no_common_codec(self):
+        self.node.data_codecs = ("json",)
+
+        with pytest.raises(ValueError, match="No data codec in common"):
+            self.selector.select(self.node)
+
+    def test_get(self):
+        assert self.selector.get("pickle") is self.pickle_codec
+
+        with pytest.raises(ValueError, match="Unsupported data codec='json'"):
+            self.selector.get("json")
+
+
+class AsyncOnlyCodecWrapper(Codec):
+    def __init__(self, codec: Codec):
+        self.codec = codec
+
+    async def encode(self, writer, obj) -> None:
+        await self.codec.encode(writer, obj)
+
+    async def decode(self, reader):
+        return await self.codec.decode(reader)
+
+
+class AsyncOnlyTopicMessageCodec(TopicMessageCodec):
+    def __init__(self, codec: TopicMessageCodec):
+        super().__init__(
+            AsyncOnlyCodecWrapper(codec.topic_codec),
+            AsyncOnlyCodecWrapper(codec.args_codec),
+            AsyncOnlyCodecWrapper(codec.kwargs_codec),
+        )
@@ -8,6 +8,10 @@ from rosy.node.callbackmanager import CallbackManager
 from rosy.node.node import Node, ServiceProxy, TopicProxy
 from rosy.node.servers import ServersManager
 from rosy.node.service.caller import ServiceCaller
+from rosy.node.topic.inprocess import InProcessInbox
+from rosy.node.topic.listenermanager import TopicListenerManager
+from rosy.node.topic.multicast import MulticastReceiver
+from rosy.node.topic.qos import TopicQoS, TopicQoSManager
 from rosy.node.topic.sender import TopicSender
 from rosy.node.topology import MeshTopologyManager
 from rosy.specs import IpConnectionSpec, MeshNodeSpec, NodeId
@@ -20,7 +24,7 @@ class TestNode:
         self.servers_manager = create_autospec(ServersManager)
         self.topology_manager = create_autospec(MeshTopologyManager)
         self.topic_sender = create_autospec(TopicSender)
-        self.topic_listener_manager = create_autospec(CallbackManager)
+        self.topic_listener_manager = create_autospec(TopicListenerManager)
         self.service_caller = create_autospec(ServiceCaller)
         self.service_handler_manager = create_autospec(CallbackManager)
 
@@ -53,6 +57,23 @@ class TestNode:
         self.discovery.register_node.assert_awaited_once()
         self.discovery.update_node.assert_not_awaited()
 
+    @pytest.mark.asyncio
+    async def test_start_and_stop_in_process_inbox(self):
+        self.node.in_process_inbox = create_autospec(InProcessInbox)
+
+        await self.node.start()
+        self.node.in_process_inbox.start.assert_called_once_with(self.id)
+
+        await self.node.stop()
+        self.node.in_process_inbox.stop.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_stop_closes_topic_sender(self):
+        await self.node.start()
+        await self.node.stop()
+
+        self.topic_sender.close.assert_called_once_with()
+
     @pytest.mark.asyncio
     async def test_start_on_started_node_raises_RuntimeError(self):
         await self.node.start()
@@ -70,6 +91,17 @@ class TestNode:
             {"key": "value"},
         )
 
+    @pytest.mark.asyncio
+    async def test_send_and_wait(self):
+        await self.node.send_and_wait("topic", "arg", key="value")
+
+        self.topic_sender.send.assert_awaited_once_with(
+            "topic",
+            ("arg",),
+            {"key": "value"},
+            wait=True,
+        )
+
     @pytest.mark.asyncio
     async def test_listen(self):
         callback = AsyncMock()
@@ -77,10 +109,75 @@ class TestNode:
         await self.node.listen("topic", callback)
 
         self.topic_listener_manager.set_callback.assert_called_once_with(
-            "topic", callback
+            "topic", callback, raw=False, qos=None
         )
         self.discovery.update_node.assert_awaited_once()
 
+    @pytest.mark.asyncio
+    async def test_listen_raw(self):
+        callback = AsyncMock()
+
+        await self.node.listen("topic", callback, raw=True)
+
+        self.topic_listener_manager.set_callback.assert_called_once_with(
+            "topic", callback, raw=True, qos=None
+        )
+        self.discovery.update_node.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_listen_with_qos(self):
+        callback = AsyncMock()
+        qos = TopicQoS(maxsize=1)
+
+        await self.node.listen("topic", callback, qos=qos)
+
+        self.topic_listener_manager.set_callback.assert_called_once_with(
+            "topic", callback, raw=False, qos=qos
+        )
+        self.discovery.update_node.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_listen_with_multicast_qos_joins_multicast_group(self):
+        self.node.multicast_receiver = create_autospec(MulticastReceiver)
+
+        await self.node.listen("topic", AsyncMock(), qos=TopicQoS(multicast=True))
+
+        self.node.multicast_receiver.join.assert_awaited_once_with("topic")
+        self.node.multicast_receiver.leave.assert_not_awaited()
+        self.discovery.update_node.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_listen_without_multicast_qos_leaves_multicast_group(self):
+        self.node.multicast_receiver = create_autospec(MulticastReceiver)
+
+        await self.node.listen("topic", AsyncMock())
+
+        self.node.multicast_receiver.join.assert_not_awaited()
+        self.node.multicast_receiver.leave.assert_awaited_once_with("topic")
+
+    @pytest.mark.asyncio
+    async def test_listen_with_multicast_qos_without_receiver_raises_ValueError(self):
+        with pytest.raises(ValueError):
+            await self.node.listen("topic", AsyncMock(), qos=TopicQoS(multicast=True))
+
+        self.topic_listener_manager.set_callback.assert_not_called()
+
+    def test_set_topic_qos(self):
+        self.topic_sender.qos_manager = create_autospec(TopicQoSManager)
+        qos = TopicQoS(maxsize=1)
+
+        self.node.set_topic_qos("topic", qos)
+
+        self.topic_sender.qos_manager.set_qos.assert_called_once_with("topic", qos)
+
+    @pytest.mark.asyncio
+    async def test_send_raw(self):
+        await self.node.send_raw("topic", b"payload")
+
+        self.topic_sender.send_raw.assert_awaited_once_with(
+            "topic", b"payload", data_codec=None
+        )
+
     @pytest.mark.asyncio
     async def test_stop_listening_to_valid_topic_registers_node(self):
         callback = AsyncMock()
@@ -91,6 +188,15 @@ class TestNode:
         self.topic_listener_manager.remove_callback.assert_called_once_with("topic")
         self.discovery.update_node.assert_awaited_once()
 
+    @pytest.mark.asyncio
+    async def test_stop_listening_leaves_multicast_group(self):
+        self.node.multicast_receiver = create_autospec(MulticastReceiver)
+        self.topic_listener_manager.remove_callback.return_value = AsyncMock()
+
+        await self.node.stop_listening("topic")
+
+        self.node.multicast_receiver.leave.assert_awaited_once_with("topic")
+
     @pytest.mark.asyncio
     async def test_stop_listening_to_invalid_topic_does_not_register_node(self):
         self.topic_listener_manager.remove_callback.return_value = None
@@ -148,6 +254,11 @@ class TestNode:
             {"key": "value"},
         )
 
+    def test_set_service_priority(self):
+        self.node.set_service_priority("service", "high")
+
+        self.service_caller.set_priority.assert_called_once_with("service", "high")
+
     @pytest.mark.asyncio
     async def test_add_service(self):
         callback = AsyncMock()
@@ -238,6 +349,24 @@ class TestNode:
 
         self.discovery.update_node.assert_awaited_once_with(expected_spec)
 
+    @pytest.mark.asyncio
+    async def test_register_advertises_data_codecs_and_features(self):
+        self.servers_manager.connection_specs = []
+        self.topic_listener_manager.keys = set()
+        self.service_handler_manager.keys = set()
+
+        self.topic_listener_manager.topic_qos = {"topic": TopicQoS(maxsize=1)}
+
+        self.node.data_codecs = ("msgpack", "pickle")
+        self.node.features = frozenset({"feature"})
+
+        await self.node.register()
+
+        spec = self.discovery.update_node.call_args[0][0]
+        assert spec.data_codecs == ("msgpack", "pickle")
+        assert spec.features == frozenset({"feature"})
+        assert spec.topic_qos == {"topic": TopicQoS(maxsize=1)}
+
 
 class TestTopicProxy:
     def setup_method(self):
@@ -253,6 +382,27 @@ class TestTopicProxy:
 
         self.node.send.assert_called_once_with(self.topic.topic, "arg", key="value")
 
+    @pytest.mark.asyncio
+    async def test_send_and_wait(self):
+        await self.topic.send_and_wait("arg", key="value")
+
+        self.node.send_and_wait.assert_called_once_with(
+            self.topic.topic, "arg", key="value"
+        )
+
+    @pytest.mark.asyncio
+    async def test_send_raw(self):
+        await self.topic.send_raw(b"payload")
+
+        self.node.send_raw.assert_called_once_with(self.topic.topic, b"payload", None)
+
+    def test_set_qos(self):
+        qos = TopicQoS(maxsize=1)
+
+        self.topic.set_qos(qos)
+
+        self.node.set_topic_qos.assert_called_once_with(self.topic.topic, qos)
+
     @pytest.mark.asyncio
     async def test_has_listeners(self):
         self.node.topic_has_listeners.return_value = True
@@ -306,6 +456,13 @@ class TestServiceProxy:
             self.service.service, "arg", key="value"
         )
 
+    def test_set_priority(self):
+        self.service.set_priority("high")
+
+        self.node.set_service_priority.assert_called_once_with(
+            self.service.service, "high"
+        )
+
     @pytest.mark.asyncio
     async def test_has_providers(self):
         self.node.service_has_providers.return_value = True
@@ -1,3 +1,5 @@
+import asyncio
+import os
 import socket
 from asyncio import Server
 from collections.abc import Callable
@@ -7,15 +9,25 @@ import pytest
 
 from rosy.asyncio import Reader, Writer
 from rosy.node.servers import (
+    DatagramServerProvider,
     ServerProvider,
     ServersManager,
+    SharedMemoryServerProvider,
     TcpServerProvider,
+    TmpUnixDatagramServerProvider,
     TmpUnixServerProvider,
+    UdpServerProvider,
     UnsupportedProviderError,
     _UnixServer,
     _close_on_return,
 )
-from rosy.specs import IpConnectionSpec, UnixConnectionSpec
+from rosy.specs import (
+    IpConnectionSpec,
+    SharedMemoryConnectionSpec,
+    UdpConnectionSpec,
+    UnixConnectionSpec,
+    UnixDatagramConnectionSpec,
+)
 
 
 class TestTcpServerProvider:
@@ -56,6 +68,29 @@ class TestTcpServerProvider:
             port=0,
         )
 
+    @patch("rosy.node.servers.asyncio.start_server")
+    @patch("rosy.node.servers.buffered.start_server")
+    @pytest.mark.asyncio
+    async def test_start_buffered_server(
+        self, buffered_start_server_mock, start_server_mock
+    ):
+        self.provider.buffered = True
+        expected_server = create_autospec(Server)
+        expected_server.sockets = [mock_socket(1234, socket.AF_INET)]
+        buffered_start_server_mock.return_value = expected_server
+
+        client_connected_cb = create_autospec(Callable)
+
+        server, _ = await self.provider.start_server(client_connected_cb)
+
+        assert server is expected_server
+        buffered_start_server_mock.assert_awaited_once_with(
+            client_connected_cb,
+            host="server-host",
+            port=0,
+        )
+        start_server_mock.assert_not_called()
+
 
 def mock_socket(port: int, family: socket.AddressFamily) -> socket.socket:
     mock_sock = Mock(socket.socket)
@@ -88,6 +123,24 @@ class TestTmpUnixServerProvider:
         assert server.server is expected_server
         assert conn_specs == [UnixConnectionSpec(sock_path)]
 
+    @patch("rosy.node.servers.buffered.start_unix_server")
+    @pytest.mark.asyncio
+    async def test_start_buffered_server(self, buffered_start_unix_server_mock):
+        self.provider.buffered = True
+        expected_server = create_autospec(Server)
+        buffered_start_unix_server_mock.return_value = expected_server
+
+        client_connected_cb = create_autospec(Callable)
+
+        server, _ = await self.provider.start_server(client_connected_cb)
+
+        buffered_start_unix_server_mock.assert_called_once_with(
+            client_connected_cb,
+            path=ANY,
+        )
+        assert server.server is expected_server
+        await server.wait_closed()
+
     @patch("rosy.node.servers.asyncio.start_unix_server")
     @pytest.mark.asyncio
     async def test_start_server_raises_UnsupportedProviderError(
@@ -101,6 +154,157 @@ class TestTmpUnixServerProvider:
             await self.provider.start_server(client_connected_cb)
 
 
+class TestSharedMemoryServerProvider:
+    @pytest.fixture(autouse=True)
+    def supported_platform(self):
+        with patch("rosy.node.servers.shm.is_supported_platform", return_value=True):
+            yield
+
+    def setup_method(self):
+        self.provider = SharedMemoryServerProvider(capacity=1024)
+
+    @patch("rosy.node.servers.shm.is_supported_platform", return_value=False)
+    @pytest.mark.asyncio
+    async def test_start_server_on_unsupported_platform_raises(self, _):
+        with pytest.raises(UnsupportedProviderError):
+            await self.provider.start_server(create_autospec(Callable))
+
+    @patch("rosy.node.servers.asyncio.start_unix_server")
+    @pytest.mark.asyncio
+    async def test_start_server(self, start_unix_server_mock):
+        expected_server = create_autospec(Server)
+        start_unix_server_mock.return_value = expected_server
+
+        client_connected_cb = create_autospec(Callable)
+
+        server, conn_specs = await self.provider.start_server(client_connected_cb)
+
+        sock_path = start_unix_server_mock.call_args[1]["path"]
+        assert "rosy-node-shm." in sock_path
+
+        assert isinstance(server, _UnixServer)
+        assert server.server is expected_server
+        assert conn_specs == [SharedMemoryConnectionSpec(sock_path)]
+
+    @patch("rosy.node.servers.shm.accept")
+    @patch("rosy.node.servers.asyncio.start_unix_server")
+    @pytest.mark.asyncio
+    async def test_client_connected_cb_is_called_with_shm_reader_writer(
+        self, start_unix_server_mock, accept_mock
+    ):
+        reader = create_autospec(Reader)
+        writer = create_autospec(Writer)
+        accept_mock.return_value = reader, writer
+
+        client_connected_cb = AsyncMock()
+
+        await self.provider.start_server(client_connected_cb)
+        handle_client = start_unix_server_mock.call_args[0][0]
+
+        sock_reader = create_autospec(Reader)
+        sock_writer = create_autospec(Writer)
+        await handle_client(sock_reader, sock_writer)
+
+        accept_mock.assert_awaited_once_with(sock_reader, sock_writer, 1024)
+        client_connected_cb.assert_awaited_once_with(reader, writer)
+        writer.close.assert_called_once()
+        writer.wait_closed.assert_awaited_once()
+
+    @patch("rosy.node.servers.shm.accept")
+    @patch("rosy.node.servers.asyncio.start_unix_server")
+    @pytest.mark.asyncio
+    async def test_client_connected_cb_is_not_called_if_handshake_fails(
+        self, start_unix_server_mock, accept_mock
+    ):
+        accept_mock.side_effect = EOFError()
+
+        client_connected_cb = AsyncMock()
+
+        await self.provider.start_server(client_connected_cb)
+        handle_client = start_unix_server_mock.call_args[0][0]
+
+        await handle_client(create_autospec(Reader), create_autospec(Writer))
+
+        client_connected_cb.assert_not_awaited()
+
+
+class TestUdpServerProvider:
+    @pytest.mark.asyncio
+    async def test_start_server_receives_datagrams(self):
+        provider = UdpServerProvider("127.0.0.1", client_host="client-host")
+        received = asyncio.Queue()
+
+        server, conn_specs = await provider.start_server(received.put)
+
+        try:
+            [conn_spec] = conn_specs
+            assert isinstance(conn_spec, UdpConnectionSpec)
+            assert conn_spec.host == "client-host"
+            assert conn_spec.port > 0
+            assert conn_spec.family == socket.AF_INET
+
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                sock.sendto(b"datagram", ("127.0.0.1", conn_spec.port))
+
+            assert await asyncio.wait_for(received.get(), 1) == b"datagram"
+        finally:
+            server.close()
+            await server.wait_closed()
+
+
+class TestTmpUnixDatagramServerProvider:
+    @pytest.mark.asyncio
+    async def test_start_server_receives_datagrams(self):
+        provider = TmpUnixDatagramServerProvider()
+        received = asyncio.Queue()
+
+        server, conn_specs = await provider.start_server(received.put)
+
+        try:
+            [conn_spec] = conn_specs
+            assert isinstance(conn_spec, UnixDatagramConnectionSpec)
+
+            with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+                sock.sendto(b"datagram0", conn_spec.path)
+                sock.sendto(b"datagram1", conn_spec.path)
+
+            assert await asyncio.wait_for(received.get(), 1) == b"datagram0"
+            assert await asyncio.wait_for(received.get(), 1) == b"datagram1"
+        finally:
+            server.close()
+            await server.wait_closed()
+
+        assert not os.path.exists(conn_spec.path)
+
+    @pytest.mark.asyncio
+    async def test_datagrams_are_dropped_when_queue_is_full(self):
+        provider = TmpUnixDatagramServerProvider(max_queue_size=1)
+        received = []
+        handling = asyncio.Event()
+
+        async def datagram_received_cb(data: bytes) -> None:
+            received.append(data)
+            await handling.wait()
+
+        server, [conn_spec] = await provider.start_server(datagram_received_cb)
+
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+                sock.sendto(b"datagram0", conn_spec.path)
+                await asyncio.sleep(0.01)  # datagram0 is being handled
+                for i in range(1, 4):
+                    sock.sendto(f"datagram{i}".encode(), conn_spec.path)
+                await asyncio.sleep(0.01)
+
+            handling.set()
+            await asyncio.sleep(0.01)
+
+            assert received == [b"datagram0", b"datagram1"]
+        finally:
+            server.close()
+            await server.wait_closed()
+
+
 class TestServersManager:
     def setup_method(self):
         servers = [
@@ -172,6 +376,43 @@ class TestServersManager:
 
         assert logger_mock.exception.call_count == len(self.server_providers)
 
+    @pytest.mark.asyncio
+    async def test_start_servers_passes_datagram_received_cb_to_datagram_providers(
+        self,
+    ):
+        datagram_provider = create_autospec(DatagramServerProvider)
+        datagram_conn_spec = create_autospec(UdpConnectionSpec)
+        datagram_provider.start_server.return_value = (
+            create_autospec(Server),
+            [datagram_conn_spec],
+        )
+        datagram_received_cb = create_autospec(Callable)
+
+        manager = ServersManager(
+            [*self.server_providers, datagram_provider],
+            self.client_connected_cb,
+            datagram_received_cb=datagram_received_cb,
+        )
+
+        await manager.start_servers()
+
+        datagram_provider.start_server.assert_awaited_once_with(datagram_received_cb)
+        assert manager.connection_specs == [*self.conn_specs, datagram_conn_spec]
+
+    @pytest.mark.asyncio
+    async def test_start_servers_skips_datagram_providers_without_callback(self):
+        datagram_provider = create_autospec(DatagramServerProvider)
+
+        manager = ServersManager(
+            [*self.server_providers, datagram_provider],
+            self.client_connected_cb,
+        )
+
+        await manager.start_servers()
+
+        datagram_provider.start_server.assert_not_awaited()
+        assert manager.connection_specs == self.conn_specs
+
 
 class TestCloseOnReturn:
     def setup_method(self):
@@ -1,4 +1,11 @@
-from rosy.node.topology import MeshTopologyManager
+from unittest.mock import create_autospec
+
+import pytest
+
+from rosy.node.peer.connection import PeerConnectionManager
+from rosy.node.peer.prewarm import ConnectionPrewarmer
+from rosy.node.topic.outbox import NodeOutboxManager
+from rosy.node.topology import MeshTopologyManager, TopologyChangedHandler
 from rosy.specs import MeshNodeSpec, MeshTopologySpec, NodeId
 
 
@@ -88,6 +95,49 @@ class TestMeshTopologyManager:
         assert removed_nodes == []
 
 
+class TestTopologyChangedHandler:
+    def setup_method(self):
+        self.topology_manager = MeshTopologyManager()
+        self.connection_manager = create_autospec(PeerConnectionManager)
+        self.outbox_manager = create_autospec(NodeOutboxManager)
+        self.connection_prewarmer = create_autospec(ConnectionPrewarmer)
+
+        self.handler = TopologyChangedHandler(
+            self.topology_manager,
+            self.connection_manager,
+            self.outbox_manager,
+            connection_prewarmer=self.connection_prewarmer,
+        )
+
+        self.node1 = mesh_node_spec("node1")
+        self.node2 = mesh_node_spec("node2")
+        self.topology_manager.set_topology(MeshTopologySpec([self.node1]))
+
+    @pytest.mark.asyncio
+    async def test_call_sets_topology(self):
+        topology = MeshTopologySpec([self.node1, self.node2])
+
+        await self.handler(topology)
+
+        assert self.topology_manager.topology is topology
+
+    @pytest.mark.asyncio
+    async def test_call_cleans_up_after_removed_nodes(self):
+        await self.handler(MeshTopologySpec([self.node2]))
+
+        self.connection_prewarmer.cancel.assert_awaited_once_with(self.node1)
+        self.outbox_manager.stop_outbox.assert_awaited_once_with(self.node1)
+        self.connection_manager.close_connection.assert_awaited_once_with(self.node1)
+
+    @pytest.mark.asyncio
+    async def test_call_prewarms_connections_to_nodes(self):
+        topology = MeshTopologySpec([self.node1, self.node2])
+
+        await self.handler(topology)
+
+        self.connection_prewarmer.prewarm.assert_called_once_with(topology.nodes)
+
+
 def mesh_node_spec(name: str) -> MeshNodeSpec:
     return MeshNodeSpec(
         id=NodeId(name),
@@ -0,0 +1,161 @@
+import asyncio
+import socket
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from rosy.node.builder import build_node_message_codec_selector
+from rosy.node.topic.datagram import DatagramEncoder, DatagramSender
+from rosy.node.topic.types import TopicMessage
+from rosy.node.types import ConnectionHello
+from rosy.specs import (
+    IpConnectionSpec,
+    UdpConnectionSpec,
+    UnixDatagramConnectionSpec,
+)
+from rosytest.util import mock_node_spec
+
+
+class TestDatagramSender:
+    def setup_method(self):
+        self.codec_selector = build_node_message_codec_selector(
+            2, "pickle", ["msgpack", "pickle"]
+        )
+        self.sender = DatagramSender(self.codec_selector, host="host")
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = str(Path(self.tmp_dir.name) / "dgram.sock")
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(self.path)
+        self.sock.settimeout(1)
+
+        self.node = mock_node_spec("node")
+        self.node.connection_specs = [UnixDatagramConnectionSpec(self.path, "host")]
+        self.node.data_codecs = ("pickle",)
+
+    def teardown_method(self):
+        self.sock.close()
+        self.tmp_dir.cleanup()
+
+    async def encode_body(self, *args, **kwargs):
+        _, codec = self.codec_selector.select(self.node)
+        return await codec.encode_topic_message_body(args, kwargs)
+
+    def decode_datagram(self, datagram: bytes) -> list:
+        _, codec = self.codec_selector.select(self.node)
+
+        frames = []
+        data = memoryview(datagram)
+        while data:
+            frame_len = int.from_bytes(data[:4], "little")
+            frames.append(
+                codec.decode_topic_message_or_service_request_from(
+                    data[4 : 4 + frame_len]
+                )
+            )
+            data = data[4 + frame_len :]
+
+        return frames
+
+    @pytest.mark.asyncio
+    async def test_send_sends_hello_and_topic_message_in_one_datagram(self):
+        body = await self.encode_body("arg", key="value")
+
+        assert await self.sender.send(self.node, "topic", body) is True
+
+        datagram = await asyncio.to_thread(self.sock.recv, 65536)
+        assert self.decode_datagram(datagram) == [
+            ConnectionHello("pickle"),
+            TopicMessage("topic", ["arg"], {"key": "value"}),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_send_over_udp(self):
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.bind(("127.0.0.1", 0))
+            sock.settimeout(1)
+            port = sock.getsockname()[1]
+            self.node.connection_specs = [
+                UdpConnectionSpec("127.0.0.1", port, socket.AF_INET)
+            ]
+
+            assert await self.sender.send(self.node, "topic", [b"\x00\x00"]) is True
+
+            datagram = await asyncio.to_thread(sock.recv, 65536)
+            assert self.decode_datagram(datagram)[1] == TopicMessage("topic", [], {})
+
+    @pytest.mark.asyncio
+    async def test_send_returns_False_if_node_does_not_accept_datagrams(self):
+        self.node.connection_specs = [
+            IpConnectionSpec("host", 8080, socket.AF_INET),
+        ]
+
+        assert await self.sender.send(self.node, "topic", [b"\x00\x00"]) is False
+
+    @pytest.mark.asyncio
+    async def test_send_does_not_send_unix_datagrams_to_other_hosts(self):
+        self.node.connection_specs = [
+            UnixDatagramConnectionSpec(self.path, "other-host"),
+        ]
+
+        assert await self.sender.send(self.node, "topic", [b"\x00\x00"]) is False
+
+    @pytest.mark.asyncio
+    async def test_send_returns_False_if_message_does_not_fit_in_a_datagram(self):
+        self.sender.max_unix_size = 100
+        body = await self.encode_body("x" * 100)
+
+        assert await self.sender.send(self.node, "topic", body) is False
+
+    @pytest.mark.asyncio
+    async def test_close_closes_endpoint(self):
+        await self.sender.send(self.node, "topic", [b"\x00\x00"])
+        endpoint = await self.sender._get_endpoint(self.node)
+
+        self.sender.close(self.node)
+
+        assert endpoint.transport.is_closing()
+        assert self.node.id not in self.sender._endpoints
+
+    @pytest.mark.asyncio
+    async def test_close_all_closes_every_endpoint(self):
+        await self.sender.send(self.node, "topic", [b"\x00\x00"])
+        endpoint = await self.sender._get_endpoint(self.node)
+
+        self.sender.close_all()
+
+        assert endpoint.transport.is_closing()
+        assert not self.sender._endpoints
+
+
+class TestDatagramEncoder:
+    def setup_method(self):
+        codec_selector = build_node_message_codec_selector(2, "pickle", None)
+        self.codec = codec_selector.default_codec
+        self.encoder = DatagramEncoder()
+
+    @pytest.mark.asyncio
+    async def test_encode_returns_datagram_that_fits_exactly(self):
+        body = [b"\x00" * 10, b"\x01" * 10]
+        datagram = await self.encoder.encode("pickle", self.codec, "topic", body, 1000)
+
+        assert datagram is not None
+        assert (
+            await self.encoder.encode(
+                "pickle", self.codec, "topic", body, len(datagram)
+            )
+            == datagram
+        )
+
+    @pytest.mark.asyncio
+    async def test_encode_returns_None_if_datagram_is_too_large(self):
+        body = [b"\x00" * 10, b"\x01" * 10]
+        datagram = await self.encoder.encode("pickle", self.codec, "topic", body, 1000)
+
+        assert (
+            await self.encoder.encode(
+                "pickle", self.codec, "topic", body, len(datagram) - 1
+            )
+            is None
+        )
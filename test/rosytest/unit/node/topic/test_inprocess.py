@@ -0,0 +1,192 @@
+import asyncio
+from unittest.mock import create_autospec
+
+import pytest
+
+from rosy.asyncio import noop
+from rosy.node.topic.inprocess import (
+    InProcessInbox,
+    InProcessRegistry,
+    InProcessSender,
+)
+from rosy.node.topic.messagehandler import TopicMessageHandler
+from rosy.node.topic.types import TopicMessage
+from rosy.specs import NodeId
+from rosytest.util import mock_node_spec
+
+
+class TestInProcessInbox:
+    def setup_method(self):
+        self.message_handler = create_autospec(TopicMessageHandler)
+        self.message_handler.raw_topics = {"raw-topic"}
+        self.registry = InProcessRegistry()
+        self.node_id = NodeId("node")
+        self.inbox = InProcessInbox(
+            self.message_handler, self.registry, max_queue_size=2
+        )
+
+    @pytest.mark.asyncio
+    async def test_start_registers_inbox(self):
+        assert self.registry.get(self.node_id) is None
+
+        self.inbox.start(self.node_id)
+
+        assert self.registry.get(self.node_id) is self.inbox
+        assert self.inbox.loop is asyncio.get_running_loop()
+        await self.inbox.stop()
+
+    @pytest.mark.asyncio
+    async def test_stop_unregisters_inbox(self):
+        self.inbox.start(self.node_id)
+
+        await self.inbox.stop()
+
+        assert self.registry.get(self.node_id) is None
+        assert not self.inbox.accepts("topic")
+
+    @pytest.mark.asyncio
+    async def test_accepts_only_non_raw_topics_once_started(self):
+        assert not self.inbox.accepts("topic")
+
+        self.inbox.start(self.node_id)
+
+        assert self.inbox.accepts("topic")
+        assert not self.inbox.accepts("raw-topic")
+        await self.inbox.stop()
+
+    @pytest.mark.asyncio
+    async def test_put_handles_messages_in_order(self):
+        self.inbox.start(self.node_id)
+        messages = [TopicMessage("topic", [i], {}) for i in range(2)]
+
+        for message in messages:
+            await self.inbox.put(message)
+        await noop()
+
+        handled = [
+            c.args[0] for c in self.message_handler.handle_message.call_args_list
+        ]
+        assert handled == messages
+        await self.inbox.stop()
+
+    @pytest.mark.asyncio
+    async def test_put_drops_message_if_queue_full(self):
+        self.inbox.start(self.node_id)
+
+        for i in range(3):
+            await self.inbox.put(TopicMessage("topic", [i], {}))
+        await noop()
+
+        assert self.message_handler.handle_message.await_count == 2
+        await self.inbox.stop()
+
+    @pytest.mark.asyncio
+    async def test_put_with_wait_waits_for_room(self):
+        self.inbox.start(self.node_id)
+
+        for i in range(3):
+            await self.inbox.put(TopicMessage("topic", [i], {}), wait=True)
+        for _ in range(3):
+            await noop()
+
+        assert self.message_handler.handle_message.await_count == 3
+        await self.inbox.stop()
+
+    @pytest.mark.asyncio
+    async def test_handler_errors_do_not_stop_inbox(self):
+        self.message_handler.handle_message.side_effect = [ValueError(), None]
+        self.inbox.start(self.node_id)
+
+        await self.inbox.put(TopicMessage("topic", [0], {}))
+        await self.inbox.put(TopicMessage("topic", [1], {}))
+        await noop()
+
+        assert self.message_handler.handle_message.await_count == 2
+        await self.inbox.stop()
+
+
+class TestInProcessRegistry:
+    def setup_method(self):
+        self.node_id = NodeId("node")
+
+    @pytest.mark.asyncio
+    async def test_get_returns_None_for_inbox_on_other_event_loop(self):
+        registry = InProcessRegistry()
+        inbox = create_autospec(InProcessInbox)
+        inbox.loop = asyncio.new_event_loop()
+        registry.register(self.node_id, inbox)
+
+        try:
+            assert registry.get(self.node_id) is None
+        finally:
+            inbox.loop.close()
+
+    def test_unregister_ignores_other_inbox(self):
+        registry = InProcessRegistry()
+        inbox = create_autospec(InProcessInbox)
+        registry.register(self.node_id, inbox)
+
+        registry.unregister(self.node_id, create_autospec(InProcessInbox))
+
+        assert registry._inboxes == {self.node_id: inbox}
+
+
+class TestInProcessSender:
+    def setup_method(self):
+        self.registry = InProcessRegistry()
+        self.sender = InProcessSender(self.registry)
+
+        self.local_node = mock_node_spec("local")
+        self.remote_node = mock_node_spec("remote")
+
+        self.inbox = create_autospec(InProcessInbox)
+        self.inbox.accepts.side_effect = lambda topic: topic != "raw-topic"
+
+    @pytest.mark.asyncio
+    async def test_send_delivers_to_local_nodes_and_returns_others(self):
+        self.inbox.loop = asyncio.get_running_loop()
+        self.registry.register(self.local_node.id, self.inbox)
+
+        nodes = await self.sender.send(
+            [self.local_node, self.remote_node], "topic", ["arg"], {"key": "value"}
+        )
+
+        assert nodes == [self.remote_node]
+        self.inbox.put.assert_awaited_once_with(
+            TopicMessage("topic", ["arg"], {"key": "value"}), False
+        )
+
+    @pytest.mark.asyncio
+    async def test_send_copies_args_and_kwargs(self):
+        self.inbox.loop = asyncio.get_running_loop()
+        self.registry.register(self.local_node.id, self.inbox)
+        arg = ["mutable"]
+
+        await self.sender.send([self.local_node], "topic", [arg], {}, wait=True)
+
+        message, wait = self.inbox.put.await_args.args
+        assert message.args == [arg]
+        assert message.args[0] is not arg
+        assert wait is True
+
+    @pytest.mark.asyncio
+    async def test_send_without_copy_passes_objects_as_is(self):
+        self.sender.copy_messages = False
+        self.inbox.loop = asyncio.get_running_loop()
+        self.registry.register(self.local_node.id, self.inbox)
+        arg = ["mutable"]
+
+        await self.sender.send([self.local_node], "topic", [arg], {})
+
+        message, _ = self.inbox.put.await_args.args
+        assert message.args[0] is arg
+
+    @pytest.mark.asyncio
+    async def test_send_does_not_deliver_raw_topics(self):
+        self.inbox.loop = asyncio.get_running_loop()
+        self.registry.register(self.local_node.id, self.inbox)
+
+        nodes = await self.sender.send([self.local_node], "raw-topic", [], {})
+
+        assert nodes == [self.local_node]
+        self.inbox.put.assert_not_awaited()
@@ -0,0 +1,58 @@
+from unittest.mock import AsyncMock
+
+from rosy.node.topic.listenermanager import TopicListenerManager
+from rosy.node.topic.qos import TopicQoS
+
+
+class TestTopicListenerManager:
+    def setup_method(self):
+        self.manager = TopicListenerManager()
+        self.callback = AsyncMock()
+
+    def test_set_callback_is_not_raw_by_default(self):
+        self.manager.set_callback("topic", self.callback)
+
+        assert self.manager.get_callback("topic") is self.callback
+        assert self.manager.raw_topics == set()
+
+    def test_set_raw_callback(self):
+        self.manager.set_callback("topic", self.callback, raw=True)
+
+        assert self.manager.get_callback("topic") is self.callback
+        assert self.manager.raw_topics == {"topic"}
+
+    def test_replacing_raw_callback_with_normal_callback(self):
+        self.manager.set_callback("topic", self.callback, raw=True)
+        self.manager.set_callback("topic", self.callback)
+
+        assert self.manager.raw_topics == set()
+
+    def test_set_callback_with_qos(self):
+        qos = TopicQoS(maxsize=1)
+
+        self.manager.set_callback("topic", self.callback, qos=qos)
+        assert self.manager.topic_qos == {"topic": qos}
+
+        self.manager.set_callback("topic", self.callback)
+        assert self.manager.topic_qos == {}
+
+    def test_remove_callback(self):
+        self.manager.set_callback(
+            "topic", self.callback, raw=True, qos=TopicQoS(maxsize=1)
+        )
+
+        assert self.manager.remove_callback("topic") is self.callback
+        assert self.manager.keys == set()
+        assert self.manager.raw_topics == set()
+        assert self.manager.topic_qos == {}
+
+    def test_version_changes_when_callbacks_change(self):
+        versions = [self.manager.version]
+
+        self.manager.set_callback("topic", self.callback)
+        versions.append(self.manager.version)
+
+        self.manager.remove_callback("topic")
+        versions.append(self.manager.version)
+
+        assert len(set(versions)) == 3
@@ -1,10 +1,12 @@
+import asyncio
 from unittest.mock import AsyncMock, Mock
 
 import pytest
 
 from rosy.node.topic.listenermanager import TopicListenerManager
-from rosy.node.topic.messagehandler import TopicMessageHandler
-from rosy.node.topic.types import TopicMessage
+from rosy.node.topic.messagehandler import TopicCallbackTable, TopicMessageHandler
+from rosy.node.topic.qos import TopicQoS
+from rosy.node.topic.types import RawTopicMessage, TopicMessage
 from rosy.types import TopicCallback
 
 
@@ -13,6 +15,7 @@ class TestTopicMessageHandler:
         self.message = TopicMessage("topic", args=["arg"], kwargs={"key": "value"})
 
         self.listener_manager = Mock(TopicListenerManager)
+        self.listener_manager.topic_qos = {}
 
         self.handler = TopicMessageHandler(self.listener_manager)
 
@@ -30,3 +33,126 @@ class TestTopicMessageHandler:
         self.listener_manager.get_callback.return_value = None
 
         assert await self.handler.handle_message(self.message) is None
+
+    @pytest.mark.asyncio
+    async def test_handle_raw_message_calls_callback_with_payload(self):
+        callback = AsyncMock(TopicCallback)
+        self.listener_manager.get_callback.return_value = callback
+
+        message = RawTopicMessage("topic", b"payload", data_codec="msgpack")
+        assert await self.handler.handle_message(message) is None
+
+        callback.assert_awaited_once_with("topic", b"payload", "msgpack")
+
+    @pytest.mark.asyncio
+    async def test_handle_message_with_topic_id_uses_callback_table(self):
+        callback = AsyncMock(TopicCallback)
+        callback_table = Mock(TopicCallbackTable)
+        callback_table.get.return_value = callback
+
+        message = self.message._replace(topic_id=1)
+        assert await self.handler.handle_message(message, callback_table) is None
+
+        callback_table.get.assert_called_once_with(1, "topic")
+        self.listener_manager.get_callback.assert_not_called()
+        callback.assert_awaited_once_with("topic", "arg", key="value")
+
+    @pytest.mark.asyncio
+    async def test_handle_message_without_topic_id_ignores_callback_table(self):
+        callback = AsyncMock(TopicCallback)
+        self.listener_manager.get_callback.return_value = callback
+        callback_table = Mock(TopicCallbackTable)
+
+        assert await self.handler.handle_message(self.message, callback_table) is None
+
+        callback_table.get.assert_not_called()
+        callback.assert_awaited_once_with("topic", "arg", key="value")
+
+    def test_raw_topics(self):
+        self.listener_manager.raw_topics = {"topic"}
+
+        assert self.handler.raw_topics == {"topic"}
+
+
+class TestKeepLatestTopicMessageHandler:
+    def setup_method(self):
+        self.listener_manager = TopicListenerManager()
+        self.handler = TopicMessageHandler(self.listener_manager)
+
+        self.received = []
+        self.release = asyncio.Event()
+
+    async def slow_callback(self, topic, value):
+        self.received.append(value)
+        await self.release.wait()
+
+    @pytest.mark.asyncio
+    async def test_slow_listener_skips_to_latest_message(self):
+        self.listener_manager.set_callback(
+            "topic", self.slow_callback, qos=TopicQoS(keep_latest=True)
+        )
+
+        for value in range(100):
+            message = TopicMessage("topic", args=[value], kwargs={})
+            await asyncio.wait_for(self.handler.handle_message(message), 1)
+            await asyncio.sleep(0)
+
+        # The callback is still busy with the first message
+        assert self.received == [0]
+
+        self.release.set()
+        for _ in range(10):
+            await asyncio.sleep(0)
+
+        assert self.received == [0, 99]
+        assert not self.handler._latest_tasks
+
+    @pytest.mark.asyncio
+    async def test_slow_listener_without_keep_latest_gets_every_message(self):
+        self.listener_manager.set_callback("topic", self.slow_callback)
+        self.release.set()
+
+        for value in range(10):
+            message = TopicMessage("topic", args=[value], kwargs={})
+            await self.handler.handle_message(message)
+
+        assert self.received == list(range(10))
+
+
+class TestTopicCallbackTable:
+    def setup_method(self):
+        self.listener_manager = TopicListenerManager()
+        self.callback = AsyncMock(TopicCallback)
+        self.listener_manager.set_callback("topic", self.callback)
+
+        self.table = TopicCallbackTable(self.listener_manager)
+
+    def test_get_resolves_callback_once_per_topic_id(self):
+        self.listener_manager.get_callback = Mock(
+            wraps=self.listener_manager.get_callback
+        )
+
+        assert self.table.get(1, "topic") is self.callback
+        assert self.table.get(1, "topic") is self.callback
+
+        self.listener_manager.get_callback.assert_called_once_with("topic")
+
+    def test_get_without_listener_returns_None(self):
+        assert self.table.get(1, "other_topic") is None
+
+    def test_get_resolves_again_after_listeners_change(self):
+        assert self.table.get(1, "topic") is self.callback
+
+        new_callback = AsyncMock(TopicCallback)
+        self.listener_manager.set_callback("topic", new_callback)
+        assert self.table.get(1, "topic") is new_callback
+
+        self.listener_manager.remove_callback("topic")
+        assert self.table.get(1, "topic") is None
+
+    def test_get_resolves_again_when_topic_id_is_redefined(self):
+        other_callback = AsyncMock(TopicCallback)
+        self.listener_manager.set_callback("other_topic", other_callback)
+
+        assert self.table.get(1, "topic") is self.callback
+        assert self.table.get(1, "other_topic") is other_callback
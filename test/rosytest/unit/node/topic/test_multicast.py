@@ -0,0 +1,115 @@
+import asyncio
+import ipaddress
+
+import pytest
+
+from rosy.node.builder import build_node_message_codec_selector
+from rosy.node.topic.multicast import (
+    MulticastReceiver,
+    MulticastSender,
+    get_multicast_address,
+)
+from rosy.node.topic.types import TopicMessage
+from rosy.node.types import ConnectionHello
+from rosytest.util import mock_node_spec
+
+
+def test_get_multicast_address_is_deterministic():
+    assert get_multicast_address("domain", "topic") == get_multicast_address(
+        "domain", "topic"
+    )
+
+
+def test_get_multicast_address_depends_on_domain_and_topic():
+    address = get_multicast_address("domain", "topic")
+
+    assert get_multicast_address("other-domain", "topic") != address
+    assert get_multicast_address("domain", "other-topic") != address
+
+
+def test_get_multicast_address_is_site_local():
+    group, port = get_multicast_address("domain", "topic")
+
+    assert ipaddress.ip_address(group) in ipaddress.ip_network("239.255.0.0/16")
+    assert 20000 <= port < 30000
+
+
+class TestMulticast:
+    def setup_method(self):
+        self.codec_selector = build_node_message_codec_selector(
+            2, "pickle", ["msgpack", "pickle"]
+        )
+        self.node = mock_node_spec("node")
+        self.node.data_codecs = ("pickle",)
+
+        self.datagrams = asyncio.Queue()
+        self.sender = MulticastSender("domain", interface="127.0.0.1")
+        self.receiver = MulticastReceiver(
+            "domain", self.datagram_received, interface="127.0.0.1"
+        )
+
+    async def datagram_received(self, data: bytes, topic: str) -> None:
+        await self.datagrams.put((data, topic))
+
+    async def send(self, topic, *args, **kwargs) -> bool:
+        data_codec, codec = self.codec_selector.select(self.node)
+        body = await codec.encode_topic_message_body(args, kwargs)
+        return await self.sender.send(topic, data_codec, codec, body)
+
+    def decode_datagram(self, datagram: bytes) -> list:
+        _, codec = self.codec_selector.select(self.node)
+
+        frames = []
+        data = memoryview(datagram)
+        while data:
+            frame_len = int.from_bytes(data[:4], "little")
+            frames.append(
+                codec.decode_topic_message_or_service_request_from(
+                    data[4 : 4 + frame_len]
+                )
+            )
+            data = data[4 + frame_len :]
+
+        return frames
+
+    @pytest.mark.asyncio
+    async def test_join_and_leave(self):
+        await self.receiver.join("topic")
+        await self.receiver.join("topic")
+        assert self.receiver.topics == {"topic"}
+
+        await self.receiver.leave("topic")
+        await self.receiver.leave("topic")
+        assert self.receiver.topics == set()
+
+    @pytest.mark.asyncio
+    async def test_close_leaves_every_topic(self):
+        await self.receiver.join("topic0")
+        await self.receiver.join("topic1")
+
+        await self.receiver.close()
+
+        assert self.receiver.topics == set()
+
+    @pytest.mark.asyncio
+    async def test_send_is_received_by_joined_receiver(self):
+        await self.receiver.join("topic")
+        try:
+            assert await self.send("topic", "arg", key="value") is True
+
+            datagram, topic = await asyncio.wait_for(self.datagrams.get(), 1)
+        finally:
+            self.sender.close()
+            await self.receiver.close()
+
+        assert topic == "topic"
+        assert self.decode_datagram(datagram) == [
+            ConnectionHello("pickle"),
+            TopicMessage("topic", ["arg"], {"key": "value"}),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_send_returns_False_if_message_does_not_fit_in_a_datagram(self):
+        self.sender.max_size = 100
+
+        assert await self.send("topic", "x" * 100) is False
@@ -1,19 +1,35 @@
 import asyncio
-from unittest.mock import AsyncMock, Mock, create_autospec, patch
+from unittest.mock import AsyncMock, Mock, call, create_autospec, patch
 
 import pytest
 
 from rosy.asyncio import LockableWriter
+from rosy.codec import oob_pickle_codec
+from rosy.node.builder import build_node_message_codec
+from rosy.node.codec import (
+    TOPIC_IDS_FEATURE,
+    NodeMessageCodec,
+    NodeMessageCodecSelector,
+)
 from rosy.node.peer.connection import PeerConnectionManager
-from rosy.node.topic.outbox import NodeOutbox, NodeOutboxManager
+from rosy.node.topic.outbox import (
+    NodeOutbox,
+    NodeOutboxManager,
+    TopicMessageDroppedError,
+)
+from rosy.node.topic.qos import TopicQoS
 from rosytest.util import mock_node_spec
 
 
 class TestNodeOutboxManager:
     def setup_method(self) -> None:
         self.connection_manager = AsyncMock(spec=PeerConnectionManager)
+        self.node_message_codec = AsyncMock(spec=NodeMessageCodec)
 
-        self.outbox_manager = NodeOutboxManager(self.connection_manager)
+        self.outbox_manager = NodeOutboxManager(
+            self.connection_manager,
+            NodeMessageCodecSelector(self.node_message_codec),
+        )
 
     @pytest.mark.asyncio
     async def test_get_new_outbox(self):
@@ -23,6 +39,7 @@ class TestNodeOutboxManager:
 
         assert outbox.node is node
         assert outbox.connection_manager is self.connection_manager
+        assert outbox.node_message_codec is self.node_message_codec
 
     @pytest.mark.asyncio
     async def test_get_existing_outbox(self):
@@ -45,6 +62,38 @@ class TestNodeOutboxManager:
         assert outbox0.node is node0
         assert outbox1.node is node1
 
+    @pytest.mark.asyncio
+    async def test_get_outbox_per_priority(self):
+        node = mock_node_spec()
+
+        normal = self.outbox_manager.get_outbox(node)
+        high = self.outbox_manager.get_outbox(node, "high")
+
+        assert normal is not high
+        assert normal.priority == "normal"
+        assert high.priority == "high"
+        assert self.outbox_manager.get_outbox(node, "high") is high
+
+    @pytest.mark.asyncio
+    @patch("rosy.node.topic.outbox.NodeOutbox")
+    async def test_stop_outbox_stops_outboxes_of_every_priority(self, NodeOutbox):
+        node = mock_node_spec()
+        other_node = mock_node_spec()
+
+        outboxes = [AsyncMock(), AsyncMock(), AsyncMock()]
+        NodeOutbox.side_effect = outboxes
+
+        self.outbox_manager.get_outbox(node)
+        self.outbox_manager.get_outbox(node, "low")
+        self.outbox_manager.get_outbox(other_node)
+
+        await self.outbox_manager.stop_outbox(node)
+
+        outboxes[0].stop.assert_awaited_once()
+        outboxes[1].stop.assert_awaited_once()
+        outboxes[2].stop.assert_not_awaited()
+        assert self.outbox_manager.get_outbox(other_node) is outboxes[2]
+
     @pytest.mark.asyncio
     @patch("rosy.node.topic.outbox.NodeOutbox")
     async def test_stop_outbox(self, NodeOutbox):
@@ -72,6 +121,7 @@ class TestNodeOutboxManager:
 class TestNodeOutbox:
     def setup_method(self) -> None:
         self.node = mock_node_spec()
+        self.node.features = frozenset({TOPIC_IDS_FEATURE})
 
         self.writer = create_autospec(LockableWriter)
         self.writer.__aenter__.return_value = self.writer
@@ -79,54 +129,353 @@ class TestNodeOutbox:
         self.connection_manager = AsyncMock(spec=PeerConnectionManager)
         self.connection_manager.get_connection.return_value.writer = self.writer
 
-    def get_outbox(self, ttl: float = None, maxsize: int = None):
-        kwargs = {}
-        if ttl is not None:
-            kwargs["ttl"] = ttl
-        if maxsize is not None:
-            kwargs["maxsize"] = maxsize
+        self.node_message_codec = AsyncMock(spec=NodeMessageCodec)
+        self.node_message_codec.encode_topic_message_frame.side_effect = (
+            lambda topic_id, topic, body: [(topic_id, topic, body)]
+        )
+
+    def get_outbox(self, **kwargs):
+        return NodeOutbox(
+            self.node,
+            self.connection_manager,
+            self.node_message_codec,
+            **kwargs,
+        )
+
+    async def wait_until_idle(self, outbox: NodeOutbox) -> None:
+        """
+        Waits until the outbox has sent or dropped every queued message, and
+        is waiting for more.
+        """
 
-        return NodeOutbox(self.node, self.connection_manager, **kwargs)
+        async def idle():
+            while outbox._messages or outbox._not_empty.is_set():
+                await asyncio.sleep(0)
+
+        await asyncio.wait_for(idle(), timeout=1)
 
     @pytest.mark.asyncio
     async def test_defaults(self):
         outbox = self.get_outbox()
-        assert outbox.ttl == 5
-        assert outbox._queue.maxsize == 100
+        assert outbox.max_batch_size == 100
+        assert outbox.max_batch_bytes == 1024 * 1024
+        assert outbox.linger == 0
 
     @pytest.mark.asyncio
     async def test_send(self):
         outbox = self.get_outbox()
 
-        assert outbox.send(b"data") is None
+        assert await outbox.send("topic", [b"data"]) is None
 
-        await asyncio.wait_for(outbox._queue.join(), timeout=1)
-        self.connection_manager.get_connection.assert_awaited_once_with(self.node)
-        self.writer.write.assert_called_once_with(b"data")
+        await self.wait_until_idle(outbox)
+        self.connection_manager.get_connection.assert_awaited_once_with(
+            self.node, "normal"
+        )
+        self.writer.writelines.assert_called_once_with([(0, "topic", [b"data"])])
         self.writer.drain.assert_awaited_once()
 
     @pytest.mark.asyncio
-    async def test_send_skips_expired_messages(self):
-        # ttl=0 forces all messages to expire
-        outbox = self.get_outbox(ttl=0)
+    async def test_large_buffers_are_written_without_being_copied(self):
+        codec = build_node_message_codec(
+            request_id_bytes=2, data_codec=oob_pickle_codec
+        )
+        outbox = NodeOutbox(self.node, self.connection_manager, codec)
+
+        data = bytearray(b"x" * 10_000)
+        body = await codec.encode_topic_message_body([memoryview(data)], {})
+        [large_segment] = [segment for segment in body if len(segment) == len(data)]
+
+        await outbox.send("topic", body)
+        await self.wait_until_idle(outbox)
+
+        [written] = self.writer.writelines.call_args.args
+        assert any(segment is large_segment for segment in written)
+
+        data[:1] = b"y"
+        assert large_segment[:1] == b"y"
+
+    @pytest.mark.asyncio
+    async def test_send_uses_connection_for_priority(self):
+        outbox = self.get_outbox(priority="high")
+
+        await outbox.send("topic", [b"data"], TopicQoS(priority="high"))
+
+        await self.wait_until_idle(outbox)
+        self.connection_manager.get_connection.assert_awaited_once_with(
+            self.node, "high"
+        )
+
+    @pytest.mark.asyncio
+    async def test_send_defines_topic_ids_once_per_topic(self):
+        outbox = self.get_outbox()
+
+        await outbox.send("topic0", [b"data0"])
+        await outbox.send("topic1", [b"data1"])
+        await outbox.send("topic0", [b"data2"])
+        await outbox.send("topic1", [b"data3"])
+
+        await self.wait_until_idle(outbox)
+        self.writer.writelines.assert_called_once_with(
+            [
+                (0, "topic0", [b"data0"]),
+                (1, "topic1", [b"data1"]),
+                (0, None, [b"data2"]),
+                (1, None, [b"data3"]),
+            ]
+        )
+        self.writer.drain.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_send_redefines_topic_ids_on_new_connection(self):
+        outbox = self.get_outbox()
+
+        await outbox.send("topic", [b"data0"])
+        await self.wait_until_idle(outbox)
+
+        new_writer = create_autospec(LockableWriter)
+        new_writer.__aenter__.return_value = new_writer
+        self.connection_manager.get_connection.return_value.writer = new_writer
+
+        await outbox.send("topic", [b"data1"])
+        await self.wait_until_idle(outbox)
+
+        self.writer.writelines.assert_called_once_with([(0, "topic", [b"data0"])])
+        new_writer.writelines.assert_called_once_with([(0, "topic", [b"data1"])])
+
+    @pytest.mark.asyncio
+    async def test_send_without_topic_ids_feature_sends_topic_names(self):
+        self.node.features = frozenset()
+        outbox = self.get_outbox()
 
-        assert outbox.send(b"data") is None
+        await outbox.send("topic", [b"data0"])
+        await outbox.send("topic", [b"data1"])
 
-        await asyncio.wait_for(outbox._queue.join(), timeout=1)
-        self.writer.write.assert_not_called()
+        await self.wait_until_idle(outbox)
+        self.writer.writelines.assert_called_once_with(
+            [
+                (None, "topic", [b"data0"]),
+                (None, "topic", [b"data1"]),
+            ]
+        )
+
+    @patch("rosy.node.topic.outbox.loop_time")
+    @pytest.mark.asyncio
+    async def test_send_skips_expired_messages(self, loop_time_mock):
+        outbox = self.get_outbox()
+
+        loop_time_mock.return_value = 0
+        assert await outbox.send("topic", [b"data"], TopicQoS(ttl=1)) is None
+        loop_time_mock.return_value = 1
+
+        await self.wait_until_idle(outbox)
+        self.writer.writelines.assert_not_called()
         self.writer.drain.assert_not_awaited()
 
     @pytest.mark.asyncio
     async def test_send_drops_oldest_message_when_queue_is_full(self):
-        outbox = self.get_outbox(maxsize=1)
+        outbox = self.get_outbox()
+        qos = TopicQoS(maxsize=1)
 
-        outbox.send(b"data1")  # This will be dropped
-        outbox.send(b"data2")
+        await outbox.send("topic", [b"data1"], qos)  # This will be dropped
+        await outbox.send("topic", [b"data2"], qos)
 
-        await asyncio.wait_for(outbox._queue.join(), timeout=1)
-        self.writer.write.assert_called_once_with(b"data2")
+        await self.wait_until_idle(outbox)
+        self.writer.writelines.assert_called_once_with([(0, "topic", [b"data2"])])
         self.writer.drain.assert_awaited_once()
 
+    @pytest.mark.asyncio
+    async def test_send_drops_newest_message_when_queue_is_full(self):
+        outbox = self.get_outbox()
+        qos = TopicQoS(maxsize=1, overflow="drop-newest")
+
+        await outbox.send("topic", [b"data1"], qos)
+        await outbox.send("topic", [b"data2"], qos)  # This will be dropped
+
+        await self.wait_until_idle(outbox)
+        self.writer.writelines.assert_called_once_with([(0, "topic", [b"data1"])])
+
+    @pytest.mark.asyncio
+    async def test_send_blocks_when_queue_is_full(self):
+        outbox = self.get_outbox()
+        qos = TopicQoS(maxsize=1, overflow="block")
+
+        await outbox.send("topic", [b"data1"], qos)
+        await asyncio.wait_for(outbox.send("topic", [b"data2"], qos), timeout=1)
+
+        await self.wait_until_idle(outbox)
+        assert self.writer.writelines.call_args_list == [
+            call([(0, "topic", [b"data1"])]),
+            call([(0, None, [b"data2"])]),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_stop_wakes_blocked_senders(self):
+        outbox = self.get_outbox()
+        qos = TopicQoS(maxsize=1, overflow="block")
+
+        async def get_connection_forever(node, priority):
+            await asyncio.Event().wait()
+
+        self.connection_manager.get_connection.side_effect = get_connection_forever
+
+        await outbox.send("topic", [b"data1"], qos)
+        await outbox.send("topic", [b"data2"], qos)
+        blocked_send = asyncio.create_task(outbox.send("topic", [b"data3"], qos))
+        await asyncio.sleep(0.01)
+        assert not blocked_send.done()
+
+        await outbox.stop()
+
+        with pytest.raises(TopicMessageDroppedError, match="Outbox was stopped"):
+            await asyncio.wait_for(blocked_send, timeout=1)
+
+    @pytest.mark.asyncio
+    async def test_stop_drops_blocked_send_and_wait(self):
+        outbox = self.get_outbox()
+        qos = TopicQoS(maxsize=1, overflow="block")
+
+        async def get_connection_forever(node, priority):
+            await asyncio.Event().wait()
+
+        self.connection_manager.get_connection.side_effect = get_connection_forever
+
+        await outbox.send("topic", [b"data1"], qos)
+        await outbox.send("topic", [b"data2"], qos)
+        blocked_send = asyncio.create_task(
+            outbox.send_and_wait("topic", [b"data3"], qos)
+        )
+        await asyncio.sleep(0.01)
+        assert not blocked_send.done()
+
+        await outbox.stop()
+
+        with pytest.raises(TopicMessageDroppedError, match="Outbox was stopped"):
+            await asyncio.wait_for(blocked_send, timeout=1)
+
+    @pytest.mark.asyncio
+    async def test_send_limits_queued_bytes(self):
+        outbox = self.get_outbox()
+        qos = TopicQoS(max_bytes=8)
+
+        await outbox.send("topic", [b"0123456789"], qos)  # Too big, but queue empty
+        await outbox.send("topic", [b"abcd"], qos)  # Drops the first message
+        await outbox.send("topic", [b"efgh"], qos)
+
+        await self.wait_until_idle(outbox)
+        self.writer.writelines.assert_called_once_with(
+            [(0, "topic", [b"abcd"]), (0, None, [b"efgh"])]
+        )
+
+    @pytest.mark.asyncio
+    async def test_send_keep_latest_replaces_queued_message_in_place(self):
+        outbox = self.get_outbox()
+        qos = TopicQoS(keep_latest=True)
+
+        await outbox.send("state", [b"state0"], qos)
+        await outbox.send("event", [b"event0"])
+        await outbox.send("state", [b"state1"], qos)
+        await outbox.send("state", [b"state2"], qos)
+
+        await self.wait_until_idle(outbox)
+        self.writer.writelines.assert_called_once_with(
+            [(0, "state", [b"state2"]), (1, "event", [b"event0"])]
+        )
+
+    @pytest.mark.asyncio
+    async def test_send_keep_latest_drops_extra_queued_messages(self):
+        outbox = self.get_outbox()
+
+        await outbox.send("state", [b"state0"])
+        await outbox.send("state", [b"state1"])
+        await outbox.send("state", [b"state2"], TopicQoS(keep_latest=True))
+
+        await self.wait_until_idle(outbox)
+        self.writer.writelines.assert_called_once_with([(0, "state", [b"state2"])])
+
+    @pytest.mark.asyncio
+    async def test_send_keep_latest_queues_message_after_previous_was_taken(self):
+        outbox = self.get_outbox()
+        qos = TopicQoS(keep_latest=True)
+
+        await outbox.send("state", [b"state0"], qos)
+        await self.wait_until_idle(outbox)
+        await outbox.send("state", [b"state1"], qos)
+        await self.wait_until_idle(outbox)
+
+        assert self.writer.writelines.call_args_list == [
+            call([(0, "state", [b"state0"])]),
+            call([(0, None, [b"state1"])]),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_queue_limits_are_per_topic(self):
+        outbox = self.get_outbox()
+        qos = TopicQoS(maxsize=1)
+
+        await outbox.send("topic0", [b"data0"], qos)
+        await outbox.send("topic1", [b"data1"], qos)
+
+        await self.wait_until_idle(outbox)
+        self.writer.writelines.assert_called_once_with(
+            [(0, "topic0", [b"data0"]), (1, "topic1", [b"data1"])]
+        )
+
+    @pytest.mark.asyncio
+    async def test_send_splits_batches_at_max_batch_size(self):
+        outbox = self.get_outbox(max_batch_size=2)
+
+        for i in range(3):
+            await outbox.send("topic", [b"data%d" % i])
+
+        await self.wait_until_idle(outbox)
+        assert self.writer.writelines.call_args_list == [
+            call([(0, "topic", [b"data0"]), (0, None, [b"data1"])]),
+            call([(0, None, [b"data2"])]),
+        ]
+        assert self.writer.drain.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_send_splits_batches_at_max_batch_bytes(self):
+        outbox = self.get_outbox(max_batch_bytes=10)
+
+        await outbox.send("topic", [b"0123456789"])
+        await outbox.send("topic", [b"a"])
+        await outbox.send("topic", [b"b"])
+
+        await self.wait_until_idle(outbox)
+        assert self.writer.writelines.call_args_list == [
+            call([(0, "topic", [b"0123456789"])]),
+            call([(0, None, [b"a"]), (0, None, [b"b"])]),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_send_with_linger_batches_messages_sent_soon_after(self):
+        outbox = self.get_outbox(linger=0.05)
+
+        await outbox.send("topic", [b"data0"])
+        await asyncio.sleep(0.01)
+        await outbox.send("topic", [b"data1"])
+
+        await self.wait_until_idle(outbox)
+        self.writer.writelines.assert_called_once_with(
+            [(0, "topic", [b"data0"]), (0, None, [b"data1"])]
+        )
+
+    @pytest.mark.asyncio
+    async def test_send_redefines_topic_ids_after_failed_write(self):
+        outbox = self.get_outbox()
+        self.writer.writelines.side_effect = [ConnectionError(), None]
+
+        await outbox.send("topic", [b"data0"])
+        await self.wait_until_idle(outbox)
+        await outbox.send("topic", [b"data1"])
+        await self.wait_until_idle(outbox)
+
+        assert self.writer.writelines.call_args_list == [
+            call([(0, "topic", [b"data0"])]),
+            call([(0, "topic", [b"data1"])]),
+        ]
+
     @pytest.mark.asyncio
     async def test_send_keeps_working_when_exception_occurs(self):
         outbox = self.get_outbox()
@@ -138,22 +487,101 @@ class TestNodeOutbox:
             connection,
         ]
 
-        outbox.send(b"data1")  # ConnectionError will cause this to be skipped
-        outbox.send(b"data2")
+        await outbox.send(
+            "topic", [b"data1"]
+        )  # ConnectionError will cause this to be skipped
+        await self.wait_until_idle(outbox)
+        await outbox.send("topic", [b"data2"])
 
-        await asyncio.wait_for(outbox._queue.join(), timeout=1)
+        await self.wait_until_idle(outbox)
         assert self.connection_manager.get_connection.await_count == 2
-        self.writer.write.assert_called_once_with(b"data2")
+        self.writer.writelines.assert_called_once_with([(0, "topic", [b"data2"])])
+        self.writer.drain.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_send_and_wait_returns_once_message_is_drained(self):
+        outbox = self.get_outbox()
+
+        assert (
+            await asyncio.wait_for(outbox.send_and_wait("topic", [b"data"]), 1) is None
+        )
+
+        self.writer.writelines.assert_called_once_with([(0, "topic", [b"data"])])
         self.writer.drain.assert_awaited_once()
 
+    @pytest.mark.asyncio
+    async def test_send_and_wait_waits_for_room_instead_of_dropping(self):
+        outbox = self.get_outbox()
+        qos = TopicQoS(maxsize=1)
+
+        await outbox.send("topic", [b"data1"], qos)
+        await asyncio.wait_for(outbox.send_and_wait("topic", [b"data2"], qos), 1)
+
+        assert self.writer.writelines.call_args_list == [
+            call([(0, "topic", [b"data1"])]),
+            call([(0, None, [b"data2"])]),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_send_and_wait_raises_write_error(self):
+        outbox = self.get_outbox()
+        self.writer.drain.side_effect = ConnectionError()
+
+        with pytest.raises(ConnectionError):
+            await asyncio.wait_for(outbox.send_and_wait("topic", [b"data"]), 1)
+
+    @pytest.mark.asyncio
+    async def test_send_and_wait_raises_error_when_message_is_replaced(self):
+        outbox = self.get_outbox()
+        qos = TopicQoS(keep_latest=True)
+
+        async def get_connection_forever(node, priority):
+            await asyncio.Event().wait()
+
+        self.connection_manager.get_connection.side_effect = get_connection_forever
+
+        await outbox.send("topic", [b"data0"], qos)
+        await asyncio.sleep(0.01)  # data0 is taken to be sent
+        waiting_send = asyncio.create_task(
+            outbox.send_and_wait("topic", [b"data1"], qos)
+        )
+        await asyncio.sleep(0.01)
+        await outbox.send("topic", [b"data2"], qos)
+
+        with pytest.raises(TopicMessageDroppedError):
+            await asyncio.wait_for(waiting_send, timeout=1)
+
+        await outbox.stop()
+
+    @pytest.mark.asyncio
+    async def test_stop_fails_waiting_senders(self):
+        outbox = self.get_outbox()
+
+        async def get_connection_forever(node, priority):
+            await asyncio.Event().wait()
+
+        self.connection_manager.get_connection.side_effect = get_connection_forever
+
+        in_flight_send = asyncio.create_task(outbox.send_and_wait("topic", [b"data0"]))
+        await asyncio.sleep(0.01)
+        queued_send = asyncio.create_task(outbox.send_and_wait("topic", [b"data1"]))
+        await asyncio.sleep(0.01)
+
+        await outbox.stop()
+
+        with pytest.raises(TopicMessageDroppedError):
+            await asyncio.wait_for(in_flight_send, timeout=1)
+        with pytest.raises(TopicMessageDroppedError):
+            await asyncio.wait_for(queued_send, timeout=1)
+
     @pytest.mark.asyncio
     async def test_stop(self):
         outbox = self.get_outbox()
         await outbox.stop()
 
         with pytest.raises(RuntimeError):
-            outbox.send(b"data")
+            await outbox.send("topic", [b"data"])
 
         self.connection_manager.get_connection.assert_not_awaited()
-        self.writer.write.assert_not_called()
+        self.writer.writelines.assert_not_called()
         self.writer.drain.assert_not_awaited()
@@ -0,0 +1,69 @@
+import pytest
+
+from rosy.node.topic.qos import TopicQoS, TopicQoSManager
+from rosytest.util import mock_node_spec
+
+
+class TestTopicQoS:
+    def test_defaults(self):
+        qos = TopicQoS()
+
+        assert qos.maxsize == 100
+        assert qos.max_bytes is None
+        assert qos.ttl == 5
+        assert qos.overflow == "drop-oldest"
+        assert qos.keep_latest is False
+        assert qos.priority == "normal"
+        assert qos.best_effort is False
+        assert qos.multicast is False
+
+    @pytest.mark.parametrize(
+        "kwargs",
+        [
+            dict(maxsize=0),
+            dict(max_bytes=0),
+            dict(ttl=0),
+            dict(overflow="invalid"),
+            dict(priority="urgent"),
+        ],
+    )
+    def test_invalid_values_raise_ValueError(self, kwargs):
+        with pytest.raises(ValueError):
+            TopicQoS(**kwargs)
+
+
+class TestTopicQoSManager:
+    def setup_method(self):
+        self.default = TopicQoS(maxsize=10)
+        self.manager = TopicQoSManager(
+            self.default,
+            {"sender_topic": TopicQoS(maxsize=1)},
+        )
+
+        self.node = mock_node_spec()
+        self.node.topic_qos = {
+            "sender_topic": TopicQoS(maxsize=2),
+            "listener_topic": TopicQoS(maxsize=3),
+        }
+
+    def test_default_default_qos(self):
+        assert TopicQoSManager().default == TopicQoS()
+
+    def test_get_qos_prefers_sender_qos(self):
+        assert self.manager.get_qos("sender_topic", self.node) == TopicQoS(maxsize=1)
+
+    def test_get_qos_uses_listener_qos_if_sender_qos_not_set(self):
+        qos = self.manager.get_qos("listener_topic", self.node)
+        assert qos == TopicQoS(maxsize=3)
+
+    def test_get_qos_uses_default_qos_if_not_set(self):
+        assert self.manager.get_qos("other_topic", self.node) is self.default
+
+    def test_set_qos(self):
+        self.manager.set_qos("listener_topic", TopicQoS(maxsize=4))
+        qos = self.manager.get_qos("listener_topic", self.node)
+        assert qos == TopicQoS(maxsize=4)
+
+        self.manager.set_qos("listener_topic", None)
+        qos = self.manager.get_qos("listener_topic", self.node)
+        assert qos == TopicQoS(maxsize=3)
@@ -1,15 +1,23 @@
-from unittest.mock import AsyncMock, Mock
+from unittest.mock import AsyncMock, call, create_autospec
 
 import pytest
 
 from rosy.asyncio import LockableWriter
-from rosy.node.codec import NodeMessageCodec
+from rosy.node.codec import NodeMessageCodec, NodeMessageCodecSelector
 from rosy.node.peer.connection import PeerConnection
 from rosy.node.peer.selector import PeerSelector
-from rosy.node.topic.outbox import NodeOutbox, NodeOutboxManager
+from rosy.node.topic.datagram import DatagramSender
+from rosy.node.topic.inprocess import InProcessSender
+from rosy.node.topic.multicast import MulticastSender
+from rosy.node.topic.outbox import (
+    NodeOutbox,
+    NodeOutboxManager,
+    TopicMessageDroppedError,
+)
+from rosy.node.topic.qos import TopicQoS, TopicQoSManager
 from rosy.node.topic.sender import TopicSender
 from rosy.node.topic.types import TopicMessage
-from rosy.specs import MeshNodeSpec
+from rosytest.util import mock_node_spec
 
 
 class TestTopicSender:
@@ -19,32 +27,35 @@ class TestTopicSender:
         self.connection.writer.__aenter__.return_value = self.connection.writer
 
         self.nodes = [
-            Mock(spec=MeshNodeSpec),
-            Mock(spec=MeshNodeSpec),
+            mock_node_spec("node0"),
+            mock_node_spec("node1"),
         ]
 
         self.peer_selector = AsyncMock(spec=PeerSelector)
         self.peer_selector.get_nodes_for_topic.return_value = self.nodes
 
-        self.encoded_data = b"encoded data"
+        self.encoded_body = [b"encoded body"]
         self.node_message_codec = AsyncMock(spec=NodeMessageCodec)
-        self.node_message_codec.encode_topic_message.return_value = self.encoded_data
+        self.node_message_codec.encode_topic_message_body.return_value = (
+            self.encoded_body
+        )
 
         self.outboxes = [
             AsyncMock(spec=NodeOutbox),
             AsyncMock(spec=NodeOutbox),
         ]
         self.outbox_manager = AsyncMock(spec=NodeOutboxManager)
-        self.outbox_manager.get_outbox.side_effect = lambda n: {
+        self.outbox_manager.get_outbox.side_effect = lambda n, priority: {
             self.nodes[0]: self.outboxes[0],
             self.nodes[1]: self.outboxes[1],
         }[n]
 
         self.topic_sender = TopicSender(
             self.peer_selector,
-            self.node_message_codec,
+            NodeMessageCodecSelector(self.node_message_codec),
             self.outbox_manager,
         )
+        self.qos = self.topic_sender.qos_manager.default
 
     @pytest.mark.asyncio
     async def test_send(self):
@@ -53,11 +64,17 @@ class TestTopicSender:
         await self.topic_sender.send(message.topic, message.args, message.kwargs)
 
         self.peer_selector.get_nodes_for_topic.assert_called_once_with(message.topic)
-        self.node_message_codec.encode_topic_message.assert_awaited_once_with(message)
+        self.node_message_codec.encode_topic_message_body.assert_awaited_once_with(
+            message.args, message.kwargs
+        )
 
         assert self.outbox_manager.get_outbox.call_count == 2
-        self.outboxes[0].send.assert_called_once_with(self.encoded_data)
-        self.outboxes[1].send.assert_called_once_with(self.encoded_data)
+        self.outboxes[0].send.assert_awaited_once_with(
+            "topic", self.encoded_body, self.qos
+        )
+        self.outboxes[1].send.assert_awaited_once_with(
+            "topic", self.encoded_body, self.qos
+        )
 
     @pytest.mark.asyncio
     async def test_send_with_no_listening_nodes(self):
@@ -68,7 +85,272 @@ class TestTopicSender:
         await self.topic_sender.send(message.topic, message.args, message.kwargs)
 
         self.peer_selector.get_nodes_for_topic.assert_called_once_with(message.topic)
-        self.node_message_codec.encode_topic_message.assert_not_awaited()
+        self.node_message_codec.encode_topic_message_body.assert_not_awaited()
+        self.outbox_manager.get_outbox.assert_not_called()
+        self.outboxes[0].send.assert_not_awaited()
+        self.outboxes[1].send.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_send_encodes_message_once_per_negotiated_codec(self):
+        msgpack_codec = AsyncMock(spec=NodeMessageCodec)
+        msgpack_codec.encode_topic_message_body.return_value = [b"msgpack body"]
+
+        self.topic_sender.codec_selector = NodeMessageCodecSelector(
+            self.node_message_codec,
+            {"msgpack": msgpack_codec},
+        )
+        self.nodes[0].data_codecs = ()
+        self.nodes[1].data_codecs = ("msgpack",)
+
+        await self.topic_sender.send("topic", ["arg"], {})
+
+        self.node_message_codec.encode_topic_message_body.assert_awaited_once()
+        msgpack_codec.encode_topic_message_body.assert_awaited_once()
+        self.outboxes[0].send.assert_awaited_once_with(
+            "topic", self.encoded_body, self.qos
+        )
+        self.outboxes[1].send.assert_awaited_once_with(
+            "topic", [b"msgpack body"], self.qos
+        )
+
+    @pytest.mark.asyncio
+    async def test_send_skips_nodes_without_common_codec(self):
+        self.topic_sender.codec_selector = NodeMessageCodecSelector(
+            self.node_message_codec,
+            {"pickle": self.node_message_codec},
+        )
+        self.nodes[0].data_codecs = ("json",)
+        self.nodes[1].data_codecs = ("pickle",)
+
+        await self.topic_sender.send("topic", ["arg"], {})
+
+        self.outboxes[0].send.assert_not_awaited()
+        self.outboxes[1].send.assert_awaited_once_with(
+            "topic", self.encoded_body, self.qos
+        )
+
+    @pytest.mark.asyncio
+    async def test_send_raw_sends_payload_without_encoding(self):
+        await self.topic_sender.send_raw("topic", b"payload")
+
+        self.peer_selector.get_nodes_for_topic.assert_called_once_with("topic")
+        self.node_message_codec.encode_topic_message_body.assert_not_awaited()
+        self.outboxes[0].send.assert_awaited_once_with("topic", [b"payload"], self.qos)
+        self.outboxes[1].send.assert_awaited_once_with("topic", [b"payload"], self.qos)
+
+    @pytest.mark.asyncio
+    async def test_send_raw_skips_nodes_using_another_codec(self):
+        msgpack_codec = AsyncMock(spec=NodeMessageCodec)
+        self.topic_sender.codec_selector = NodeMessageCodecSelector(
+            self.node_message_codec,
+            {"pickle": self.node_message_codec, "msgpack": msgpack_codec},
+        )
+        # No codec in common, and a codec other than the payload's
+        self.nodes[0].data_codecs = ("json",)
+        self.nodes[1].data_codecs = ("msgpack",)
+
+        await self.topic_sender.send_raw("topic", b"payload")
+
         self.outbox_manager.get_outbox.assert_not_called()
-        self.outboxes[0].send.assert_not_called()
-        self.outboxes[1].send.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_send_raw_with_data_codec(self):
+        msgpack_codec = AsyncMock(spec=NodeMessageCodec)
+        self.topic_sender.codec_selector = NodeMessageCodecSelector(
+            self.node_message_codec,
+            {"pickle": self.node_message_codec, "msgpack": msgpack_codec},
+        )
+        self.nodes[0].data_codecs = ("pickle",)
+        self.nodes[1].data_codecs = ("msgpack",)
+
+        await self.topic_sender.send_raw("topic", b"payload", data_codec="msgpack")
+
+        self.outboxes[0].send.assert_not_awaited()
+        self.outboxes[1].send.assert_awaited_once_with("topic", [b"payload"], self.qos)
+
+    @pytest.mark.asyncio
+    async def test_send_with_wait_waits_for_each_node(self):
+        await self.topic_sender.send("topic", ["arg"], {}, wait=True)
+
+        for outbox in self.outboxes:
+            outbox.send.assert_not_awaited()
+            outbox.send_and_wait.assert_awaited_once_with(
+                "topic", self.encoded_body, self.qos
+            )
+
+    @pytest.mark.asyncio
+    async def test_send_with_wait_raises_error_from_any_node(self):
+        self.outboxes[1].send_and_wait.side_effect = TopicMessageDroppedError()
+
+        with pytest.raises(TopicMessageDroppedError):
+            await self.topic_sender.send("topic", ["arg"], {}, wait=True)
+
+        self.outboxes[0].send_and_wait.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_send_raw_with_wait(self):
+        await self.topic_sender.send_raw("topic", b"payload", wait=True)
+
+        for outbox in self.outboxes:
+            outbox.send_and_wait.assert_awaited_once_with(
+                "topic", [b"payload"], self.qos
+            )
+
+    @pytest.mark.asyncio
+    async def test_send_uses_qos_for_each_node(self):
+        listener_qos = TopicQoS(maxsize=1)
+        self.nodes[1].topic_qos = {"topic": listener_qos}
+
+        await self.topic_sender.send("topic", ["arg"], {})
+
+        self.outboxes[0].send.assert_awaited_once_with(
+            "topic", self.encoded_body, self.qos
+        )
+        self.outboxes[1].send.assert_awaited_once_with(
+            "topic", self.encoded_body, listener_qos
+        )
+
+    @pytest.mark.asyncio
+    async def test_send_uses_outbox_for_qos_priority(self):
+        qos = TopicQoS(priority="high")
+        self.topic_sender.qos_manager.set_qos("topic", qos)
+
+        await self.topic_sender.send("topic", ["arg"], {})
+
+        self.outbox_manager.get_outbox.assert_any_call(self.nodes[0], "high")
+        self.outbox_manager.get_outbox.assert_any_call(self.nodes[1], "high")
+        self.outboxes[0].send.assert_awaited_once_with("topic", self.encoded_body, qos)
+
+    @pytest.mark.asyncio
+    async def test_send_best_effort_sends_datagrams(self):
+        self.topic_sender.datagram_sender = create_autospec(DatagramSender)
+        self.topic_sender.datagram_sender.send.side_effect = [True, False]
+        qos = TopicQoS(best_effort=True)
+        self.topic_sender.qos_manager.set_qos("topic", qos)
+
+        await self.topic_sender.send("topic", ["arg"], {})
+
+        assert self.topic_sender.datagram_sender.send.await_args_list == [
+            call(self.nodes[0], "topic", self.encoded_body),
+            call(self.nodes[1], "topic", self.encoded_body),
+        ]
+
+        # Falls back to the outbox if the message could not be sent as a datagram
+        self.outboxes[0].send.assert_not_awaited()
+        self.outboxes[1].send.assert_awaited_once_with("topic", self.encoded_body, qos)
+
+    @pytest.mark.asyncio
+    async def test_send_does_not_send_datagrams_if_not_best_effort(self):
+        self.topic_sender.datagram_sender = create_autospec(DatagramSender)
+
+        await self.topic_sender.send("topic", ["arg"], {})
+
+        self.topic_sender.datagram_sender.send.assert_not_awaited()
+        self.outboxes[0].send.assert_awaited_once()
+        self.outboxes[1].send.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_send_multicasts_once_to_nodes_that_joined(self):
+        self.topic_sender.multicast_sender = create_autospec(MulticastSender)
+        self.topic_sender.multicast_sender.send.return_value = True
+        self.nodes.append(mock_node_spec("node2"))
+        self.nodes[0].topic_qos = {"topic": TopicQoS(multicast=True)}
+        self.nodes[2].topic_qos = {"topic": TopicQoS(multicast=True)}
+
+        await self.topic_sender.send("topic", ["arg"], {})
+
+        self.topic_sender.multicast_sender.send.assert_awaited_once_with(
+            "topic", None, self.node_message_codec, self.encoded_body
+        )
+        self.outboxes[0].send.assert_not_awaited()
+        self.outboxes[1].send.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_send_falls_back_to_unicast_if_message_is_not_multicast(self):
+        self.topic_sender.multicast_sender = create_autospec(MulticastSender)
+        self.topic_sender.multicast_sender.send.return_value = False
+        self.nodes[0].topic_qos = {"topic": TopicQoS(multicast=True)}
+
+        await self.topic_sender.send("topic", ["arg"], {})
+
+        self.topic_sender.multicast_sender.send.assert_awaited_once()
+        self.outboxes[0].send.assert_awaited_once()
+        self.outboxes[1].send.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_send_does_not_multicast_if_listeners_use_different_codecs(self):
+        self.topic_sender.multicast_sender = create_autospec(MulticastSender)
+        self.topic_sender.codec_selector = create_autospec(NodeMessageCodecSelector)
+        self.topic_sender.codec_selector.select.side_effect = lambda node: (
+            ("pickle" if node is self.nodes[0] else "msgpack"),
+            self.node_message_codec,
+        )
+        for node in self.nodes:
+            node.topic_qos = {"topic": TopicQoS(multicast=True)}
+
+        await self.topic_sender.send("topic", ["arg"], {})
+
+        self.topic_sender.multicast_sender.send.assert_not_awaited()
+        self.outboxes[0].send.assert_awaited_once()
+        self.outboxes[1].send.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_send_adds_topic_to_topics(self):
+        await self.topic_sender.send("topic", [], {})
+        await self.topic_sender.send_raw("raw-topic", b"payload")
+
+        assert self.topic_sender.topics == {"topic", "raw-topic"}
+
+    def test_get_priorities_returns_qos_priorities_of_topics_sent_to_node(self):
+        self.topic_sender.topics.update({"topic", "high-topic", "other"})
+        self.topic_sender.qos_manager.set_qos("high-topic", TopicQoS(priority="high"))
+        node = self.nodes[0]
+        node.topics = {"topic", "high-topic", "not-sent"}
+
+        assert self.topic_sender.get_priorities(node) == {"normal", "high"}
+
+    def test_get_priorities_skips_topics_node_receives_by_multicast(self):
+        self.topic_sender.topics.add("topic")
+        node = self.nodes[0]
+        node.topics = {"topic"}
+        node.topic_qos = {"topic": TopicQoS(multicast=True)}
+
+        assert self.topic_sender.get_priorities(node) == set()
+
+    @pytest.mark.asyncio
+    async def test_send_delivers_to_in_process_nodes_without_encoding(self):
+        self.topic_sender.in_process_sender = create_autospec(InProcessSender)
+        self.topic_sender.in_process_sender.send.return_value = []
+
+        await self.topic_sender.send("topic", ["arg"], {}, wait=True)
+
+        self.topic_sender.in_process_sender.send.assert_awaited_once_with(
+            self.nodes, "topic", ["arg"], {}, True
+        )
+        self.node_message_codec.encode_topic_message_body.assert_not_awaited()
+        self.outboxes[0].send_and_wait.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_send_sends_to_nodes_not_in_process_over_outboxes(self):
+        self.topic_sender.in_process_sender = create_autospec(InProcessSender)
+        self.topic_sender.in_process_sender.send.return_value = [self.nodes[1]]
+
+        await self.topic_sender.send("topic", ["arg"], {})
+
+        self.outboxes[0].send.assert_not_awaited()
+        self.outboxes[1].send.assert_awaited_once()
+
+    def test_close_closes_datagram_and_multicast_senders(self):
+        self.topic_sender.datagram_sender = create_autospec(DatagramSender)
+        self.topic_sender.multicast_sender = create_autospec(MulticastSender)
+
+        self.topic_sender.close()
+
+        self.topic_sender.datagram_sender.close_all.assert_called_once_with()
+        self.topic_sender.multicast_sender.close.assert_called_once_with()
+
+    def test_close_without_datagram_or_multicast_senders(self):
+        self.topic_sender.close()
+
+    def test_default_qos_manager(self):
+        assert isinstance(self.topic_sender.qos_manager, TopicQoSManager)
@@ -1,3 +1,5 @@
+import asyncio
+import sys
 from asyncio import IncompleteReadError
 from unittest.mock import create_autospec
 
@@ -7,9 +9,13 @@ from rosy.asyncio import (
     BufferReader,
     BufferWriter,
     LockableWriter,
+    SegmentedBuffer,
     Writer,
     close_ignoring_errors,
+    eager_task_factory,
     noop,
+    readexactly_view,
+    run,
 )
 
 
@@ -46,6 +52,78 @@ async def test_noop():
     assert await noop() is None
 
 
+class TestRun:
+    @staticmethod
+    async def get_loop_and_task_factory():
+        loop = asyncio.get_running_loop()
+        return type(loop), loop.get_task_factory()
+
+    def test_runs_on_asyncio_event_loop_by_default(self, monkeypatch):
+        monkeypatch.delenv("ROSY_EVENT_LOOP", raising=False)
+        monkeypatch.delenv("ROSY_EAGER_TASKS", raising=False)
+
+        loop_type, task_factory = run(self.get_loop_and_task_factory())
+
+        assert loop_type.__module__.startswith("asyncio.")
+        assert task_factory is None
+
+    def test_invalid_event_loop_raises_ValueError(self):
+        with pytest.raises(ValueError):
+            run(self.get_loop_and_task_factory(), event_loop="invalid")
+
+    def test_uvloop_not_installed_raises_ImportError(self, monkeypatch):
+        monkeypatch.setitem(sys.modules, "uvloop", None)
+        with pytest.raises(ImportError, match="rosy\\[uvloop\\]"):
+            run(self.get_loop_and_task_factory(), event_loop="uvloop")
+
+    def test_auto_falls_back_to_asyncio_if_uvloop_not_installed(self, monkeypatch):
+        monkeypatch.setitem(sys.modules, "uvloop", None)
+
+        loop_type, _ = run(self.get_loop_and_task_factory(), event_loop="auto")
+
+        assert loop_type.__module__.startswith("asyncio.")
+
+    def test_uses_event_loop_from_env_var(self, monkeypatch):
+        monkeypatch.setitem(sys.modules, "uvloop", None)
+        monkeypatch.setenv("ROSY_EVENT_LOOP", "uvloop")
+        with pytest.raises(ImportError):
+            run(self.get_loop_and_task_factory())
+
+    def test_uvloop(self):
+        uvloop = pytest.importorskip("uvloop")
+
+        loop_type, _ = run(self.get_loop_and_task_factory(), event_loop="uvloop")
+
+        assert loop_type is uvloop.Loop
+
+    @pytest.mark.skipif(sys.version_info < (3, 12), reason="Requires Python 3.12+")
+    @pytest.mark.parametrize("event_loop", ["asyncio", "uvloop"])
+    def test_eager_tasks(self, event_loop: str):
+        if event_loop == "uvloop":
+            pytest.importorskip("uvloop")
+
+        async def main():
+            order = []
+
+            async def task():
+                order.append("task")
+
+            asyncio.create_task(task())
+            order.append("main")
+            return order, asyncio.get_running_loop().get_task_factory()
+
+        order, task_factory = run(main(), event_loop=event_loop, eager_tasks=True)
+
+        assert order == ["task", "main"]
+        assert task_factory is eager_task_factory
+
+    @pytest.mark.skipif(sys.version_info >= (3, 12), reason="Requires Python <3.12")
+    def test_eager_tasks_are_ignored_before_python_3_12(self):
+        _, task_factory = run(self.get_loop_and_task_factory(), eager_tasks=True)
+
+        assert task_factory is None
+
+
 class TestLockableWriter:
     def setup_method(self):
         self.writer = create_autospec(Writer)
@@ -71,6 +149,23 @@ class TestLockableWriter:
 
         self.writer.write.assert_not_called()
 
+    @pytest.mark.asyncio
+    async def test_writelines_succeeds_when_locked(self):
+        async with self.lockable_writer:
+            self.lockable_writer.writelines([b"te", b"st"])
+
+        self.writer.writelines.assert_called_once_with([b"te", b"st"])
+
+    @pytest.mark.asyncio
+    async def test_writelines_fails_when_not_locked(self):
+        with pytest.raises(
+            RuntimeError,
+            match="Writer must be locked before writing",
+        ):
+            self.lockable_writer.writelines([b"test"])
+
+        self.writer.writelines.assert_not_called()
+
     @pytest.mark.asyncio
     async def test_drain(self):
         await self.lockable_writer.drain()
@@ -117,6 +212,26 @@ class TestBufferReader:
             await self.reader.readuntil(b" ")
 
 
+class TestReadexactlyView:
+    @pytest.mark.asyncio
+    async def test_uses_readexactly_view_if_reader_has_it(self):
+        view = memoryview(b"data")
+
+        class ViewReader(BufferReader):
+            async def readexactly_view(self, n: int) -> memoryview:
+                return view
+
+        reader = ViewReader(b"data")
+
+        assert await readexactly_view(reader, 4) is view
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_readexactly(self):
+        reader = BufferReader(b"test data")
+
+        assert await readexactly_view(reader, 4) == b"test"
+
+
 class TestBufferWriter:
     def setup_method(self):
         self.writer = BufferWriter()
@@ -126,6 +241,10 @@ class TestBufferWriter:
         self.writer.write(b" data")
         assert bytes(self.writer) == b"test data"
 
+    def test_writelines(self):
+        self.writer.writelines([b"test", memoryview(b" data")])
+        assert bytes(self.writer) == b"test data"
+
     @pytest.mark.asyncio
     async def test_drain_is_noop(self):
         assert await self.writer.drain() is None
@@ -146,3 +265,47 @@ class TestBufferWriter:
     def test_get_extra_info_not_implemented(self):
         with pytest.raises(NotImplementedError):
             self.writer.get_extra_info("name")
+
+
+class TestSegmentedBuffer:
+    def setup_method(self):
+        self.buffer = SegmentedBuffer()
+
+    def test_segments_without_added_segments_is_the_buffer_itself(self):
+        self.buffer.write(b"test data")
+
+        assert self.buffer.segments() == [self.buffer]
+        assert self.buffer.nbytes == 9
+
+    def test_added_segments_are_not_copied(self):
+        data = bytearray(b"large")
+
+        self.buffer.write(b"head ")
+        self.buffer.add_segment(data)
+        self.buffer.add_segment(memoryview(b" middle "))
+        self.buffer.write(b" tail")
+
+        segments = self.buffer.segments()
+        assert b"".join(segments) == b"head large middle  tail"
+        assert self.buffer.nbytes == len(b"head large middle  tail")
+        assert len(self.buffer) == len(b"head  tail")
+
+        data[:] = b"LARGE"
+        assert segments[1] == b"LARGE"
+
+    def test_segment_at_start_and_end(self):
+        self.buffer.add_segment(b"start")
+        self.buffer.add_segment(b"end")
+
+        assert [bytes(s) for s in self.buffer.segments()] == [b"start", b"end"]
+
+    def test_buffer_cannot_be_resized_while_segments_are_held(self):
+        self.buffer.write(b"head")
+        self.buffer.add_segment(b"segment")
+        segments = self.buffer.segments()
+
+        with pytest.raises(BufferError):
+            self.buffer.write(b"tail")
+
+        del segments
+        self.buffer.write(b"tail")
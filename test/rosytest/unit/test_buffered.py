@@ -0,0 +1,200 @@
+import asyncio
+import socket
+from asyncio import IncompleteReadError
+
+import pytest
+
+from rosy.buffered import (
+    BufferedStreamReader,
+    BufferedStreamWriter,
+    open_connection,
+    open_unix_connection,
+    start_server,
+)
+
+
+class TestConnection:
+    async def connect(self, buffer_size: int):
+        client_sock, server_sock = socket.socketpair(socket.AF_UNIX)
+
+        client_reader, client_writer = await open_unix_connection(
+            sock=client_sock, buffer_size=buffer_size
+        )
+        server_reader, server_writer = await open_unix_connection(
+            sock=server_sock, buffer_size=buffer_size
+        )
+
+        return client_reader, client_writer, server_reader, server_writer
+
+    async def close(self, *writers: BufferedStreamWriter) -> None:
+        for writer in writers:
+            writer.close()
+            await writer.wait_closed()
+
+    @pytest.mark.asyncio
+    async def test_data_is_sent_both_ways(self):
+        client_reader, client_writer, server_reader, server_writer = await self.connect(
+            buffer_size=64
+        )
+
+        client_writer.write(b"hello")
+        await client_writer.drain()
+        assert await server_reader.readexactly(5) == b"hello"
+
+        server_writer.writelines([b"wor", memoryview(b"ld")])
+        await server_writer.drain()
+        assert await client_reader.readexactly(5) == b"world"
+
+        await self.close(client_writer, server_writer)
+
+    @pytest.mark.asyncio
+    async def test_reads_split_across_and_within_buffers(self):
+        client_reader, client_writer, server_reader, server_writer = await self.connect(
+            buffer_size=64
+        )
+
+        data = bytes(range(256)) * 16
+        sizes = [1, 7, 30, 64, 2, 40, 3000, 5, 50, 897]
+
+        async def send():
+            for i in range(0, len(data), 100):
+                client_writer.write(data[i : i + 100])
+                await client_writer.drain()
+
+        async def receive():
+            return [await server_reader.readexactly(size) for size in sizes]
+
+        _, received = await asyncio.wait_for(asyncio.gather(send(), receive()), 5)
+
+        assert b"".join(received) == data
+        assert [len(chunk) for chunk in received] == sizes
+
+        await self.close(client_writer, server_writer)
+
+    @pytest.mark.asyncio
+    async def test_readexactly_view_of_large_read_owns_its_data(self):
+        client_reader, client_writer, server_reader, server_writer = await self.connect(
+            buffer_size=64
+        )
+
+        first, second = b"a" * 1000, b"b" * 1000
+        client_writer.write(first + second)
+        await client_writer.drain()
+
+        first_view = await server_reader.readexactly_view(1000)
+        second_view = await server_reader.readexactly_view(1000)
+
+        assert first_view == first
+        assert second_view == second
+        assert first_view.readonly
+
+        await self.close(client_writer, server_writer)
+
+    @pytest.mark.asyncio
+    async def test_readexactly_view_of_small_read(self):
+        client_reader, client_writer, server_reader, server_writer = await self.connect(
+            buffer_size=64
+        )
+
+        client_writer.write(b"hello world")
+        await client_writer.drain()
+
+        first_view = await server_reader.readexactly_view(6)
+        second_view = await server_reader.readexactly_view(5)
+
+        assert first_view == b"hello "
+        assert second_view == b"world"
+
+        await self.close(client_writer, server_writer)
+
+    @pytest.mark.asyncio
+    async def test_reading_is_paused_until_data_is_read(self):
+        client_reader, client_writer, server_reader, server_writer = await self.connect(
+            buffer_size=64
+        )
+
+        data = bytes(range(256)) * 4
+        client_writer.write(data)
+        await client_writer.drain()
+        await asyncio.sleep(0.01)
+
+        assert server_reader._paused
+        assert server_reader._end - server_reader._start <= 64
+
+        received = await asyncio.wait_for(server_reader.readexactly(len(data)), 5)
+        assert received == data
+
+        await self.close(client_writer, server_writer)
+
+    @pytest.mark.asyncio
+    async def test_reader_raises_IncompleteReadError_when_peer_closes(self):
+        client_reader, client_writer, server_reader, server_writer = await self.connect(
+            buffer_size=64
+        )
+
+        client_writer.write(b"abc")
+        await client_writer.drain()
+        await self.close(client_writer)
+
+        with pytest.raises(IncompleteReadError) as exc_info:
+            await asyncio.wait_for(server_reader.readexactly(5), 5)
+
+        assert exc_info.value.partial == b"abc"
+
+        await self.close(server_writer)
+
+    @pytest.mark.asyncio
+    async def test_large_read_raises_IncompleteReadError_when_peer_closes(self):
+        client_reader, client_writer, server_reader, server_writer = await self.connect(
+            buffer_size=64
+        )
+
+        client_writer.write(b"x" * 100)
+        await client_writer.drain()
+        await self.close(client_writer)
+
+        with pytest.raises(IncompleteReadError) as exc_info:
+            await asyncio.wait_for(server_reader.readexactly_view(1000), 5)
+
+        assert exc_info.value.partial == b"x" * 100
+
+        await self.close(server_writer)
+
+    @pytest.mark.asyncio
+    async def test_drain_raises_ConnectionResetError_after_connection_lost(self):
+        client_reader, client_writer, server_reader, server_writer = await self.connect(
+            buffer_size=64
+        )
+
+        await self.close(server_writer)
+        await self.close(client_writer)
+
+        client_writer.write(b"abc")
+        with pytest.raises(ConnectionResetError):
+            await client_writer.drain()
+
+
+class TestServer:
+    @pytest.mark.asyncio
+    async def test_client_connected_cb_gets_buffered_reader_and_writer(self):
+        async def echo(reader, writer):
+            assert isinstance(reader, BufferedStreamReader)
+            assert isinstance(writer, BufferedStreamWriter)
+
+            writer.write(await reader.readexactly(5))
+            await writer.drain()
+            writer.close()
+
+        server = await start_server(echo, host="127.0.0.1", port=0)
+        port = server.sockets[0].getsockname()[1]
+
+        reader, writer = await open_connection("127.0.0.1", port)
+        writer.write(b"hello")
+        await writer.drain()
+
+        assert await asyncio.wait_for(reader.readexactly(5), 5) == b"hello"
+
+        writer.close()
+        await writer.wait_closed()
+        server.close()
+        await server.wait_closed()
@@ -1,16 +1,20 @@
+import os
 import pickle
-from unittest.mock import ANY, AsyncMock, call, patch
+from asyncio import IncompleteReadError
+from unittest.mock import ANY, AsyncMock, Mock, call, patch
 
 import pytest
 
-from rosy.asyncio import Reader, Writer
+from rosy.asyncio import BufferReader, BufferWriter, Reader, SegmentedBuffer, Writer
 from rosy.codec import (
     Codec,
+    CompressedCodec,
     DictCodec,
     FixedLengthIntCodec,
     JsonCodec,
     LengthPrefixedStringCodec,
     MsgpackCodec,
+    NumpyCodec,
     PickleCodec,
     SequenceCodec,
     VariableLengthIntCodec,
@@ -406,6 +410,104 @@ class TestPickleCodec(CodecTest):
         )
 
 
+class TestOutOfBandPickleCodec:
+    def setup_method(self):
+        self.codec = PickleCodec(out_of_band=True, min_out_of_band_size=10)
+
+    def test_requires_protocol_5(self):
+        with pytest.raises(ValueError, match="out_of_band requires pickle protocol"):
+            PickleCodec(protocol=4, out_of_band=True)
+
+    @pytest.mark.parametrize(
+        "obj",
+        [
+            None,
+            b"small",
+            b"large bytes value",
+            bytearray(b"large bytearray value"),
+            {"key": [b"large bytes value", "value"]},
+        ],
+    )
+    @pytest.mark.asyncio
+    async def test_round_trip(self, obj):
+        buffer = bytearray()
+        self.codec.encode_into(buffer, obj)
+
+        writer = BufferWriter()
+        await self.codec.encode(writer, obj)
+        assert writer == buffer
+
+        result, offset = self.codec.decode_from(memoryview(bytes(buffer)))
+        assert result == obj
+        assert type(result) is type(obj)
+        assert offset == len(buffer)
+
+        assert await self.codec.decode(BufferReader(bytes(buffer))) == obj
+
+    @pytest.mark.parametrize(
+        "value",
+        [
+            memoryview(b"large memoryview value"),
+            memoryview(bytearray(b"large writable memoryview value")),
+        ],
+    )
+    def test_large_buffers_are_not_copied_into_pickle_data(self, value):
+
+        buffer = bytearray()
+        self.codec.encode_into(buffer, value)
+
+        data_len = int.from_bytes(buffer[:4], "little")
+        data = buffer[4 : 4 + data_len]
+        assert bytes(value) not in data
+        assert buffer.endswith(value)
+
+    @pytest.mark.asyncio
+    async def test_large_buffers_are_not_copied_into_segmented_buffer(self):
+        value = bytearray(b"large writable memoryview value")
+
+        buffer = SegmentedBuffer()
+        self.codec.encode_into(buffer, memoryview(value))
+        writer = SegmentedBuffer()
+        await self.codec.encode(writer, memoryview(value))
+
+        segments_list = [buffer.segments(), writer.segments()]
+        value[:5] = b"LARGE"
+
+        for segments in segments_list:
+            assert len(segments) == 2
+            assert segments[1] == value
+
+            result, _ = self.codec.decode_from(memoryview(b"".join(segments)))
+            assert result == value
+
+    def test_memoryview_is_decoded_without_copy(self):
+        value = memoryview(b"large memoryview value")
+
+        buffer = bytearray()
+        self.codec.encode_into(buffer, value)
+        data = memoryview(bytes(buffer))
+
+        result, _ = self.codec.decode_from(data)
+
+        assert isinstance(result, memoryview)
+        assert result == value
+        assert result.obj is data.obj
+
+    def test_numpy_array_is_decoded_without_copy(self):
+        np = pytest.importorskip("numpy")
+
+        value = np.arange(100, dtype=np.float32)
+
+        buffer = bytearray()
+        self.codec.encode_into(buffer, value)
+        data = bytes(buffer)
+
+        result, _ = self.codec.decode_from(memoryview(data))
+
+        assert np.array_equal(result, value)
+        assert np.shares_memory(result, np.frombuffer(data, dtype=np.uint8))
+
+
 class TestJsonCodec(CodecTest):
     def setup_method(self):
         super().setup_method()
@@ -482,3 +584,260 @@ class TestMsgpackCodec(CodecTest):
             (self.reader.readexactly, call(4)),
             (unpackb, call(b"data")),
         )
+
+
+class TestSyncCodecs:
+    @pytest.mark.parametrize(
+        "codec, obj",
+        [
+            (FixedLengthIntCodec(length=2), 256),
+            (VariableLengthIntCodec(), 0),
+            (VariableLengthIntCodec(), 65535),
+            (LengthPrefixedStringCodec(FixedLengthIntCodec(length=1)), ""),
+            (LengthPrefixedStringCodec(FixedLengthIntCodec(length=1)), "héllo"),
+            (SequenceCodec(FixedLengthIntCodec(length=1), PickleCodec()), [1, "a"]),
+            (
+                DictCodec(
+                    FixedLengthIntCodec(length=1),
+                    LengthPrefixedStringCodec(FixedLengthIntCodec(length=1)),
+                    JsonCodec(),
+                ),
+                {"key": [1, 2]},
+            ),
+            (PickleCodec(), {"key": b"value"}),
+            (JsonCodec(), {"key": "value"}),
+            (MsgpackCodec(), {"key": b"value"}),
+        ],
+    )
+    @pytest.mark.asyncio
+    async def test_sync_and_async_are_equivalent(self, codec: Codec, obj):
+        assert codec.supports_sync
+
+        buffer = bytearray(b"?")
+        assert codec.encode_into(buffer, obj) is None
+
+        writer = BufferWriter(b"?")
+        await codec.encode(writer, obj)
+        assert buffer == writer
+
+        data = memoryview(bytes(buffer) + b"!")
+        result, offset = codec.decode_from(data, 1)
+        assert result == obj
+        assert offset == len(buffer)
+
+        assert await codec.decode(BufferReader(data[1:])) == obj
+
+    def test_decode_from_raises_IncompleteReadError_if_data_too_short(self):
+        codec = FixedLengthIntCodec(length=2)
+
+        with pytest.raises(IncompleteReadError):
+            codec.decode_from(memoryview(b"\x00\x01"), 1)
+
+    def test_composite_codec_does_not_support_sync_if_child_does_not(self):
+        codec = SequenceCodec(FixedLengthIntCodec(length=1), AsyncOnlyCodec())
+        assert not codec.supports_sync
+
+    def test_async_only_codec_raises_NotImplementedError(self):
+        codec = AsyncOnlyCodec()
+
+        with pytest.raises(NotImplementedError):
+            codec.encode_into(bytearray(), "data")
+
+        with pytest.raises(NotImplementedError):
+            codec.decode_from(memoryview(b""))
+
+
+class AsyncOnlyCodec(Codec[str]):
+    async def encode(self, writer: Writer, obj: str) -> None: ...
+
+    async def decode(self, reader: Reader) -> str: ...
+
+
+class AsyncOnlyIntCodec(Codec[int]):
+    def __init__(self):
+        self.codec = FixedLengthIntCodec(length=4)
+
+    async def encode(self, writer: Writer, obj: int) -> None:
+        await self.codec.encode(writer, obj)
+
+    async def decode(self, reader: Reader) -> int:
+        return await self.codec.decode(reader)
+
+
+class TestNumpyCodec:
+    def setup_method(self):
+        self.np = pytest.importorskip("numpy")
+        self.codec = NumpyCodec()
+
+    @pytest.mark.parametrize(
+        "make_array",
+        [
+            lambda np: np.arange(12, dtype="<f4").reshape(3, 4),
+            lambda np: np.asfortranarray(np.arange(6).reshape(2, 3)),
+            lambda np: np.arange(20)[::2],
+            lambda np: np.array(5.0),
+            lambda np: np.zeros((0, 3), dtype=np.uint8),
+            lambda np: np.array(["2020-01-01"], dtype="datetime64[ns]"),
+        ],
+    )
+    @pytest.mark.asyncio
+    async def test_array_round_trip(self, make_array):
+        array = make_array(self.np)
+
+        buffer = bytearray()
+        self.codec.encode_into(buffer, array)
+
+        writer = BufferWriter()
+        await self.codec.encode(writer, array)
+        assert writer == buffer
+
+        for result in [
+            self.codec.decode_from(memoryview(bytes(buffer)))[0],
+            await self.codec.decode(BufferReader(bytes(buffer))),
+        ]:
+            assert result.dtype == array.dtype
+            assert result.shape == array.shape
+            assert self.np.array_equal(result, array)
+
+    def test_array_is_decoded_without_copy(self):
+        array = self.np.arange(100, dtype=self.np.float64)
+
+        buffer = bytearray()
+        self.codec.encode_into(buffer, array)
+        data = bytes(buffer)
+
+        result, offset = self.codec.decode_from(memoryview(data))
+
+        assert offset == len(data)
+        assert self.np.shares_memory(
+            result, self.np.frombuffer(data, dtype=self.np.uint8)
+        )
+
+    @pytest.mark.asyncio
+    async def test_array_data_is_not_copied_into_segmented_buffer(self):
+        array = self.np.arange(100, dtype=self.np.float64)
+
+        buffer = SegmentedBuffer()
+        self.codec.encode_into(buffer, array)
+        writer = SegmentedBuffer()
+        await self.codec.encode(writer, array)
+
+        for segments in (buffer.segments(), writer.segments()):
+            header, data = segments
+            assert self.np.shares_memory(array, self.np.frombuffer(data))
+
+            result, _ = self.codec.decode_from(memoryview(b"".join(segments)))
+            assert self.np.array_equal(result, array)
+
+    @pytest.mark.parametrize(
+        "obj",
+        [
+            None,
+            {"key": "value"},
+            [1, 2, 3],
+        ],
+    )
+    @pytest.mark.asyncio
+    async def test_non_arrays_use_fallback_codec(self, obj):
+        buffer = bytearray()
+        self.codec.encode_into(buffer, obj)
+
+        assert buffer[:1] == b"\x00"
+        assert self.codec.decode_from(memoryview(bytes(buffer)))[0] == obj
+        assert await self.codec.decode(BufferReader(bytes(buffer))) == obj
+
+    def test_object_arrays_use_fallback_codec(self):
+        array = self.np.array([1, "a"], dtype=object)
+
+        buffer = bytearray()
+        self.codec.encode_into(buffer, array)
+
+        assert buffer[:1] == b"\x00"
+        result, _ = self.codec.decode_from(memoryview(bytes(buffer)))
+        assert list(result) == [1, "a"]
+
+    def test_decode_unknown_tag_raises_ValueError(self):
+        with pytest.raises(ValueError, match="Received unknown tag="):
+            self.codec.decode_from(memoryview(b"?"))
+
+
+class TestCompressedCodec:
+    def setup_method(self):
+        self.codec = CompressedCodec(PickleCodec(), min_size=100)
+
+    def test_unknown_algorithm_raises_ValueError(self):
+        with pytest.raises(ValueError, match="algorithm must be one of"):
+            CompressedCodec(PickleCodec(), algorithm="unknown")
+
+    @pytest.mark.parametrize("algorithm", ["zlib", "lzma"])
+    @pytest.mark.parametrize("obj", ["small", "large" * 100, list(range(1000))])
+    @pytest.mark.asyncio
+    async def test_round_trip(self, algorithm, obj):
+        codec = CompressedCodec(PickleCodec(), algorithm=algorithm, min_size=100)
+
+        buffer = bytearray()
+        codec.encode_into(buffer, obj)
+
+        writer = BufferWriter()
+        await codec.encode(writer, obj)
+        assert writer == buffer
+
+        result, offset = codec.decode_from(memoryview(bytes(buffer) + b"!"))
+        assert result == obj
+        assert offset == len(buffer)
+
+        assert await codec.decode(BufferReader(bytes(buffer))) == obj
+
+    @pytest.mark.parametrize("obj", ["small", "large" * 100])
+    @pytest.mark.asyncio
+    async def test_round_trip_with_async_only_len_header_codec(self, obj):
+        codec = CompressedCodec(
+            PickleCodec(), min_size=100, len_header_codec=AsyncOnlyIntCodec()
+        )
+        assert not codec.supports_sync
+
+        writer = BufferWriter()
+        await codec.encode(writer, obj)
+
+        expected = bytearray()
+        self.codec.encode_into(expected, obj)
+        assert writer == expected
+
+        assert await codec.decode(BufferReader(bytes(writer))) == obj
+
+    def test_small_data_is_not_compressed(self):
+        buffer = bytearray()
+        self.codec.encode_into(buffer, "small")
+
+        assert buffer[:1] == b"\x00"
+
+    def test_large_data_is_compressed(self):
+        buffer = bytearray()
+        self.codec.encode_into(buffer, "large" * 100)
+
+        assert buffer[:1] == b"\x01"
+        assert len(buffer) < 500
+
+    def test_incompressible_data_is_not_compressed(self):
+        buffer = bytearray()
+        self.codec.encode_into(buffer, os.urandom(1000))
+
+        assert buffer[:1] == b"\x00"
+
+    def test_adaptive_mode_skips_compression_when_ratio_is_poor(self):
+        codec = CompressedCodec(
+            PickleCodec(), min_size=100, adaptive=True, skip_count=1
+        )
+
+        compress = Mock(return_value=b"x" * 1000)
+        codec._compression = codec._compression._replace(compress=compress)
+
+        codec.encode_into(bytearray(), os.urandom(1000))
+        codec.encode_into(bytearray(), os.urandom(1000))  # Skipped
+        codec.encode_into(bytearray(), os.urandom(1000))
+
+        assert compress.call_count == 2
+
+    def test_decode_unknown_tag_raises_ValueError(self):
+        with pytest.raises(ValueError, match="Received unknown compression tag="):
+            self.codec.decode_from(memoryview(b"?"))
@@ -0,0 +1,269 @@
+import asyncio
+import socket
+from asyncio import IncompleteReadError
+from unittest.mock import patch
+
+import pytest
+
+from rosy.shm import SharedMemoryRing, accept, connect, is_supported_platform
+
+
+@pytest.mark.parametrize(
+    "machine, expected",
+    [
+        ("x86_64", True),
+        ("AMD64", True),
+        ("i686", True),
+        ("aarch64", False),
+        ("arm64", False),
+    ],
+)
+def test_is_supported_platform(machine: str, expected: bool):
+    with patch("rosy.shm.platform.machine", return_value=machine):
+        assert is_supported_platform() is expected
+
+
+class TestSharedMemoryRing:
+    def setup_method(self):
+        self.ring = SharedMemoryRing.create(capacity=8)
+        self.peer = SharedMemoryRing.attach(self.ring.name, capacity=8)
+
+    def teardown_method(self):
+        self.peer.close()
+        self.ring.unlink()
+        self.ring.close()
+
+    def test_initially_empty(self):
+        assert self.ring.readable() == 0
+        assert self.ring.writable() == 8
+        assert self.peer.read(8) == b""
+
+    def test_data_written_is_visible_to_peer(self):
+        assert self.ring.write(memoryview(b"abc")) == 3
+
+        assert self.peer.readable() == 3
+        assert self.peer.read(8) == b"abc"
+        assert self.ring.writable() == 8
+
+    def test_write_returns_amount_that_fits(self):
+        assert self.ring.write(memoryview(b"0123456789")) == 8
+        assert self.ring.write(memoryview(b"x")) == 0
+
+        assert self.peer.read(10) == b"01234567"
+
+    def test_read_and_write_wrap_around(self):
+        self.ring.write(memoryview(b"012345"))
+        assert self.peer.read(4) == b"0123"
+
+        assert self.ring.write(memoryview(b"abcdef")) == 6
+
+        assert self.peer.read(8) == b"45abcdef"
+
+    def test_read_into(self):
+        self.ring.write(memoryview(b"012345"))
+        self.peer.read(4)
+        self.ring.write(memoryview(b"abcdef"))
+
+        target = bytearray(10)
+        assert self.peer.read_into(memoryview(target)) == 8
+        assert target == b"45abcdef\x00\x00"
+        assert self.peer.readable() == 0
+
+    def test_waiting_flags(self):
+        assert not self.peer.reader_waiting
+        assert not self.peer.writer_waiting
+
+        self.ring.reader_waiting = True
+        assert self.peer.reader_waiting
+        assert not self.peer.writer_waiting
+
+        self.ring.writer_waiting = True
+        self.ring.reader_waiting = False
+        assert not self.peer.reader_waiting
+        assert self.peer.writer_waiting
+
+    def test_closed_ring_is_empty_and_cannot_be_written(self):
+        self.ring.write(memoryview(b"abc"))
+        self.peer.close()
+
+        assert self.peer.readable() == 0
+        assert self.peer.writable() == 0
+
+        with pytest.raises(ConnectionResetError):
+            self.peer.write(memoryview(b"abc"))
+
+
+class TestConnection:
+    async def connect(self, capacity: int):
+        client_sock, server_sock = socket.socketpair(socket.AF_UNIX)
+
+        client = await asyncio.open_unix_connection(sock=client_sock)
+        server = await asyncio.open_unix_connection(sock=server_sock)
+
+        (client_reader, client_writer), (server_reader, server_writer) = (
+            await asyncio.gather(
+                connect(*client, capacity=capacity),
+                accept(*server, capacity=capacity),
+            )
+        )
+
+        return client_reader, client_writer, server_reader, server_writer
+
+    @pytest.mark.asyncio
+    async def test_data_is_sent_both_ways(self):
+        client_reader, client_writer, server_reader, server_writer = await self.connect(
+            capacity=64
+        )
+
+        client_writer.write(b"hello")
+        await client_writer.drain()
+        assert await server_reader.readexactly(5) == b"hello"
+
+        server_writer.write(b"world")
+        await server_writer.drain()
+        assert await client_reader.readexactly(5) == b"world"
+
+        client_writer.close()
+        await client_writer.wait_closed()
+        server_writer.close()
+        await server_writer.wait_closed()
+
+    @pytest.mark.asyncio
+    async def test_writelines(self):
+        client_reader, client_writer, server_reader, server_writer = await self.connect(
+            capacity=64
+        )
+
+        client_writer.writelines([b"hello ", memoryview(b"world")])
+        await client_writer.drain()
+        assert await server_reader.readexactly(11) == b"hello world"
+
+        client_writer.close()
+        await client_writer.wait_closed()
+        server_writer.close()
+        await server_writer.wait_closed()
+
+    @pytest.mark.asyncio
+    async def test_messages_larger_than_capacity(self):
+        client_reader, client_writer, server_reader, server_writer = await self.connect(
+            capacity=64
+        )
+
+        data = bytes(range(256)) * 4
+
+        async def send():
+            for _ in range(3):
+                client_writer.write(data)
+                await client_writer.drain()
+
+        async def receive():
+            return [await server_reader.readexactly(len(data)) for _ in range(3)]
+
+        _, received = await asyncio.wait_for(asyncio.gather(send(), receive()), 5)
+
+        assert received == [data, data, data]
+
+        client_writer.close()
+        await client_writer.wait_closed()
+        server_writer.close()
+        await server_writer.wait_closed()
+
+    @pytest.mark.asyncio
+    async def test_readexactly_view(self):
+        client_reader, client_writer, server_reader, server_writer = await self.connect(
+            capacity=64
+        )
+
+        data = bytes(range(256)) * 4
+
+        async def send():
+            client_writer.write(b"small")
+            client_writer.write(data)
+            await client_writer.drain()
+
+        async def receive():
+            return [
+                await server_reader.readexactly_view(5),
+                await server_reader.readexactly_view(len(data)),
+            ]
+
+        _, (small, large) = await asyncio.wait_for(asyncio.gather(send(), receive()), 5)
+
+        assert small == b"small"
+        assert large == data
+        assert large.readonly
+
+        client_writer.close()
+        await client_writer.wait_closed()
+        server_writer.close()
+        await server_writer.wait_closed()
+
+    @pytest.mark.asyncio
+    async def test_reader_raises_IncompleteReadError_when_peer_closes(self):
+        client_reader, client_writer, server_reader, server_writer = await self.connect(
+            capacity=64
+        )
+
+        client_writer.write(b"abc")
+        await client_writer.drain()
+        client_writer.close()
+        await client_writer.wait_closed()
+
+        with pytest.raises(IncompleteReadError) as exc_info:
+            await asyncio.wait_for(server_reader.readexactly(5), 5)
+
+        assert exc_info.value.partial == b"abc"
+        assert server_writer.is_closing()
+
+        server_writer.close()
+        await server_writer.wait_closed()
+
+    @pytest.mark.asyncio
+    async def test_missed_reader_wakeup_is_recovered_within_poll_interval(self):
+        client_reader, client_writer, server_reader, server_writer = await self.connect(
+            capacity=64
+        )
+        server_reader.channel.poll_interval = 0.05
+
+        read = asyncio.create_task(server_reader.readexactly(5))
+        await asyncio.sleep(0.01)
+        assert server_reader.channel.inbound.reader_waiting
+
+        # Write without waking up the reader, like when the wakeup is missed
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        client_writer.channel.outbound.write(memoryview(b"hello"))
+
+        assert await asyncio.wait_for(read, 1) == b"hello"
+        assert loop.time() - start < 0.05 + 0.2
+
+        client_writer.close()
+        await client_writer.wait_closed()
+        server_writer.close()
+        await server_writer.wait_closed()
+
+    @pytest.mark.asyncio
+    async def test_missed_writer_wakeup_is_recovered_within_poll_interval(self):
+        client_reader, client_writer, server_reader, server_writer = await self.connect(
+            capacity=64
+        )
+        client_writer.channel.poll_interval = 0.05
+
+        client_writer.write(bytes(64 + 5))
+        drain = asyncio.create_task(client_writer.drain())
+        await asyncio.sleep(0.01)
+        assert client_writer.channel.outbound.writer_waiting
+
+        # Read without waking up the writer, like when the wakeup is missed
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        assert server_reader.channel.inbound.read(64) == bytes(64)
+
+        await asyncio.wait_for(drain, 1)
+        assert loop.time() - start < 0.05 + 0.2
+        assert await server_reader.readexactly(5) == bytes(5)
+
+        client_writer.close()
+        await client_writer.wait_closed()
+        server_writer.close()
+        await server_writer.wait_closed()
@@ -1,6 +1,6 @@
 import pytest
 
-from rosy.utils import require
+from rosy.utils import get_eager_tasks, get_event_loop_name, require
 
 
 def test_require_returns_None_given_True():
@@ -14,3 +14,40 @@ def test_require_raises_ValueError_given_False():
 
     with pytest.raises(ValueError, match="foo"):
         require(False, message="foo")
+
+
+def test_get_event_loop_name_returns_default_if_env_var_not_set(monkeypatch):
+    monkeypatch.delenv("ROSY_EVENT_LOOP", raising=False)
+
+    assert get_event_loop_name() == "asyncio"
+    assert get_event_loop_name(default="auto") == "auto"
+
+
+def test_get_event_loop_name_returns_env_var(monkeypatch):
+    monkeypatch.setenv("ROSY_EVENT_LOOP", "uvloop")
+
+    assert get_event_loop_name() == "uvloop"
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("1", True),
+        ("true", True),
+        ("Yes", True),
+        ("0", False),
+        ("false", False),
+        ("", False),
+    ],
+)
+def test_get_eager_tasks_returns_env_var(monkeypatch, value: str, expected: bool):
+    monkeypatch.setenv("ROSY_EAGER_TASKS", value)
+
+    assert get_eager_tasks() is expected
+
+
+def test_get_eager_tasks_returns_default_if_env_var_not_set(monkeypatch):
+    monkeypatch.delenv("ROSY_EAGER_TASKS", raising=False)
+
+    assert get_eager_tasks() is False
+    assert get_eager_tasks(default=True) is True
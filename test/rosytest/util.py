@@ -12,4 +12,7 @@ def mock_node_spec(name: str = "node"):
     node = create_autospec(MeshNodeSpec)
     node.id = NodeId(name)
     node.connection_specs = [create_autospec(IpConnectionSpec)]
+    node.data_codecs = ()
+    node.features = frozenset()
+    node.topic_qos = {}
     return node